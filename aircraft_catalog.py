@@ -0,0 +1,159 @@
+"""
+aircraft_catalog.py — Flat aircraft catalogue index with aliases and typeahead.
+
+config.AIRCRAFT_SIZES is nested by category ({'GA Aircraft': {'Cessna 172':
+{...}}}). Looking a type up meant looping over every category, and pages
+embedded the whole structure. The catalogue is flattened once per config
+into
+
+    by key      normalised name or alias → AircraftType      get()  O(1)
+    sorted keys (key, name) for every name, word suffix and alias
+                                                              search() bisect
+
+Keys are upper-case alphanumerics ("Van's RV-10" → VANSRV10). Aliases are
+derived from the names — the first model token ("172", "PA28", "SR22"), a
+Cessna "C" prefix ("C172") — plus ICAO type designators in DESIGNATORS. An
+alias shared by several types goes to the one named by it alone ("DA42" is
+the Diamond DA42, not the DA42 L360) or is dropped rather than guessed.
+
+search() ranks exact matches, then prefixes of the name or an alias, then
+prefixes of a later word ("cherokee"), then difflib close matches against
+all of those keys for typos ("bonanaz").
+
+Usage:
+    from aircraft_catalog import get, search
+    get('c-172').name                   # 'Cessna 172'
+    search('sr2', limit=5)              # [AircraftType('Cirrus SR20', ...), ...]
+"""
+
+import bisect
+import difflib
+import logging
+import re
+from collections import defaultdict, namedtuple
+
+logger = logging.getLogger(__name__)
+
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+FUZZY_CUTOFF = 0.6
+
+# ICAO type designators whose spelling can't be derived from the catalogue name
+DESIGNATORS = {
+    'P28A': 'Piper PA-28 Cherokee',
+    'BE36': 'Beechcraft Bonanza',
+    'BE55': 'Beechcraft Baron 55',
+    'BE58': 'Beechcraft Baron 58',
+    'BE9L': 'Beechcraft King Air 90',
+    'BE20': 'Beechcraft King Air B200',
+    'B350': 'Beechcraft King Air 350',
+    'P46T': 'Piper PA-46-500TP Meridian',
+    'E50P': 'Embraer Phenom 100',
+    'E55P': 'Embraer Phenom 300',
+    'HDJT': 'HondaJet HA-420',
+    'C25C': 'Cessna Citation CJ4',
+    'C208': 'Cessna 208 Caravan',
+}
+_MANUFACTURER_PREFIX = {'CESSNA': 'C'}
+
+AircraftType = namedtuple('AircraftType', 'name category length wingspan height')
+
+
+def normalize(text) -> str:
+    return re.sub(r'[^A-Z0-9]', '', str(text or '').upper())
+
+
+class Catalog:
+
+    def __init__(self, sizes: dict):
+        self.types = {}
+        for category, models in sizes.items():
+            for name, dims in models.items():
+                self.types[name] = AircraftType(name, category, float(dims['length']),
+                                                float(dims['wingspan']), float(dims.get('height') or 0))
+
+        exact, aliases = {}, defaultdict(set)
+        for name in self.types:
+            exact[normalize(name)] = name
+            words = name.split()
+            if len(words) > 1:
+                model = normalize(words[1])
+                if any(ch.isdigit() for ch in model):
+                    plain = len(words) == 2
+                    aliases[model].add((name, plain))
+                    prefix = _MANUFACTURER_PREFIX.get(normalize(words[0]))
+                    if prefix and model[:1].isdigit():
+                        aliases[prefix + model].add((name, plain))
+        self.by_key = dict(exact)
+        for key, named in aliases.items():
+            plain = [name for name, is_plain in named if is_plain]
+            target = next(iter(named))[0] if len(named) == 1 else (plain[0] if len(plain) == 1 else None)
+            if target and key not in self.by_key:
+                self.by_key[key] = target
+        for code, name in DESIGNATORS.items():
+            if name in self.types:
+                self.by_key[code] = name
+
+        # Prefix index: whole keys (rank 1) and later-word suffixes of the name (rank 2)
+        entries = {(key, name, 1) for key, name in self.by_key.items()}
+        for name in self.types:
+            words = name.split()
+            for i in range(1, len(words)):
+                entries.add((normalize(''.join(words[i:])), name, 2))
+        self._sorted = sorted(entries)
+        self._keys = [e[0] for e in self._sorted]
+        self._fuzzy = defaultdict(list)
+        for key, name, rank in self._sorted:
+            self._fuzzy[key].append(name)
+
+    def get(self, name):
+        """AircraftType for an exact name or alias (any case or punctuation), else None."""
+        if name in self.types:
+            return self.types[name]
+        found = self.by_key.get(normalize(name))
+        return self.types[found] if found else None
+
+    def search(self, query, limit: int = SEARCH_LIMIT) -> list:
+        q = normalize(query)
+        if not q:
+            return []
+        ranked = {}
+        exact = self.by_key.get(q)
+        if exact:
+            ranked[exact] = 0
+        for i in range(bisect.bisect_left(self._keys, q), len(self._keys)):
+            key, name, rank = self._sorted[i]
+            if not key.startswith(q):
+                break
+            ranked[name] = min(ranked.get(name, rank), rank)
+        ranked = {name: (rank, len(name), name) for name, rank in ranked.items()}
+        if len(ranked) < limit:
+            # Typos: closest first
+            close = difflib.get_close_matches(q, self._fuzzy, n=limit, cutoff=FUZZY_CUTOFF)
+            for i, key in enumerate(close):
+                for name in self._fuzzy[key]:
+                    ranked.setdefault(name, (3, i, len(name), name))
+        names = sorted(ranked, key=ranked.get)
+        return [self.types[n] for n in names[:limit]]
+
+
+_catalog = (None, None)     # (AIRCRAFT_SIZES it was built from, Catalog)
+
+
+def catalog() -> Catalog:
+    """The catalogue for the current app's AIRCRAFT_SIZES, built on first use."""
+    global _catalog
+    from flask import current_app
+    sizes = current_app.config.get('AIRCRAFT_SIZES', {})
+    if _catalog[0] is not sizes:
+        _catalog = (sizes, Catalog(sizes))
+        logger.info(f"[AIRCRAFT] catalogue indexed — {len(_catalog[1].types)} types, {len(_catalog[1].by_key)} keys")
+    return _catalog[1]
+
+
+def get(name):
+    return catalog().get(name)
+
+
+def search(query, limit: int = SEARCH_LIMIT) -> list:
+    return catalog().search(query, limit)
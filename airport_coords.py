@@ -22,6 +22,10 @@ import time
 from pathlib import Path
 from typing import Optional, Tuple
 
+import requests
+
+from integrations import IntegrationError, client
+
 logger = logging.getLogger(__name__)
 
 # ── Fallback coordinates for when CSV is unavailable ─────────────────────────
@@ -207,24 +211,27 @@ def _load_from_file(path: Path) -> Optional[dict[str, tuple[float, float]]]:
 
 
 def _load_from_url(url: str) -> Optional[dict[str, tuple[float, float]]]:
-    """Try to download CSV from OurAirports CDN."""
-    import urllib.request
+    """Try to download CSV from OurAirports CDN (None if the download fails)."""
+    logger.info(f"[AIRPORT-COORDS] downloading from {url} …")
+    t0 = time.time()
+    try:
+        resp = client("ourairports").get(url)
+        resp.raise_for_status()
+    except (requests.RequestException, IntegrationError) as exc:
+        logger.warning(f"[AIRPORT-COORDS] download failed: {exc}")
+        return None
+    raw = resp.content.decode("utf-8")
+    elapsed = time.time() - t0
+    data = _load_csv_stream(io.StringIO(raw))
+    logger.info(f"[AIRPORT-COORDS] downloaded {len(data):,} airports in {elapsed:.1f}s")
+    # Cache to disk for next startup (the download is still used if that fails)
     try:
-        logger.info(f"[AIRPORT-COORDS] downloading from {url} …")
-        t0 = time.time()
-        with urllib.request.urlopen(url, timeout=15) as resp:
-            raw = resp.read().decode("utf-8")
-        elapsed = time.time() - t0
-        data = _load_csv_stream(io.StringIO(raw))
-        logger.info(f"[AIRPORT-COORDS] downloaded {len(data):,} airports in {elapsed:.1f}s")
-        # Cache to disk for next startup
         CSV_LOCAL_PATH.parent.mkdir(parents=True, exist_ok=True)
         CSV_LOCAL_PATH.write_text(raw, encoding="utf-8")
         logger.info(f"[AIRPORT-COORDS] saved to {CSV_LOCAL_PATH} for future startups")
-        return data
-    except Exception as exc:
-        logger.warning(f"[AIRPORT-COORDS] download failed: {exc}")
-        return None
+    except OSError as exc:
+        logger.warning(f"[AIRPORT-COORDS] could not save {CSV_LOCAL_PATH}: {exc}")
+    return data
 
 
 def load_airport_coords() -> None:
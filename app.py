@@ -83,6 +83,10 @@ def create_app(config_class=Config):
     
     app.limiter = limiter
 
+    # One outbound layer for weather, FBO, airport data, the concierge LLM and Stripe
+    import integrations
+    integrations.init_app(app)
+
     # Stripe Configuration
     s_key = app.config.get('STRIPE_SECRET_KEY')
     p_key = app.config.get('STRIPE_PUBLISHABLE_KEY')
@@ -168,11 +172,22 @@ def create_app(config_class=Config):
                 ('hurricane_tiedowns', 'BOOLEAN DEFAULT FALSE'),
                 ('ramp_cam_url', 'TEXT'),
                 ('tail_height_clearance', 'FLOAT'),
+                ('hangar_width_ft', 'FLOAT'),
+                ('hangar_depth_ft', 'FLOAT'),
+                ('door_width_ft', 'FLOAT'),
+                ('door_height_ft', 'FLOAT'),
+                ('fit_long_ft', 'FLOAT'),
+                ('fit_short_ft', 'FLOAT'),
+                ('fit_span_ft', 'FLOAT'),
+                ('fit_height_ft', 'FLOAT'),
                 ('nfpa_409_compliant', 'BOOLEAN DEFAULT FALSE'),
                 ('floor_loading_pcn', 'TEXT'),
                 ('gpu_power_available', 'BOOLEAN DEFAULT FALSE'),
                 ('shuttle_info', 'VARCHAR(255)'),
                 ('is_verified', 'BOOLEAN DEFAULT FALSE'),
+                ('ai_suggested_price', 'FLOAT'),
+                ('ai_model_version', 'VARCHAR(32)'),
+                ('version', 'INTEGER NOT NULL DEFAULT 0'),
             ]:
                 safe_add_column('listings', col_name, col_type)
 
@@ -193,9 +208,46 @@ def create_app(config_class=Config):
                 ('lease_pdf_path', 'TEXT'),
                 ('sign_token_owner', 'TEXT'),
                 ('sign_token_renter', 'TEXT'),
+                ('footprint_sqft', 'FLOAT'),
+                ('hold_expires_at', 'TIMESTAMP'),
+                ('aircraft_type', 'VARCHAR(100)'),
             ]:
                 safe_add_column('bookings', col_name, col_type)
 
+            # create_all() skips indexes on tables that already exist
+            try:
+                db.session.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_booking_listing_dates "
+                    "ON bookings (listing_id, start_date, end_date)"
+                ))
+                db.session.commit()
+            except Exception as idx_err:
+                db.session.rollback()
+                print(f"  ⚠️  Could not create idx_booking_listing_dates: {idx_err}")
+
+            # "Fits my aircraft" capability columns for listings saved before they existed
+            try:
+                from packing import backfill_fit_capability   # also registers the listeners that keep them current
+                db.session.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_listing_fit ON listings (fit_short_ft, fit_long_ft)"
+                ))
+                filled = backfill_fit_capability()
+                if filled:
+                    print(f"  ✅ Fit capability computed for {filled} listings")
+            except Exception as fit_err:
+                db.session.rollback()
+                print(f"  ⚠️  Could not backfill fit capability: {fit_err}")
+
+            # Signing tokens for bookings paid before lease_tokens existed
+            try:
+                from lease_tokens import backfill_lease_tokens
+                filled = backfill_lease_tokens()
+                if filled:
+                    print(f"  ✅ Lease signing tokens indexed for {filled} bookings")
+            except Exception as lease_err:
+                db.session.rollback()
+                print(f"  ⚠️  Could not backfill lease tokens: {lease_err}")
+
             # --- Messages (guest messaging) ---
             for col_name, col_type in [
                 ('is_guest', 'BOOLEAN DEFAULT FALSE'),
@@ -0,0 +1,146 @@
+"""
+availability.py — Per-listing booking calendar and double-booking checks.
+
+Confirmed bookings and unexpired Pending checkout holds (checkout.py) hold
+their dates. Stays are half-open
+[check-in, checkout) so back-to-back stays don't clash, and two stays
+overlap iff
+
+    booking.start_date < end  AND  booking.end_date > start
+
+which the (listing_id, start_date, end_date) index on bookings answers with
+a range scan per listing. A booking holds its aircraft footprint, or the
+whole hangar when it has none, so shared hangars take several aircraft at
+once (see capacity.py). The predicate is used three ways:
+
+    is_available()       single listing, before a booking is created
+    calendar()           full nights and free-space runs for the date picker
+    stay_search.py       NOT EXISTS / footprint SUM over every listing in a search
+
+Listing.status stays an owner-controlled on/off switch; confirming a booking
+no longer flips the whole listing to 'Rented'.
+
+Usage:
+    from availability import is_available, calendar
+    is_available(listing_id, '2026-08-01', '2026-08-05', sqft=1200)
+    calendar(listing_id, start, end)            # → {'booked': [...], 'free': [...], ...}
+"""
+
+import datetime
+import logging
+
+from extensions import db
+from models import Booking, Listing
+from capacity import timeline_for, MIN_FREE_SQFT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CALENDAR_DAYS = 90
+MAX_CALENDAR_DAYS = 366
+
+
+class AvailabilityError(ValueError):
+    """Bad date range (message is user-facing)."""
+
+
+def as_date(d) -> datetime.date:
+    if isinstance(d, str):
+        return datetime.datetime.strptime(d, '%Y-%m-%d').date()
+    return d.date() if isinstance(d, datetime.datetime) else d
+
+
+def parse_range(start, end) -> tuple:
+    """(start, end) as dates; raises AvailabilityError unless end > start."""
+    try:
+        start, end = as_date(start), as_date(end)
+    except (TypeError, ValueError):
+        raise AvailabilityError("Dates must be in YYYY-MM-DD format.")
+    if end <= start:
+        raise AvailabilityError("Checkout date must be after check-in date.")
+    return start, end
+
+
+def _bounds(start, end) -> tuple:
+    return (datetime.datetime.combine(as_date(start), datetime.time.min),
+            datetime.datetime.combine(as_date(end), datetime.time.min))
+
+
+def holding():
+    """SQL predicate: the booking currently holds its space (Confirmed, or Pending with a live hold)."""
+    return db.or_(Booking.status == 'Confirmed',
+                  db.and_(Booking.status == 'Pending',
+                          db.or_(Booking.hold_expires_at.is_(None),
+                                 Booking.hold_expires_at > datetime.datetime.utcnow())))
+
+
+def overlaps(start, end):
+    """SQL predicate: a holding booking overlapping [start, end)."""
+    start, end = _bounds(start, end)
+    return db.and_(holding(),
+                   Booking.start_date < end,
+                   Booking.end_date > start)
+
+
+def is_available(listing_id, start, end, sqft=None, exclude_renter_pending=None, exclude_booking=None) -> bool:
+    """Room for `sqft` (default: any aircraft) on every night of [start, end).
+
+    exclude_renter_pending: ignore that renter's own Pending bookings (an
+    abandoned checkout shouldn't lock the renter out of their own dates).
+    exclude_booking: ignore that booking (re-checking it before confirming).
+    """
+    listing = db.session.get(Listing, listing_id)
+    if listing is None:
+        return False
+    tl = timeline_for(listing, start, end, exclude_renter_pending, exclude_booking)
+    return tl.fits(sqft or MIN_FREE_SQFT)
+
+
+def booked_listing_ids(listing_ids, day) -> set:
+    """Which of `listing_ids` have a blocking booking covering the night of `day`."""
+    if not listing_ids:
+        return set()
+    day = as_date(day)
+    rows = (db.session.query(Booking.listing_id)
+            .filter(Booking.listing_id.in_(list(listing_ids)),
+                    overlaps(day, day + datetime.timedelta(days=1)))
+            .distinct())
+    return {r.listing_id for r in rows}
+
+
+def merge_ranges(ranges) -> list:
+    """Merge overlapping/adjacent (start, end) date pairs; input needn't be sorted."""
+    merged = []
+    for s, e in sorted(ranges):
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return [tuple(r) for r in merged]
+
+
+def calendar(listing_id, start=None, end=None) -> dict:
+    """Full nights and free-space runs for [start, end), clipped to that window."""
+    start = as_date(start) if start else datetime.date.today()
+    end = as_date(end) if end else start + datetime.timedelta(days=DEFAULT_CALENDAR_DAYS)
+    start, end = parse_range(start, end)
+    if (end - start).days > MAX_CALENDAR_DAYS:
+        raise AvailabilityError(f"Calendar window is limited to {MAX_CALENDAR_DAYS} days.")
+
+    listing = db.session.get(Listing, listing_id)
+    tl = timeline_for(listing, start, end)
+    runs = tl.segments()
+    booked = merge_ranges((s, e) for s, e, free in runs if free < MIN_FREE_SQFT)
+
+    nights = []
+    for s, e in booked:
+        nights.extend(s + datetime.timedelta(days=i) for i in range((e - s).days))
+    return {
+        'listing_id': listing_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'capacity_sqft': tl.capacity,
+        'min_free_sqft': tl.free(),
+        'booked': [{'start': s.isoformat(), 'end': e.isoformat()} for s, e in booked],
+        'free': [{'start': s.isoformat(), 'end': e.isoformat(), 'free_sqft': round(free, 1)} for s, e, free in runs],
+        'unavailable_dates': [d.isoformat() for d in nights],
+    }
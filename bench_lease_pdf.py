@@ -0,0 +1,91 @@
+"""
+Benchmark: lease PDF throughput (see lease_pdf.py).
+
+    python bench_lease_pdf.py                  # 40 leases, pool of 4
+    python bench_lease_pdf.py -n 200 --workers 8
+
+Reports PDFs/sec for
+    cached      an unchanged lease: HTML + content hash + file lookup, no render
+    cold        one render at a time, fonts and CSS loaded for every render (the old path)
+    warm        one render at a time, fonts and CSS loaded once
+    pool        --workers render processes
+Renders go to a temporary directory; nothing touches the database.
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+from app import app
+import lease_pdf
+
+
+def _fake_booking(i):
+    owner = SimpleNamespace(first_name='Olive', last_name=f'Owner{i}', email=f'owner{i}@example.com')
+    renter = SimpleNamespace(first_name='Rey', last_name=f'Renter{i}', email=f'renter{i}@example.com')
+    listing = SimpleNamespace(airport_icao='KBEN', size_sqft=2500 + i, covered=bool(i % 2), owner=owner)
+    start = datetime.datetime(2026, 11, 1) + datetime.timedelta(days=i)
+    return SimpleNamespace(id=i, listing=listing, renter=renter, total_price=450.0 + i,
+                           start_date=start, end_date=start + datetime.timedelta(days=5),
+                           created_at=start, owner_signed=False, renter_signed=bool(i % 3),
+                           sign_token_owner=f'own{i:06d}tok', sign_token_renter=f'ren{i:06d}tok')
+
+
+def _rate(label, n, seconds):
+    print(f"  {label:<8} {n:>5} PDFs in {seconds:6.2f}s  →  {n / seconds:8.1f} PDFs/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lease PDF rendering throughput")
+    parser.add_argument('-n', type=int, default=40, help="leases per run")
+    parser.add_argument('--workers', type=int, default=4, help="render processes for the pool run")
+    args = parser.parse_args()
+
+    with app.test_request_context():
+        _, css_path = lease_pdf._paths()
+        docs = [lease_pdf.lease_html(_fake_booking(i)) for i in range(args.n)]
+
+        with tempfile.TemporaryDirectory() as out_dir:
+            names = [lease_pdf.content_name(h, css_path) for h in docs]
+            for name in names:      # pretend everything is already rendered
+                open(os.path.join(out_dir, name), 'wb').close()
+            t0 = time.perf_counter()
+            for i in range(args.n):
+                html = lease_pdf.lease_html(_fake_booking(i))
+                assert os.path.exists(os.path.join(out_dir, lease_pdf.content_name(html, css_path)))
+            _rate('cached', args.n, time.perf_counter() - t0)
+
+        if not lease_pdf.engine_available():
+            print("  WeasyPrint is not available here (missing GTK/Pango); render runs skipped.")
+            return
+
+        with tempfile.TemporaryDirectory() as out_dir:
+            paths = [os.path.join(out_dir, f"{i}.pdf") for i in range(args.n)]
+
+            t0 = time.perf_counter()
+            for html, path in zip(docs, paths):
+                lease_pdf._stylesheets = None       # reload fonts + CSS every time
+                lease_pdf.render_pdf(html, path, css_path)
+            _rate('cold', args.n, time.perf_counter() - t0)
+
+            lease_pdf._init_renderer(css_path)
+            t0 = time.perf_counter()
+            for html, path in zip(docs, paths):
+                lease_pdf.render_pdf(html, path, css_path)
+            _rate('warm', args.n, time.perf_counter() - t0)
+
+            with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=lease_pdf._init_renderer, initargs=(css_path,)) as pool:
+                list(pool.map(lease_pdf.render_pdf, docs[:args.workers], paths[:args.workers],
+                              [css_path] * args.workers))   # start-up and first render outside the timing
+                t0 = time.perf_counter()
+                list(pool.map(lease_pdf.render_pdf, docs, paths, [css_path] * args.n))
+                _rate(f'pool×{args.workers}', args.n, time.perf_counter() - t0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Nightly / incremental job for precomputed Smart Matches (user_recommendations).
+
+    python build_recommendations.py            # full rebuild (nightly)
+    python build_recommendations.py --delta    # only users new listings could affect
+    python build_recommendations.py --top-n 30
+
+See recommendations.py for how scores are computed.
+"""
+import argparse
+import time
+
+from app import app
+from recommendations import TOP_N, rebuild_all, refresh_for_new_listings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute per-user Smart Matches")
+    parser.add_argument('--delta', action='store_true', help="rescore only users affected by new listings")
+    parser.add_argument('--top-n', type=int, default=TOP_N, help="recommendations stored per user")
+    args = parser.parse_args()
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        if args.delta:
+            users = refresh_for_new_listings(n=args.top_n)
+            print(f"Delta refresh: rescored {users} users in {time.perf_counter() - t0:.2f}s")
+        else:
+            rows = rebuild_all(n=args.top_n)
+            print(f"Rebuilt {rows} recommendation rows in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+capacity.py — Time-aware floor-space model for shared (sub-let) hangars.
+
+A hangar's capacity is its size_sqft. Every Pending/Confirmed booking holds
+its aircraft footprint (Booking.footprint_sqft, 10% buffer included) for the
+nights [start, end); bookings without a footprint hold the whole hangar.
+
+CapacityTimeline covers one listing over a date window with a day-indexed
+segment tree (range add, range max, lazy propagation), so
+
+    add(start, end, sqft)     O(log days)
+    peak(start, end)          O(log days)   max sqft in use on any night
+    free(start, end)          capacity - peak
+
+stay cheap however many aircraft share the hangar. For a whole window at once
+daily_usage() does a single sweep over the interval endpoints.
+
+Usage:
+    from capacity import timeline_for, free_sqft_by_listing
+    tl = timeline_for(listing, start, end)
+    tl.free(start, end)                          # sqft free on every night of the stay
+    free_sqft_by_listing(listings, start, end)   # {id: free sqft}, one query
+"""
+
+import datetime
+import logging
+from collections import defaultdict
+
+from extensions import db
+from models import Booking
+
+logger = logging.getLogger(__name__)
+
+FOOTPRINT_BUFFER = 1.1          # clearance around the aircraft's L × W rectangle
+MIN_FREE_SQFT = 1.0             # "has any room left"
+
+
+def _as_date(d) -> datetime.date:
+    if isinstance(d, str):
+        return datetime.datetime.strptime(d, '%Y-%m-%d').date()
+    return d.date() if isinstance(d, datetime.datetime) else d
+
+
+def aircraft_footprint(name, buffer: float = FOOTPRINT_BUFFER):
+    """Footprint of a catalogue type (name or alias, see aircraft_catalog), or None if unknown."""
+    from aircraft_catalog import get
+    aircraft = get(name)
+    return round(aircraft.length * aircraft.wingspan * buffer, 1) if aircraft else None
+
+
+def capacity_of(listing) -> float:
+    return float(listing.size_sqft or 0)
+
+
+class CapacityTimeline:
+    """Sqft in use per night over [start, end) for one hangar."""
+
+    def __init__(self, capacity: float, start, end):
+        self.capacity = float(capacity)
+        self.start = _as_date(start)
+        self.end = _as_date(end)
+        self.days = max(1, (self.end - self.start).days)
+        self._max = [0.0] * (4 * self.days)
+        self._lazy = [0.0] * (4 * self.days)
+        self._intervals = []
+
+    def _span(self, start, end):
+        """Clip [start, end) to the window as day offsets [lo, hi); None if empty."""
+        lo = max(0, (_as_date(start) - self.start).days)
+        hi = min(self.days, (_as_date(end) - self.start).days)
+        return (lo, hi) if lo < hi else None
+
+    def _add(self, node, l, r, lo, hi, v):
+        if hi <= l or r <= lo:
+            return
+        if lo <= l and r <= hi:
+            self._max[node] += v
+            self._lazy[node] += v
+            return
+        m = (l + r) // 2
+        self._add(2 * node, l, m, lo, hi, v)
+        self._add(2 * node + 1, m, r, lo, hi, v)
+        self._max[node] = self._lazy[node] + max(self._max[2 * node], self._max[2 * node + 1])
+
+    def _peak(self, node, l, r, lo, hi):
+        if hi <= l or r <= lo:
+            return float('-inf')
+        if lo <= l and r <= hi:
+            return self._max[node]
+        m = (l + r) // 2
+        return self._lazy[node] + max(self._peak(2 * node, l, m, lo, hi),
+                                      self._peak(2 * node + 1, m, r, lo, hi))
+
+    def add(self, start, end, sqft) -> None:
+        """Hold `sqft` (None → the whole hangar) for the nights [start, end)."""
+        sqft = self.capacity if sqft is None else float(sqft)
+        span = self._span(start, end)
+        if span:
+            self._intervals.append((span[0], span[1], sqft))
+            self._add(1, 0, self.days, span[0], span[1], sqft)
+
+    def peak(self, start=None, end=None) -> float:
+        span = self._span(start or self.start, end or self.end)
+        return self._peak(1, 0, self.days, *span) if span else 0.0
+
+    def free(self, start=None, end=None) -> float:
+        """Sqft free on every night of [start, end)."""
+        return max(0.0, self.capacity - self.peak(start, end))
+
+    def fits(self, sqft, start=None, end=None) -> bool:
+        need = self.capacity if sqft is None else max(float(sqft), MIN_FREE_SQFT)
+        return self.capacity - self.peak(start, end) >= need
+
+    def daily_usage(self) -> list:
+        """Sqft in use per night across the window (sweep line)."""
+        delta = [0.0] * (self.days + 1)
+        for lo, hi, sqft in self._intervals:
+            delta[lo] += sqft
+            delta[hi] -= sqft
+        usage, running = [], 0.0
+        for d in delta[:-1]:
+            running += d
+            usage.append(running)
+        return usage
+
+    def segments(self) -> list:
+        """[(start, end, free_sqft)] runs of constant free space across the window."""
+        runs = []
+        for i, used in enumerate(self.daily_usage()):
+            free = max(0.0, self.capacity - used)
+            if runs and runs[-1][2] == free:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1, free])
+        day = lambda i: self.start + datetime.timedelta(days=i)
+        return [(day(lo), day(hi), free) for lo, hi, free in runs]
+
+
+def _holding_bookings(start, end, listing_ids=None, exclude_renter_pending=None, exclude_booking=None):
+    from availability import overlaps
+    q = db.session.query(Booking.listing_id, Booking.start_date, Booking.end_date, Booking.footprint_sqft
+                         ).filter(overlaps(start, end))
+    if listing_ids is not None:
+        q = q.filter(Booking.listing_id.in_(list(listing_ids)))
+    if exclude_renter_pending is not None:
+        q = q.filter(~db.and_(Booking.renter_id == exclude_renter_pending, Booking.status == 'Pending'))
+    if exclude_booking is not None:
+        q = q.filter(Booking.id != exclude_booking)
+    return q.all()
+
+
+def timeline_for(listing, start, end, exclude_renter_pending=None, exclude_booking=None) -> CapacityTimeline:
+    tl = CapacityTimeline(capacity_of(listing), start, end)
+    for b in _holding_bookings(start, end, [listing.id], exclude_renter_pending, exclude_booking):
+        tl.add(b.start_date, b.end_date, b.footprint_sqft)
+    return tl
+
+
+def _timelines(start, end, capacities) -> dict:
+    """{listing_id: CapacityTimeline} for listings in `capacities` holding bookings in the window (one query)."""
+    by_listing = defaultdict(list)
+    for b in _holding_bookings(start, end, list(capacities)):
+        by_listing[b.listing_id].append(b)
+    timelines = {}
+    for lid, bookings in by_listing.items():
+        tl = timelines[lid] = CapacityTimeline(capacities.get(lid) or 0, start, end)
+        for b in bookings:
+            tl.add(b.start_date, b.end_date, b.footprint_sqft)
+    return timelines
+
+
+def free_sqft_by_listing(listings, start, end) -> dict:
+    """{listing.id: sqft free on every night of [start, end)} for a batch of listings."""
+    capacities = {l.id: capacity_of(l) for l in listings}
+    timelines = _timelines(start, end, capacities)
+    return {lid: timelines[lid].free() if lid in timelines else cap for lid, cap in capacities.items()}
+
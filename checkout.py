@@ -0,0 +1,188 @@
+"""
+checkout.py — Concurrency-safe booking holds and confirmation.
+
+Several gunicorn workers can book the same hangar at once, so nothing here
+does read-modify-write on shared rows:
+
+    place_hold()        capacity check (plus door height and floor packing for
+                        a typed aircraft) + Pending booking with
+                        hold_expires_at, committed only if Listing.version is
+                        still the value read before the checks
+                        (compare-and-swap). A concurrent hold on the same
+                        listing bumps the version first, so the loser rolls
+                        back and re-checks against the winner's booking
+                        instead of overselling.
+    release_hold()      Pending → Cancelled (checkout failed or abandoned).
+    confirm_booking()   Pending → Confirmed as one conditional UPDATE; only the
+                        request that flips it credits the owner, via an
+                        in-database increment of users.total_revenue. The
+                        space is re-checked first (payment may arrive after
+                        the hold lapsed); if it's gone the booking becomes
+                        REFUND_DUE instead.
+    increment()         UPDATE ... SET col = COALESCE(col, 0) + n for counters.
+
+These bulk UPDATEs skip the mapper hooks that expire cached quotes and stay
+searches, so each function invalidates them itself once it has committed.
+
+Holds last HOLD_MINUTES, matching the Stripe Checkout session expiry, after
+which availability ignores them.
+
+Usage:
+    from checkout import place_hold, confirm_booking, HoldUnavailable
+    booking = place_hold(listing, renter_id, start, end, footprint_sqft=1080.1, total_price=...)
+    confirm_booking(booking)      # True the first time only
+"""
+
+import datetime
+import logging
+
+from sqlalchemy import case, func, update
+
+from extensions import db
+from models import Booking, Listing, User
+from availability import as_date, is_available, overlaps
+from packing import fits_alongside, has_floor_plan
+
+logger = logging.getLogger(__name__)
+
+HOLD_MINUTES = 30              # Stripe Checkout's minimum session lifetime
+HOLD_ATTEMPTS = 5
+REFUND_DUE = 'Refund Due'      # paid, but the space was resold after the hold lapsed
+PLATFORM_FEE_RATE = 0.10
+
+
+class HoldUnavailable(Exception):
+    """The dates/space are taken (message is user-facing)."""
+
+
+def increment(model, row_id, **deltas) -> int:
+    """Atomic counter bump in SQL; returns rows updated (caller commits)."""
+    values = {name: func.coalesce(getattr(model, name), 0) + delta for name, delta in deltas.items()}
+    return db.session.execute(update(model).where(model.id == row_id).values(**values)).rowcount
+
+
+def _claim(listing_id, seen_version) -> bool:
+    """Bump Listing.version iff it is still `seen_version`."""
+    result = db.session.execute(
+        update(Listing)
+        .where(Listing.id == listing_id, Listing.version == seen_version)
+        .values(version=Listing.version + 1)
+        .execution_options(synchronize_session=False))
+    return result.rowcount == 1
+
+
+def _space_changed(listing_id) -> None:
+    """Expire cached quotes and stay searches for the listing (call after commit)."""
+    from quotes import invalidate_quotes
+    from stay_search import invalidate_airport
+    invalidate_quotes(listing_id)
+    invalidate_airport(db.session.query(Listing.airport_icao).filter(Listing.id == listing_id).scalar())
+
+
+def _packing_problem(listing, aircraft, start, end, renter_id):
+    """Why `aircraft` can't join the aircraft already booked for [start, end), or None."""
+    packed = fits_alongside(listing, aircraft, start, end, exclude_renter=renter_id)
+    if aircraft in packed.too_tall:
+        return f"A {aircraft} is too tall for this hangar's door."
+    # The floor is only checked once the owner has measured it; a square guess would turn away real fits
+    if packed.unplaced and has_floor_plan(listing):
+        return f"A {aircraft} won't fit the hangar floor alongside the aircraft already booked for those dates."
+    return None
+
+
+def place_hold(listing, renter_id, start, end, footprint_sqft=None, **fields) -> Booking:
+    """Hold floor space for [start, end) and commit a Pending booking, or raise HoldUnavailable.
+
+    footprint_sqft=None holds the whole hangar. Extra keyword arguments are
+    Booking columns (total_price, insurance_fee, ...); with an aircraft_type
+    the aircraft must also clear the door and pack in beside the others.
+    """
+    start = datetime.datetime.combine(as_date(start), datetime.time.min)
+    end = datetime.datetime.combine(as_date(end), datetime.time.min)
+    for attempt in range(HOLD_ATTEMPTS):
+        seen = db.session.query(Listing.version).filter(Listing.id == listing.id).scalar()
+        if not is_available(listing.id, start, end, sqft=footprint_sqft or listing.size_sqft,
+                            exclude_renter_pending=renter_id):
+            db.session.rollback()
+            raise HoldUnavailable("Not enough hangar space is free for those dates. Please choose different dates.")
+        problem = fields.get('aircraft_type') and _packing_problem(listing, fields['aircraft_type'],
+                                                                   start, end, renter_id)
+        if problem:
+            db.session.rollback()
+            raise HoldUnavailable(problem)
+
+        # A retried checkout supersedes this renter's earlier hold on the same nights
+        db.session.execute(
+            update(Booking)
+            .where(Booking.listing_id == listing.id, Booking.renter_id == renter_id,
+                   Booking.status == 'Pending', overlaps(start, end))
+            .values(status='Cancelled')
+            .execution_options(synchronize_session=False))
+        booking = Booking(listing_id=listing.id, renter_id=renter_id, start_date=start, end_date=end,
+                          status='Pending', footprint_sqft=footprint_sqft,
+                          hold_expires_at=datetime.datetime.utcnow() + datetime.timedelta(minutes=HOLD_MINUTES),
+                          **fields)
+        db.session.add(booking)
+        db.session.flush()
+        if _claim(listing.id, seen):
+            db.session.commit()
+            _space_changed(listing.id)
+            return booking
+        db.session.rollback()
+        logger.info(f"[CHECKOUT] listing {listing.id} changed under hold attempt {attempt + 1}, retrying")
+    raise HoldUnavailable("This hangar is being booked right now. Please try again.")
+
+
+def release_hold(booking) -> None:
+    db.session.execute(update(Booking).where(Booking.id == booking.id, Booking.status == 'Pending')
+                       .values(status='Cancelled').execution_options(synchronize_session=False))
+    db.session.commit()
+    _space_changed(booking.listing_id)
+
+
+def confirm_booking(booking) -> bool:
+    """Pending → Confirmed and credit the owner, exactly once. Commits; returns whether this call confirmed.
+
+    Payment can land after the hold lapsed (delayed payment methods confirm
+    days later) and the space may have been sold again meanwhile, so the
+    space is re-checked under the same version claim as place_hold(). A
+    booking that no longer fits goes to REFUND_DUE for manual review instead.
+    """
+    listing_id = booking.listing_id
+    for attempt in range(HOLD_ATTEMPTS):
+        seen, size = db.session.query(Listing.version, Listing.size_sqft).filter(Listing.id == listing_id).one()
+        fits = is_available(listing_id, booking.start_date, booking.end_date,
+                            sqft=booking.footprint_sqft or size, exclude_booking=booking.id)
+        flipped = db.session.execute(
+            update(Booking)
+            .where(Booking.id == booking.id, Booking.status == 'Pending')
+            .values(status='Confirmed' if fits else REFUND_DUE, hold_expires_at=None)
+            .execution_options(synchronize_session=False)).rowcount == 1
+        if not flipped:
+            db.session.rollback()
+            db.session.refresh(booking)
+            return False
+        if not _claim(listing_id, seen):
+            db.session.rollback()
+            logger.info(f"[CHECKOUT] listing {listing_id} changed under confirm attempt {attempt + 1}, retrying")
+            continue
+        if fits:
+            owner_id = db.session.query(Listing.owner_id).filter(Listing.id == listing_id).scalar()
+            increment(User, owner_id, total_revenue=round(booking.total_price * (1.0 - PLATFORM_FEE_RATE), 2))
+        else:
+            logger.warning(f"[CHECKOUT] booking {booking.id} paid after its hold lapsed and the space was "
+                           f"resold — marked {REFUND_DUE}")
+        db.session.commit()
+        _space_changed(listing_id)
+        db.session.refresh(booking)
+        return fits
+    raise RuntimeError(f"listing {listing_id} kept changing while confirming booking {booking.id}")
+
+
+def bump_health(listing_id, points: int = 5) -> None:
+    """health_score += points, capped at 100, in SQL (caller commits)."""
+    raised = func.coalesce(Listing.health_score, 0) + points
+    db.session.execute(update(Listing).where(Listing.id == listing_id)
+                       .values(health_score=case((raised > 100, 100), else_=raised))
+                       .execution_options(synchronize_session=False))
+
@@ -0,0 +1,42 @@
+"""
+commit_hooks.py — Defer cache invalidation until the transaction commits.
+
+Mapper events (after_insert/update/delete) fire during flush, before COMMIT.
+Bumping a cache token there leaves a window where another request still reads
+the old committed rows and caches them under the new token, so the stale
+entry outlives the change. after_commit() queues the call on the target's
+session instead: it runs once the session commits and is dropped on rollback.
+
+Usage:
+    from commit_hooks import after_commit
+
+    @event.listens_for(Listing, 'after_update')
+    def _listing_changed(mapper, connection, target):
+        after_commit(target, invalidate_quotes, target.id)
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+_PENDING = 'after_commit'
+
+
+def after_commit(target, fn, *args) -> None:
+    """Call fn(*args) after target's session commits (now, if it has no session)."""
+    session = object_session(target)
+    if session is None:
+        fn(*args)
+        return
+    # dict, not set: one call per (fn, args) per transaction, in the order queued
+    session.info.setdefault(_PENDING, {})[(fn, args)] = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_pending(session):
+    for fn, args in session.info.pop(_PENDING, {}):
+        fn(*args)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending(session):
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,114 @@
+"""
+concierge.py — Streaming replies for the AI Concierge.
+
+The Socket.IO handler and /api/concierge used to wait for the whole
+completion (up to MAX_TOKENS) before sending anything. Replies are now
+streamed: stream_reply() yields text deltas as the model produces them, and
+every blocking step of the LLM call (opening the stream, each next chunk)
+runs in eventlet's OS thread pool when the worker runs on the eventlet hub,
+so one slow completion doesn't stall every other client on the worker.
+
+    build_messages(...)     system prompt (user + live DB context) + last
+                            HISTORY_TURNS turns + the new message
+    complete(llm, msgs)     the whole reply at once (JSON /api/concierge)
+    stream_reply(llm, msgs) generator of text deltas (the OpenAI call goes
+                            through integrations, so breaker and metrics apply)
+    sse(event, data)        one text/event-stream frame
+
+Wire events:
+    Socket.IO   chat_delta {'delta'} per chunk, then chat_response {'reply', 'source'}
+    SSE         event: delta {'delta'} per chunk, then event: done {'reply', 'source'}
+
+Usage:
+    from concierge import build_messages, stream_reply
+    for delta in stream_reply(openai_client(), build_messages(...)):
+        emit('chat_delta', {'delta': delta})
+"""
+
+import json
+import os
+
+from integrations import call
+
+MAX_TOKENS = 400
+TEMPERATURE = 0.7
+HISTORY_TURNS = 6
+DEFAULT_MODEL = 'gpt-4o-mini'
+
+SYSTEM_PROMPT = """You are the HangarLinks AI Concierge — a smart, friendly aviation assistant specializing in Short-Term transient parking (Overnights & Weekends 1-7 days).
+You help transient aircraft owners find overnight hangars, and hangar owners optimize their listings for event surges.
+
+USER CONTEXT:
+- Name: {user_name}
+- Role: {user_role}
+- Home Airport: {home_airport}
+
+LIVE DATABASE CONTEXT (use this to answer):
+{db_context}
+
+INSTRUCTIONS:
+- PRIORITY 1: Always prioritize and highlight listings with minimum stays of 1 to 7 nights first.
+- PRIORITY 2: Automatically check if dates/locations match Major Events (e.g. Oshkosh, Sun 'n Fun) and suggest nightly Event Surge rates.
+- Use the live data above to answer questions about availability, translating monthly rates down to estimated Nightly Rates (Monthly/30) if only monthly is defined.
+- Be concise and friendly. Use markdown (bold, bullet points) for clarity.
+- If you find matching listings, always include the [View Listing](/listing/ID) link.
+- If asked "Book this?" direct them to the listing link. If asked "Message owner?" state "I'll connect you — click the listing link and use the owner contact module."
+- NEVER make up listing data. Only use what's in LIVE DATABASE CONTEXT.
+- Keep replies under 200 words."""
+
+
+def build_messages(message, history, db_context, user_name='Guest', user_role='guest', home_airport='Not set') -> list:
+    system = SYSTEM_PROMPT.format(user_name=user_name, user_role=user_role, home_airport=home_airport,
+                                  db_context=db_context or "No specific data found for this query.")
+    messages = [{'role': 'system', 'content': system}]
+    for h in (history or [])[-HISTORY_TURNS:]:
+        if isinstance(h, dict) and h.get('role') in ('user', 'assistant') and h.get('content'):
+            messages.append({'role': h['role'], 'content': h['content']})
+    messages.append({'role': 'user', 'content': message})
+    return messages
+
+
+def _blocking():
+    """eventlet.tpool.execute on the eventlet hub (socket monkey-patched), else a plain call."""
+    try:
+        from eventlet import patcher, tpool
+    except ImportError:
+        return None
+    return tpool.execute if patcher.is_monkey_patched('socket') else None
+
+
+def off_hub(fn, *args, **kwargs):
+    execute = _blocking()
+    return execute(fn, *args, **kwargs) if execute else fn(*args, **kwargs)
+
+
+_END = object()
+
+
+def _model(model):
+    return model or os.environ.get('OPENAI_MODEL', DEFAULT_MODEL)
+
+
+def complete(llm, messages, model=None) -> str:
+    """The whole reply in one call (the JSON endpoint)."""
+    resp = off_hub(call, 'openai', llm.chat.completions.create, model=_model(model),
+                   messages=messages, max_tokens=MAX_TOKENS, temperature=TEMPERATURE)
+    return resp.choices[0].message.content.strip()
+
+
+def stream_reply(llm, messages, model=None):
+    """Yield the reply's text deltas as they arrive; raises if the call fails, possibly after some deltas."""
+    stream = off_hub(call, 'openai', llm.chat.completions.create, model=_model(model),
+                     messages=messages, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, stream=True)
+    chunks = iter(stream)
+    while True:
+        chunk = off_hub(next, chunks, _END)
+        if chunk is _END:
+            return
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
+
+
+def sse(event, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
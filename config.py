@@ -1,3 +1,4 @@
+import json
 import os
 
 class Config:
@@ -46,15 +47,56 @@ class Config:
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'static/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     
-    # Caching
-    CACHE_TYPE = 'SimpleCache'
+    # Caching — SimpleCache is per process, so each gunicorn worker keeps its own
+    # quotes, searches and invalidation tokens. Set CACHE_REDIS_URL to share them.
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', '').strip()
+    CACHE_TYPE = 'RedisCache' if CACHE_REDIS_URL else 'SimpleCache'
     CACHE_DEFAULT_TIMEOUT = 300
     
     # Stripe
     STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', '').strip()
     STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', '').strip()
     STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '').strip()
-    
+    # Local development only: accept unsigned webhook bodies when no secret is set
+    # (every fulfilment is driven by the webhook, so never enable this in production)
+    STRIPE_WEBHOOK_ALLOW_UNSIGNED = os.environ.get('STRIPE_WEBHOOK_ALLOW_UNSIGNED', '0') == '1'
+    # Webhook events are acknowledged at once and applied by a background worker
+    # in each web process (stripe_events.py); set to 0 to leave it to stripe_worker.py
+    STRIPE_EVENT_WORKER = os.environ.get('STRIPE_EVENT_WORKER', '1') == '1'
+    # Base for absolute links built outside a request (lease e-mails from the worker)
+    PUBLIC_URL = os.environ.get('PUBLIC_URL', 'https://hangarlinks.com')
+
+    # AI Rental Optimizer — directory holding versioned model artifacts
+    # (defaults to <instance_path>/models; see pricing_model.py)
+    PRICING_MODEL_DIR = os.environ.get('PRICING_MODEL_DIR')
+
+    # Lease PDFs render in this many background processes per web worker (lease_pdf.py); 0 = inline
+    LEASE_PDF_WORKERS = int(os.environ.get('LEASE_PDF_WORKERS', 2))
+
+    # Airport weather on listing pages (weather_service.py): served from a per-ICAO cache for
+    # WEATHER_TTL_SECONDS, then stale while a background refresh runs; a synchronous fetch only
+    # past WEATHER_MAX_STALE_SECONDS (and last-known data if that fails)
+    WEATHER_TTL_SECONDS = int(os.environ.get('WEATHER_TTL_SECONDS', 600))
+    WEATHER_MAX_STALE_SECONDS = int(os.environ.get('WEATHER_MAX_STALE_SECONDS', 3600))
+
+    # Bulk METAR/TAF ingestion (metar_feed.py): every reporting airport from one cache file each,
+    # re-read every METAR_REFRESH_SECONDS; a source may also be a local path (e.g. synced by cron)
+    METAR_INGEST = os.environ.get('METAR_INGEST', '1') == '1'
+    METAR_SOURCE = os.environ.get('METAR_SOURCE', 'https://aviationweather.gov/data/cache/metars.cache.csv.gz')
+    TAF_SOURCE = os.environ.get('TAF_SOURCE', 'https://aviationweather.gov/data/cache/tafs.cache.xml.gz')
+    METAR_REFRESH_SECONDS = int(os.environ.get('METAR_REFRESH_SECONDS', 300))
+
+    # FBO & fuel data on listing pages (fbo_service.py): local dataset first, then AviationStack
+    # answers cached per airport and refreshed in the background behind a circuit breaker
+    FBO_DATASET = os.environ.get('FBO_DATASET', 'static/data/fbo_fuel.json')
+    AVIATIONSTACK_KEY = os.environ.get('AVIATIONSTACK_KEY', '').strip()
+    FBO_CACHE_TTL_SECONDS = int(os.environ.get('FBO_CACHE_TTL_SECONDS', 3600))
+
+    # Outbound calls (integrations.py): per-service policy overrides as JSON, e.g.
+    # {"openai": {"timeout": 60}}, and services answered by local fakes (e.g. "openai,aviationstack")
+    INTEGRATION_POLICIES = json.loads(os.environ.get('INTEGRATION_POLICIES') or '{}')
+    INTEGRATION_FAKES = os.environ.get('INTEGRATION_FAKES', '')
+
     # Application
     DEBUG = os.environ.get('FLASK_DEBUG', '0') == '1'
 
@@ -3,9 +3,12 @@ conftest.py — pytest fixtures for HangarLink MVP tests
 Uses an in-memory SQLite database so tests never touch production data.
 """
 import pytest
+from flask import g, has_app_context
 from werkzeug.security import generate_password_hash
 from app import create_app
-from extensions import db as _db
+from config import Config
+import demand_forecast
+from extensions import cache, db as _db, limiter
 from models import User, Listing, Ad
 
 
@@ -23,6 +26,7 @@ class TestConfig:
     LOGIN_DISABLED = False
     UPLOAD_FOLDER = 'static/uploads'
     RECAPTCHA_ENABLED = False
+    AIRCRAFT_SIZES = Config.AIRCRAFT_SIZES
 
 
 @pytest.fixture(scope='session')
@@ -87,6 +91,39 @@ def make_listing(db, owner, icao='CYTZ', price=350.0, covered=True, size=1500):
     return l
 
 
+def login_as(client, user):
+    """Log the test client in as `user` without going through the rate-limited /login form."""
+    # The session-scoped app context is shared with the test client, so drop
+    # any user Flask-Login cached on `g` during an earlier request.
+    g.pop('_login_user', None)
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user.id)
+        sess['_fresh'] = True
+
+
+@pytest.fixture(autouse=True)
+def _forget_login():
+    """Drop the user Flask-Login cached on the session-scoped app context's `g` after every test."""
+    yield
+    if has_app_context():
+        g.pop('_login_user', None)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_process_state():
+    """Start every test with empty rate-limit counters, app cache and search-volume buffer.
+
+    They live in this process for the whole session, so otherwise one test's
+    logins, cached results or buffered searches leak into the next, and
+    whether a test passes depends on what ran before it.
+    """
+    if has_app_context():
+        limiter.reset()
+        cache.clear()
+    demand_forecast.reset_searches()
+    yield
+
+
 @pytest.fixture
 def seed_owner(db):
     u = make_owner(db)
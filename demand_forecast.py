@@ -0,0 +1,398 @@
+"""
+demand_forecast.py — Regional hangar demand forecaster behind /api/forecast.
+
+For every region the weekly number of bookings starting that week is
+modelled on the log scale as
+
+    log1p(bookings) ≈ β0 + β1·t + β2·sin(2πw/52) + β3·cos(2πw/52)
+                      + β4·event_intensity + β5·log1p(searches)
+
+where event_intensity is the surge-weighted share of the week covered by
+events at the region's airports (event_surge.EVENT_REGISTRY) and searches is
+the /listings search volume (models.SearchVolume, counted in memory by
+record_search() and written in batches). Every region is a small ridge
+regression shrunk towards the all-regions fit, so regions with little
+history borrow the global seasonality. Seasonal terms are only used once a
+series spans a full year; before that they can't be told apart from trend.
+All regions are fitted from one regions × weeks matrix with NumPy.
+
+Fitting is offline (fit_forecast.py on a schedule). The fitted coefficients
+and the ready-made forecast for each region are written to forecast.json in
+the model directory; workers load it once and re-check its mtime every
+RELOAD_CHECK_SECONDS, so a request is just a dict lookup. Until the job has
+published once, every region gets a neutral 'stable' forecast.
+
+Usage:
+    from demand_forecast import forecast_for
+    forecast_for(airport='CYTZ')   # {'region', 'trend', 'percentage', 'season', 'message', 'weekly', ...}
+    forecast_for(region='US Midwest')
+
+    # offline
+    from demand_forecast import fit_and_publish
+    fit_and_publish()
+"""
+
+import datetime
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from sqlalchemy import func
+
+from extensions import db
+from models import Booking, Listing, SearchVolume
+
+logger = logging.getLogger(__name__)
+
+FORECAST_FILE = 'forecast.json'
+RELOAD_CHECK_SECONDS = 60
+SEARCH_FLUSH_SECONDS = 60
+LOOKBACK_WEEKS = 104
+HORIZON_WEEKS = 12
+RIDGE_LAMBDA = 4.0
+TREND_BAND_PCT = 5
+ALL_REGIONS = 'All regions'
+
+FEATURES = ['intercept', 'trend', 'season_sin', 'season_cos', 'events', 'searches']
+SEASON_COLUMNS = [2, 3]
+MIN_SEASON_WEEKS = 52
+MIN_REGION_BOOKINGS = 10
+
+# (name, country prefix, test on (lat, lon)) — first match wins
+REGIONS = [
+    ('British Columbia', 'C', lambda lat, lon: lon < -114),
+    ('Prairies', 'C', lambda lat, lon: lon < -89.5),
+    ('Ontario', 'C', lambda lat, lon: lon < -74.5),
+    ('Quebec', 'C', lambda lat, lon: lon < -63 and lat >= 45),
+    ('Atlantic Canada', 'C', lambda lat, lon: True),
+    ('US West', 'K', lambda lat, lon: lon < -114),
+    ('US Mountain', 'K', lambda lat, lon: lon < -102),
+    ('US Midwest', 'K', lambda lat, lon: lon < -87 and lat >= 37),
+    ('US South', 'K', lambda lat, lon: lon < -87),
+    ('US Northeast', 'K', lambda lat, lon: lat >= 39.5),
+    ('US Southeast', 'K', lambda lat, lon: True),
+]
+REGION_NAMES = [r[0] for r in REGIONS]
+
+
+def region_for(icao, lat=None, lon=None):
+    """Map an airport (and optional coordinates) to a forecast region name, or None."""
+    code = (icao or '').strip().upper()
+    if lat is None or lon is None:
+        from airport_coords import get_coords
+        lat, lon, found = get_coords(code)
+        if not found:
+            return None
+    for name, prefix, test in REGIONS:
+        if code.startswith(prefix) and test(lat, lon):
+            return name
+    return None
+
+
+def season_label(d: datetime.date) -> str:
+    name = {12: 'Winter', 1: 'Winter', 2: 'Winter', 3: 'Spring', 4: 'Spring', 5: 'Spring',
+            6: 'Summer', 7: 'Summer', 8: 'Summer'}.get(d.month, 'Fall')
+    return f"{name} {d.year}"
+
+
+def _week_start(d) -> datetime.date:
+    d = d.date() if isinstance(d, datetime.datetime) else d
+    return d - datetime.timedelta(days=d.weekday())
+
+
+def design_matrix(weeks, events, searches) -> np.ndarray:
+    """(..., n_weeks, len(FEATURES)) design matrix; `weeks` are week-start dates."""
+    t = np.array([(w - weeks[0]).days / 7 for w in weeks]) / 52.0
+    woy = np.array([w.isocalendar()[1] for w in weeks], dtype=float)
+    base = np.stack([np.ones_like(t), t, np.sin(2 * math.pi * woy / 52), np.cos(2 * math.pi * woy / 52)], axis=-1)
+    base = np.broadcast_to(base, events.shape + (4,))
+    return np.concatenate([base, events[..., None], np.log1p(searches)[..., None]], axis=-1)
+
+
+def _without_unidentified_season(X, counts) -> np.ndarray:
+    """Zero the seasonal columns when history spans under a year (season ≈ trend otherwise)."""
+    active = np.flatnonzero(counts)
+    if len(active) and active[-1] - active[0] >= MIN_SEASON_WEEKS:
+        return X
+    X = X.copy()
+    X[..., SEASON_COLUMNS] = 0.0
+    return X
+
+
+def ridge(X, y, lam=RIDGE_LAMBDA, prior=None) -> np.ndarray:
+    """Ridge fit shrinking every coefficient but the intercept towards `prior`."""
+    penalty = np.diag([1e-6] + [lam] * (X.shape[1] - 1))
+    prior = np.zeros(X.shape[1]) if prior is None else prior
+    return np.linalg.solve(X.T @ X + penalty, X.T @ y + penalty @ prior)
+
+
+# ── Data loading ──────────────────────────────────────────────────────────────
+
+def _event_intensity(weeks, region_index) -> np.ndarray:
+    """(regions, weeks) surge-weighted fraction of each week covered by events."""
+    from event_surge import get_index
+    out = np.zeros((len(region_index), len(weeks)))
+    pos = {w: i for i, w in enumerate(weeks)}
+    for ev in get_index().events:
+        regions = {region_for(code) for code in ev.airports}
+        if ev.venue:
+            regions.add(region_for(ev.airports[0] if ev.airports else '', *ev.venue))
+        rows = [region_index[r] for r in regions if r in region_index]
+        d = ev.start
+        while d <= ev.end:
+            w = pos.get(_week_start(d))
+            if w is not None:
+                out[rows, w] += ev.surge_pct / 100 / 7
+            d += datetime.timedelta(days=1)
+    return out
+
+
+def load_history(today=None):
+    """Weekly bookings and searches per region over LOOKBACK_WEEKS + HORIZON_WEEKS of week slots."""
+    today = today or datetime.date.today()
+    first = _week_start(today) - datetime.timedelta(weeks=LOOKBACK_WEEKS)
+    weeks = [first + datetime.timedelta(weeks=i) for i in range(LOOKBACK_WEEKS + HORIZON_WEEKS)]
+    n_hist = LOOKBACK_WEEKS
+    region_index = {name: i for i, name in enumerate(REGION_NAMES)}
+    bookings = np.zeros((len(REGION_NAMES), len(weeks)))
+    searches = np.zeros_like(bookings)
+    pos = {w: i for i, w in enumerate(weeks[:n_hist])}
+
+    region_cache = {}
+
+    def _region(icao, lat=None, lon=None):
+        key = (icao, lat, lon)
+        if key not in region_cache:
+            region_cache[key] = region_for(icao, lat, lon)
+        return region_cache[key]
+
+    rows = (db.session.query(Booking.start_date, Listing.airport_icao, Listing.lat, Listing.lon)
+            .join(Listing, Booking.listing_id == Listing.id)
+            .filter(Booking.status != 'Cancelled',
+                    Booking.start_date >= datetime.datetime.combine(first, datetime.time.min))
+            .all())
+    for start, icao, lat, lon in rows:
+        r, w = _region(icao, lat, lon), pos.get(_week_start(start))
+        if r is not None and w is not None:
+            bookings[region_index[r], w] += 1
+
+    vol = (db.session.query(SearchVolume.airport_icao, SearchVolume.day, func.sum(SearchVolume.count))
+           .filter(SearchVolume.day >= first)
+           .group_by(SearchVolume.airport_icao, SearchVolume.day)
+           .all())
+    for icao, day, count in vol:
+        r, w = _region(icao), pos.get(_week_start(day))
+        if r is not None and w is not None:
+            searches[region_index[r], w] += count
+
+    # Unknown future search volume: carry the last four weeks forward
+    searches[:, n_hist:] = searches[:, n_hist - 4:n_hist].mean(axis=1, keepdims=True)
+    events = _event_intensity(weeks, region_index)
+    return weeks, n_hist, bookings, searches, events
+
+
+# ── Fitting ───────────────────────────────────────────────────────────────────
+
+def fit(today=None, horizon=HORIZON_WEEKS) -> dict:
+    today = today or datetime.date.today()
+    weeks, n_hist, bookings, searches, events = load_history(today)
+    X = design_matrix(weeks, events, searches)          # (regions, weeks, features)
+    y = np.log1p(bookings[:, :n_hist])
+
+    # Global curve on total demand, then each region shrunk towards it
+    g_events = events.sum(axis=0)
+    g_search = searches.sum(axis=0)
+    g_bookings = bookings[:, :n_hist].sum(axis=0)
+    Xg = _without_unidentified_season(design_matrix(weeks, g_events, g_search), g_bookings)
+    beta_g = ridge(Xg[:n_hist], np.log1p(g_bookings), lam=1.0)
+
+    regions = {}
+    for i, name in enumerate(REGION_NAMES):
+        if bookings[i, :n_hist].sum() < MIN_REGION_BOOKINGS:
+            # Too little local history: report the all-regions curve under this region's name
+            regions[name] = dict(_summarise(name, beta_g, Xg, bookings.sum(axis=0), n_hist, weeks, horizon),
+                                 n_bookings=int(bookings[i, :n_hist].sum()), low_data=True)
+            continue
+        X[i] = _without_unidentified_season(X[i], bookings[i, :n_hist])
+        beta = ridge(X[i, :n_hist], y[i], prior=beta_g)
+        regions[name] = _summarise(name, beta, X[i], bookings[i], n_hist, weeks, horizon)
+    regions[ALL_REGIONS] = _summarise(ALL_REGIONS, beta_g, Xg, bookings.sum(axis=0), n_hist, weeks, horizon)
+
+    return {
+        'fitted_at': datetime.datetime.utcnow().isoformat(),
+        'as_of': today.isoformat(),
+        'features': FEATURES,
+        'horizon_weeks': horizon,
+        'regions': regions,
+    }
+
+
+def _summarise(name, beta, X, bookings, n_hist, weeks, horizon) -> dict:
+    pred = np.clip(np.expm1(X @ beta), 0, None)
+    # Compare the model with itself (fitted last `horizon` weeks vs. the next
+    # `horizon`) so a level bias in the fit doesn't show up as a trend.
+    recent = pred[n_hist - horizon:n_hist].mean()
+    ahead = pred[n_hist:n_hist + horizon]
+    pct = int(round((ahead.mean() / recent - 1) * 100)) if recent > 0 else 0
+    trend = 'rising' if pct > TREND_BAND_PCT else 'falling' if pct < -TREND_BAND_PCT else 'stable'
+    season = season_label(weeks[n_hist + horizon // 2])
+    where = name if name == ALL_REGIONS else f"{name} region"
+    return {
+        'region': name,
+        'low_data': False,
+        'beta': [round(float(b), 6) for b in beta],
+        'n_bookings': int(bookings[:n_hist].sum()),
+        'trend': trend,
+        'percentage': abs(pct),
+        'season': season,
+        'message': f"Hangar demand forecast: {where} {trend} {abs(pct)}% this {season.split()[0].lower()}.",
+        'weekly': [{'week': w.isoformat(), 'bookings': round(float(p), 2)}
+                   for w, p in zip(weeks[n_hist:n_hist + horizon], ahead)],
+    }
+
+
+def forecast_path(directory=None) -> str:
+    from pricing_model import model_dir
+    return os.path.join(directory or model_dir(), FORECAST_FILE)
+
+
+def fit_and_publish(directory=None, today=None) -> dict:
+    params = fit(today)
+    path = forecast_path(directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+    os.replace(tmp, path)
+    logger.warning(f"[FORECAST] published {len(params['regions'])} regional forecasts to {path}")
+    return params
+
+
+def neutral_params(today=None) -> dict:
+    """Same shape as fit(), every region 'stable' at 0% with no weekly curve (no forecast published yet)."""
+    today = today or datetime.date.today()
+    season = season_label(_week_start(today) + datetime.timedelta(weeks=HORIZON_WEEKS // 2))
+    regions = {}
+    for name in REGION_NAMES + [ALL_REGIONS]:
+        where = name if name == ALL_REGIONS else f"{name} region"
+        regions[name] = {
+            'region': name, 'low_data': True, 'beta': [], 'n_bookings': 0,
+            'trend': 'stable', 'percentage': 0, 'season': season,
+            'message': f"Hangar demand forecast for {where} isn't available yet.",
+            'weekly': [],
+        }
+    return {'fitted_at': None, 'as_of': today.isoformat(), 'features': FEATURES,
+            'horizon_weeks': HORIZON_WEEKS, 'regions': regions}
+
+
+# ── Serving ───────────────────────────────────────────────────────────────────
+_LOCK = threading.Lock()
+_PARAMS = None
+_MTIME = None
+_LAST_CHECK = 0.0
+
+
+def get_params(directory=None, force_check=False):
+    """Current fitted forecasts for this worker (loaded from forecast.json; neutral until it exists)."""
+    global _PARAMS, _MTIME, _LAST_CHECK
+    now = time.monotonic()
+    if not force_check and _PARAMS is not None and now - _LAST_CHECK < RELOAD_CHECK_SECONDS:
+        return _PARAMS
+    with _LOCK:
+        _LAST_CHECK = now
+        path = forecast_path(directory)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        if mtime is None:
+            if _PARAMS is None:
+                # Nothing published yet: never fit on a request, answer "stable" until fit_forecast.py runs
+                logger.warning(f"[FORECAST] {path} not found — serving neutral forecasts until the fit job publishes")
+                _PARAMS = neutral_params()
+        elif mtime != _MTIME:
+            with open(path, encoding='utf-8') as f:
+                _PARAMS = json.load(f)
+            _MTIME = mtime
+        return _PARAMS
+
+
+def reset_cache() -> None:
+    global _PARAMS, _MTIME, _LAST_CHECK
+    with _LOCK:
+        _PARAMS, _MTIME, _LAST_CHECK = None, None, 0.0
+
+
+# ── Search volume ─────────────────────────────────────────────────────────────
+#
+# Counting each /listings search with its own UPDATE + commit made the day's
+# row for a busy airport a hot spot during event surges. Searches are counted
+# in this worker's memory and written every SEARCH_FLUSH_SECONDS as one
+# batched upsert, on a short-lived background thread.
+
+_searches = Counter()           # (icao, day) → searches not yet written
+_search_lock = threading.Lock()
+_last_flush = time.monotonic()
+_flushing = False
+
+
+def record_search(icao, day=None) -> None:
+    """Count one search for the forecaster (in memory; nothing is written on the request)."""
+    global _flushing
+    key = ((icao or '').strip().upper()[:10], day or datetime.datetime.utcnow().date())
+    with _search_lock:
+        _searches[key] += 1
+        due = not _flushing and time.monotonic() - _last_flush >= SEARCH_FLUSH_SECONDS
+        if due:
+            _flushing = True
+    if due:
+        from flask import current_app
+        threading.Thread(target=_flush_in_app, args=(current_app._get_current_object(),),
+                         daemon=True, name='search-volume').start()
+
+
+def _flush_in_app(app) -> None:
+    with app.app_context():
+        flush_searches()
+
+
+def flush_searches() -> int:
+    """Write the buffered counts in one transaction; returns the (airport, day) rows touched."""
+    global _last_flush, _flushing
+    with _search_lock:
+        pending = dict(_searches)
+        _searches.clear()
+        _last_flush = time.monotonic()
+    try:
+        SearchVolume.add_counts(pending)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        with _search_lock:
+            _searches.update(pending)       # kept for the next flush
+        logger.error(f"[FORECAST] search volume flush failed ({len(pending)} rows kept): {e}")
+        return 0
+    finally:
+        with _search_lock:
+            _flushing = False
+    return len(pending)
+
+
+def reset_searches() -> None:
+    """Drop the buffered counts and restart the flush clock (tests)."""
+    global _last_flush
+    with _search_lock:
+        _searches.clear()
+        _last_flush = time.monotonic()
+
+
+def forecast_for(airport=None, region=None) -> dict:
+    regions = get_params()['regions']
+    if region not in regions:
+        region = region_for(airport) if airport else None
+    return regions.get(region) or regions[ALL_REGIONS]
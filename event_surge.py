@@ -0,0 +1,227 @@
+"""
+event_surge.py — Date-indexed event surge engine.
+
+Fly-ins and airshows push transient hangar demand well above normal for a few
+nights. Events are registered as structured date ranges (night of `start`
+through the night of `end`, inclusive) with the airports that host them and an
+optional venue position. On first use the registry is expanded into a flat
+{(ICAO, night): SurgeHit} index, so "what is the surge for this listing on
+night D?" is a single dict lookup no matter how many events exist.
+
+Airports within `radius_nm` of an event venue (or of any host airport) pick up
+NEARBY_SURGE_FACTOR of the event surge. Airport codes are normalised when the
+registry is built; anything that is not an ICAO-style identifier (e.g. a
+lakebed venue name) is dropped with a warning rather than silently never
+matching.
+
+Usage:
+    from event_surge import get_index
+    index = get_index()
+    index.multiplier('KOSH', datetime.date(2026, 7, 22))     # → 1.5
+    index.nightly('KOSH', start, end)   # [(night, multiplier, SurgeHit|None), ...]
+    index.upcoming('KOSH')              # events affecting KOSH that haven't ended
+"""
+
+import datetime
+import logging
+import math
+import re
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RADIUS_NM = 30
+NEARBY_SURGE_FACTOR = 0.5      # airports inside the radius but not hosting the event
+EARTH_RADIUS_NM = 3440.065
+
+_ICAO_RE = re.compile(r'^[A-Z0-9]{3,4}$')
+
+
+@dataclass(frozen=True)
+class SurgeEvent:
+    name: str
+    start: datetime.date
+    end: datetime.date          # last surged night (inclusive)
+    surge_pct: int
+    airports: tuple
+    venue: Optional[tuple] = None   # (lat, lon) when the venue is not an airport
+    radius_nm: float = DEFAULT_RADIUS_NM
+
+    @property
+    def dates(self) -> str:
+        return f"{self.start.isoformat()} to {self.end.isoformat()}"
+
+
+@dataclass(frozen=True)
+class SurgeHit:
+    event: SurgeEvent
+    surge_pct: float
+    nearby: bool = False        # True when applied via the radius, not a host airport
+
+    @property
+    def multiplier(self) -> float:
+        return 1 + self.surge_pct / 100
+
+
+def normalize_icao(code) -> Optional[str]:
+    """'kRNO ' → 'KRNO'; non-airport strings → None."""
+    code = (code or '').strip().upper()
+    return code if _ICAO_RE.match(code) else None
+
+
+def make_event(name, start, end, surge_pct, airports, venue=None, radius_nm=DEFAULT_RADIUS_NM) -> SurgeEvent:
+    """Build a SurgeEvent, normalising dates and airport codes."""
+    if isinstance(start, str):
+        start = datetime.date.fromisoformat(start)
+    if isinstance(end, str):
+        end = datetime.date.fromisoformat(end)
+    if end < start:
+        raise ValueError(f"event {name!r} ends before it starts")
+
+    codes = []
+    for raw in airports:
+        code = normalize_icao(raw)
+        if code is None:
+            logger.warning(f"[SURGE] {name}: ignoring non-ICAO airport {raw!r}")
+        elif code not in codes:
+            codes.append(code)
+    return SurgeEvent(name=name, start=start, end=end, surge_pct=surge_pct,
+                      airports=tuple(codes), venue=venue, radius_nm=radius_nm)
+
+
+EVENT_REGISTRY = (
+    make_event('Oshkosh AirVenture', '2026-07-20', '2026-07-26', 50, ['KOSH', 'KATW', 'KFLD'],
+               venue=(43.9844, -88.5570), radius_nm=40),
+    make_event('Sun n Fun Aerospace Expo', '2026-04-05', '2026-04-10', 40, ['KLAL', 'KPCM', 'KBOW'],
+               venue=(27.9889, -82.0186)),
+    make_event('NBAA-BACE Las Vegas', '2026-10-14', '2026-10-16', 45, ['KLAS', 'KHND', 'KVGT'],
+               venue=(36.1300, -115.1500)),
+    make_event('Reno Air Races', '2026-09-10', '2026-09-14', 35, ['KRTS', 'kRNO', 'KCXP'],
+               venue=(39.6680, -119.8760)),
+    # The fly-in itself happens on the playa, not at an airport
+    make_event('High Sierra Fly-In', '2026-10-15', '2026-10-18', 30, ['Dead Cow Lakebed', 'KWMC', 'KRNO'],
+               venue=(40.0830, -119.1950), radius_nm=60),
+)
+
+
+def haversine_nm(lat1, lon1, lat2, lon2) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_NM * math.asin(math.sqrt(a))
+
+
+def _nights(start: datetime.date, end: datetime.date):
+    d = start
+    while d <= end:
+        yield d
+        d += datetime.timedelta(days=1)
+
+
+def _as_date(d) -> datetime.date:
+    return d.date() if isinstance(d, datetime.datetime) else d
+
+
+class SurgeIndex:
+    """Flat (airport, night) → SurgeHit index built once from a list of events."""
+
+    def __init__(self, events=EVENT_REGISTRY, coords=None):
+        self.events = tuple(events)
+        self._by_night = {}
+        self._by_airport = {}
+        coords = coords if coords is not None else _airport_coords()
+        for ev in self.events:
+            for code, nearby in self._affected_airports(ev, coords).items():
+                pct = ev.surge_pct * NEARBY_SURGE_FACTOR if nearby else ev.surge_pct
+                hit = SurgeHit(event=ev, surge_pct=pct, nearby=nearby)
+                self._by_airport.setdefault(code, []).append(hit)
+                for night in _nights(ev.start, ev.end):
+                    current = self._by_night.get((code, night))
+                    # Overlapping events: the strongest surge wins
+                    if current is None or hit.surge_pct > current.surge_pct:
+                        self._by_night[(code, night)] = hit
+        for hits in self._by_airport.values():
+            hits.sort(key=lambda h: h.event.start)
+        logger.info(f"[SURGE] indexed {len(self.events)} events → {len(self._by_night):,} airport-nights")
+
+    @staticmethod
+    def _affected_airports(ev: SurgeEvent, coords) -> dict:
+        """{ICAO: nearby?} — host airports first, then everything inside the radius."""
+        affected = {code: False for code in ev.airports}
+        centres = [ev.venue] if ev.venue else []
+        centres += [coords[c] for c in ev.airports if c in coords]
+        if not centres or not ev.radius_nm:
+            return affected
+
+        # Cheap lat/lon box before the great-circle check
+        dlat = ev.radius_nm / 60.0
+        for code, (lat, lon) in coords.items():
+            if code in affected:
+                continue
+            for clat, clon in centres:
+                if abs(lat - clat) > dlat:
+                    continue
+                dlon = dlat / max(0.01, math.cos(math.radians(clat)))
+                if abs(lon - clon) > dlon:
+                    continue
+                if haversine_nm(lat, lon, clat, clon) <= ev.radius_nm:
+                    affected[code] = True
+                    break
+        return affected
+
+    def surge_for(self, icao, night) -> Optional[SurgeHit]:
+        return self._by_night.get(((icao or '').strip().upper(), _as_date(night)))
+
+    def multiplier(self, icao, night) -> float:
+        hit = self.surge_for(icao, night)
+        return hit.multiplier if hit else 1.0
+
+    def nightly(self, icao, start, end) -> list:
+        """[(night, multiplier, hit)] for each night of a stay (checkout day excluded)."""
+        code = (icao or '').strip().upper()
+        out = []
+        night, end = _as_date(start), _as_date(end)
+        while night < end:
+            hit = self._by_night.get((code, night))
+            out.append((night, hit.multiplier if hit else 1.0, hit))
+            night += datetime.timedelta(days=1)
+        return out
+
+    def upcoming(self, icao, today=None) -> list:
+        """Events affecting this airport that have not finished yet, soonest first."""
+        today = _as_date(today) or datetime.date.today()
+        return [h for h in self._by_airport.get((icao or '').strip().upper(), []) if h.event.end >= today]
+
+    def as_dict(self) -> dict:
+        """{name: {'dates', 'airports', 'surge'}} — the shape post_listing.html reads."""
+        return {ev.name: {'dates': ev.dates, 'airports': list(ev.airports), 'surge': ev.surge_pct}
+                for ev in self.events}
+
+
+def _airport_coords() -> dict:
+    import airport_coords
+    airport_coords.load_airport_coords()
+    return airport_coords._COORDS_CACHE or airport_coords.HARDCODED_COORDS
+
+
+# ── Process-wide index ────────────────────────────────────────────────────────
+_LOCK = threading.Lock()
+_INDEX: Optional[SurgeIndex] = None
+
+
+def get_index() -> SurgeIndex:
+    global _INDEX
+    if _INDEX is None:
+        with _LOCK:
+            if _INDEX is None:
+                _INDEX = SurgeIndex()
+    return _INDEX
+
+
+def reset_index(index: Optional[SurgeIndex] = None) -> None:
+    """Drop (or replace) the cached index — used by tests and after registry edits."""
+    global _INDEX
+    with _LOCK:
+        _INDEX = index
@@ -35,4 +35,4 @@ except ImportError:
 db = SQLAlchemy()
 login_manager = LoginManager()
 migrate = Migrate()
-cache = Cache(config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 300})
+cache = Cache()                 # CACHE_* settings come from the app config
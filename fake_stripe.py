@@ -0,0 +1,122 @@
+"""
+fake_stripe.py — Local generator for signed Stripe webhook events.
+
+Builds event payloads shaped like Stripe's and signs them the way Stripe
+does (Stripe-Signature: t=<unix>,v1=HMAC-SHA256(secret, "<t>.<body>")), so
+tests and local development can drive /webhook/stripe without Stripe.
+
+Usage:
+    from fake_stripe import checkout_completed, signed
+    body, headers = signed(checkout_completed('cs_test_1', {'item_type': 'rental_booking'}), secret)
+    client.post('/webhook/stripe', data=body, headers=headers)
+
+    python fake_stripe.py checkout.session.completed --session cs_test_1 \\
+        --meta item_type=rental_booking --secret whsec_... --url http://localhost:5000/webhook/stripe
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import time
+import uuid
+
+
+def _id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+def event(type: str, obj: dict, event_id: str = None) -> dict:
+    return {
+        'id': event_id or _id('evt'),
+        'object': 'event',
+        'api_version': '2023-10-16',
+        'created': int(time.time()),
+        'livemode': False,
+        'pending_webhooks': 1,
+        'type': type,
+        'data': {'object': obj},
+    }
+
+
+def checkout_session(session_id=None, metadata=None, mode='payment', status='complete', payment_status='paid',
+                     customer=None, subscription=None, payment_intent=None) -> dict:
+    return {
+        'id': session_id or _id('cs_test'),
+        'object': 'checkout.session',
+        'mode': mode,
+        'status': status,
+        'payment_status': payment_status,
+        'customer': customer,
+        'subscription': subscription,
+        'payment_intent': payment_intent if payment_intent or mode != 'payment' else _id('pi'),
+        'metadata': {k: str(v) for k, v in (metadata or {}).items()},
+    }
+
+
+def checkout_completed(session_id=None, metadata=None, **fields) -> dict:
+    return event('checkout.session.completed', checkout_session(session_id, metadata, **fields))
+
+
+def checkout_expired(session_id=None, metadata=None) -> dict:
+    return event('checkout.session.expired',
+                 checkout_session(session_id, metadata, status='expired', payment_status='unpaid'))
+
+
+def subscription_deleted(subscription_id, customer=None) -> dict:
+    return event('customer.subscription.deleted',
+                 {'id': subscription_id, 'object': 'subscription', 'customer': customer, 'status': 'canceled'})
+
+
+def invoice_paid(customer, subscription=None, period_end=None) -> dict:
+    lines = [{'period': {'start': int(time.time()), 'end': period_end}}] if period_end else []
+    return event('invoice.payment_succeeded',
+                 {'id': _id('in'), 'object': 'invoice', 'customer': customer,
+                  'subscription': subscription, 'lines': {'data': lines}})
+
+
+def signature(payload: str, secret: str, timestamp: int = None) -> str:
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def signed(evt: dict, secret: str, timestamp: int = None) -> tuple:
+    """(body, headers) ready to POST to /webhook/stripe."""
+    body = json.dumps(evt)
+    return body, {'Stripe-Signature': signature(body, secret, timestamp), 'Content-Type': 'application/json'}
+
+
+def main():
+    from urllib.request import Request, urlopen
+
+    parser = argparse.ArgumentParser(description="Send a signed fake Stripe event to a local webhook")
+    parser.add_argument('type', choices=['checkout.session.completed', 'checkout.session.expired',
+                                         'customer.subscription.deleted', 'invoice.payment_succeeded'])
+    parser.add_argument('--session', help="checkout session id (checkout events)")
+    parser.add_argument('--meta', action='append', default=[], help="metadata key=value (repeatable)")
+    parser.add_argument('--subscription', help="subscription id")
+    parser.add_argument('--customer', help="customer id")
+    parser.add_argument('--secret', required=True, help="STRIPE_WEBHOOK_SECRET of the target app")
+    parser.add_argument('--url', default='http://localhost:5000/webhook/stripe')
+    parser.add_argument('--repeat', type=int, default=1, help="deliver the same event N times")
+    args = parser.parse_args()
+
+    metadata = dict(kv.split('=', 1) for kv in args.meta)
+    if args.type == 'checkout.session.completed':
+        evt = checkout_completed(args.session, metadata, customer=args.customer, subscription=args.subscription)
+    elif args.type == 'checkout.session.expired':
+        evt = checkout_expired(args.session, metadata)
+    elif args.type == 'customer.subscription.deleted':
+        evt = subscription_deleted(args.subscription, args.customer)
+    else:
+        evt = invoice_paid(args.customer, args.subscription)
+
+    for _ in range(args.repeat):
+        body, headers = signed(evt, args.secret)
+        with urlopen(Request(args.url, data=body.encode(), headers=headers, method='POST')) as resp:
+            print(f"{evt['id']} {evt['type']} -> {resp.status} {resp.read().decode()}")
+
+
+if __name__ == '__main__':
+    main()
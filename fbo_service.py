@@ -0,0 +1,181 @@
+"""
+fbo_service.py — FBO & fuel data for listing pages, never waited on.
+
+listing_detail used to call AviationStack synchronously on every view (new
+connection each time, 2 s timeout) and then show mock data anyway. Lookups
+now go through providers:
+
+    StaticProvider          local JSON dataset (FBO_DATASET), one dict lookup;
+                            reloaded when the file changes
+    AviationStackProvider   the remote API through integrations.client('aviationstack')
+                            (pooled session, timeout, circuit breaker)
+
+FBOService.lookup(icao) answers from the dataset, else from a per-airport
+cache of remote answers (FBO_CACHE_TTL_SECONDS), else DEFAULT_FBO. A remote
+miss or an expired entry is refreshed on a small background pool, so the
+page renders with what is known now and the next view gets the fresh data.
+While the upstream's breaker is open no refresh is queued at all.
+
+Dataset format ({ICAO: fields shown on the page}):
+    {"KOSH": {"fbo_name": "Basler Flight Service", "fuel_type": "100LL",
+              "fuel_price": 6.89, "services": ["GPU", "Crew Cars"]}}
+
+Usage:
+    from fbo_service import fbo_for
+    fbo_data = fbo_for(listing.airport_icao)      # dict, 'source' says where it came from
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from integrations import client
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = 3600
+REFRESH_WORKERS = 2
+AVIATIONSTACK_URL = 'http://api.aviationstack.com/v1/airports'
+
+DEFAULT_FBO = {
+    'fbo_name': 'Million Air',
+    'fuel_type': 'Jet A',
+    'fuel_price': 6.50,         # USD per gallon
+    'services': ['Transport', 'GPU'],
+    'source': 'default',
+}
+
+_clock = time.monotonic
+
+
+# ── Providers ─────────────────────────────────────────────────────────────────
+
+class StaticProvider:
+    name = 'dataset'
+
+    def __init__(self, path):
+        self.path = path
+        self._data, self._mtime = {}, None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return {}
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    with open(self.path, encoding='utf-8') as f:
+                        self._data = {k.upper(): v for k, v in json.load(f).items()}
+                    logger.info(f"[FBO] dataset loaded — {len(self._data)} airports")
+                except (OSError, ValueError, AttributeError) as e:
+                    logger.error(f"[FBO] could not read {self.path}: {e}")
+                self._mtime = mtime
+            return self._data
+
+    def lookup(self, icao) -> Optional[dict]:
+        return self._load().get(icao)
+
+
+class AviationStackProvider:
+    name = 'aviationstack'
+
+    def __init__(self, key):
+        self.key = key
+
+    @property
+    def client(self):
+        return client(self.name)
+
+    def lookup(self, icao) -> Optional[dict]:
+        """Airport record for `icao`, None if AviationStack doesn't know it; raises if the call fails."""
+        resp = self.client.get(AVIATIONSTACK_URL, params={'access_key': self.key, 'search': icao})
+        resp.raise_for_status()
+        rows = resp.json().get('data') or []
+        row = next((r for r in rows if (r.get('icao_code') or '').upper() == icao), rows[0] if rows else None)
+        if row is None:
+            return None
+        # AviationStack has airports, not FBOs: the airport name is all it adds to the defaults
+        return {'airport_name': row.get('airport_name')}
+
+
+# ── Service ───────────────────────────────────────────────────────────────────
+
+_Entry = namedtuple('_Entry', 'data fetched_at')
+
+
+class FBOService:
+
+    def __init__(self, static=None, remote=None, ttl: float = CACHE_TTL_SECONDS, executor=None):
+        self.static = static
+        self.remote = remote
+        self.ttl = ttl
+        self.executor = executor
+        self._cache = {}            # icao → _Entry (data None = the upstream doesn't know it)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def lookup(self, icao) -> dict:
+        icao = (icao or '').upper()
+        found = self.static.lookup(icao) if self.static and icao else None
+        if found:
+            return dict(DEFAULT_FBO, **found, source=self.static.name)
+        if not self.remote or not icao:
+            return dict(DEFAULT_FBO)
+        with self._lock:
+            entry = self._cache.get(icao)
+            due = entry is None or _clock() - entry.fetched_at >= self.ttl
+            queue = due and icao not in self._refreshing and self.remote.client.breaker.state != 'open'
+            if queue:
+                self._refreshing.add(icao)
+        if queue:
+            self._submit(icao)
+        if entry is not None and entry.data:
+            return dict(DEFAULT_FBO, **entry.data, source=self.remote.name)
+        return dict(DEFAULT_FBO)
+
+    def _submit(self, icao):
+        try:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='fbo')
+            self.executor.submit(self._refresh, icao)
+        except Exception as e:
+            logger.error(f"[FBO] could not queue refresh of {icao}: {e}")
+            with self._lock:
+                self._refreshing.discard(icao)
+
+    def _refresh(self, icao):
+        try:
+            try:
+                data = self.remote.lookup(icao)
+            except Exception as e:
+                logger.warning(f"[FBO] {self.remote.name} lookup for {icao} failed: {e}")
+                return
+            with self._lock:
+                self._cache[icao] = _Entry(data, _clock())
+        finally:
+            with self._lock:
+                self._refreshing.discard(icao)
+
+
+def build_service(config) -> FBOService:
+    key = config.get('AVIATIONSTACK_KEY') or os.environ.get('AVIATIONSTACK_KEY')
+    dataset = config.get('FBO_DATASET')
+    return FBOService(static=StaticProvider(dataset) if dataset else None,
+                      remote=AviationStackProvider(key) if key else None,
+                      ttl=config.get('FBO_CACHE_TTL_SECONDS', CACHE_TTL_SECONDS))
+
+
+def fbo_for(icao) -> dict:
+    """FBO & fuel data for an airport through the current app's FBOService (built on first use)."""
+    from flask import current_app
+    service = current_app.extensions.get('fbo_service')
+    if service is None:
+        service = current_app.extensions.setdefault('fbo_service', build_service(current_app.config))
+    return service.lookup(icao)
@@ -0,0 +1,31 @@
+"""
+Scheduled job: refit regional demand forecasts for /api/forecast.
+
+    python fit_forecast.py                 # e.g. every 6 hours from cron
+    python fit_forecast.py --model-dir /data/models
+
+Writes forecast.json next to the pricing model; web workers pick it up within
+demand_forecast.RELOAD_CHECK_SECONDS.
+"""
+import argparse
+import time
+
+from app import app
+from demand_forecast import fit_and_publish
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit and publish regional demand forecasts")
+    parser.add_argument('--model-dir', default=None, help="override PRICING_MODEL_DIR")
+    args = parser.parse_args()
+
+    with app.app_context():
+        t0 = time.perf_counter()
+        params = fit_and_publish(args.model_dir)
+        print(f"Fitted {len(params['regions'])} regions in {time.perf_counter() - t0:.2f}s")
+        for name, r in params['regions'].items():
+            print(f"  {name:<18} {r['n_bookings']:>6} bookings  {r['trend']:<8} {r['percentage']:>4}%")
+
+
+if __name__ == '__main__':
+    main()
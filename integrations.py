@@ -0,0 +1,475 @@
+"""
+integrations.py — One outbound layer for every third-party call.
+
+Each upstream is a named service with a Policy (per-attempt timeout, total
+time budget, retries, breaker threshold / reset, connection pool size):
+
+    openweathermap   weather_service      aviationstack   fbo_service
+    aviationweather  metar_feed           ourairports     airport_coords
+    openai           concierge            stripe          every Stripe SDK call
+
+client(name) is that service's Client, one per process:
+
+    session         keep-alive requests.Session, pool sized by the policy
+    request/get/post
+                    timeout = min(policy timeout, budget left); idempotent
+                    requests are retried on connection errors, 5xx and 429
+                    while the budget allows; every attempt is timed
+    call(fn, ...)   the same breaker and metrics around an SDK call (OpenAI)
+    breaker         CircuitBreaker — after `failure_threshold` straight
+                    failures, calls fail fast with CircuitOpen until
+                    `reset_seconds` pass; then one trial call decides
+    metrics         calls, failures, short circuits, p50 / p95 / max latency
+
+Stripe is wired in by configure_stripe(): the SDK's HTTP client becomes a
+RequestsClient on the pooled session whose requests go through the breaker.
+openai_client() returns one OpenAI client per key instead of one per message.
+
+init_app(app) reads the overrides: INTEGRATION_POLICIES per service, e.g.
+{'openai': {'timeout': 60}}. Fakes replace the transport, not the caller: a
+handler installed with install_fake() (or fake() in tests) answers the
+service's HTTP requests, so timeouts, breakers and metrics still run. Services
+listed in INTEGRATION_FAKES use the built-in local fakes (no network needed).
+
+Usage:
+    from integrations import client, call, openai_client
+    resp = client('openweathermap').get(url, params=params)
+    reply = call('openai', openai_client().chat.completions.create, model=..., messages=...)
+    with fake('aviationstack', lambda req: {'data': []}): ...
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+Policy = namedtuple('Policy', 'timeout budget retries failure_threshold reset_seconds pool_size')
+
+DEFAULT_POLICY = Policy(timeout=5, budget=10, retries=0, failure_threshold=5, reset_seconds=60, pool_size=10)
+POLICIES = {
+    'openweathermap':  Policy(timeout=5, budget=5, retries=0, failure_threshold=5, reset_seconds=60, pool_size=10),
+    'aviationweather': Policy(timeout=30, budget=60, retries=1, failure_threshold=3, reset_seconds=300, pool_size=2),
+    'aviationstack':   Policy(timeout=2, budget=2, retries=0, failure_threshold=5, reset_seconds=60, pool_size=10),
+    'ourairports':     Policy(timeout=15, budget=30, retries=1, failure_threshold=3, reset_seconds=300, pool_size=2),
+    'openai':          Policy(timeout=30, budget=45, retries=1, failure_threshold=5, reset_seconds=60, pool_size=10),
+    'stripe':          Policy(timeout=20, budget=40, retries=1, failure_threshold=5, reset_seconds=30, pool_size=10),
+}
+IDEMPOTENT = {'GET', 'HEAD', 'OPTIONS'}
+LATENCY_SAMPLES = 500
+USER_AGENT = 'HangarLinks/1.0'
+
+_clock = time.monotonic
+
+
+class IntegrationError(Exception):
+
+    def __init__(self, service, message):
+        super().__init__(f"{service}: {message}")
+        self.service = service
+
+
+class CircuitOpen(IntegrationError):
+    """The service's breaker is open: failing fast instead of calling it."""
+
+
+class BudgetExceeded(IntegrationError):
+    """No time left in the call's budget for another attempt."""
+
+
+_overrides = {}             # name → Policy fields, from INTEGRATION_POLICIES
+_fakes = set()              # names answered by BUILTIN_FAKES, from INTEGRATION_FAKES
+
+
+def init_app(app) -> None:
+    """Read INTEGRATION_POLICIES / INTEGRATION_FAKES; clients are process-wide, so worker threads see them too."""
+    global _overrides, _fakes
+    _overrides = dict(app.config.get('INTEGRATION_POLICIES') or {})
+    raw = app.config.get('INTEGRATION_FAKES') or ''
+    _fakes = {s.strip() for s in (raw.split(',') if isinstance(raw, str) else raw) if s.strip()}
+    reset()
+    try:
+        import stripe
+    except ImportError:
+        return
+    configure_stripe(stripe)
+
+
+def policy(name) -> Policy:
+    base = POLICIES.get(name, DEFAULT_POLICY)
+    overrides = _overrides.get(name)
+    return base._replace(**overrides) if overrides else base
+
+
+# ── Breaker & metrics ─────────────────────────────────────────────────────────
+
+class CircuitBreaker:
+    """closed → open after `threshold` straight failures; open → one trial call after `reset_seconds`."""
+
+    def __init__(self, threshold: int = DEFAULT_POLICY.failure_threshold,
+                 reset_seconds: float = DEFAULT_POLICY.reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if _clock() - self.opened_at >= self.reset_seconds else 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self.failures, self.opened_at, self._trial = 0, None, False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = _clock()
+
+
+class Metrics:
+
+    def __init__(self):
+        self.calls = self.failures = self.short_circuits = 0
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)     # seconds, most recent attempts
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.failures += not ok
+            self._latencies.append(seconds)
+
+    def short_circuit(self) -> None:
+        with self._lock:
+            self.short_circuits += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._latencies)
+            calls, failures, short = self.calls, self.failures, self.short_circuits
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1) if samples else None
+        return {'calls': calls, 'failures': failures, 'short_circuits': short,
+                'p50_ms': pct(0.5), 'p95_ms': pct(0.95), 'max_ms': round(samples[-1] * 1000, 1) if samples else None}
+
+
+def _upstream_failure(exc) -> bool:
+    """Connection problems, 5xx and 429 count against the breaker; the caller's own 4xx errors don't."""
+    status = getattr(exc, 'http_status', None) or getattr(exc, 'status_code', None)
+    return status is None or status >= 500 or status == 429
+
+
+# ── Fakes ─────────────────────────────────────────────────────────────────────
+
+def _adapter_base():
+    from requests.adapters import BaseAdapter
+    return BaseAdapter
+
+
+class FakeTransport(_adapter_base()):
+    """requests transport adapter answering from `handler(request)`.
+
+    The handler returns a requests.Response, a (status, body[, headers]) tuple,
+    a dict/list (JSON, 200), str/bytes (200), or raises to simulate a failure.
+    """
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+
+    def send(self, request, **kwargs):
+        import requests
+        result = self.handler(request)
+        if isinstance(result, requests.Response):
+            return result
+        status, headers = 200, {}
+        if isinstance(result, tuple):
+            status, body = result[0], result[1]
+            headers = result[2] if len(result) > 2 else {}
+        else:
+            body = result
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+            headers = {'Content-Type': 'application/json', **headers}
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = body.encode('utf-8') if isinstance(body, str) else (body or b'')
+        resp.headers.update(headers)
+        resp.url = request.url
+        resp.request = request
+        resp.encoding = 'utf-8'
+        return resp
+
+    def close(self):
+        pass
+
+
+# ── Client ────────────────────────────────────────────────────────────────────
+
+class Client:
+
+    def __init__(self, name):
+        self.name = name
+        p = policy(name)
+        self.breaker = CircuitBreaker(p.failure_threshold, p.reset_seconds)
+        self.metrics = Metrics()
+        self.fake = None            # SDK stand-in (openai) or the HTTP handler, when installed
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                session.headers['User-Agent'] = USER_AGENT
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=policy(self.name).pool_size, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def _attempt(self, fn, args=(), kwargs=None, failed=None):
+        if not self.breaker.allow():
+            self.metrics.short_circuit()
+            raise CircuitOpen(self.name, f"circuit open after {self.breaker.failures} failures")
+        started = _clock()
+        try:
+            result = fn(*args, **(kwargs or {}))
+        except Exception as e:
+            failed = _upstream_failure(e)
+            self.metrics.record(_clock() - started, not failed)
+            if failed:
+                self.breaker.failure()
+            else:
+                self.breaker.success()
+            raise
+        ok = not (failed and failed(result))
+        self.metrics.record(_clock() - started, ok)
+        if ok:
+            self.breaker.success()
+        else:
+            self.breaker.failure()
+        return result
+
+    def request(self, method, url, **kwargs):
+        import requests
+        p = policy(self.name)
+        method = method.upper()
+        deadline = _clock() + p.budget
+        attempts = 1 + (p.retries if method in IDEMPOTENT else 0)
+        error = None
+        for attempt in range(attempts):
+            remaining = deadline - _clock()
+            if remaining <= 0:
+                raise BudgetExceeded(self.name, f"{p.budget}s budget spent") from error
+            timeout = min(p.timeout, remaining)
+            try:
+                resp = self._attempt(self._send, (method, url, timeout, dict(kwargs)))
+            except requests.RequestException as e:
+                error = e
+                logger.warning(f"[HTTP] {self.name} {method} attempt {attempt + 1}/{attempts} failed: {e}")
+                continue
+            return resp
+        raise error
+
+    def _send(self, method, url, timeout, kwargs):
+        resp = self.session.request(method, url, timeout=kwargs.pop('timeout', timeout), **kwargs)
+        if resp.status_code >= 500 or resp.status_code == 429:
+            import requests
+            error = requests.HTTPError(f"{resp.status_code} from {self.name}", response=resp)
+            error.status_code = resp.status_code
+            raise error
+        return resp
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def call(self, fn, *args, **kwargs):
+        """Run an SDK call (which applies its own timeout) through the breaker and metrics."""
+        return self._attempt(fn, args, kwargs)
+
+    def install_fake(self, handler) -> None:
+        self.fake = handler
+        if callable(handler) and not hasattr(handler, 'chat'):
+            transport = FakeTransport(handler)
+            self.session.mount('http://', transport)
+            self.session.mount('https://', transport)
+
+    def remove_fake(self) -> None:
+        with self._lock:
+            self.fake = None
+            self._session = None
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client(name) -> Client:
+    with _clients_lock:
+        c = _clients.get(name)
+        if c is None:
+            c = _clients[name] = Client(name)
+            builtin = BUILTIN_FAKES.get(name)
+            if builtin and name in _fakes:
+                c.install_fake(builtin())
+                logger.info(f"[HTTP] {name} uses its local fake")
+        return c
+
+
+def call(name, fn, *args, **kwargs):
+    return client(name).call(fn, *args, **kwargs)
+
+
+def metrics() -> dict:
+    with _clients_lock:
+        clients = dict(_clients)
+    return {name: dict(c.metrics.snapshot(), breaker=c.breaker.state) for name, c in sorted(clients.items())}
+
+
+def install_fake(name, handler) -> None:
+    client(name).install_fake(handler)
+
+
+def remove_fake(name) -> None:
+    client(name).remove_fake()
+
+
+@contextmanager
+def fake(name, handler):
+    install_fake(name, handler)
+    try:
+        yield client(name)
+    finally:
+        remove_fake(name)
+
+
+def reset() -> None:
+    """Forget every client (breakers, metrics, sessions, fakes)."""
+    with _clients_lock:
+        _clients.clear()
+
+
+# ── SDKs ──────────────────────────────────────────────────────────────────────
+
+_openai_clients = {}
+
+
+def openai_client():
+    """Shared OpenAI-compatible client for the configured key, a fake if installed, else None."""
+    import os
+    c = client('openai')
+    if c.fake is not None:
+        return c.fake
+    api_key = os.environ.get('OPENAI_API_KEY') or os.environ.get('GROK_API_KEY')
+    if not api_key:
+        return None
+    try:
+        import openai
+    except ImportError:
+        return None
+    base_url = os.environ.get('OPENAI_BASE_URL')     # https://api.x.ai/v1 for Grok
+    key = (api_key, base_url)
+    with _clients_lock:
+        sdk = _openai_clients.get(key)
+        if sdk is None:
+            p = policy('openai')
+            kwargs = {'api_key': api_key, 'timeout': p.timeout, 'max_retries': p.retries}
+            if base_url:
+                kwargs['base_url'] = base_url
+            sdk = _openai_clients[key] = openai.OpenAI(**kwargs)
+        return sdk
+
+
+def configure_stripe(stripe_module) -> None:
+    """Route the Stripe SDK's HTTP through the 'stripe' client (pooled session, timeout, breaker, metrics)."""
+    if getattr(stripe_module.default_http_client, 'integration', None) == 'stripe':
+        return
+
+    class _StripeHTTPClient(stripe_module.http_client.RequestsClient):
+        integration = 'stripe'
+
+        def request(self, method, url, headers, post_data=None):
+            c = client('stripe')
+            self._session = c.session
+            return c._attempt(super().request, (method, url, headers, post_data),
+                              failed=lambda result: result[1] >= 500 or result[1] == 429)
+
+    p = policy('stripe')
+    stripe_module.default_http_client = _StripeHTTPClient(timeout=p.timeout)
+    stripe_module.max_network_retries = p.retries
+
+
+# ── Built-in local fakes (INTEGRATION_FAKES) ──────────────────────────────────
+
+def _fake_openweathermap():
+    def handler(request):
+        return {'main': {'temp': 68}, 'wind': {'speed': 9, 'deg': 270}, 'visibility': 16093,
+                'weather': [{'main': 'Clear', 'description': 'clear sky', 'icon': '01d'}]}
+    return handler
+
+
+def _fake_aviationstack():
+    def handler(request):
+        from urllib.parse import parse_qs, urlparse
+        icao = (parse_qs(urlparse(request.url).query).get('search') or [''])[0].upper()
+        return {'data': [{'icao_code': icao, 'airport_name': f'{icao} (local fake)'}]}
+    return handler
+
+
+class FakeOpenAI:
+    """chat.completions.create() that answers from the last user message, for offline development.
+
+    With stream=True the reply comes back word by word as chunks, like the real API.
+    """
+
+    def __init__(self, reply=None):
+        self.reply = reply
+        self.chat = self
+        self.completions = self
+        self.requests = []
+
+    def create(self, **kwargs):
+        from types import SimpleNamespace
+        self.requests.append(kwargs)
+        last = next((m['content'] for m in reversed(kwargs.get('messages', [])) if m.get('role') == 'user'), '')
+        text = self.reply if self.reply is not None else f"(offline concierge) You asked: {last}"
+        if kwargs.get('stream'):
+            words = text.split(' ')
+            return (SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=w if i == 0 else ' ' + w))])
+                    for i, w in enumerate(words))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+BUILTIN_FAKES = {
+    'openweathermap': _fake_openweathermap,
+    'aviationstack': _fake_aviationstack,
+    'openai': FakeOpenAI,
+}
@@ -0,0 +1,201 @@
+"""
+lease_pdf.py — Off-request, content-addressed lease PDF rendering.
+
+WeasyPrint layout is CPU-bound (hundreds of ms per lease) and would stall an
+eventlet worker, and every request multiplexed on it, for the whole render.
+So requests only do the cheap part:
+
+    ensure_lease_pdf(booking)   render the lease HTML (Jinja), hash it and point
+                                booking.lease_pdf_path at lease-<sha256>.pdf.
+                                If that file exists nothing else happens;
+                                otherwise the PDF is queued on a process pool.
+    lease_status(booking)       {'ready', 'pending', 'url'} for the signing
+                                page, which polls until the file lands.
+
+The name is the hash of the exact HTML plus lease.css, so an unchanged lease
+is never rendered twice: reopening the signing page, re-downloading or a
+redelivered payment webhook reuse the file, while a signature (which changes
+the document) yields a new one. The HTML includes both sign tokens, so names
+can't be guessed. A <name>.pending marker, created with O_EXCL, stops
+several web processes queueing the same render.
+
+Each render process builds its FontConfiguration and parses lease.css once,
+then reuses both for every lease it renders.
+
+LEASE_PDF_WORKERS (config) sizes the pool; 0 renders inline (tests, scripts).
+
+Usage:
+    from lease_pdf import ensure_lease_pdf, lease_status
+    ensure_lease_pdf(booking)           # caller commits
+    lease_status(booking)['ready']
+"""
+
+import datetime
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+RENDER_VERSION = '1'            # bump when a WeasyPrint upgrade changes output
+LEASE_SUBDIR = os.path.join('static', 'leases')
+PENDING_TIMEOUT_SECONDS = 300   # a .pending marker older than this is a crashed render
+
+_pool = None
+_pool_lock = threading.Lock()
+_css_digests = {}
+
+# ── Render process side ───────────────────────────────────────────────────────
+
+_font_config = None
+_stylesheets = None
+
+
+def _init_renderer(css_path):
+    """Load fonts and parse lease.css once per process."""
+    global _font_config, _stylesheets
+    from weasyprint import CSS
+    try:
+        from weasyprint.text.fonts import FontConfiguration
+    except ImportError:         # WeasyPrint < 53
+        from weasyprint.fonts import FontConfiguration
+    _font_config = FontConfiguration()
+    _stylesheets = [CSS(filename=css_path, font_config=_font_config)]
+
+
+def render_pdf(html: str, out_path: str, css_path: str) -> str:
+    """Write `html` to `out_path` as a PDF (atomically) and clear its pending marker."""
+    try:
+        if _stylesheets is None:
+            _init_renderer(css_path)
+        from weasyprint import HTML
+        tmp = f"{out_path}.{os.getpid()}.tmp"
+        HTML(string=html).write_pdf(tmp, stylesheets=_stylesheets, font_config=_font_config)
+        os.replace(tmp, out_path)
+        return out_path
+    finally:
+        try:
+            os.remove(out_path + '.pending')
+        except OSError:
+            pass
+
+
+# ── Web side ──────────────────────────────────────────────────────────────────
+
+def _paths() -> tuple:
+    from flask import current_app
+    return (os.path.join(current_app.root_path, LEASE_SUBDIR),
+            os.path.join(current_app.root_path, 'templates', 'lease.css'))
+
+
+def engine_available() -> bool:
+    from routes import HTML     # WeasyPrint, imported (or not) with its GTK setup in routes
+    return HTML is not None
+
+
+def _css_digest(css_path) -> str:
+    mtime = os.path.getmtime(css_path)
+    cached = _css_digests.get(css_path)
+    if not cached or cached[0] != mtime:
+        with open(css_path, 'rb') as f:
+            cached = _css_digests[css_path] = (mtime, hashlib.sha256(f.read()).hexdigest())
+    return cached[1]
+
+
+def lease_html(booking) -> str:
+    from flask import render_template
+    # Stamp with the booking date, not "now", so the same lease always renders the same bytes
+    generated = booking.created_at or datetime.datetime.utcnow()
+    return render_template('lease_template.html',
+                           booking=booking,
+                           listing=booking.listing,
+                           owner=booking.listing.owner,
+                           renter=booking.renter,
+                           current_time=generated.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def content_name(html: str, css_path: str) -> str:
+    digest = hashlib.sha256(f"{RENDER_VERSION}\n{_css_digest(css_path)}\n{html}".encode()).hexdigest()
+    return f"lease-{digest}.pdf"
+
+
+def _claim_render(out_path) -> bool:
+    """Create the .pending marker; False if another process is already rendering this file."""
+    marker = out_path + '.pending'
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(marker) > PENDING_TIMEOUT_SECONDS:
+                os.remove(marker)
+                return _claim_render(out_path)
+        except OSError:
+            pass
+        return False
+
+
+def _get_pool(workers: int, css_path: str) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: a forked copy of an eventlet/gunicorn worker is not safe to run
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_renderer, initargs=(css_path,))
+        return _pool
+
+
+def _log_failure(name, future):
+    if future.exception():
+        logger.error(f"[LEASE] render of {name} failed: {future.exception()}")
+
+
+def ensure_lease_pdf(booking):
+    """Point booking.lease_pdf_path at the current lease and queue it if not rendered; caller commits."""
+    if not booking.sign_token_renter or not engine_available():
+        return None
+    from flask import current_app
+    out_dir, css_path = _paths()
+    html = lease_html(booking)
+    name = content_name(html, css_path)
+    booking.lease_pdf_path = name
+
+    out_path = os.path.join(out_dir, name)
+    if os.path.exists(out_path):
+        return name
+    os.makedirs(out_dir, exist_ok=True)
+    if not _claim_render(out_path):
+        return name
+
+    workers = current_app.config.get('LEASE_PDF_WORKERS', 0)
+    if not workers:
+        try:
+            render_pdf(html, out_path, css_path)
+        except Exception as e:
+            logger.error(f"[LEASE] render of {name} failed: {e}")
+        return name
+    try:
+        future = _get_pool(workers, css_path).submit(render_pdf, html, out_path, css_path)
+    except Exception as e:
+        os.remove(out_path + '.pending')
+        logger.error(f"[LEASE] could not queue {name}: {e}")
+        return name
+    future.add_done_callback(lambda f: _log_failure(name, f))
+    logger.info(f"[LEASE] queued {name} for booking {booking.id}")
+    return name
+
+
+def lease_status(booking) -> dict:
+    from flask import url_for
+    name = booking.lease_pdf_path
+    if not name:
+        return {'ready': False, 'pending': False, 'url': None}
+    out_dir, _ = _paths()
+    out_path = os.path.join(out_dir, name)
+    if os.path.exists(out_path):
+        return {'ready': True, 'pending': False, 'url': url_for('static', filename='leases/' + name)}
+    return {'ready': False, 'pending': os.path.exists(out_path + '.pending'), 'url': None}
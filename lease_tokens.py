@@ -0,0 +1,109 @@
+"""
+lease_tokens.py — Indexed lease signing tokens and signature events.
+
+A signing link carries a random token. Finding its booking used to be
+`(sign_token_renter == t) | (sign_token_owner == t)` on two unindexed text
+columns of bookings — a full scan per click. Tokens now live in lease_tokens
+(primary key = token), so
+
+    find(token)             one primary-key lookup → LeaseToken (booking, role),
+                            None if unknown or expired
+    sign(lease_token, user) insert a lease_signatures row (unique per booking
+                            and role, so a double click is a no-op), mark the
+                            token used and set the booking's *_signed flag
+    signed_roles(booking)   {'renter', 'owner'} ⊇ roles that have signed, from
+                            lease_signatures — no booking scan, and two parties
+                            signing at once both see the other's row
+
+Tokens expire TOKEN_GRACE after the stay ends. Booking.sign_token_renter /
+sign_token_owner are still written: the lease document prints them.
+
+Usage:
+    from lease_tokens import issue_tokens, find, sign
+    issue_tokens(booking)                           # once payment confirms the booking; caller commits
+    lease_token = find(token) or abort(404)
+    both = sign(lease_token, current_user)          # caller commits
+"""
+
+import datetime
+import logging
+import secrets
+
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Booking, LeaseSignature, LeaseToken
+
+logger = logging.getLogger(__name__)
+
+ROLES = ('renter', 'owner')
+TOKEN_GRACE = datetime.timedelta(days=30)
+
+
+def _expiry(booking):
+    return booking.end_date + TOKEN_GRACE if booking.end_date else None
+
+
+def issue_tokens(booking) -> dict:
+    """Signing tokens for both parties, created once per booking; {role: token}. Caller commits."""
+    for role in ROLES:
+        token = getattr(booking, f'sign_token_{role}')
+        if not token:
+            token = secrets.token_urlsafe(32)
+            setattr(booking, f'sign_token_{role}', token)
+        if db.session.get(LeaseToken, token) is None:
+            db.session.add(LeaseToken(token=token, booking_id=booking.id, role=role,
+                                      expires_at=_expiry(booking)))
+    return {role: getattr(booking, f'sign_token_{role}') for role in ROLES}
+
+
+def find(token):
+    """LeaseToken for a signing link, or None if it is unknown or expired."""
+    if not token:
+        return None
+    lease_token = db.session.get(LeaseToken, token)
+    if lease_token is None:
+        return None
+    if lease_token.expires_at and lease_token.expires_at < datetime.datetime.utcnow():
+        return None
+    return lease_token
+
+
+def signed_roles(booking_id) -> set:
+    return set(db.session.execute(
+        db.select(LeaseSignature.role).where(LeaseSignature.booking_id == booking_id)).scalars())
+
+
+def sign(lease_token, user) -> bool:
+    """Record this party's signature; True once both parties have signed. Caller commits."""
+    booking = lease_token.booking
+    if lease_token.used_at is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(LeaseSignature(booking_id=booking.id, role=lease_token.role,
+                                              user_id=getattr(user, 'id', None)))
+        except IntegrityError:
+            pass        # already signed through another link or request
+        lease_token.used_at = datetime.datetime.utcnow()
+    setattr(booking, f'{lease_token.role}_signed', True)
+    return signed_roles(booking.id) >= set(ROLES)
+
+
+def backfill_lease_tokens(batch: int = 500) -> int:
+    """Token and signature rows for bookings signed before the tables existed; returns bookings filled."""
+    done = 0
+    while True:
+        rows = (Booking.query
+                .outerjoin(LeaseToken, LeaseToken.token == Booking.sign_token_renter)
+                .filter(Booking.sign_token_renter.isnot(None), LeaseToken.token.is_(None))
+                .limit(batch).all())
+        if not rows:
+            return done
+        for booking in rows:
+            issue_tokens(booking)
+            for role in ROLES:
+                if getattr(booking, f'{role}_signed'):
+                    db.session.add(LeaseSignature(booking_id=booking.id, role=role, signed_at=None))
+        db.session.commit()
+        done += len(rows)
+        logger.info(f"[LEASE] backfilled signing tokens for {done} bookings")
@@ -0,0 +1,132 @@
+"""
+matching.py — "Smart Matches" scoring for /matches.
+
+The match score is a SQL expression (a sum of CASE terms, capped at 99) so the
+database ranks every Active listing and returns only the top k with
+ORDER BY score DESC LIMIT k — no candidate pool, no per-listing owner loads.
+
+    base 60
+    +25 listing at the user's alert airport (+5 elsewhere if they set one)
+    +15 price_month within the user's alert_max_price
+    +5  owner is premium          +10 owner is certified
+    +5  health_score >= 80        +20 short-term friendly (min stay <= 7 nights)
+
+Ranked (listing_id, score) pairs are cached per user. The cache key contains
+the user's alert preferences and a listings generation token that any
+Listing insert/update/delete bumps (and any change to an owner's is_premium
+or is_certified, which also feed the score), so results stay cached until
+either side changes.
+
+Usage:
+    from matching import top_matches
+    matches = top_matches(current_user, k=10)   # [{'listing': Listing, 'score': 94}, ...]
+"""
+
+import logging
+import uuid
+
+from sqlalchemy import case, event, inspect, literal
+
+from commit_hooks import after_commit
+from extensions import db, cache
+from models import Listing, User
+
+logger = logging.getLogger(__name__)
+
+MATCH_CACHE_SECONDS = 600
+
+# Score weights (also used by recommendations.py for the nightly batch)
+BASE_SCORE = 60
+AIRPORT_MATCH = 25
+AIRPORT_OTHER = 5
+WITHIN_BUDGET = 15
+OWNER_PREMIUM = 5
+OWNER_CERTIFIED = 10
+HEALTHY = 5
+HEALTH_THRESHOLD = 80
+SHORT_STAY = 20
+SHORT_STAY_NIGHTS = 7
+MAX_SCORE = 99
+_GENERATION_KEY = 'matches_gen'
+
+
+def score_expression(user):
+    """SQL expression for the match score of Listing (joined to its owner) for `user`."""
+    airport = user.alert_airport
+    max_price = user.alert_max_price
+
+    score = literal(BASE_SCORE)
+    if airport:
+        score = score + case((Listing.airport_icao == airport, AIRPORT_MATCH), else_=AIRPORT_OTHER)
+    if max_price:
+        score = score + case((Listing.price_month <= max_price, WITHIN_BUDGET), else_=0)
+    score = (score
+             + case((User.is_premium.is_(True), OWNER_PREMIUM), else_=0)
+             + case((User.is_certified.is_(True), OWNER_CERTIFIED), else_=0)
+             + case((Listing.health_score >= HEALTH_THRESHOLD, HEALTHY), else_=0)
+             + case((Listing.min_stay_nights <= SHORT_STAY_NIGHTS, SHORT_STAY), else_=0))
+    return case((score > MAX_SCORE, MAX_SCORE), else_=score)
+
+
+def ranked_ids(user, k: int = 10) -> list:
+    """[(listing_id, score)] for the top k Active listings, best first."""
+    score = score_expression(user).label('score')
+    rows = (db.session.query(Listing.id, score)
+            .join(User, Listing.owner_id == User.id)
+            .filter(Listing.status == 'Active')
+            .order_by(score.desc(), Listing.is_featured.desc(), Listing.created_at.desc(), Listing.id.desc())
+            .limit(k)
+            .all())
+    return [(row.id, int(row.score)) for row in rows]
+
+
+def _generation() -> str:
+    gen = cache.get(_GENERATION_KEY)
+    if gen is None:
+        gen = uuid.uuid4().hex[:12]
+        cache.set(_GENERATION_KEY, gen, timeout=0)
+    return gen
+
+
+def invalidate_matches() -> None:
+    cache.set(_GENERATION_KEY, uuid.uuid4().hex[:12], timeout=0)
+
+
+def _cache_key(user, k) -> str:
+    return f"matches:{user.id}:{k}:{user.alert_airport or ''}:{user.alert_max_price or ''}:{_generation()}"
+
+
+def cached_ranked_ids(user, k: int = 10) -> list:
+    key = _cache_key(user, k)
+    ranked = cache.get(key)
+    if ranked is None:
+        ranked = ranked_ids(user, k)
+        cache.set(key, ranked, timeout=MATCH_CACHE_SECONDS)
+    return ranked
+
+
+def load_matches(ranked) -> list:
+    """Turn [(listing_id, score)] into [{'listing', 'score'}] with one query, keeping order."""
+    if not ranked:
+        return []
+    by_id = {l.id: l for l in Listing.query.filter(Listing.id.in_([lid for lid, _ in ranked]),
+                                                   Listing.status == 'Active').all()}
+    return [{'listing': by_id[lid], 'score': score} for lid, score in ranked if lid in by_id]
+
+
+def top_matches(user, k: int = 10) -> list:
+    return load_matches(cached_ranked_ids(user, k))
+
+
+@event.listens_for(Listing, 'after_insert')
+@event.listens_for(Listing, 'after_update')
+@event.listens_for(Listing, 'after_delete')
+def _listing_changed(mapper, connection, target):
+    after_commit(target, invalidate_matches)
+
+
+@event.listens_for(User, 'after_update')
+def _owner_changed(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if attrs.is_premium.history.has_changes() or attrs.is_certified.history.has_changes():
+        after_commit(target, invalidate_matches)
@@ -0,0 +1,247 @@
+"""
+metar_feed.py — Bulk METAR/TAF ingestion for every airport at once.
+
+aviationweather.gov publishes the latest METAR and TAF for every reporting
+station as one cache file each (metars.cache.csv.gz, tafs.cache.xml.gz, ...,
+refreshed every minute). Instead of one weather API call per listing view, a
+background thread reads those files every METAR_REFRESH_SECONDS and swaps in
+a compact per-ICAO index:
+
+    metar(icao)     Metar(station, observed_at, temp_c, dewpoint_c, wind_dir,
+                    wind_kt, gust_kt, visibility_mi, wx, cover, ceiling_ft,
+                    category, raw) — None if unknown or older than MAX_AGE
+    taf(icao)       Taf(station, issued_at, valid_from, valid_to, raw)
+
+Both the CSV and the XML flavours are understood (sniffed from the content,
+gzip by its magic bytes), and a source may be a URL or a local file — a
+fixture in the tests, or a file synced by cron on hosts without egress. A
+failed read keeps the previous index, so pages keep the last-known
+observations. weather_service turns a Metar into its go/no-go dict.
+
+Usage:
+    import metar_feed
+    metar_feed.load('metars.cache.csv', 'tafs.cache.xml')   # or start_worker(app)
+    metar_feed.metar('KOSH').ceiling_ft
+"""
+
+import csv
+import datetime
+import gzip
+import io
+import logging
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = 300
+MAX_AGE = datetime.timedelta(minutes=90)     # METARs are hourly; older means the station stopped reporting
+CEILING_COVERS = ('BKN', 'OVC', 'OVX')
+_COVER_ORDER = ('SKC', 'CLR', 'CAVOK', 'NSC', 'FEW', 'SCT', 'BKN', 'OVC', 'OVX')
+
+Metar = namedtuple('Metar', 'station observed_at temp_c dewpoint_c wind_dir wind_kt gust_kt '
+                            'visibility_mi wx cover ceiling_ft category raw')
+Taf = namedtuple('Taf', 'station issued_at valid_from valid_to raw')
+Index = namedtuple('Index', 'metars tafs loaded_at')
+
+_index = Index({}, {}, None)        # replaced whole, so readers never need the lock
+_load_lock = threading.Lock()
+_start_lock = threading.Lock()
+
+
+def _utcnow():
+    return datetime.datetime.utcnow()
+
+
+# ── Reading ───────────────────────────────────────────────────────────────────
+
+def _read(source) -> str:
+    if source.startswith(('http://', 'https://')):
+        from integrations import client
+        resp = client('aviationweather').get(source)
+        resp.raise_for_status()
+        raw = resp.content
+    else:
+        with open(source, 'rb') as f:
+            raw = f.read()
+    if raw[:2] == b'\x1f\x8b':
+        raw = gzip.decompress(raw)
+    return raw.decode('utf-8', errors='replace')
+
+
+def _csv_records(text):
+    """Rows of an aviationweather.gov cache CSV (preamble lines before the header are skipped)."""
+    lines = text.splitlines()
+    start = next((i for i, line in enumerate(lines) if line.startswith('raw_text,')), None)
+    if start is None:
+        return
+    reader = csv.reader(lines[start:])
+    header = next(reader)
+    first = {}
+    for i, name in enumerate(header):
+        first.setdefault(name, i)
+    covers = [i for i, name in enumerate(header) if name == 'sky_cover']
+    bases = [i for i, name in enumerate(header) if name == 'cloud_base_ft_agl']
+    for row in reader:
+        if not row:
+            continue
+        rec = {name: row[i] for name, i in first.items() if i < len(row)}
+        rec['sky'] = [(row[c], row[b] if b < len(row) else '') for c, b in zip(covers, bases)
+                      if c < len(row) and row[c]]
+        yield rec
+
+
+def _xml_records(text, tag):
+    for _, elem in ET.iterparse(io.BytesIO(text.encode('utf-8')), events=('end',)):
+        if elem.tag != tag:
+            continue
+        rec = {child.tag: (child.text or '') for child in elem if len(child) == 0 and child.tag != 'sky_condition'}
+        rec['sky'] = [(s.get('sky_cover', ''), s.get('cloud_base_ft_agl', '')) for s in elem.findall('sky_condition')]
+        yield rec
+        elem.clear()
+
+
+def _records(text, tag):
+    return _xml_records(text, tag) if text.lstrip().startswith('<') else _csv_records(text)
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(str(value).rstrip('+'))        # visibility "10+"
+    except (TypeError, ValueError):
+        return None
+
+
+def _time(value) -> Optional[datetime.datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _metar(rec) -> Optional[Metar]:
+    station = (rec.get('station_id') or '').strip().upper()
+    if not station:
+        return None
+    sky = [(cover.upper(), _float(base)) for cover, base in rec.get('sky', [])]
+    vert_vis = _float(rec.get('vert_vis_ft'))
+    if vert_vis is not None:
+        ceilings = [vert_vis]       # sky obscured: reported as OVX at 0 ft, the vertical visibility is the ceiling
+    else:
+        ceilings = [base for cover, base in sky if cover in CEILING_COVERS and base is not None]
+    cover = max((c for c, _ in sky if c in _COVER_ORDER), key=_COVER_ORDER.index, default='CLR')
+    wind_dir = rec.get('wind_dir_degrees')
+    return Metar(
+        station=station,
+        observed_at=_time(rec.get('observation_time')),
+        temp_c=_float(rec.get('temp_c')),
+        dewpoint_c=_float(rec.get('dewpoint_c')),
+        wind_dir=int(_float(wind_dir)) if _float(wind_dir) is not None else None,    # None = VRB
+        wind_kt=_float(rec.get('wind_speed_kt')) or 0.0,
+        gust_kt=_float(rec.get('wind_gust_kt')) or 0.0,
+        visibility_mi=_float(rec.get('visibility_statute_mi')),
+        wx=(rec.get('wx_string') or '').strip(),
+        cover='VV' if vert_vis is not None else cover,
+        ceiling_ft=min(ceilings) if ceilings else None,
+        category=(rec.get('flight_category') or '').strip() or None,
+        raw=(rec.get('raw_text') or '').strip(),
+    )
+
+
+def _taf(rec) -> Optional[Taf]:
+    station = (rec.get('station_id') or '').strip().upper()
+    if not station:
+        return None
+    return Taf(station, _time(rec.get('issue_time')), _time(rec.get('valid_time_from')),
+               _time(rec.get('valid_time_to')), (rec.get('raw_text') or '').strip())
+
+
+def _latest(items, stamp) -> dict:
+    """station → newest item (cache files may carry more than one report per station)."""
+    out = {}
+    for item in items:
+        if item is None:
+            continue
+        held = out.get(item.station)
+        if held is None or (stamp(item) or datetime.datetime.min) >= (stamp(held) or datetime.datetime.min):
+            out[item.station] = item
+    return out
+
+
+def parse_metars(text) -> dict:
+    return _latest((_metar(r) for r in _records(text, 'METAR')), lambda m: m.observed_at)
+
+
+def parse_tafs(text) -> dict:
+    return _latest((_taf(r) for r in _records(text, 'TAF')), lambda t: t.issued_at)
+
+
+# ── Index ─────────────────────────────────────────────────────────────────────
+
+def load(metar_source, taf_source=None) -> Index:
+    """Read the cache files and swap in a new index; a source that fails keeps its previous data."""
+    global _index
+    with _load_lock:
+        metars, tafs = _index.metars, _index.tafs
+        try:
+            metars = parse_metars(_read(metar_source))
+        except Exception as e:
+            logger.error(f"[METAR] could not ingest {metar_source}: {e}")
+        if taf_source:
+            try:
+                tafs = parse_tafs(_read(taf_source))
+            except Exception as e:
+                logger.error(f"[METAR] could not ingest {taf_source}: {e}")
+        _index = Index(metars, tafs, _utcnow())
+        logger.info(f"[METAR] index ready — {len(metars)} METARs, {len(tafs)} TAFs")
+        return _index
+
+
+def metar(icao) -> Optional[Metar]:
+    obs = _index.metars.get((icao or '').upper())
+    if obs is None or obs.observed_at is None or _utcnow() - obs.observed_at > MAX_AGE:
+        return None
+    return obs
+
+
+def taf(icao) -> Optional[Taf]:
+    forecast = _index.tafs.get((icao or '').upper())
+    if forecast is None or (forecast.valid_to and forecast.valid_to < _utcnow()):
+        return None
+    return forecast
+
+
+def clear() -> None:
+    global _index
+    _index = Index({}, {}, None)
+
+
+# ── Schedule ──────────────────────────────────────────────────────────────────
+
+def run_forever(metar_source, taf_source=None, refresh_seconds: int = REFRESH_SECONDS) -> None:
+    while True:
+        try:
+            load(metar_source, taf_source)
+        except Exception:
+            logger.exception("[METAR] ingestion pass failed")
+        time.sleep(refresh_seconds)
+
+
+def start_worker(app) -> None:
+    """Start the ingestion loop for this process, once (no-op unless METAR_INGEST is on)."""
+    if not app.config.get('METAR_INGEST') or not app.config.get('METAR_SOURCE'):
+        return
+    with _start_lock:
+        if app.extensions.get('metar_feed'):
+            return
+        app.extensions['metar_feed'] = True
+    # The eventlet gunicorn worker monkey-patches threading, so this is a green thread there
+    threading.Thread(target=run_forever, daemon=True, name='metar-feed',
+                     args=(app.config['METAR_SOURCE'], app.config.get('TAF_SOURCE'),
+                           app.config.get('METAR_REFRESH_SECONDS', REFRESH_SECONDS))).start()
+    logger.info("[METAR] ingestion worker started")
@@ -89,6 +89,7 @@ class Listing(db.Model):
         db.Index('idx_listing_premium', 'is_premium_listing'),
         db.Index('idx_listing_price_night', 'price_night'),
         db.Index('idx_listing_min_stay', 'min_stay_nights'),
+        db.Index('idx_listing_fit', 'fit_short_ft', 'fit_long_ft'),
     )
     
     id = db.Column(db.Integer, primary_key=True)
@@ -105,6 +106,7 @@ class Listing(db.Model):
     status = db.Column(db.String(20), default='Active')  # 'Active', 'Inactive', 'Rented'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0') # Bumped by every booking hold (optimistic lock)
     
     # Monetization Tier 2
     is_featured = db.Column(db.Boolean, default=False)
@@ -139,6 +141,15 @@ class Listing(db.Model):
     
     # Corporate Jet Safety Features
     tail_height_clearance = db.Column(db.Float, nullable=True) # in feet
+    hangar_width_ft = db.Column(db.Float, nullable=True)  # floor dimensions for packing (packing.py)
+    hangar_depth_ft = db.Column(db.Float, nullable=True)
+    door_width_ft = db.Column(db.Float, nullable=True)
+    door_height_ft = db.Column(db.Float, nullable=True)
+    # Largest aircraft the hangar takes; kept in step by packing.py for the "fits my aircraft" filter
+    fit_long_ft = db.Column(db.Float, nullable=True)
+    fit_short_ft = db.Column(db.Float, nullable=True)
+    fit_span_ft = db.Column(db.Float, nullable=True)
+    fit_height_ft = db.Column(db.Float, nullable=True)
     nfpa_409_compliant = db.Column(db.Boolean, default=False)
     floor_loading_pcn = db.Column(db.String(50), nullable=True)
     gpu_power_available = db.Column(db.Boolean, default=False)
@@ -150,6 +161,11 @@ class Listing(db.Model):
     
     # Ground Logistics
     shuttle_info = db.Column(db.String(255), nullable=True)  # e.g. "Free shuttle to terminal"
+
+    # AI Rental Optimizer — ideal price refreshed nightly by score_listings.py, read by
+    # pricing_model.stored_scores() while ai_model_version is the published model
+    ai_suggested_price = db.Column(db.Float, nullable=True)
+    ai_model_version = db.Column(db.String(32), nullable=True)
     
     # Relationships
     bookings = db.relationship('Booking', backref='listing', lazy=True)
@@ -175,6 +191,10 @@ class Listing(db.Model):
 
 class Booking(db.Model):
     __tablename__ = 'bookings'
+    __table_args__ = (
+        # Overlap checks: listing_id = ? AND start_date < ? AND end_date > ?
+        db.Index('idx_booking_listing_dates', 'listing_id', 'start_date', 'end_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     listing_id = db.Column(db.Integer, db.ForeignKey('listings.id'), nullable=False)
@@ -183,7 +203,10 @@ class Booking(db.Model):
     start_date = db.Column(db.DateTime, nullable=False)
     end_date = db.Column(db.DateTime, nullable=False)
     total_price = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), default='Pending') # Pending, Confirmed, Cancelled, Completed
+    status = db.Column(db.String(20), default='Pending') # Pending, Confirmed, Cancelled, Completed, Refund Due
+    footprint_sqft = db.Column(db.Float, nullable=True) # Floor space held; NULL = whole hangar
+    aircraft_type = db.Column(db.String(100), nullable=True) # AIRCRAFT_SIZES name, for packing checks
+    hold_expires_at = db.Column(db.DateTime, nullable=True) # Pending checkout hold lapses after this
     stripe_payment_id = db.Column(db.String(100), nullable=True)
     
     # Tiert 2: Insurance Add-on
@@ -275,4 +298,99 @@ class Payment(db.Model):
     
     user = db.relationship('User', backref='payments_list') # renamed to avoid conflict with existing backrefs if any
 
+class UserRecommendation(db.Model):
+    """Precomputed top-N Smart Matches per user (rebuilt by build_recommendations.py)."""
+    __tablename__ = 'user_recommendations'
+    __table_args__ = (
+        db.Index('idx_user_rec_user_rank', 'user_id', 'rank'),
+        db.Index('idx_user_rec_listing', 'listing_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    listing_id = db.Column(db.Integer, db.ForeignKey('listings.id', ondelete='CASCADE'), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UserRecommendation user={self.user_id} #{self.rank} listing={self.listing_id}>'
+
+class SearchVolume(db.Model):
+    """Daily /listings search counts per airport (demand signal for the forecaster)."""
+    __tablename__ = 'search_volume'
+    __table_args__ = (
+        db.UniqueConstraint('airport_icao', 'day', name='uq_search_volume_airport_day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    airport_icao = db.Column(db.String(10), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def add_counts(cls, counts):
+        """Add {(airport_icao, day): n} in one upsert per batch; caller commits."""
+        if not counts:
+            return
+        rows = [{'airport_icao': icao, 'day': day, 'count': n} for (icao, day), n in counts.items()]
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            for row in rows:
+                updated = cls.query.filter_by(airport_icao=row['airport_icao'], day=row['day']).update(
+                    {cls.count: cls.count + row['count']}, synchronize_session=False)
+                if not updated:
+                    db.session.add(cls(**row))
+            return
+        stmt = insert(cls).values(rows)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['airport_icao', 'day'], set_={'count': cls.count + stmt.excluded['count']}))
+
+class StripeEvent(db.Model):
+    """Inbound Stripe webhook events, keyed by Stripe's event id (processed once by stripe_events.py)."""
+    __tablename__ = 'stripe_events'
+    __table_args__ = (
+        db.Index('idx_stripe_events_status', 'status', 'received_at'),
+    )
+
+    id = db.Column(db.String(255), primary_key=True)                  # evt_...
+    type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)                      # raw JSON body as delivered
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, processing, processed, failed, ignored
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+class LeaseToken(db.Model):
+    """Lease signing links, keyed by the token itself (looked up once per click by lease_tokens.py)."""
+    __tablename__ = 'lease_tokens'
+
+    token = db.Column(db.String(100), primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=False, index=True)
+    role = db.Column(db.String(10), nullable=False)                   # renter, owner
+    expires_at = db.Column(db.DateTime, nullable=True)
+    used_at = db.Column(db.DateTime, nullable=True)                   # when this side signed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    booking = db.relationship('Booking')
+
+class LeaseSignature(db.Model):
+    """One row per party that has signed a booking's lease."""
+    __tablename__ = 'lease_signatures'
+    __table_args__ = (
+        db.UniqueConstraint('booking_id', 'role', name='uq_lease_signature_role'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=False)
+    role = db.Column(db.String(10), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    signed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 # Optimization Indexes are defined within the Listing model's __table_args__
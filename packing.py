@@ -0,0 +1,303 @@
+"""
+packing.py — Multi-aircraft hangar packing.
+
+Floor area alone says a 2,500 sq ft hangar takes a PC-12; geometry says a
+50 ft wide one doesn't (53 ft span). Each aircraft is packed as its
+length × wingspan rectangle plus CLEARANCE_FT into the hangar's width × depth
+with a MaxRects packer (best short side fit, largest aircraft first, 90°
+turns allowed), so the questions the calculator and the booking flow ask are
+
+    pack(w, d, [types])                    can these N aircraft fit?
+    how_many_more(w, d, [types], 'X')      how many more X fit alongside them?
+
+Options:
+    wing_overlap    neighbours may nest wings (high wing over low wing,
+                    staggered nose-in / tail-in): each span is shortened by up
+                    to WING_OVERLAP_FT and the hangar gets that much back once,
+                    so n aircraft in a row need n·span − (n−1)·overlap.
+    height_limit    door / tail clearance in ft; aircraft taller than
+                    height_limit − TAIL_MARGIN_FT are reported as too tall.
+
+Packings are pure functions of (hangar dims, options, aircraft multiset) and
+are memoised per process, so running the check over a page of search results
+costs one packing per distinct hangar shape.
+
+Usage:
+    from packing import pack, how_many_more, listing_packing
+    pack(60, 50, ['Cessna 172', 'Cessna 172', 'Cirrus SR22']).fits
+    how_many_more(60, 50, ['Cirrus SR22'], 'Cessna 172')
+    listing_packing(listing, ['Pilatus PC-12'])
+    fits_alongside(listing, 'Cirrus SR22', start, end)   # with the typed aircraft booked then
+    Listing.query.filter(fits_aircraft('C172'))           # "Fits my aircraft" search filter
+"""
+
+import logging
+import math
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+from sqlalchemy import event, inspect
+
+from extensions import db
+from models import Booking, Listing
+from availability import overlaps
+from aircraft_catalog import get as get_aircraft
+
+logger = logging.getLogger(__name__)
+
+CLEARANCE_FT = 2.0              # walk-around gap between aircraft (half of it to the walls)
+WING_OVERLAP_FT = 6.0           # how far neighbouring wings may nest when allowed
+TAIL_MARGIN_FT = 1.0            # headroom required under the door / roof
+MAX_EXTRA = 200                 # how_many_more stops counting here
+DEFAULT_TARGET = 'Cessna 172'   # "how many more" when no type is chosen
+
+Placement = namedtuple('Placement', 'name x y width depth rotated')
+Packing = namedtuple('Packing', 'fits placements unplaced too_tall used_sqft')
+
+
+def has_floor_plan(listing) -> bool:
+    return bool(getattr(listing, 'hangar_width_ft', None) and getattr(listing, 'hangar_depth_ft', None))
+
+
+def hangar_dims(listing):
+    """(width, depth) in ft: the owner's measurements, else a square of size_sqft."""
+    width, depth = getattr(listing, 'hangar_width_ft', None), getattr(listing, 'hangar_depth_ft', None)
+    if has_floor_plan(listing):
+        return float(width), float(depth)
+    side = math.sqrt(float(listing.size_sqft or 0))
+    return side, side
+
+
+def _items(names):
+    """Hashable aircraft multiset: ((name, length, span, height, qty), ...); unknown types skipped."""
+    counts = Counter()
+    for name in names:
+        aircraft = get_aircraft(name)
+        if aircraft is None:
+            logger.warning(f"[PACKING] unknown aircraft type {name!r}")
+            continue
+        counts[aircraft] += 1
+    return tuple((a.name, a.length, a.wingspan, a.height, qty) for a, qty in sorted(counts.items()))
+
+
+# ── MaxRects ──────────────────────────────────────────────────────────────────
+
+class _MaxRects:
+    """Free space as maximal rectangles (x, y, w, h); place() is best short side fit."""
+
+    def __init__(self, width, depth):
+        self.free = [(0.0, 0.0, width, depth)]
+
+    def place(self, w, h):
+        best = None
+        for fx, fy, fw, fh in self.free:
+            for rw, rh, rotated in ((w, h, False), (h, w, True)):
+                if rw <= fw + 1e-9 and rh <= fh + 1e-9:
+                    score = (min(fw - rw, fh - rh), max(fw - rw, fh - rh))
+                    if best is None or score < best[0]:
+                        best = (score, fx, fy, rw, rh, rotated)
+        if best is None:
+            return None
+        _, x, y, rw, rh, rotated = best
+        self._split(x, y, rw, rh)
+        return x, y, rw, rh, rotated
+
+    def _split(self, x, y, w, h):
+        pieces = []
+        for fx, fy, fw, fh in self.free:
+            if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+                pieces.append((fx, fy, fw, fh))
+                continue
+            if x > fx:
+                pieces.append((fx, fy, x - fx, fh))
+            if x + w < fx + fw:
+                pieces.append((x + w, fy, fx + fw - x - w, fh))
+            if y > fy:
+                pieces.append((fx, fy, fw, y - fy))
+            if y + h < fy + fh:
+                pieces.append((fx, y + h, fw, fy + fh - y - h))
+        self.free = [r for i, r in enumerate(pieces)
+                     if not any(j != i and _contains(o, r) and (o != r or j < i) for j, o in enumerate(pieces))]
+
+
+def _contains(outer, inner):
+    ox, oy, ow, oh = outer
+    ix, iy, iw, ih = inner
+    return ox <= ix and oy <= iy and ix + iw <= ox + ow and iy + ih <= oy + oh
+
+
+def _rect(length, span, wing_overlap):
+    nest = min(WING_OVERLAP_FT, 0.3 * span) if wing_overlap else 0.0
+    return span - nest + CLEARANCE_FT, length + CLEARANCE_FT
+
+
+def _start(width, depth, items, wing_overlap, height_limit):
+    """Pack `items` largest first; returns (packer, placements, unplaced, too_tall)."""
+    bonus = WING_OVERLAP_FT if wing_overlap else 0.0
+    packer = _MaxRects(width + bonus, depth + bonus)
+    placements, unplaced, too_tall = [], [], []
+    order = sorted(items, key=lambda it: (-max(it[1], it[2]), -it[1] * it[2], it[0]))
+    for name, length, span, height, qty in order:
+        if height_limit and height > height_limit - TAIL_MARGIN_FT:
+            too_tall.extend([name] * qty)
+            continue
+        w, h = _rect(length, span, wing_overlap)
+        for _ in range(qty):
+            spot = packer.place(w, h)
+            if spot is None:
+                unplaced.append(name)
+            else:
+                placements.append(Placement(name, *spot))
+    return packer, placements, unplaced, too_tall
+
+
+@lru_cache(maxsize=4096)
+def _pack(width, depth, items, wing_overlap, height_limit) -> Packing:
+    _, placements, unplaced, too_tall = _start(width, depth, items, wing_overlap, height_limit)
+    used = sum(p.width * p.depth for p in placements)
+    return Packing(not unplaced and not too_tall, tuple(placements), tuple(unplaced), tuple(too_tall),
+                   round(used, 1))
+
+
+@lru_cache(maxsize=4096)
+def _more(width, depth, items, target, wing_overlap, height_limit) -> int:
+    packer, _, unplaced, too_tall = _start(width, depth, items, wing_overlap, height_limit)
+    name, length, span, height, _ = target
+    if unplaced or too_tall or (height_limit and height > height_limit - TAIL_MARGIN_FT):
+        return 0
+    w, h = _rect(length, span, wing_overlap)
+    count = 0
+    while count < MAX_EXTRA and packer.place(w, h) is not None:
+        count += 1
+    return count
+
+
+def _key(width, depth, height_limit):
+    return round(float(width or 0), 1), round(float(depth or 0), 1), round(float(height_limit or 0), 1)
+
+
+def pack(width, depth, names, wing_overlap=False, height_limit=None) -> Packing:
+    """Can every aircraft in `names` (type names, repeats allowed) go in a width × depth hangar?"""
+    w, d, hl = _key(width, depth, height_limit)
+    return _pack(w, d, _items(names), bool(wing_overlap), hl)
+
+
+def how_many_more(width, depth, names, target, wing_overlap=False, height_limit=None) -> int:
+    """How many more `target` aircraft fit once everything in `names` is parked (0 if they don't)."""
+    extra = _items([target])
+    if not extra:
+        return 0
+    w, d, hl = _key(width, depth, height_limit)
+    return _more(w, d, _items(names), extra[0], bool(wing_overlap), hl)
+
+
+def height_limit(listing):
+    """Lowest of the tail clearance and the door height, or None if neither is known."""
+    limits = [h for h in (listing.tail_height_clearance, getattr(listing, 'door_height_ft', None)) if h]
+    return min(limits) if limits else None
+
+
+def listing_packing(listing, names, wing_overlap=False) -> Packing:
+    """pack() against a listing's floor and door / tail clearance."""
+    width, depth = hangar_dims(listing)
+    return pack(width, depth, names, wing_overlap, height_limit(listing))
+
+
+def fits_alongside(listing, name, start, end, exclude_renter=None) -> Packing:
+    """Pack `name` with every typed aircraft holding space in the listing during [start, end).
+
+    Aircraft booked on different nights of the stay are packed together, the
+    same upper bound the footprint SUM uses; bookings without a type are left
+    to the square-footage ledger in capacity.py.
+    """
+    q = db.session.query(Booking.aircraft_type).filter(Booking.listing_id == listing.id,
+                                                       Booking.aircraft_type.isnot(None),
+                                                       overlaps(start, end))
+    if exclude_renter is not None:
+        q = q.filter(db.or_(Booking.renter_id != exclude_renter, Booking.status != 'Pending'))
+    return listing_packing(listing, [name] + [t for (t,) in q.all()])
+
+
+def cache_info():
+    return {'pack': _pack.cache_info(), 'more': _more.cache_info()}
+
+
+# ── Fit capability ────────────────────────────────────────────────────────────
+#
+# "Fits my aircraft" is one aircraft in an empty hangar: its rectangle goes
+# on the floor (turned either way), its span through the door and its tail
+# under the lowest clearance. Those limits are stored on the listing so the
+# search filter is plain column comparisons:
+#
+#     fit_long_ft  ≥ max(length, span)      fit_span_ft   ≥ span
+#     fit_short_ft ≥ min(length, span)      fit_height_ft ≥ height
+#     size_sqft    ≥ footprint
+#
+# Occupancy is not part of it: dated searches leave that to the capacity
+# ledger (stay_search's footprint SUM and capacity timelines).
+#
+# Anything the owner hasn't measured is UNCONSTRAINED_FT rather than NULL,
+# so the predicate needs no IS NULL branches.
+
+UNCONSTRAINED_FT = 9999.0
+_FIT_INPUTS = ('hangar_width_ft', 'hangar_depth_ft', 'door_width_ft', 'door_height_ft',
+               'tail_height_clearance')
+
+
+def fit_capability(listing) -> dict:
+    if has_floor_plan(listing):
+        width, depth = float(listing.hangar_width_ft), float(listing.hangar_depth_ft)
+        longest, shortest = max(width, depth) - CLEARANCE_FT, min(width, depth) - CLEARANCE_FT
+    else:
+        longest = shortest = UNCONSTRAINED_FT
+    door = getattr(listing, 'door_width_ft', None)
+    limit = height_limit(listing)
+    return {
+        'fit_long_ft': longest,
+        'fit_short_ft': shortest,
+        'fit_span_ft': door - CLEARANCE_FT if door else UNCONSTRAINED_FT,
+        'fit_height_ft': limit - TAIL_MARGIN_FT if limit else UNCONSTRAINED_FT,
+    }
+
+
+def apply_fit_capability(listing) -> None:
+    for column, value in fit_capability(listing).items():
+        setattr(listing, column, value)
+
+
+def fits_aircraft(name):
+    """SQL predicate: the listing can take `name` (catalogue name or alias); None if unknown."""
+    from capacity import aircraft_footprint
+    aircraft = get_aircraft(name)
+    if aircraft is None:
+        return None
+    return db.and_(Listing.fit_short_ft >= min(aircraft.length, aircraft.wingspan),
+                   Listing.fit_long_ft >= max(aircraft.length, aircraft.wingspan),
+                   Listing.fit_span_ft >= aircraft.wingspan,
+                   Listing.fit_height_ft >= aircraft.height,
+                   Listing.size_sqft >= aircraft_footprint(aircraft.name))
+
+
+def backfill_fit_capability(batch: int = 500) -> int:
+    """Fill the capability columns where they are missing; returns listings updated."""
+    done = 0
+    while True:
+        rows = Listing.query.filter(Listing.fit_height_ft.is_(None)).limit(batch).all()
+        if not rows:
+            return done
+        for listing in rows:
+            apply_fit_capability(listing)
+        db.session.commit()
+        done += len(rows)
+
+
+@event.listens_for(Listing, 'before_insert')
+def _fit_on_insert(mapper, connection, target):
+    apply_fit_capability(target)
+
+
+@event.listens_for(Listing, 'before_update')
+def _fit_on_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _FIT_INPUTS) or target.fit_height_ft is None:
+        apply_fit_capability(target)
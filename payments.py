@@ -0,0 +1,170 @@
+"""
+payments.py — Apply paid Stripe checkouts to local state.
+
+Stripe reports every outcome through the webhook; stripe_events.py stores
+each event once and a background worker calls into here. The success pages
+only read the result. Stripe delivers at least once, so every function is
+safe to run again for the same checkout — the state change is a conditional
+UPDATE and only the call that makes it grants anything:
+
+    fulfil_booking()       rental checkout → Confirmed booking, sign tokens, lease PDF queued
+                           (Refund Due if the lapsed hold's space was resold meanwhile)
+    fulfil_payment()       /create-checkout-session items (premium, featured, reports, white-label)
+    fulfil_white_label()   white-label reservation fee → request Paid
+    release_booking()      checkout expired → hold released, payment failed
+    end_subscription()     subscription deleted → back to free
+    renew_subscription()   invoice paid → expiry pushed out
+
+Usage:
+    from payments import fulfil_booking
+    fulfil_booking(booking)            # True the first time only
+"""
+
+import datetime
+import logging
+
+from flask import url_for
+from sqlalchemy import update
+
+from extensions import db
+from models import Listing, Payment, User, WhiteLabelRequest
+from checkout import confirm_booking, release_hold, PLATFORM_FEE_RATE, REFUND_DUE
+
+logger = logging.getLogger(__name__)
+
+FEATURED_DAYS = 30
+ANALYTICS_DAYS = 30
+
+
+def _complete(session_id, reference=None, status='completed') -> bool:
+    """Pending payment for a checkout session → `status`; True iff this call changed it (caller commits)."""
+    values = {'status': status}
+    if reference:
+        values['stripe_payment_intent'] = reference
+    return db.session.execute(
+        update(Payment)
+        .where(Payment.stripe_session_id == session_id, Payment.status == 'pending')
+        .values(**values)
+        .execution_options(synchronize_session=False)).rowcount > 0
+
+
+def fulfil_booking(booking, reference=None) -> bool:
+    """Paid rental checkout: Pending → Confirmed, owner credited, lease sent. True the first time only."""
+    _complete(booking.stripe_payment_id, reference)
+    db.session.commit()
+
+    if not confirm_booking(booking):
+        if booking.status == REFUND_DUE:
+            # Paid after the hold lapsed and the space went to someone else: refund by hand
+            print(f"[EMAIL MOCK] To: admin@hangarlink.com -> Booking {booking.id} at {booking.listing.airport_icao} "
+                  f"was paid after its hold lapsed and the space is gone. Refund payment {reference or booking.stripe_payment_id}.")
+        return False
+    owner = booking.listing.owner
+    revenue = booking.total_price * (1.0 - PLATFORM_FEE_RATE)
+
+    # Notify Renter & Owner (Mock)
+    print(f"[EMAIL MOCK] To: {booking.renter.email} -> Your booking at {booking.listing.airport_icao} is CONFIRMED!")
+    print(f"[EMAIL MOCK] To: {owner.email} -> New confirmed rental! Revenue added: ${revenue:.2f}")
+
+    # Only a confirmed booking gets a lease: signing links, then the PDF queued on the render pool
+    # (the signing page polls until it is there)
+    from lease_tokens import issue_tokens
+    from lease_pdf import ensure_lease_pdf
+    issue_tokens(booking)
+    ensure_lease_pdf(booking)
+    db.session.commit()
+
+    # Mock Mailer for Lease
+    print(f"\n[MAIL SIMULATOR] Sent Lease Agreement for Verification!")
+    print(f"--> Renter Link: {url_for('main.sign_lease', token=booking.sign_token_renter, _external=True)}")
+    print(f"--> Owner Link:  {url_for('main.sign_lease', token=booking.sign_token_owner, _external=True)}\n")
+
+    # Mock Mailer for Insurance
+    if booking.insurance_opt_in:
+        print(f"\n[MAIL SIMULATOR] Sent Short-Term Insurance Policy Activation!")
+        print(f"--> To: {booking.renter.email}")
+        print(f"--> Subject: Your Avemco Short-Term Policy Details")
+        print(f"--> Body: Thank you for adding insurance to your HangarLinks booking.")
+        print(f"-->       Your {booking.listing.airport_icao} stay is protected. Policy value: ${booking.insurance_fee:.2f}.")
+        print(f"-->       Activate/View complete policy: https://www.avemco.com/hangarlinks/activate?booking={booking.id}\n")
+    logger.info(f"[PAYMENTS] booking {booking.id} confirmed")
+    return True
+
+
+def release_booking(booking) -> None:
+    """Checkout expired or failed: free the hold and fail the pending payment."""
+    release_hold(booking)
+    _complete(booking.stripe_payment_id, status='failed')
+    db.session.commit()
+
+
+def fulfil_payment(payment, session) -> bool:
+    """Grant what a /create-checkout-session item bought. True the first time only."""
+    reference = session.get('payment_intent') or session.get('subscription')
+    if not _complete(payment.stripe_session_id, reference):
+        db.session.rollback()
+        return False
+
+    now = datetime.datetime.utcnow()
+    user = db.session.get(User, payment.user_id)
+    item_type = payment.item_type or ''
+    if item_type.startswith('premium_'):
+        user.is_premium = True
+        user.subscription_tier = 'premium'
+        user.subscription_expires = now + datetime.timedelta(days=365 if item_type.endswith('_yearly') else 30)
+        # Later invoice / cancellation events find the user by these
+        user.stripe_customer_id = session.get('customer') or user.stripe_customer_id
+        user.stripe_subscription_id = session.get('subscription') or user.stripe_subscription_id
+    elif item_type.startswith('featured_'):
+        listing = db.session.get(Listing, payment.item_id) if payment.item_id else None
+        if listing:
+            listing.is_featured = True
+            listing.is_premium_listing = True
+            listing.featured_tier = item_type.split('_')[1]
+            listing.featured_expires_at = now + datetime.timedelta(days=FEATURED_DAYS)
+    elif item_type in ('analytics_report', 'analytics_report_national'):
+        user.has_analytics_access = True
+        user.analytics_expires_at = now + datetime.timedelta(days=ANALYTICS_DAYS)
+    elif item_type == 'white_label':
+        user.is_white_label_partner = True
+        user.stripe_customer_id = session.get('customer') or user.stripe_customer_id
+    db.session.commit()
+    logger.info(f"[PAYMENTS] {item_type} fulfilled for user {user.id}")
+    return True
+
+
+def fulfil_white_label(session) -> bool:
+    """White-label reservation fee paid: request → Paid. True the first time only."""
+    meta = session.get('metadata') or {}
+    _complete(session['id'], session.get('payment_intent'))
+    q = WhiteLabelRequest.query.filter_by(status='Pending Payment')
+    if meta.get('request_id'):
+        q = q.filter_by(id=int(meta['request_id']))
+    elif meta.get('fbo_name'):
+        q = q.filter_by(fbo_name=meta['fbo_name'])       # sessions created before request_id was sent
+    else:
+        db.session.commit()
+        return False
+    paid = q.update({'status': 'Paid'}, synchronize_session=False) > 0
+    db.session.commit()
+    return paid
+
+
+def end_subscription(subscription_id) -> None:
+    user = User.query.filter_by(stripe_subscription_id=subscription_id).first()
+    if user:
+        user.subscription_tier = 'free'
+        user.is_premium = False
+        user.stripe_subscription_id = None
+        db.session.commit()
+
+
+def renew_subscription(customer_id, period_end=None) -> None:
+    """Paid invoice: premium until the end of the billed period (default 30 days)."""
+    user = User.query.filter_by(stripe_customer_id=customer_id).first()
+    if user:
+        if period_end:
+            user.subscription_expires = datetime.datetime.utcfromtimestamp(int(period_end))
+        else:
+            user.subscription_expires = datetime.datetime.utcnow() + datetime.timedelta(days=30)
+        db.session.commit()
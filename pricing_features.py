@@ -0,0 +1,136 @@
+"""
+pricing_features.py — Feature pipeline for the AI Rental Optimizer.
+
+Turns Listing rows (ORM objects, column rows or plain dicts) into the numeric
+matrix the pricing model is trained and scored on:
+
+    size / cover      size_sqft, covered
+    amenities         is_heated, access_24_7, nfpa_409_compliant,
+                      gpu_power_available, electric_door, tail_height_clearance
+    stay terms        min_stay_nights
+    location          lat, lon (region), airport_te (target-encoded airport)
+    seasonality       season_sin, season_cos (month the listing was posted)
+
+The airport target encoding is smoothed towards the global mean and computed
+out-of-fold during training so the model never sees its own target leak in.
+A fitted pipeline is pickled inside the model artifact, so inference always
+uses exactly the encoding the model was trained with.
+"""
+
+import datetime
+import math
+
+import numpy as np
+import pandas as pd
+
+# Raw listing attributes the pipeline reads (also the column list for batch scoring)
+RAW_FIELDS = [
+    'id', 'airport_icao', 'size_sqft', 'covered', 'price_month', 'min_stay_nights',
+    'is_heated', 'access_24_7', 'nfpa_409_compliant', 'gpu_power_available',
+    'door_type', 'tail_height_clearance', 'lat', 'lon', 'created_at',
+]
+
+FEATURES = [
+    'size_sqft', 'covered', 'is_heated', 'access_24_7', 'nfpa_409_compliant',
+    'gpu_power_available', 'electric_door', 'tail_height_clearance',
+    'min_stay_nights', 'lat', 'lon', 'airport_te', 'season_sin', 'season_cos',
+]
+
+# The original two-feature model, kept as the evaluation baseline
+LEGACY_FEATURES = ['size_sqft', 'covered']
+
+ELECTRIC_DOORS = {'Electric', 'Hydraulic', 'Bi-Fold (Electric)'}
+
+TE_SMOOTHING = 10      # pseudo-count pulling small airports towards the global mean
+TE_FOLDS = 5
+
+
+def listing_record(l) -> dict:
+    """Extract RAW_FIELDS from a Listing, a SQLAlchemy Row, or a dict."""
+    if isinstance(l, dict):
+        return {f: l.get(f) for f in RAW_FIELDS}
+    return {f: getattr(l, f, None) for f in RAW_FIELDS}
+
+
+def _base_frame(records) -> pd.DataFrame:
+    """Every feature except airport_te (which needs fitted state)."""
+    df = pd.DataFrame.from_records(records, columns=RAW_FIELDS)
+    out = pd.DataFrame(index=df.index)
+    out['size_sqft'] = pd.to_numeric(df['size_sqft'], errors='coerce').fillna(0.0)
+    for flag in ('covered', 'is_heated', 'access_24_7', 'nfpa_409_compliant', 'gpu_power_available'):
+        out[flag] = df[flag].fillna(False).astype(bool).astype(int)
+    out['electric_door'] = df['door_type'].isin(ELECTRIC_DOORS).astype(int)
+    out['tail_height_clearance'] = pd.to_numeric(df['tail_height_clearance'], errors='coerce').fillna(0.0)
+    out['min_stay_nights'] = pd.to_numeric(df['min_stay_nights'], errors='coerce').fillna(1).clip(lower=1)
+    out['lat'] = pd.to_numeric(df['lat'], errors='coerce')
+    out['lon'] = pd.to_numeric(df['lon'], errors='coerce')
+
+    this_month = datetime.date.today().month
+    months = np.array([
+        c.month if isinstance(c, (datetime.date, datetime.datetime)) else this_month
+        for c in df['created_at']
+    ], dtype=float)
+    out['season_sin'] = np.sin(2 * math.pi * months / 12)
+    out['season_cos'] = np.cos(2 * math.pi * months / 12)
+    return out
+
+
+def _airports(records) -> pd.Series:
+    return pd.Series([(r.get('airport_icao') or '').strip().upper() for r in records])
+
+
+class FeaturePipeline:
+    """Fit-once / transform-many feature builder stored alongside the model."""
+
+    def __init__(self, features=None, smoothing: float = TE_SMOOTHING, folds: int = TE_FOLDS):
+        self.features = list(features or FEATURES)
+        self.smoothing = smoothing
+        self.folds = folds
+        self.global_mean = 0.0
+        self.airport_means = {}
+        self.lat_fill = 0.0
+        self.lon_fill = 0.0
+
+    def _encode(self, sums, counts, airports):
+        m = self.smoothing
+        enc = {a: (sums[a] + m * self.global_mean) / (counts[a] + m) for a in counts.index}
+        return airports.map(enc).fillna(self.global_mean).to_numpy(dtype=float)
+
+    def fit_transform(self, records, y) -> pd.DataFrame:
+        """Fit encoders on training records and return their (out-of-fold) features."""
+        y = pd.Series(np.asarray(y, dtype=float))
+        airports = _airports(records)
+        frame = _base_frame(records)
+        self.global_mean = float(y.mean()) if len(y) else 0.0
+        self.lat_fill = float(frame['lat'].median()) if frame['lat'].notna().any() else 0.0
+        self.lon_fill = float(frame['lon'].median()) if frame['lon'].notna().any() else 0.0
+
+        # Full-data encoding, used at inference time
+        grouped = y.groupby(airports)
+        sums, counts = grouped.sum(), grouped.count()
+        encoded = self._encode(sums, counts, pd.Series(counts.index))
+        self.airport_means = {a: float(v) for a, v in zip(counts.index, encoded)}
+
+        # Out-of-fold encoding for the training matrix itself
+        te = np.empty(len(y), dtype=float)
+        fold_ids = np.arange(len(y)) % max(1, self.folds)
+        for k in np.unique(fold_ids):
+            train_mask = fold_ids != k
+            if not train_mask.any():
+                te[~train_mask] = self.global_mean
+                continue
+            g = y[train_mask].groupby(airports[train_mask])
+            te[~train_mask] = self._encode(g.sum(), g.count(), airports[~train_mask])
+
+        frame['airport_te'] = te
+        return self._finish(frame)
+
+    def transform(self, records) -> pd.DataFrame:
+        frame = _base_frame(records)
+        frame['airport_te'] = _airports(records).map(self.airport_means).fillna(self.global_mean).to_numpy(dtype=float)
+        return self._finish(frame)
+
+    def _finish(self, frame) -> pd.DataFrame:
+        frame['lat'] = frame['lat'].fillna(self.lat_fill)
+        frame['lon'] = frame['lon'].fillna(self.lon_fill)
+        return frame[self.features]
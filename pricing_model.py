@@ -0,0 +1,459 @@
+"""
+pricing_model.py — Persistent, versioned AI Rental Optimizer model.
+
+The RandomForest behind /insights/optimizer is trained offline (see
+train_pricing_model.py), serialized to PRICING_MODEL_DIR together with its
+version and a fingerprint of the training data, and published by atomically
+rewriting a small LATEST pointer file. Web workers load the artifact once and
+only re-check the pointer every RELOAD_CHECK_SECONDS, hot-swapping in a newer
+version without a restart. Requests therefore only ever run inference.
+
+Usage:
+    from pricing_model import get_model
+    artifact = get_model()          # None until a model has been trained
+    if artifact:
+        artifact.model.predict(...)
+
+    # one vectorized call for many listings
+    from pricing_model import score_listings, stored_scores
+    scores = score_listings(user_listings)      # [{'listing_id', 'ideal_price', ...}]
+    scores = stored_scores(user_listings)       # same, reusing the nightly job's ai_* columns
+
+    # offline / cron
+    from pricing_model import train_and_publish, score_all_active
+    train_and_publish()
+    score_all_active()
+
+    # offline evaluation (full feature set vs. the legacy size/covered model)
+    from pricing_model import build_training_rows, evaluate
+    report = evaluate(build_training_rows(Listing.query.all()))
+
+Features come from pricing_features.FeaturePipeline, which is pickled with
+the model so scoring reuses the exact fitted airport encoding.
+"""
+
+import datetime
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import joblib
+    import numpy as np
+    import pandas as pd
+    from sklearn.ensemble import RandomForestRegressor
+except ImportError:
+    joblib = np = pd = RandomForestRegressor = None
+
+try:
+    from pricing_features import FEATURES, LEGACY_FEATURES, RAW_FIELDS, FeaturePipeline, listing_record
+except ImportError:  # pandas / numpy missing
+    FEATURES = LEGACY_FEATURES = RAW_FIELDS = []
+    FeaturePipeline = listing_record = None
+
+DEFAULT_MODEL_DIR = os.path.join('instance', 'models')
+LATEST_POINTER = 'LATEST'
+RELOAD_CHECK_SECONDS = 60
+
+TARGET = 'price_month'
+N_ESTIMATORS = 100
+
+# Recommendation thresholds (same rules the optimizer page always used)
+DEFAULT_SUCCESS_CHANCE = 75.0
+MAINTAIN_BAND_USD = 50
+
+# Listings scored per chunk by the nightly batch job, and the columns it reads
+SCORE_BATCH_SIZE = 2000
+SCORING_COLUMNS = RAW_FIELDS
+
+# Below this many real listings we pad with synthetic rows (seeded → reproducible)
+MIN_REAL_SAMPLES = 15
+SYNTHETIC_SAMPLES = 50
+
+
+@dataclass
+class ModelArtifact:
+    model: object
+    version: str
+    fingerprint: str
+    features: list
+    market_avg: float
+    n_samples: int
+    trained_at: str
+    pipeline: object = None
+    extra: dict = field(default_factory=dict)
+
+
+# ── Per-worker cache ──────────────────────────────────────────────────────────
+_LOCK = threading.Lock()
+_CURRENT: Optional[ModelArtifact] = None
+_LAST_CHECK = 0.0
+
+
+def model_dir() -> str:
+    """Resolve the artifact directory from app config, env, or the default."""
+    try:
+        from flask import current_app
+        configured = current_app.config.get('PRICING_MODEL_DIR')
+        if configured:
+            return configured
+        return os.path.join(current_app.instance_path, 'models')
+    except RuntimeError:
+        return os.environ.get('PRICING_MODEL_DIR') or DEFAULT_MODEL_DIR
+
+
+def _read_pointer(directory: str) -> Optional[str]:
+    try:
+        with open(os.path.join(directory, LATEST_POINTER), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def load_latest(directory: Optional[str] = None) -> Optional[ModelArtifact]:
+    """Load whatever LATEST points at, bypassing the per-worker cache."""
+    if joblib is None:
+        return None
+    directory = directory or model_dir()
+    filename = _read_pointer(directory)
+    if not filename:
+        return None
+    try:
+        return joblib.load(os.path.join(directory, filename))
+    except Exception as exc:
+        logger.error(f"[PRICING-MODEL] could not load {filename}: {exc}")
+        return None
+
+
+def get_model(directory: Optional[str] = None, force_check: bool = False) -> Optional[ModelArtifact]:
+    """
+    Return the current model artifact for this worker.
+    Checks the LATEST pointer at most every RELOAD_CHECK_SECONDS and swaps in a
+    newer version when one has been published.
+    """
+    global _CURRENT, _LAST_CHECK
+    now = time.monotonic()
+    if not force_check and _CURRENT is not None and now - _LAST_CHECK < RELOAD_CHECK_SECONDS:
+        return _CURRENT
+
+    with _LOCK:
+        if not force_check and _CURRENT is not None and now - _LAST_CHECK < RELOAD_CHECK_SECONDS:
+            return _CURRENT
+        _LAST_CHECK = now
+        directory = directory or model_dir()
+        pointer = _read_pointer(directory)
+        if pointer is None:
+            return _CURRENT
+        if _CURRENT is not None and pointer == _filename(_CURRENT.version):
+            return _CURRENT
+        artifact = load_latest(directory)
+        if artifact is not None:
+            if _CURRENT is not None:
+                logger.warning(f"[PRICING-MODEL] hot-swapped {_CURRENT.version} → {artifact.version}")
+            else:
+                logger.warning(f"[PRICING-MODEL] loaded version {artifact.version}")
+            _CURRENT = artifact
+        return _CURRENT
+
+
+def reset_cache() -> None:
+    """Forget the loaded model (tests / after deleting artifacts)."""
+    global _CURRENT, _LAST_CHECK
+    with _LOCK:
+        _CURRENT = None
+        _LAST_CHECK = 0.0
+
+
+# ── Training (offline only) ───────────────────────────────────────────────────
+
+def _filename(version: str) -> str:
+    return f"pricing_model_{version}.joblib"
+
+
+def build_training_rows(listings, seed: int = 42) -> list:
+    """
+    Turn Listing rows into training records (RAW_FIELDS + price_month).
+    Cold start only: when there are fewer than MIN_REAL_SAMPLES real listings,
+    seeded synthetic rows (flagged with synthetic=True) are added so the page
+    has something to show. evaluate() never scores against synthetic rows.
+    """
+    rows = []
+    if len(listings) < MIN_REAL_SAMPLES:
+        rng = random.Random(seed)
+        for _ in range(SYNTHETIC_SAMPLES):
+            size = rng.randint(800, 5000)
+            is_covered = rng.choice([0, 1])
+            base_price = (size * 0.15) + (is_covered * 200) + rng.randint(-100, 100)
+            rows.append({'size_sqft': size, 'covered': is_covered, 'min_stay_nights': 1,
+                         TARGET: max(150, base_price), 'synthetic': True})
+
+    for l in listings:
+        if not l.price_month:
+            continue
+        record = listing_record(l)
+        record[TARGET] = l.price_month
+        rows.append(record)
+    return rows
+
+
+def fingerprint_rows(rows) -> str:
+    """Stable hash of the training data so identical data is never retrained."""
+    h = hashlib.sha256()
+    for r in sorted(repr(sorted((k, v) for k, v in r.items() if k != 'id')) for r in rows):
+        h.update(r.encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def _fit(rows, features=None, n_estimators: int = N_ESTIMATORS, seed: int = 42):
+    pipeline = FeaturePipeline(features)
+    X = pipeline.fit_transform(rows, [r[TARGET] for r in rows])
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=seed, n_jobs=1)
+    model.fit(X, [r[TARGET] for r in rows])
+    return pipeline, model
+
+
+def train(rows, features=None) -> ModelArtifact:
+    """Fit the feature pipeline and optimizer model on prepared rows."""
+    if pd is None or RandomForestRegressor is None:
+        raise RuntimeError("pandas / scikit-learn are required to train the pricing model")
+
+    pipeline, model = _fit(rows, features)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return ModelArtifact(
+        model=model,
+        version=now.strftime('%Y%m%d%H%M%S%f'),
+        fingerprint=fingerprint_rows(rows),
+        features=list(pipeline.features),
+        market_avg=float(np.mean([r[TARGET] for r in rows])),
+        n_samples=len(rows),
+        trained_at=now.isoformat(),
+        pipeline=pipeline,
+        extra={'synthetic_rows': sum(1 for r in rows if r.get('synthetic'))},
+    )
+
+
+def evaluate(rows, test_size: float = 0.2, seed: int = 42, feature_sets=None) -> dict:
+    """
+    Reproducible hold-out evaluation.
+
+    Real rows are shuffled with `seed` and split; synthetic rows (if any) only
+    ever join the training side. Each feature set is trained on the same split
+    and reports MAE / RMSE / MAPE / R², fit time and per-1k-row inference time.
+    """
+    feature_sets = feature_sets or {'full': FEATURES, 'legacy': LEGACY_FEATURES}
+    real = [r for r in rows if not r.get('synthetic')]
+    synthetic = [r for r in rows if r.get('synthetic')]
+    if len(real) < 5:
+        raise ValueError(f"need at least 5 real listings to evaluate, have {len(real)}")
+
+    order = np.random.default_rng(seed).permutation(len(real))
+    n_test = max(1, int(round(len(real) * test_size)))
+    test = [real[i] for i in order[:n_test]]
+    train_rows = [real[i] for i in order[n_test:]] + synthetic
+    y_true = np.array([r[TARGET] for r in test], dtype=float)
+
+    report = {'n_train': len(train_rows), 'n_test': len(test), 'synthetic_rows': len(synthetic),
+              'seed': seed, 'test_size': test_size, 'models': {}}
+    for name, features in feature_sets.items():
+        t0 = time.perf_counter()
+        pipeline, model = _fit(train_rows, features, seed=seed)
+        fit_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        y_pred = model.predict(pipeline.transform(test))
+        infer_s = time.perf_counter() - t0
+
+        err = y_pred - y_true
+        ss_tot = float(((y_true - y_true.mean()) ** 2).sum())
+        report['models'][name] = {
+            'features': list(features),
+            'mae': float(np.abs(err).mean()),
+            'rmse': float(np.sqrt((err ** 2).mean())),
+            'mape_pct': float((np.abs(err) / np.where(y_true == 0, 1, y_true)).mean() * 100),
+            'r2': float(1 - (err ** 2).sum() / ss_tot) if ss_tot else 0.0,
+            'fit_seconds': fit_s,
+            'infer_ms_per_1k': infer_s / len(test) * 1000 * 1000,
+        }
+    return report
+
+
+def publish(artifact: ModelArtifact, directory: Optional[str] = None) -> str:
+    """Write the artifact, then atomically repoint LATEST at it."""
+    directory = directory or model_dir()
+    os.makedirs(directory, exist_ok=True)
+    filename = _filename(artifact.version)
+    tmp_path = os.path.join(directory, filename + '.tmp')
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, os.path.join(directory, filename))
+
+    pointer_tmp = os.path.join(directory, LATEST_POINTER + '.tmp')
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        f.write(filename)
+    os.replace(pointer_tmp, os.path.join(directory, LATEST_POINTER))
+    return os.path.join(directory, filename)
+
+
+def train_and_publish(directory: Optional[str] = None, force: bool = False) -> Optional[ModelArtifact]:
+    """
+    Train on the current Listing table and publish a new version.
+    Skips training (returns None) when the data fingerprint is unchanged,
+    unless force=True. Must run inside an app context.
+    """
+    from models import Listing
+
+    directory = directory or model_dir()
+    rows = build_training_rows(Listing.query.all())
+    fingerprint = fingerprint_rows(rows)
+
+    current = load_latest(directory)
+    if current is not None and current.fingerprint == fingerprint and not force:
+        logger.warning(f"[PRICING-MODEL] data unchanged (fingerprint {fingerprint}); keeping {current.version}")
+        return None
+
+    t0 = time.perf_counter()
+    artifact = train(rows)
+    path = publish(artifact, directory)
+    logger.warning(
+        f"[PRICING-MODEL] published {artifact.version} ({artifact.n_samples} rows, "
+        f"fingerprint {fingerprint}) in {time.perf_counter() - t0:.2f}s → {path}"
+    )
+    return artifact
+
+
+# ── Batch inference ───────────────────────────────────────────────────────────
+
+def feature_frame(listings, artifact: ModelArtifact):
+    """Build one feature matrix (DataFrame) for many listings (ORM objects or column rows)."""
+    records = [listing_record(l) for l in listings]
+    if artifact.pipeline is not None:
+        return artifact.pipeline.transform(records)
+    # Artifacts published before the feature pipeline existed
+    return pd.DataFrame({
+        'size_sqft': [r['size_sqft'] or 0 for r in records],
+        'covered': [1 if r['covered'] else 0 for r in records],
+    })[artifact.features]
+
+
+def score_listings(listings, artifact: Optional[ModelArtifact] = None) -> list:
+    """
+    Score many listings in one vectorized pass.
+
+    Returns one dict per listing (same order) with listing_id, ideal_price,
+    success_chance, price_diff, trend and suggestion. Without a published model,
+    the listing's own price is treated as ideal.
+    """
+    if not listings:
+        return []
+    if artifact is None:
+        artifact = get_model()
+    if artifact is None or pd is None:
+        return _scores(listings, None)
+    return _scores(listings, artifact.model.predict(feature_frame(listings, artifact)).astype(float))
+
+
+def stored_scores(listings, artifact: Optional[ModelArtifact] = None) -> list:
+    """
+    score_listings() reusing the nightly job's ideal prices.
+
+    Listings last scored by the published model version keep their stored
+    ai_suggested_price; only the rest (new listings, or a newer model) go
+    through one predict. Success chance and the suggestion always use the
+    current price_month.
+    """
+    if not listings:
+        return []
+    if artifact is None:
+        artifact = get_model()
+    if artifact is None or pd is None:
+        return _scores(listings, None)
+    stale = [l for l in listings
+             if l.ai_model_version != artifact.version or l.ai_suggested_price is None]
+    live = {}
+    if stale:
+        predicted = artifact.model.predict(feature_frame(stale, artifact)).astype(float)
+        live = {l.id: p for l, p in zip(stale, predicted.tolist())}
+    ideal = np.array([live[l.id] if l.id in live else l.ai_suggested_price for l in listings], dtype=float)
+    return _scores(listings, ideal)
+
+
+def _scores(listings, ideal) -> list:
+    """Result dicts from each listing's ideal price (None: no model, price as listed)."""
+    prices = np.array([l.price_month or 0.0 for l in listings], dtype=float)
+    if ideal is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct_diff = np.where(ideal > 0, (prices - ideal) / ideal, 0.0)
+        success = np.clip(85 - pct_diff * 100, 10, 98)
+    else:
+        ideal = prices.copy()
+        success = np.full(len(listings), DEFAULT_SUCCESS_CHANCE)
+
+    diff = prices - ideal
+    results = []
+    for l, ideal_p, chance, d in zip(listings, ideal.tolist(), success.tolist(), diff.tolist()):
+        if abs(d) < MAINTAIN_BAND_USD:
+            suggestion = "Strong pricing - maintain."
+        else:
+            suggestion = (f"Recommendation: {'Decrease' if d > 0 else 'Increase'} price by "
+                          f"${abs(round(d, 2))} for optimal velocity.")
+        results.append({
+            'listing_id': l.id,
+            'ideal_price': round(ideal_p, 2),
+            'success_chance': round(chance, 1),
+            'price_diff': round(d, 2),
+            'trend': 'up' if d < 0 else 'down',
+            'suggestion': suggestion,
+        })
+    return results
+
+
+def score_all_active(batch_size: int = SCORE_BATCH_SIZE) -> int:
+    """
+    Nightly job: score every Active listing in chunks and persist the results
+    on the listing (ai_suggested_price / ai_model_version), which
+    stored_scores() then serves to the optimizer page. Returns the number of
+    listings scored.
+    """
+    from sqlalchemy import select, update
+    from extensions import db
+    from models import Listing
+
+    artifact = get_model(force_check=True)
+    if artifact is None:
+        logger.warning("[PRICING-MODEL] no published model — skipping nightly scoring")
+        return 0
+
+    total = 0
+    last_id = 0
+    while True:
+        # Keyset pagination keeps every chunk an index range scan; plain column
+        # rows (not ORM entities) keep the identity map and memory flat.
+        chunk = db.session.execute(
+            select(*[getattr(Listing, c) for c in SCORING_COLUMNS])
+            .where(Listing.status == 'Active', Listing.id > last_id)
+            .order_by(Listing.id)
+            .limit(batch_size)
+        ).all()
+        if not chunk:
+            break
+        scores = score_listings(chunk, artifact)
+        db.session.execute(update(Listing), [
+            {
+                'id': s['listing_id'],
+                'ai_suggested_price': s['ideal_price'],
+                'ai_model_version': artifact.version,
+            }
+            for s in scores
+        ])
+        db.session.commit()
+        total += len(chunk)
+        last_id = chunk[-1].id
+
+    logger.warning(f"[PRICING-MODEL] scored {total} active listings with {artifact.version}")
+    return total
@@ -0,0 +1,191 @@
+"""
+quotes.py — Single source of truth for rental pricing.
+
+book_listing() and GET /api/quote both price a stay through build_quote():
+
+    stays of 30+ nights   flat monthly rate
+    shorter stays         price_night per night × event surge (event_surge)
+    platform fee          10% of the rental
+    insurance (opt-in)    $15/night + $45, capped at $150
+
+get_quote() wraps it in the app cache, keyed per (listing, check-in, checkout,
+insurance) plus a per-listing version token. Any insert/update/delete of the
+listing or one of its bookings bumps the token once the transaction commits
+(commit_hooks), orphaning every cached quote for that listing, so the date
+picker can re-quote on each change without touching the database until
+something actually changes. A hold that lapses by the clock commits
+nothing, so a quote cached while a hold covers its dates expires when that
+hold does. Set CACHE_REDIS_URL so every worker shares the
+quotes and the tokens; with the default per-process SimpleCache another
+worker's copy lives until QUOTE_CACHE_SECONDS.
+
+Usage:
+    from quotes import build_quote, get_quote, QuoteError
+    quote = build_quote(listing, start, end, insurance=True)   # always fresh
+    data = get_quote(listing_id, start, end, insurance=True)   # cached dict
+"""
+
+import datetime
+import logging
+import math
+import uuid
+from dataclasses import dataclass, field, asdict
+
+from sqlalchemy import event, func
+
+from commit_hooks import after_commit
+from extensions import db, cache
+from models import Listing, Booking
+from event_surge import get_index as get_surge_index
+from availability import is_available, overlaps
+
+logger = logging.getLogger(__name__)
+
+MONTHLY_RATE_NIGHTS = 30
+PLATFORM_FEE_RATE = 0.10
+INSURANCE_DAILY = 15.00
+INSURANCE_BASE = 45.00
+INSURANCE_CAP = 150.00
+
+QUOTE_CACHE_SECONDS = 300     # bounds staleness in other workers when the cache isn't shared
+_VERSION_KEY = 'quote_ver:{}'
+_QUOTE_KEY = 'quote:{}:{}:{}:{}:{}'
+
+
+class QuoteError(ValueError):
+    """Date range the listing can't be quoted for (message is user-facing)."""
+
+
+@dataclass
+class Quote:
+    listing_id: int
+    start_date: str
+    end_date: str
+    nights: int
+    rate_type: str                 # 'nightly' or 'monthly'
+    breakdown: list = field(default_factory=list)
+    rental: float = 0.0
+    surge_total: float = 0.0
+    platform_fee: float = 0.0
+    insurance_fee: float = 0.0
+    total: float = 0.0
+    available: bool = True
+    currency: str = 'usd'
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _as_date(d) -> datetime.date:
+    if isinstance(d, str):
+        return datetime.datetime.strptime(d, '%Y-%m-%d').date()
+    return d.date() if isinstance(d, datetime.datetime) else d
+
+
+def insurance_fee_for(nights: int) -> float:
+    return min(INSURANCE_CAP, INSURANCE_DAILY * nights + INSURANCE_BASE)
+
+
+def build_quote(listing, start, end, insurance: bool = False) -> Quote:
+    """Price a stay from check-in `start` to checkout `end` (both dates or YYYY-MM-DD)."""
+    try:
+        start, end = _as_date(start), _as_date(end)
+    except (TypeError, ValueError):
+        raise QuoteError("Dates must be in YYYY-MM-DD format.")
+    nights = (end - start).days
+    if nights <= 0:
+        raise QuoteError("Checkout date must be after check-in date.")
+    if nights < (listing.min_stay_nights or 1):
+        raise QuoteError(f"This listing requires a minimum stay of {listing.min_stay_nights} nights.")
+
+    quote = Quote(listing_id=listing.id, start_date=start.isoformat(), end_date=end.isoformat(),
+                  nights=nights, rate_type='monthly' if nights >= MONTHLY_RATE_NIGHTS else 'nightly')
+
+    if quote.rate_type == 'monthly':
+        per_night = round((listing.price_month or 0) / nights, 2)
+        quote.breakdown = [{'date': (start + datetime.timedelta(days=i)).isoformat(), 'base': per_night,
+                            'surge_pct': 0, 'event': None, 'amount': per_night} for i in range(nights)]
+        quote.rental = round(listing.price_month or 0, 2)
+    else:
+        rate = listing.price_night or 0
+        for night, mult, hit in get_surge_index().nightly(listing.airport_icao, start, end):
+            amount = round(rate * mult, 2)
+            quote.breakdown.append({
+                'date': night.isoformat(),
+                'base': round(rate, 2),
+                'surge_pct': round(hit.surge_pct, 1) if hit else 0,
+                'event': hit.event.name if hit else None,
+                'amount': amount,
+            })
+            quote.surge_total += amount - rate
+        quote.rental = round(sum(n['amount'] for n in quote.breakdown), 2)
+        quote.surge_total = round(quote.surge_total, 2)
+
+    quote.platform_fee = round(quote.rental * PLATFORM_FEE_RATE, 2)
+    quote.insurance_fee = insurance_fee_for(nights) if insurance else 0.0
+    quote.total = round(quote.rental + quote.platform_fee + quote.insurance_fee, 2)
+    quote.available = is_available(listing.id, start, end)
+    return quote
+
+
+# ── Cache ─────────────────────────────────────────────────────────────────────
+
+def _listing_version(listing_id) -> str:
+    key = _VERSION_KEY.format(listing_id)
+    version = cache.get(key)
+    if version is None:
+        # Unknown (first use or evicted): start a fresh generation so nothing
+        # cached under an older token can be served.
+        version = uuid.uuid4().hex[:12]
+        cache.set(key, version, timeout=0)
+    return version
+
+
+def invalidate_quotes(listing_id) -> None:
+    cache.set(_VERSION_KEY.format(listing_id), uuid.uuid4().hex[:12], timeout=0)
+
+
+def _quote_timeout(listing_id, start, end) -> int:
+    """QUOTE_CACHE_SECONDS, cut short to when the first live hold on these dates lapses."""
+    now = datetime.datetime.utcnow()
+    lapse = (db.session.query(func.min(Booking.hold_expires_at))
+             .filter(Booking.listing_id == listing_id, Booking.status == 'Pending',
+                     Booking.hold_expires_at > now, overlaps(start, end))
+             .scalar())
+    if lapse is None:
+        return QUOTE_CACHE_SECONDS
+    # At least a second: a timeout of 0 means "never expires"
+    return max(1, min(QUOTE_CACHE_SECONDS, math.ceil((lapse - now).total_seconds())))
+
+
+def get_quote(listing_id, start, end, insurance: bool = False) -> dict:
+    """Cached build_quote() as a dict. Raises QuoteError, or LookupError for unknown listings."""
+    try:
+        start, end = _as_date(start), _as_date(end)
+    except (TypeError, ValueError):
+        raise QuoteError("Dates must be in YYYY-MM-DD format.")
+    key = _QUOTE_KEY.format(listing_id, start, end, int(bool(insurance)), _listing_version(listing_id))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    listing = db.session.get(Listing, listing_id)
+    if listing is None:
+        raise LookupError(listing_id)
+    data = build_quote(listing, start, end, insurance).to_dict()
+    cache.set(key, data, timeout=_quote_timeout(listing_id, start, end))
+    return data
+
+
+@event.listens_for(Listing, 'after_insert')
+@event.listens_for(Listing, 'after_update')
+@event.listens_for(Listing, 'after_delete')
+def _listing_changed(mapper, connection, target):
+    after_commit(target, invalidate_quotes, target.id)
+
+
+@event.listens_for(Booking, 'after_insert')
+@event.listens_for(Booking, 'after_update')
+@event.listens_for(Booking, 'after_delete')
+def _booking_changed(mapper, connection, target):
+    after_commit(target, invalidate_quotes, target.listing_id)
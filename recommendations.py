@@ -0,0 +1,250 @@
+"""
+recommendations.py — Nightly precomputed Smart Matches.
+
+Builds the user_recommendations table offline so /matches and the renter
+dashboard read a handful of indexed rows instead of ranking listings per
+request.
+
+Every Active listing becomes a row of a column-oriented feature set: its
+user-independent score (owner premium / certified, health, short-stay), an
+integer airport code and its monthly price. Every user with alert
+preferences becomes an (airport code, max price) vector. Scores for a block
+of users against all listings are one broadcast NumPy expression:
+
+    S = static + has_airport·(AIRPORT_OTHER + Δ·[user_airport == listing_airport])
+               + has_budget·WITHIN_BUDGET·[price <= max_price]
+
+using exactly the weights in matching.py, so precomputed rows agree with the
+live SQL ranking. Blocks are sized so the score matrix stays under
+BLOCK_CELLS entries regardless of table size, and top-N is taken with
+argpartition on a composite key that preserves the SQL tie-break (featured,
+newer, higher id).
+
+Delta path: refresh_for_new_listings() scores only listings created since
+the last run against all users and rescores just the users whose top-N
+those listings would enter (plus users who have no rows yet).
+
+Usage:
+    from recommendations import rebuild_all, refresh_for_new_listings, recommended_matches
+    rebuild_all()                                  # nightly
+    refresh_for_new_listings()                     # every few minutes
+    recommended_matches(current_user, k=10)        # [{'listing', 'score'}, ...]
+"""
+
+import datetime
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import delete, func, insert, or_
+
+from extensions import db
+from models import Listing, User, UserRecommendation
+import matching
+
+logger = logging.getLogger(__name__)
+
+TOP_N = 20
+BLOCK_CELLS = 2_000_000        # max users × listings scored at once (~16 MB of int64)
+INSERT_CHUNK = 5000
+
+
+@dataclass
+class ListingFeatures:
+    ids: np.ndarray             # in SQL tie-break order: featured, newest, highest id first
+    static: np.ndarray
+    airport: np.ndarray
+    price: np.ndarray
+
+    def __len__(self):
+        return len(self.ids)
+
+
+@dataclass
+class UserFeatures:
+    ids: np.ndarray
+    airport: np.ndarray         # -1 when unset
+    has_airport: np.ndarray
+    max_price: np.ndarray       # nan when unset
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _airport_code(codes: dict, icao) -> int:
+    if not icao:
+        return -2
+    return codes.setdefault(icao, len(codes))
+
+
+def load_listing_features(codes: dict, since=None) -> ListingFeatures:
+    q = (db.session.query(Listing.id, Listing.airport_icao, Listing.price_month, Listing.health_score,
+                          Listing.min_stay_nights, User.is_premium, User.is_certified)
+         .join(User, Listing.owner_id == User.id)
+         .filter(Listing.status == 'Active'))
+    if since is not None:
+        q = q.filter(Listing.created_at > since)
+    rows = q.order_by(Listing.is_featured.desc(), Listing.created_at.desc(), Listing.id.desc()).all()
+
+    n = len(rows)
+    static = np.full(n, matching.BASE_SCORE, dtype=np.int64)
+    airport = np.empty(n, dtype=np.int64)
+    price = np.empty(n, dtype=float)
+    for i, r in enumerate(rows):
+        static[i] += (matching.OWNER_PREMIUM * bool(r.is_premium)
+                      + matching.OWNER_CERTIFIED * bool(r.is_certified)
+                      + matching.HEALTHY * (r.health_score is not None and r.health_score >= matching.HEALTH_THRESHOLD)
+                      + matching.SHORT_STAY * (r.min_stay_nights is not None
+                                               and r.min_stay_nights <= matching.SHORT_STAY_NIGHTS))
+        airport[i] = _airport_code(codes, r.airport_icao)
+        price[i] = r.price_month if r.price_month is not None else np.nan
+    return ListingFeatures(ids=np.array([r.id for r in rows], dtype=np.int64),
+                           static=static, airport=airport, price=price)
+
+
+def load_user_features(codes: dict, user_ids=None) -> UserFeatures:
+    q = db.session.query(User.id, User.alert_airport, User.alert_max_price).filter(
+        or_(User.alert_airport.isnot(None), User.alert_max_price.isnot(None)))
+    if user_ids is not None:
+        q = q.filter(User.id.in_(list(user_ids)))
+    rows = q.order_by(User.id).all()
+    return UserFeatures(
+        ids=np.array([r.id for r in rows], dtype=np.int64),
+        # Airports no listing uses get fresh codes: they never match but still earn AIRPORT_OTHER
+        airport=np.array([_airport_code(codes, r.alert_airport) if r.alert_airport else -1 for r in rows],
+                         dtype=np.int64),
+        has_airport=np.array([bool(r.alert_airport) for r in rows]),
+        max_price=np.array([r.alert_max_price if r.alert_max_price else np.nan for r in rows], dtype=float),
+    )
+
+
+def score_block(users: UserFeatures, sl: slice, listings: ListingFeatures) -> np.ndarray:
+    """(block users × listings) int64 score matrix."""
+    ua = users.airport[sl, None]
+    has_airport = users.has_airport[sl, None]
+    max_price = users.max_price[sl, None]
+
+    scores = np.broadcast_to(listings.static, (len(ua), len(listings))).copy()
+    scores += has_airport * (matching.AIRPORT_OTHER
+                             + (matching.AIRPORT_MATCH - matching.AIRPORT_OTHER) * (ua == listings.airport[None, :]))
+    with np.errstate(invalid='ignore'):
+        within = listings.price[None, :] <= max_price      # nan on either side → False
+    scores += matching.WITHIN_BUDGET * within
+    np.minimum(scores, matching.MAX_SCORE, out=scores)
+    return scores
+
+
+def top_n(scores: np.ndarray, n: int):
+    """Per-row (column indices, scores) of the n best, ties broken by column order."""
+    n_cols = scores.shape[1]
+    n = min(n, n_cols)
+    if n == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64), scores[:, :0]
+    key = scores * n_cols + (n_cols - 1 - np.arange(n_cols))
+    idx = np.argpartition(-key, n - 1, axis=1)[:, :n]
+    order = np.argsort(-np.take_along_axis(key, idx, axis=1), axis=1)
+    idx = np.take_along_axis(idx, order, axis=1)
+    return idx, np.take_along_axis(scores, idx, axis=1)
+
+
+def _block_rows(n_listings: int, block_cells: int) -> int:
+    return max(1, block_cells // max(1, n_listings))
+
+
+def _write(users: UserFeatures, listings: ListingFeatures, n: int, block_cells: int, now) -> int:
+    written = 0
+    step = _block_rows(len(listings), block_cells)
+    for start in range(0, len(users), step):
+        sl = slice(start, min(start + step, len(users)))
+        idx, scores = top_n(score_block(users, sl, listings), n)
+        rows = [
+            {'user_id': int(uid), 'listing_id': int(listings.ids[j]), 'rank': rank + 1,
+             'score': float(s), 'computed_at': now}
+            for uid, cols, row_scores in zip(users.ids[sl], idx, scores)
+            for rank, (j, s) in enumerate(zip(cols, row_scores))
+        ]
+        for c in range(0, len(rows), INSERT_CHUNK):
+            db.session.execute(insert(UserRecommendation), rows[c:c + INSERT_CHUNK])
+        written += len(rows)
+    return written
+
+
+def rebuild_all(n: int = TOP_N, block_cells: int = BLOCK_CELLS) -> int:
+    """Recompute every user's top-n and swap the table contents in one transaction."""
+    codes = {}
+    listings = load_listing_features(codes)
+    users = load_user_features(codes)
+    now = datetime.datetime.utcnow()
+    db.session.execute(delete(UserRecommendation))
+    written = _write(users, listings, n, block_cells, now)
+    db.session.commit()
+    logger.info(f"[RECS] rebuilt {written} rows for {len(users)} users over {len(listings)} listings")
+    return written
+
+
+def rescore_users(user_ids, n: int = TOP_N, block_cells: int = BLOCK_CELLS) -> int:
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    codes = {}
+    listings = load_listing_features(codes)
+    users = load_user_features(codes, user_ids)
+    db.session.execute(delete(UserRecommendation).where(UserRecommendation.user_id.in_(user_ids)))
+    written = _write(users, listings, n, block_cells, datetime.datetime.utcnow())
+    db.session.commit()
+    return written
+
+
+def affected_by_new_listings(since, n: int = TOP_N, block_cells: int = BLOCK_CELLS) -> list:
+    """Users whose stored top-n would change because of listings created after `since`."""
+    codes = {}
+    new = load_listing_features(codes, since=since)
+    users = load_user_features(codes)
+    if not len(users):
+        return []
+
+    # Current cut-off per user: the n-th best stored score, or -1 if they have fewer than n rows
+    stored = dict(db.session.query(UserRecommendation.user_id, func.count(UserRecommendation.id))
+                  .group_by(UserRecommendation.user_id).all())
+    cutoff = dict(db.session.query(UserRecommendation.user_id, func.min(UserRecommendation.score))
+                  .group_by(UserRecommendation.user_id).all())
+    threshold = np.array([cutoff[u] if stored.get(u, 0) >= n else -1 for u in users.ids.tolist()])
+
+    affected = [int(u) for u in users.ids if u not in stored]
+    if len(new):
+        step = _block_rows(len(new), block_cells)
+        for start in range(0, len(users), step):
+            sl = slice(start, min(start + step, len(users)))
+            best_new = score_block(users, sl, new).max(axis=1)
+            # New listings are the newest, so they win ties against stored rows
+            affected += [int(u) for u in users.ids[sl][best_new >= threshold[sl]]]
+    return sorted(set(affected))
+
+
+def refresh_for_new_listings(since=None, n: int = TOP_N) -> int:
+    """Delta path: rescore only users the newest listings could affect. Returns users rescored."""
+    if since is None:
+        since = db.session.query(func.max(UserRecommendation.computed_at)).scalar()
+    if since is None:
+        rebuild_all(n)
+        return len(load_user_features({}))
+    users = affected_by_new_listings(since, n)
+    rescore_users(users, n)
+    logger.info(f"[RECS] delta since {since}: rescored {len(users)} users")
+    return len(users)
+
+
+def clear_user(user_id) -> None:
+    """Drop a user's rows (e.g. after they change preferences) so /matches ranks live."""
+    db.session.execute(delete(UserRecommendation).where(UserRecommendation.user_id == user_id))
+
+
+def recommended_matches(user, k: int = 10) -> list:
+    """Precomputed matches for `user`, falling back to the live SQL ranking."""
+    rows = (db.session.query(UserRecommendation.listing_id, UserRecommendation.score)
+            .filter(UserRecommendation.user_id == user.id)
+            .order_by(UserRecommendation.rank)
+            .limit(k).all())
+    if rows:
+        return matching.load_matches([(r.listing_id, int(r.score)) for r in rows])
+    return matching.top_matches(user, k)
@@ -0,0 +1,277 @@
+"""
+report_exports.py — Streaming owner reports (bookings, payments, per-listing earnings).
+
+Every report is a plain column SELECT executed with ``yield_per`` so PostgreSQL
+uses a server-side cursor and only one partition of rows is ever held in memory.
+Rows are encoded on the fly as CSV or as a minimal XLSX workbook that is zipped
+straight into the response stream, so the first byte leaves the server as soon
+as the header row is written — even for FBOs with tens of thousands of bookings.
+
+Usage:
+    from report_exports import REPORTS, stream_report
+    chunks = stream_report('bookings', 'csv', owner_id=7)   # generator of bytes
+"""
+
+import csv
+import datetime
+import io
+import zipfile
+from xml.sax.saxutils import escape
+
+from sqlalchemy import case, func, select
+
+from extensions import db
+from models import Booking, Listing, Payment, User
+
+# Owners keep 90% of each rental (matches booking_success revenue split)
+OWNER_SHARE = 0.90
+
+# Rows fetched per server-side cursor round trip
+YIELD_PER = 500
+
+# Encoded rows buffered before a chunk is flushed to the client
+FLUSH_ROWS = 200
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def _bookings_query(owner_id: int):
+    return (
+        select(
+            Booking.id,
+            Listing.id,
+            Listing.airport_icao,
+            User.username,
+            Booking.start_date,
+            Booking.end_date,
+            Booking.status,
+            Booking.total_price,
+            Booking.insurance_fee,
+            Booking.total_price * OWNER_SHARE,
+            Booking.created_at,
+        )
+        .join(Listing, Booking.listing_id == Listing.id)
+        .join(User, Booking.renter_id == User.id)
+        .where(Listing.owner_id == owner_id)
+        .order_by(Booking.created_at.desc(), Booking.id.desc())
+    )
+
+
+def _with_nights(row):
+    start, end = row[4], row[5]
+    nights = (end - start).days if start and end else None
+    return row[:6] + (nights,) + row[6:]
+
+
+def _payments_query(owner_id: int):
+    return (
+        select(
+            Payment.id,
+            Payment.item_id,
+            Listing.airport_icao,
+            User.username,
+            Payment.amount,
+            Payment.currency,
+            Payment.status,
+            Payment.stripe_session_id,
+            Payment.created_at,
+        )
+        .join(Listing, Payment.item_id == Listing.id)
+        .join(User, Payment.user_id == User.id)
+        .where(Payment.item_type == 'rental_booking', Listing.owner_id == owner_id)
+        .order_by(Payment.created_at.desc(), Payment.id.desc())
+    )
+
+
+def _earnings_query(owner_id: int):
+    confirmed = Booking.status.in_(['Confirmed', 'Completed'])
+    gross = func.coalesce(func.sum(case((confirmed, Booking.total_price), else_=0.0)), 0.0)
+    return (
+        select(
+            Listing.id,
+            Listing.airport_icao,
+            Listing.status,
+            func.count(Booking.id),
+            func.coalesce(func.sum(case((confirmed, 1), else_=0)), 0),
+            gross,
+            gross * OWNER_SHARE,
+            func.max(Booking.start_date),
+        )
+        .outerjoin(Booking, Booking.listing_id == Listing.id)
+        .where(Listing.owner_id == owner_id)
+        .group_by(Listing.id, Listing.airport_icao, Listing.status)
+        .order_by(Listing.id)
+    )
+
+
+# report name → (header row, query builder, optional per-row mapper)
+REPORTS = {
+    'bookings': (
+        ['booking_id', 'listing_id', 'airport', 'renter', 'start_date', 'end_date',
+         'nights', 'status', 'rental_total', 'insurance_fee', 'owner_payout', 'created_at'],
+        _bookings_query,
+        _with_nights,
+    ),
+    'payments': (
+        ['payment_id', 'listing_id', 'airport', 'payer', 'amount', 'currency',
+         'status', 'stripe_session_id', 'created_at'],
+        _payments_query,
+        None,
+    ),
+    'earnings': (
+        ['listing_id', 'airport', 'status', 'bookings', 'confirmed_bookings',
+         'gross_revenue', 'owner_earnings', 'last_booking_start'],
+        _earnings_query,
+        None,
+    ),
+}
+
+
+def _iter_rows(stmt, mapper=None):
+    """Yield result tuples through a server-side cursor (PG) / chunked fetch."""
+    result = db.session.execute(stmt.execution_options(yield_per=YIELD_PER))
+    try:
+        for row in result:
+            yield mapper(tuple(row)) if mapper else tuple(row)
+    finally:
+        result.close()
+
+
+def _cell(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, float):
+        return round(value, 2)
+    return value
+
+
+def iter_csv(header, rows):
+    """Encode rows as CSV, yielding bytes every FLUSH_ROWS rows."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    yield buf.getvalue().encode('utf-8')
+    buf.seek(0)
+    buf.truncate()
+
+    pending = 0
+    for row in rows:
+        writer.writerow([_cell(v) for v in row])
+        pending += 1
+        if pending >= FLUSH_ROWS:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    if pending:
+        yield buf.getvalue().encode('utf-8')
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object that ZipFile streams into."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XLSX_STATIC = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values) -> str:
+    cells = []
+    for v in values:
+        v = _cell(v)
+        if v is None:
+            cells.append('<c/>')
+        elif isinstance(v, bool):
+            cells.append(f'<c t="b"><v>{int(v)}</v></c>')
+        elif isinstance(v, (int, float)):
+            cells.append(f'<c><v>{v}</v></c>')
+        else:
+            cells.append(f'<c t="inlineStr"><is><t>{escape(str(v))}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def iter_xlsx(header, rows, sheet_name='Report'):
+    """
+    Encode rows as a single-sheet XLSX workbook without buffering the file.
+    The sheet XML is deflated straight into the zip stream; no openpyxl needed.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, body in _XLSX_STATIC.items():
+            zf.writestr(name, body)
+        zf.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(header)
+            ).encode('utf-8'))
+            yield sink.drain()
+
+            pending = []
+            for row in rows:
+                pending.append(_xlsx_row(row))
+                if len(pending) >= FLUSH_ROWS:
+                    sheet.write(''.join(pending).encode('utf-8'))
+                    pending.clear()
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+            sheet.write((''.join(pending) + '</sheetData></worksheet>').encode('utf-8'))
+    yield sink.drain()
+
+
+def stream_report(report: str, fmt: str, owner_id: int):
+    """Return a generator of encoded bytes for one of REPORTS in one of FORMATS."""
+    header, build_query, mapper = REPORTS[report]
+    rows = _iter_rows(build_query(owner_id), mapper)
+    if fmt == 'xlsx':
+        return iter_xlsx(header, rows, sheet_name=report.title())
+    return iter_csv(header, rows)
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, abort, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, abort, current_app, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
@@ -36,6 +36,7 @@ except ImportError:
     URLSafeTimedSerializer = SignatureExpired = BadSignature = None
 import os
 import random
+import time
 import uuid
 # ... (rest of imports)
 import datetime
@@ -47,27 +48,18 @@ try:
 except ImportError:
     stripe = None
 
-try:
-    import openai
-except ImportError:
-    openai = None
+from integrations import openai_client, metrics as integration_metrics
+from concierge import (build_messages as build_concierge_messages, complete as complete_concierge_reply,
+                       stream_reply as stream_concierge_reply, sse)
 
 try:
     import pandas as pd
     import numpy as np
-    from sklearn.ensemble import RandomForestRegressor
-    from sklearn.model_selection import train_test_split
 except ImportError:
-    pd = np = RandomForestRegressor = train_test_split = None
-
-# Global Event Registry mapped to AI Pricing Optimizations
-EVENTS = {
-    'Oshkosh AirVenture': {'dates': '2026-07-20 to 2026-07-26', 'airports': ['KOSH', 'KATW', 'KFLD'], 'surge': 50},
-    'Sun n Fun Aerospace Expo': {'dates': '2026-04-05 to 2026-04-10', 'airports': ['KLAL', 'KPCM', 'KBOW'], 'surge': 40},
-    'NBAA-BACE Las Vegas': {'dates': '2026-10-14 to 2026-10-16', 'airports': ['KLAS', 'KHND', 'KVGT'], 'surge': 45},
-    'Reno Air Races': {'dates': '2026-09-10 to 2026-09-14', 'airports': ['KRTS', 'kRNO', 'KCXP'], 'surge': 35},
-    'High Sierra Fly-In': {'dates': '2026-10-15 to 2026-10-18', 'airports': ['Dead Cow Lakebed', 'KWMC', 'KRNO'], 'surge': 30}
-}
+    pd = np = None
+
+# Event surges live in event_surge.EVENT_REGISTRY (date-indexed, see get_surge_index)
+from event_surge import get_index as get_surge_index
 
 bp = Blueprint('main', __name__)
 
@@ -190,6 +182,11 @@ def listings():
 
     airport = request.args.get('airport', '').strip().upper()
     radius = request.args.get('radius', 250, type=int)
+
+    # Search volume feeds the demand forecaster (counted in memory, written in batches)
+    if airport and request.args.get('page', 1, type=int) == 1:
+        from demand_forecast import record_search
+        record_search(airport)
     covered = request.args.get('covered', '')
     min_price = request.args.get('min_price', type=float)
     max_price = request.args.get('max_price', type=float)
@@ -199,8 +196,46 @@ def listings():
     electric_doors_only = request.args.get('electric_doors_only')
     nfpa_409_compliant = request.args.get('nfpa_409_compliant')
     gpu_power_available = request.args.get('gpu_power_available')
+    check_in = request.args.get('check_in', '').strip()
+    check_out = request.args.get('check_out', '').strip()
+    min_sqft = request.args.get('min_sqft', type=float)
+    within_nm = request.args.get('within_nm', type=float)
+
+    # "Fits my aircraft": catalogue type (name or alias) the hangar must take
+    from aircraft_catalog import get as get_aircraft
+    aircraft_arg = request.args.get('aircraft', '').strip()
+    fit_aircraft = get_aircraft(aircraft_arg) if aircraft_arg else None
+    if aircraft_arg and fit_aircraft is None:
+        flash(f"Unknown aircraft type '{aircraft_arg}' — pick one from the list.", 'error')
+
+    # Optional stay dates: drop listings with no room left (or less than min_sqft) on any of those nights
+    stay = None
+    if check_in and check_out:
+        from availability import parse_range, AvailabilityError
+        try:
+            stay = parse_range(check_in, check_out)
+        except AvailabilityError as e:
+            flash(str(e), 'error')
 
     def _run_query():
+        if stay:
+            # Dated search: radius + free-space anti-join + nightly price band in one cached query plan
+            from stay_search import StaySearch, search_page, AMENITY_FLAGS
+            from capacity import aircraft_footprint
+            flags = {'is_heated': is_heated, 'access_24_7': access_24_7,
+                     'nfpa_409_compliant': nfpa_409_compliant, 'gpu_power_available': gpu_power_available}
+            need = [v for v in (min_sqft, fit_aircraft and aircraft_footprint(fit_aircraft.name)) if v]
+            return search_page(StaySearch(
+                start=stay[0], end=stay[1],
+                airport=airport or None, radius_nm=within_nm if airport else None,
+                need_sqft=max(need) if need else None,
+                covered={'yes': True, 'no': False}.get(covered),
+                min_night=min_price, max_night=max_price,
+                amenities=tuple(f for f in AMENITY_FLAGS if flags[f] == '1'),
+                electric_doors=electric_doors_only == '1',
+                aircraft=fit_aircraft.name if fit_aircraft else None,
+            ), page=request.args.get('page', 1, type=int))
+
         q = Listing.query.filter_by(status='Active')
         if airport:
             q = q.filter_by(airport_icao=airport)
@@ -224,6 +259,9 @@ def listings():
             q = q.filter_by(nfpa_409_compliant=True)
         if gpu_power_available == '1':
             q = q.filter_by(gpu_power_available=True)
+        if fit_aircraft:
+            from packing import fits_aircraft
+            q = q.filter(fits_aircraft(fit_aircraft.name))
         return q.order_by(
             Listing.min_stay_nights.asc(),
             Listing.is_featured.desc(),
@@ -251,7 +289,7 @@ def listings():
                                    listings=[], pagination=None,
                                    airport=airport, radius=radius,
                                    covered=covered, min_price=min_price,
-                                   max_price=max_price,
+                                   max_price=max_price, aircraft=aircraft_arg,
                                    search_limited=search_limited,
                                    markers=[]), 503
 
@@ -281,6 +319,11 @@ def listings():
                            covered=covered,
                            min_price=min_price,
                            max_price=max_price,
+                           check_in=check_in,
+                           check_out=check_out,
+                           within_nm=within_nm,
+                           min_sqft=min_sqft,
+                           aircraft=fit_aircraft.name if fit_aircraft else aircraft_arg,
                            search_limited=search_limited,
                            markers=markers)
 
@@ -293,8 +336,6 @@ def listing_detail(id):
     print(f"DEBUG: listing_detail entered for id={id}")
     try:
         listing = db.get_or_404(Listing, id)
-        aircraft_sizes = current_app.config.get('AIRCRAFT_SIZES', {})
-
         # Check if user has access to secure items like Ramp Cam
         has_access = False
         if current_user.is_authenticated:
@@ -311,48 +352,42 @@ def listing_detail(id):
         # Fetch live weather for this airport
         weather = None
         try:
-            from weather_service import fetch_airport_weather
+            from weather_service import cached_airport_weather
+            from metar_feed import start_worker as start_metar_feed
+            start_metar_feed(current_app._get_current_object())
             lat = listing.lat or 43.6275
             lon = listing.lon or -79.3962
-            weather = fetch_airport_weather(lat, lon, listing.airport_icao or 'UNKN')
+            weather = cached_airport_weather(lat, lon, listing.airport_icao or 'UNKN')
         except Exception as we:
             current_app.logger.warning(f"[WEATHER] Could not fetch weather: {we}")
 
-        # Live Fuel & FBO Data (AviationStack API)
+        # Fuel & FBO data: local dataset or cached upstream answers, never fetched in the request
         fbo_data = None
-        aviationstack_key = os.environ.get('AVIATIONSTACK_KEY')
-        if aviationstack_key and listing.airport_icao:
-            try:
-                import requests
-                # Mocking the endpoint concept as AviationStack doesn't have a direct 'fbo/fuel' endpoint in free tier, 
-                # but making the request as requested by the user.
-                response = requests.get(f"http://api.aviationstack.com/v1/airports?access_key={aviationstack_key}&search={listing.airport_icao}", timeout=2)
-                if response.status_code == 200:
-                    api_data = response.json()
-                    if 'data' in api_data and api_data['data']:
-                        # Simulate parsing fuel/FBO from their airport database response
-                        fbo_data = {
-                            'fbo_name': 'Million Air',
-                            'fuel_type': 'Jet A',
-                            'fuel_price': 6.50,
-                            'services': ['GPU', 'Crew Cars', 'Catering']
-                        }
-            except Exception as e:
-                print(f"[FBO API] Error fetching AviationStack data: {e}")
-        
-        # Fallback to realistic mock data if API key missing or fails
-        if not fbo_data:
-            fbo_data = {
-                'fbo_name': 'Million Air',
-                'fuel_type': 'Jet A',
-                'fuel_price': 6.50, # USD per gallon
-                'services': ['Transport', 'GPU']
-            }
+        try:
+            from fbo_service import fbo_for
+            fbo_data = fbo_for(listing.airport_icao)
+        except Exception as fe:
+            current_app.logger.warning(f"[FBO] Could not load FBO data: {fe}")
+
+        # "Similar hangars" from the in-memory nearest-neighbour index
+        similar_listings = []
+        try:
+            from similar_listings import similar_to
+            similar_listings = similar_to(listing, k=4)
+        except Exception as se:
+            current_app.logger.warning(f"[SIMILAR] Could not load similar listings: {se}")
+
+        # Floor space not held by bookings tonight (shared hangars take several aircraft)
+        from capacity import timeline_for
+        today = datetime.date.today()
+        free_sqft = timeline_for(listing, today, today + datetime.timedelta(days=1)).free()
 
         print(f"DEBUG: rendering listing_detail.html for listing {id}")
         return render_template('listing_detail.html', listing=listing,
-                               aircraft_sizes=aircraft_sizes, has_access=has_access,
-                               weather=weather, fbo_data=fbo_data)
+                               has_access=has_access,
+                               weather=weather, fbo_data=fbo_data,
+                               similar_listings=similar_listings,
+                               free_sqft=free_sqft)
 
     except NotFound:
         raise
@@ -431,6 +466,10 @@ def post_listing():
             
             tail_height = request.form.get('tail_height_clearance')
             tail_height_clearance = float(tail_height) if tail_height and tail_height.strip() else None
+            hangar_width_ft = request.form.get('hangar_width_ft', type=float)
+            hangar_depth_ft = request.form.get('hangar_depth_ft', type=float)
+            door_width_ft = request.form.get('door_width_ft', type=float)
+            door_height_ft = request.form.get('door_height_ft', type=float)
             
             floor_loading_pcn = request.form.get('floor_loading_pcn')
             
@@ -522,6 +561,10 @@ def post_listing():
                 hurricane_tiedowns=hurricane_tiedowns,
                 ramp_cam_url=ramp_cam_url,
                 tail_height_clearance=tail_height_clearance,
+                hangar_width_ft=hangar_width_ft,
+                hangar_depth_ft=hangar_depth_ft,
+                door_width_ft=door_width_ft,
+                door_height_ft=door_height_ft,
                 nfpa_409_compliant=nfpa_409_compliant,
                 floor_loading_pcn=floor_loading_pcn,
                 gpu_power_available=gpu_power_available,
@@ -544,7 +587,8 @@ def post_listing():
             temp_listing = Listing(airport_icao=airport, id=0)
             price_intel = temp_listing.get_price_intelligence()
         
-        return render_template('post_listing.html', price_intel=price_intel, airport=airport, events=EVENTS)
+        return render_template('post_listing.html', price_intel=price_intel, airport=airport,
+                               events=get_surge_index().as_dict())
 
     except Exception as e:
         print(f"CRITICAL ERROR in post_listing: {str(e)}")
@@ -581,8 +625,9 @@ def feed():
 @login_required
 def like_listing(listing_id):
     """Like a listing"""
+    from checkout import increment
     listing = Listing.query.get_or_404(listing_id)
-    listing.likes += 1
+    increment(Listing, listing.id, likes=1)
     db.session.commit()
     return {'likes': listing.likes}
 
@@ -645,6 +690,10 @@ def edit_listing(id):
         listing.price_month = float(request.form.get('price_month'))
         listing.description = request.form.get('description')
         listing.status = request.form.get('status', 'Active')
+        listing.hangar_width_ft = request.form.get('hangar_width_ft', type=float)
+        listing.hangar_depth_ft = request.form.get('hangar_depth_ft', type=float)
+        listing.door_width_ft = request.form.get('door_width_ft', type=float)
+        listing.door_height_ft = request.form.get('door_height_ft', type=float)
 
         # ── Auto-update lat/lon when ICAO changes ────────────────────────────
         from airport_coords import get_coords
@@ -1027,7 +1076,10 @@ def profile():
         current_user.alert_max_price = float(request.form.get('alert_max_price')) if request.form.get('alert_max_price') else None
         current_user.alert_min_size = int(request.form.get('alert_min_size')) if request.form.get('alert_min_size') else None
         current_user.alert_covered_only = request.form.get('alert_covered_only') == 'on'
-        
+
+        # Precomputed matches reflect the old preferences; rank live until the next rebuild
+        from recommendations import clear_user
+        clear_user(current_user.id)
         db.session.commit()
         flash('Alert preferences saved! You\'ll be notified when matching listings are posted.', 'success')
         return redirect(url_for('main.profile'))
@@ -1060,23 +1112,29 @@ def owner_dashboard():
             month_key = booking.start_date.strftime('%Y-%m')
             monthly_data[month_key] = monthly_data.get(month_key, 0) + booking.total_price
             
-        if listing.status == 'Rented':
-            occupancy_count += 1
+    # Occupied = booked tonight (or switched off as Rented by the owner)
+    from availability import booked_listing_ids
+    from capacity import free_sqft_by_listing
+    today = datetime.date.today()
+    booked_tonight = booked_listing_ids([l.id for l in listings], today)
+    free_sqft = free_sqft_by_listing(listings, today, today + datetime.timedelta(days=1))
+    occupancy_count = sum(1 for l in listings if l.id in booked_tonight or l.status == 'Rented')
             
     occupancy_rate = (occupancy_count / total_listings * 100) if total_listings > 0 else 0
     
     event_suggestions = []
+    surge_index = get_surge_index()
     for l in listings:
-        for ev_name, ev_data in EVENTS.items():
-            if l.airport_icao in ev_data.get('airports', []):
-                new_p = round(l.price_night * (1 + ev_data['surge']/100), 2) if l.price_night else 0
-                event_suggestions.append({
-                    'airport': l.airport_icao,
-                    'event': ev_name,
-                    'dates': ev_data['dates'],
-                    'surge': ev_data['surge'],
-                    'suggested_price': new_p
-                })
+        for hit in surge_index.upcoming(l.airport_icao):
+            new_p = round(l.price_night * hit.multiplier, 2) if l.price_night else 0
+            event_suggestions.append({
+                'airport': l.airport_icao,
+                'event': hit.event.name,
+                'dates': hit.event.dates,
+                'surge': round(hit.surge_pct),
+                'nearby': hit.nearby,
+                'suggested_price': new_p
+            })
     
     return render_template('dashboard_owner.html', 
                           total_earnings=total_earnings,
@@ -1085,7 +1143,33 @@ def owner_dashboard():
                           chart_data=monthly_data,
                           total_listings=total_listings,
                           recent_bookings=recent_bookings,
-                          event_suggestions=event_suggestions)
+                          event_suggestions=event_suggestions,
+                          free_sqft=free_sqft)
+
+@bp.route('/dashboard/owner/export/<report>.<fmt>')
+@login_required
+def export_owner_report(report, fmt):
+    """Stream bookings / payments / per-listing earnings as CSV or XLSX (Owner Premium)."""
+    from report_exports import REPORTS, FORMATS, stream_report
+
+    if report not in REPORTS or fmt not in FORMATS:
+        abort(404)
+    if current_user.role != 'owner':
+        flash('Access restricted to hangar owners.', 'error')
+        return redirect(url_for('main.index'))
+    if not (current_user.is_premium or current_user.is_admin):
+        flash("Report exports are an Owner Premium feature. Upgrade to download your data.", "warning")
+        return redirect(url_for('main.pricing'))
+
+    filename = f"hangarlinks_{report}_{date.today().isoformat()}.{fmt}"
+    response = current_app.response_class(
+        stream_with_context(stream_report(report, fmt, current_user.id)),
+        mimetype=FORMATS[fmt],
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the stream
+    return response
 
 @bp.route('/renter-dashboard')
 @login_required
@@ -1094,10 +1178,14 @@ def renter_dashboard():
     recent_bookings = Booking.query.filter_by(renter_id=current_user.id).order_by(Booking.created_at.desc()).limit(20).all()
     
     total_spent = sum(b.total_price for b in recent_bookings if b.status == 'Confirmed')
-    
+
+    from recommendations import recommended_matches
+    recommendations = recommended_matches(current_user, k=3)
+
     return render_template('dashboard_renter.html',
                            recent_bookings=recent_bookings,
-                           total_spent=total_spent)
+                           total_spent=total_spent,
+                           recommendations=recommendations)
 
 # ========== HANGAR VALUE CALCULATOR (Single-Player Revenue Estimator) ==========
 
@@ -1147,36 +1235,41 @@ def book_listing(listing_id):
         flash("Start and end dates are required.", "error")
         return redirect(url_for('main.listing_detail', id=listing.id))
         
-    start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d')
-    end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d')
-    duration_days = (end_date - start_date).days
-    
-    if duration_days < listing.min_stay_nights:
-        flash(f"This listing requires a minimum stay of {listing.min_stay_nights} nights.", "error")
+    from quotes import build_quote, QuoteError
+    add_insurance = request.form.get('add_insurance') == 'on'
+    try:
+        quote = build_quote(listing, start_date_str, end_date_str, insurance=add_insurance)
+    except QuoteError as e:
+        flash(str(e), "error")
         return redirect(url_for('main.listing_detail', id=listing.id))
-        
-    if duration_days <= 0:
-        flash("Checkout date must be after check-in date.", "error")
+
+    # Floor space this aircraft holds for the stay (unknown type → the whole hangar)
+    from capacity import aircraft_footprint
+    from checkout import place_hold, release_hold, bump_health, HoldUnavailable, HOLD_MINUTES
+    from aircraft_catalog import get as get_aircraft
+    booking_aircraft = request.form.get('booking_aircraft')
+    aircraft = get_aircraft(booking_aircraft) if booking_aircraft else None
+    booking_aircraft = aircraft.name if aircraft else booking_aircraft
+    footprint = aircraft_footprint(booking_aircraft) if aircraft else None
+
+    duration_days = quote.nights
+
+    # Rental (monthly rate or surge-adjusted nights) + 10% platform fee + optional insurance
+    base_rental = quote.rental
+    base_total = quote.rental + quote.platform_fee
+    insurance_fee = quote.insurance_fee
+    final_total = quote.total
+
+    # Hold the space first so two checkouts can't sell the same floor (place_hold also checks the door
+    # and packing under its version claim); the hold lapses with the Stripe session
+    try:
+        booking = place_hold(listing, current_user.id, quote.start_date, quote.end_date,
+                             footprint_sqft=footprint, total_price=base_rental,
+                             aircraft_type=booking_aircraft if footprint else None,
+                             insurance_opt_in=add_insurance, insurance_fee=insurance_fee)
+    except HoldUnavailable as e:
+        flash(str(e), "error")
         return redirect(url_for('main.listing_detail', id=listing.id))
-        
-    # Calculate rental price
-    # If it's 30+ days, just charge the monthly rate. Otherwise use nightly rate.
-    base_rental = listing.price_month if duration_days >= 30 else (listing.price_night * duration_days)
-    
-    # Platform Service Fee (Airbnb Model - usually 10-15%, we'll use 10%)
-    platform_fee = base_rental * 0.10
-    base_total = base_rental + platform_fee
-    
-    add_insurance = request.form.get('add_insurance') == 'on'
-    insurance_fee = 0.0
-    
-    if add_insurance:
-        # Scale insurance based on duration (Min 45, Max 150)
-        base_insurance_daily = 15.00
-        calculated_insurance = (base_insurance_daily * duration_days) + 45.00
-        insurance_fee = min(150.00, calculated_insurance)
-        
-    final_total = base_total + insurance_fee
     
     try:
         stripe_lib = get_stripe()
@@ -1215,26 +1308,18 @@ def book_listing(listing_id):
                 mode='payment',
                 success_url=url_for('main.booking_success', _external=True) + '?session_id={CHECKOUT_SESSION_ID}',
                 cancel_url=url_for('main.listing_detail', id=listing.id, _external=True),
+                expires_at=int(time.time()) + HOLD_MINUTES * 60,
                 metadata={
                     'user_id': current_user.id,
                     'item_type': 'rental_booking',
-                    'listing_id': listing.id
+                    'listing_id': listing.id,
+                    'booking_id': booking.id
                 }
             )
             checkout_session_url = checkout_session.url
             session_id = checkout_session.id
         
-        booking = Booking(
-            listing_id=listing.id, 
-            renter_id=current_user.id,
-            start_date=start_date,
-            end_date=end_date,
-            total_price=base_rental,
-            status='Pending',
-            stripe_payment_id=session_id,
-            insurance_opt_in=add_insurance,
-            insurance_fee=insurance_fee
-        )
+        booking.stripe_payment_id = session_id
         # Log to Payment model for billing history
         payment = Payment(
             user_id=current_user.id,
@@ -1245,192 +1330,161 @@ def book_listing(listing_id):
             status='pending'
         )
         
-        # Space Calculation via Aircraft Config
-        booking_aircraft = request.form.get('booking_aircraft')
-        if booking_aircraft:
-            from flask import current_app
-            sizes = current_app.config.get('AIRCRAFT_SIZES', {})
-            for cat, dicts in sizes.items():
-                if booking_aircraft in dicts:
-                    dims = dicts[booking_aircraft]
-                    # 10% buffer applied equivalent to booking verification modal
-                    req_sqft = (dims['length'] * dims['wingspan']) * 1.1 
-                    
-                    if listing.available_sqft is None:
-                        listing.available_sqft = listing.size_sqft
-                        
-                    if listing.available_sqft >= req_sqft:
-                        listing.available_sqft -= req_sqft
-                        listing.health_score = min(100, (listing.health_score or 0) + 5)
-                    break
+        if footprint:
+            bump_health(listing.id)
         
-        db.session.add(booking)
         db.session.add(payment)
         db.session.commit()
             
         return redirect(checkout_session_url, code=303)
     except Exception as e:
+        db.session.rollback()
+        release_hold(booking)
         flash(f'Payment Error: {str(e)}', 'error')
         return redirect(url_for('main.listing_detail', id=listing.id))
 
+@bp.route('/api/quote')
+@limiter.limit("600 per hour")
+def api_quote():
+    """Per-night price breakdown for a stay; cached until the listing or its bookings change."""
+    from quotes import get_quote, QuoteError
+    listing_id = request.args.get('listing_id', type=int)
+    start = request.args.get('start')
+    end = request.args.get('end')
+    if not listing_id or not start or not end:
+        return jsonify({'error': 'listing_id, start and end are required.'}), 400
+    try:
+        quote = get_quote(listing_id, start, end, insurance=request.args.get('insurance') in ('1', 'true', 'on'))
+    except QuoteError as e:
+        return jsonify({'error': str(e)}), 400
+    except LookupError:
+        return jsonify({'error': 'Listing not found.'}), 404
+    return jsonify(quote)
+
+@bp.route('/api/aircraft')
+@limiter.limit("1200 per hour")
+def api_aircraft():
+    """Aircraft typeahead: name/alias prefix matches first, then close spellings."""
+    from aircraft_catalog import get, search, SEARCH_LIMIT, MAX_SEARCH_LIMIT
+    from capacity import aircraft_footprint
+    q = request.args.get('q', '')
+    limit = min(request.args.get('limit', SEARCH_LIMIT, type=int), MAX_SEARCH_LIMIT)
+    exact = get(q) if q else None
+    results = [dict(a._asdict(), footprint_sqft=aircraft_footprint(a.name), exact=a == exact)
+               for a in search(q, limit)]
+    response = jsonify({'results': results})
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+@bp.route('/listing/<int:id>/availability')
+@limiter.limit("600 per hour")
+def listing_availability(id):
+    """Booked ranges and unavailable nights for the date picker (default: next 90 days)."""
+    from availability import calendar, AvailabilityError
+    listing = Listing.query.get_or_404(id)
+    try:
+        data = calendar(listing.id, request.args.get('start'), request.args.get('end'))
+    except AvailabilityError as e:
+        return jsonify({'error': str(e)}), 400
+    data['bookable'] = listing.status == 'Active'
+    return jsonify(data)
+
 @bp.route('/booking/success')
 @login_required
 def booking_success():
-    session_id = request.args.get('session_id')
+    """Stripe's return page: shows what the webhook has applied, never calls Stripe itself."""
+    session_id = request.args.get('session_id', '')
     booking = Booking.query.filter_by(stripe_payment_id=session_id).first_or_404()
-    
-    # Generate cryptographic sign tokens
-    if not booking.sign_token_renter:
-        booking.sign_token_renter = secrets.token_urlsafe(32)
-        booking.sign_token_owner = secrets.token_urlsafe(32)
-        
-    # Update Booking status to Confirmed directly for maximum transparency as requested
-    booking.status = 'Confirmed'
-    booking.listing.status = 'Rented'
-    
-    # Calculate revenue (total - 10% platform fee)
-    platform_fee_rate = 0.10
-    owner_share = 1.0 - platform_fee_rate
-    revenue = booking.total_price * owner_share
-    
-    owner = booking.listing.owner
-    if owner.total_revenue is None: owner.total_revenue = 0.0
-    owner.total_revenue += revenue
-    
-    # Update Payment status
-    payment = Payment.query.filter_by(stripe_session_id=session_id).first()
-    if payment:
-        payment.status = 'completed'
-        
-    db.session.commit()
-    
-    # Notify Renter & Owner (Mock)
-    print(f"[EMAIL MOCK] To: {booking.renter.email} -> Your booking at {booking.listing.airport_icao} is CONFIRMED!")
-    print(f"[EMAIL MOCK] To: {owner.email} -> New confirmed rental! Revenue added: ${revenue:.2f}")
-    
-    # WeasyPrint PDF Generation Engine
-    if HTML:
-        try:
-            rendered_html = render_template('lease_template.html', 
-                                         booking=booking, 
-                                         listing=booking.listing, 
-                                         owner=booking.listing.owner, 
-                                         renter=booking.renter,
-                                         current_time=datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-            
-            os.makedirs(os.path.join(current_app.root_path, 'static', 'leases'), exist_ok=True)
-            filename = f"lease_{booking.id}_{booking.sign_token_renter[:8]}.pdf"
-            filepath = os.path.join(current_app.root_path, 'static', 'leases', filename)
-            
-            HTML(string=rendered_html).write_pdf(filepath)
-            booking.lease_pdf_path = filename
-            db.session.commit()
-        except Exception as e:
-            print(f"WeasyPrint PDF Generation Failed: {e}")
-            
-    # Mock Mailer for Lease
-    print(f"\n[MAIL SIMULATOR] Sent Lease Agreement for Verification!")
-    print(f"--> Renter Link: {url_for('main.sign_lease', token=booking.sign_token_renter, _external=True)}")
-    print(f"--> Owner Link:  {url_for('main.sign_lease', token=booking.sign_token_owner, _external=True)}\n")
-    
-    # Mock Mailer for Insurance
-    if booking.insurance_opt_in:
-        print(f"\n[MAIL SIMULATOR] Sent Short-Term Insurance Policy Activation!")
-        print(f"--> To: {current_user.email}")
-        print(f"--> Subject: Your Avemco Short-Term Policy Details")
-        print(f"--> Body: Thank you for adding insurance to your HangarLinks booking.")
-        print(f"-->       Your {booking.listing.airport_icao} stay is protected. Policy value: ${booking.insurance_fee:.2f}.")
-        print(f"-->       Activate/View complete policy: https://www.avemco.com/hangarlinks/activate?booking={booking.id}\n")
-    
+
+    if session_id.startswith('mock_session_') and not get_stripe():
+        # Mock checkout (no Stripe configured): no webhook will come, so confirm here
+        from payments import fulfil_booking
+        fulfil_booking(booking)
+
+    if booking.status == 'Cancelled':
+        flash('This checkout expired before payment completed. Please book again.', 'error')
+        return redirect(url_for('main.listing_detail', id=booking.listing_id))
+    from checkout import REFUND_DUE
+    if booking.status == REFUND_DUE:
+        flash('Your payment arrived after the hold on this hangar lapsed and the space has since been booked. '
+              'No lease was created; your payment will be refunded in full.', 'warning')
+        return redirect(url_for('main.listing_detail', id=booking.listing_id))
+    if booking.status == 'Pending' or not booking.sign_token_renter:
+        return render_template('payment_processing.html', title='Confirming your booking',
+                               message=f'We are confirming your payment for {booking.listing.airport_icao}. '
+                                       'This page updates automatically.')
+
     flash('Booking Escrowed! Check your email to digitally sign the generated lease agreement.', 'success')
     return redirect(url_for('main.sign_lease', token=booking.sign_token_renter))
 
+def _lease_token(token):
+    """LeaseToken for a sign link (404 if unknown or expired), 403 unless it's the current user's side."""
+    from lease_tokens import find
+    lease_token = find(token)
+    if lease_token is None: abort(404)
+    booking = lease_token.booking
+    if lease_token.role == 'renter' and current_user.id != booking.renter_id: abort(403)
+    if lease_token.role == 'owner' and current_user.id != booking.listing.owner_id: abort(403)
+    return lease_token
+
+def _lease_booking(token):
+    return _lease_token(token).booking
+
 @bp.route('/sign-lease/<token>', methods=['GET'])
 @login_required
 def sign_lease(token):
-    # Determine if token belongs to renter or owner
-    booking = Booking.query.filter((Booking.sign_token_renter == token) | (Booking.sign_token_owner == token)).first_or_404()
-    
-    # Check authorization mapping
-    is_renter = booking.sign_token_renter == token
-    if is_renter and current_user.id != booking.renter_id: abort(403)
-    if not is_renter and current_user.id != booking.listing.owner_id: abort(403)
-    
-    return render_template('sign_lease.html', booking=booking, token=token)
+    from lease_pdf import ensure_lease_pdf, lease_status
+    booking = _lease_booking(token)
+    # Cheap when the PDF exists (content-addressed); otherwise queued and polled for below
+    ensure_lease_pdf(booking)
+    db.session.commit()
+    return render_template('sign_lease.html', booking=booking, token=token, lease=lease_status(booking))
+
+@bp.route('/sign-lease/<token>/pdf-status')
+@login_required
+def lease_pdf_status(token):
+    from lease_pdf import ensure_lease_pdf, lease_status
+    booking = _lease_booking(token)
+    status = lease_status(booking)
+    if not status['ready'] and not status['pending']:
+        # Never queued here, or the render failed: queue it (again)
+        ensure_lease_pdf(booking)
+        db.session.commit()
+        status = lease_status(booking)
+    return jsonify(status)
     
 @bp.route('/execute-lease/<token>', methods=['POST'])
 @login_required
 def execute_lease(token):
-    booking = Booking.query.filter((Booking.sign_token_renter == token) | (Booking.sign_token_owner == token)).first_or_404()
-    
-    if booking.sign_token_renter == token:
-        booking.renter_signed = True
+    from lease_tokens import sign
+    lease_token = _lease_token(token)
+    booking = lease_token.booking
+    # Signing only records signatures; confirmation (capacity, version claim, owner credit) is checkout's job
+    if booking.status != 'Confirmed':
+        flash('This booking is not confirmed, so its lease cannot be signed.', 'error')
+        return redirect(url_for('main.listing_detail', id=booking.listing_id))
+    both_signed = sign(lease_token, current_user)
+
+    if lease_token.role == 'renter':
         flash('You have successfully signed the lease as the Lessee!', 'success')
     else:
-        booking.owner_signed = True
         flash('You have successfully signed the lease as the Lessor!', 'success')
-        
-    # Check if both constraints fulfilled securely mapping to Confirmed!
-    if booking.renter_signed and booking.owner_signed:
-        booking.status = 'Confirmed'
-        booking.listing.status = 'Rented'
+
+    if both_signed:
         booking.listing.insurance_active = True
-        flash('Both parties have signed! Digital Escrow dispersed and lease is now Confirmed.', 'success')
-        
+        flash('Both parties have signed! Digital Escrow dispersed and the lease is now fully executed.', 'success')
+
+    # The signature block changed, so this is a new document (and a new PDF) — queued, not rendered here
+    from lease_pdf import ensure_lease_pdf
+    ensure_lease_pdf(booking)
     db.session.commit()
     return redirect(url_for('main.listing_detail', id=booking.listing_id))
 
 @bp.route('/matches')
 @login_required
 def matches():
-    airport = current_user.alert_airport
-    
-    # Optimization: Filter in DB to avoid loading all 10k listings
-    query = Listing.query.filter_by(status='Active')
-    
-    candidates = []
-    
-    # 1. Prioritize strict airport matches (Limit 50)
-    if airport:
-        candidates.extend(query.filter_by(airport_icao=airport).limit(50).all())
-        
-    # 2. Get high-value/recent listings for broader match (Limit 100)
-    # Exclude already found ones implies we need IDs, but simple union is faster for now
-    candidates.extend(query.order_by(Listing.is_featured.desc(), Listing.created_at.desc()).limit(100).all())
-    
-    # Remove duplicates
-    listings = list({l.id: l for l in candidates}.values())
-    scored_matches = []
-    
-    for l in listings:
-        score = 60 
-        if airport and l.airport_icao == airport:
-            score += 25
-        elif airport:
-            score += 5
-            
-        if current_user.alert_max_price and l.price_month <= current_user.alert_max_price:
-            score += 15
-            
-        if l.owner.is_premium:
-            score += 5
-        if l.owner.is_certified:
-            score += 10
-            
-        if l.health_score >= 80:
-            score += 5
-            
-        # Reward explicitly Short-Term optimized structures mathematically
-        if getattr(l, 'min_stay_nights', 30) <= 7:
-            score += 20 # Massive immediate ranking modifier
-            
-        final_score = min(score, 99)
-        scored_matches.append({'listing': l, 'score': final_score})
-        
-    scored_matches.sort(key=lambda x: x['score'], reverse=True)
-    top_matches = scored_matches[:10]
-    
-    return render_template('matches.html', matches=top_matches)
+    from recommendations import recommended_matches
+    return render_template('matches.html', matches=recommended_matches(current_user, k=10))
 
 @bp.route('/concierge')
 def concierge():
@@ -1438,15 +1492,14 @@ def concierge():
 
 @bp.route('/api/forecast', methods=['GET'])
 def get_forecast():
-    import random
-    trend = random.choice(['rising', 'stable'])
-    percent = random.choice([15, 20, 30])
-    return {
-        'trend': trend,
-        'percentage': percent,
-        'season': 'Winter 2025',
-        'message': f"Hangar demand forecast: Ontario region {trend} {percent}% this winter."
-    }
+    """Regional demand forecast (?airport= or ?region=, default: the user's alert airport)."""
+    from demand_forecast import forecast_for
+    airport = request.args.get('airport', '').strip().upper() or None
+    region = request.args.get('region')
+    if not airport and not region and current_user.is_authenticated:
+        airport = current_user.alert_airport
+    forecast = forecast_for(airport=airport, region=region)
+    return jsonify({k: v for k, v in forecast.items() if k != 'beta'})
 
 @bp.route('/rewards')
 @login_required
@@ -1480,45 +1533,64 @@ def self_certify():
 @bp.route('/dashboard/space-calculator', methods=['GET', 'POST'])
 @login_required
 def space_calculator():
+    from packing import pack, how_many_more, hangar_dims, has_floor_plan, DEFAULT_TARGET
     remaining_sqft = None
     aircraft_count_fit = 0
+    packing_result = None
+    listing = None
+    from aircraft_catalog import get as get_aircraft
+    target = get_aircraft(request.form.get('target_type') or DEFAULT_TARGET)
+    target_type = target.name if target else DEFAULT_TARGET
+    my_listings = Listing.query.filter_by(owner_id=current_user.id).order_by(Listing.airport_icao).all()
     if request.method == 'POST':
         try:
-            length = float(request.form.get('hangar_length', 0))
-            width = float(request.form.get('hangar_width', 0))
-            total_sqft = length * width
-            
-            aircraft_type_1 = request.form.get('aircraft_type_1')
-            qty_1 = int(request.form.get('qty_1', 0))
-            
-            used_sqft = 0
-            
-            # Estimate footprint with a 20% buffer for maneuvering
-            sizes = current_app.config.get('AIRCRAFT_SIZES', {})
-            plane_dims = None
-            for category, dicts in sizes.items():
-                if aircraft_type_1 in dicts:
-                    plane_dims = dicts[aircraft_type_1]
-                    break
-                    
-            if plane_dims:
-                # Footprint = length * wingspan
-                footprint = plane_dims['length'] * plane_dims['wingspan']
-                used_sqft += (footprint * 1.2) * qty_1
-                
-            remaining_sqft = max(0, total_sqft - used_sqft)
-            
-            # How many small GA planes (Cessna 172 ~ 1000 sqft with buffer) could fit?
-            # 27.2L * 36.1W = 981 sqft. * 1.2 = 1178
-            aircraft_count_fit = int(remaining_sqft // 1178)
-            
+            parked = []
+            for i in (1, 2, 3):
+                aircraft_type = request.form.get(f'aircraft_type_{i}')
+                qty = request.form.get(f'qty_{i}', type=int) or 0
+                if aircraft_type and qty > 0:
+                    parked.extend([aircraft_type] * min(qty, 50))
+            wing_overlap = request.form.get('wing_overlap') == 'on'
+
+            listing_id = request.form.get('listing_id', type=int)
+            booked = []
+            if listing_id:
+                # One of the owner's hangars: start from the space bookings leave free over the dates
+                from capacity import timeline_for
+                from availability import overlaps
+                listing = next((l for l in my_listings if l.id == listing_id), None)
+                if listing is None:
+                    raise ValueError("unknown hangar")
+                start = request.form.get('start_date') or datetime.date.today().isoformat()
+                end = request.form.get('end_date') or (datetime.date.fromisoformat(start)
+                                                       + datetime.timedelta(days=1)).isoformat()
+                total_sqft = timeline_for(listing, start, end).free()
+                width, depth = hangar_dims(listing)
+                height_limit = listing.tail_height_clearance
+                booked = [t for (t,) in db.session.query(Booking.aircraft_type).filter(
+                    Booking.listing_id == listing.id, Booking.aircraft_type.isnot(None), overlaps(start, end))]
+            else:
+                depth = float(request.form.get('hangar_length', 0))
+                width = float(request.form.get('hangar_width', 0))
+                height_limit = request.form.get('hangar_height', type=float)
+                total_sqft = depth * width
+
+            # Pack the actual rectangles (with clearance) instead of area × 1.2 and a stock 172
+            packing_result = pack(width, depth, booked + parked, wing_overlap, height_limit)
+            remaining_sqft = max(0, total_sqft - pack(width, depth, parked, wing_overlap, height_limit).used_sqft)
+            aircraft_count_fit = how_many_more(width, depth, booked + parked, target_type,
+                                               wing_overlap, height_limit)
+
         except Exception as e:
             flash(f"Error calculating space: {e}", "error")
             
     return render_template('space_calculator.html', 
                            remaining_sqft=remaining_sqft, 
                            aircraft_count_fit=aircraft_count_fit,
-                           aircraft_sizes=current_app.config.get('AIRCRAFT_SIZES', {}))
+                           packing=packing_result,
+                           floor_guessed=listing is not None and not has_floor_plan(listing),
+                           target_type=target_type,
+                           my_listings=my_listings)
 
 @bp.route('/dashboard/insights')
 @login_required
@@ -1571,9 +1643,8 @@ def book_viewing(listing_id):
 def contact_guest(listing_id):
     """Guest (unauthenticated) contact form — no login required."""
     print(f"DEBUG: Entering guest message route for listing_id={listing_id}")
+    listing = Listing.query.get_or_404(listing_id)    # outside the try: a 404 is not "something went wrong"
     try:
-        listing = Listing.query.get_or_404(listing_id)
-
         # If user is logged in, redirect to the real messaging system
         if current_user.is_authenticated:
             return redirect(url_for('main.message_user', user_id=listing.owner_id, listing_id=listing.id))
@@ -1713,26 +1784,19 @@ def subscription_success():
     session_id = request.args.get('session_id')
     plan_type = request.args.get('plan', 'owner')
     billing_cycle = request.args.get('billing', 'monthly')  # 'monthly' or 'yearly'
-    stripe = get_stripe()
-    
-    # Determine subscription duration based on billing cycle
-    days_active = 365 if billing_cycle == 'yearly' else 30
-    
-    if stripe and session_id:
-        try:
-            checkout = stripe.checkout.Session.retrieve(session_id)
-            current_user.stripe_customer_id = checkout.customer
-            current_user.stripe_subscription_id = checkout.subscription
-            current_user.subscription_tier = 'premium'
-            current_user.is_premium = True
-            current_user.subscription_expires = datetime.utcnow() + timedelta(days=days_active)
-            db.session.commit()
-        except Exception as e:
-            print(f"Stripe session retrieve error: {e}")
+
+    if get_stripe() and session_id:
+        # Activated by the checkout.session.completed webhook (stripe_events.py)
+        if current_user.subscription_tier != 'premium':
+            return render_template('payment_processing.html', title='Activating Premium',
+                                   message='We are confirming your subscription with Stripe. '
+                                           'This page updates automatically.')
     else:
+        # Mock checkout for dev: activate locally
+        days_active = 365 if billing_cycle == 'yearly' else 30
         current_user.subscription_tier = 'premium'
         current_user.is_premium = True
-        current_user.subscription_expires = datetime.utcnow() + timedelta(days=days_active)
+        current_user.subscription_expires = datetime.datetime.utcnow() + timedelta(days=days_active)
         db.session.commit()
 
     # Admin email notification (MVP placeholder)
@@ -1753,42 +1817,28 @@ def subscription_cancel():
     return redirect(url_for('main.pricing'))
 
 @bp.route('/webhook/stripe', methods=['POST'])
+@limiter.exempt
 def stripe_webhook():
-    stripe = get_stripe()
-    if not stripe:
-        return jsonify({'error': 'Stripe not configured'}), 400
-    
+    """Verify, store once and acknowledge; stripe_events.py applies the event off the request."""
+    from stripe_events import parse_event, record_event, start_worker, notify, InvalidEvent
+    webhook_secret = current_app.config.get('STRIPE_WEBHOOK_SECRET') or os.environ.get('STRIPE_WEBHOOK_SECRET', '')
+    allow_unsigned = current_app.config.get('STRIPE_WEBHOOK_ALLOW_UNSIGNED', False)
+    if not webhook_secret and not allow_unsigned:
+        current_app.logger.error("[STRIPE] webhook rejected: STRIPE_WEBHOOK_SECRET is not set")
+        return jsonify({'error': 'Webhook signing secret not configured'}), 400
+
     payload = request.get_data(as_text=True)
-    sig_header = request.headers.get('Stripe-Signature')
-    webhook_secret = os.environ.get('STRIPE_WEBHOOK_SECRET', '')
-    
     try:
-        if webhook_secret:
-            event = stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
-        else:
-            event = stripe.Event.construct_from(
-                __import__('json').loads(payload), stripe.api_key
-            )
-    except Exception as e:
+        event = parse_event(payload, request.headers.get('Stripe-Signature'), webhook_secret, allow_unsigned)
+    except InvalidEvent as e:
         return jsonify({'error': str(e)}), 400
-    
-    if event['type'] == 'customer.subscription.deleted':
-        sub = event['data']['object']
-        user = User.query.filter_by(stripe_subscription_id=sub['id']).first()
-        if user:
-            user.subscription_tier = 'free'
-            user.is_premium = False
-            user.stripe_subscription_id = None
-            db.session.commit()
-    
-    elif event['type'] == 'invoice.payment_succeeded':
-        invoice = event['data']['object']
-        user = User.query.filter_by(stripe_customer_id=invoice['customer']).first()
-        if user:
-            user.subscription_expires = datetime.utcnow() + timedelta(days=30)
-            db.session.commit()
-    
-    return jsonify({'status': 'success'}), 200
+
+    if not record_event(event, payload):
+        return jsonify({'status': 'duplicate'}), 200
+    if current_app.config.get('STRIPE_EVENT_WORKER'):
+        start_worker(current_app._get_current_object())
+        notify()
+    return jsonify({'status': 'queued'}), 200
 
 @bp.route('/manage-subscription')
 @login_required
@@ -1966,14 +2016,11 @@ def insights():
     user_avg_price = [round(avg_nightly_rate * (0.95 + 0.01 * i), 2) for i in range(-5, 1)]
     occupancy_data = [80, 82, 85, 81, 86, weekend_occupancy]
 
-    active_surges = []
-    for event_name, data in EVENTS.items():
-        if airport_code in data['airports']:
-            active_surges.append({
-                'name': event_name,
-                'surge': data['surge'],
-                'dates': data['dates']
-            })
+    active_surges = [{
+        'name': hit.event.name,
+        'surge': round(hit.surge_pct),
+        'dates': hit.event.dates
+    } for hit in get_surge_index().upcoming(airport_code)]
     
     return render_template('insights.html', 
                            labels=labels, 
@@ -2146,7 +2193,8 @@ def white_label_submit():
             metadata={
                 'user_id': current_user.id if current_user.is_authenticated else 'guest',
                 'item_type': 'white_label_reservation',
-                'fbo_name': fbo_name
+                'fbo_name': fbo_name,
+                'request_id': req.id
             }
         )
         
@@ -2168,28 +2216,13 @@ def white_label_submit():
 
 @bp.route('/white-label/success')
 def white_label_success():
+    # Marked Paid by the checkout.session.completed webhook (stripe_events.py)
     session_id = request.args.get('session_id')
-    stripe_lib = get_stripe()
-    
-    if session_id and stripe_lib:
-        try:
-            session = stripe_lib.checkout.Session.retrieve(session_id)
-            fbo_name = session.metadata.get('fbo_name')
-            
-            # Update Payment Record
-            payment = Payment.query.filter_by(stripe_session_id=session_id).first()
-            if payment:
-                payment.status = 'completed'
-            
-            # Update Request Record
-            if fbo_name:
-                req = WhiteLabelRequest.query.filter_by(fbo_name=fbo_name, status='Pending Payment').first()
-                if req:
-                    req.status = 'Paid'
-            
-            db.session.commit()
-        except Exception as e:
-            print(f"White label success verification error: {e}")
+    payment = Payment.query.filter_by(stripe_session_id=session_id).first() if session_id else None
+    if payment and payment.status == 'pending':
+        return render_template('payment_processing.html', title='Confirming your reservation',
+                               message='We are confirming your White-Label reservation payment. '
+                                       'This page updates automatically.')
 
     return render_template('subscription_success.html', title="Reservation Confirmed", message="Thank you for reserving your White-Label slot! Our deployment team will contact you within 24 hours.")
 
@@ -2315,6 +2348,14 @@ def admin_listings():
                            featured_filter=featured_filter)
 
 
+@bp.route('/admin/integrations')
+@login_required
+@admin_required
+def admin_integrations():
+    """Admin: per-upstream call counts, failures, latency and breaker state (integrations.metrics)."""
+    return jsonify(integration_metrics())
+
+
 @bp.route('/admin/toggle-featured/<int:listing_id>', methods=['POST'])
 @login_required
 @admin_required
@@ -2454,7 +2495,25 @@ def _build_db_context(message: str) -> str:
             if row:
                 ctx_parts.append(f"Average active listing price at **{icao}**: **${row:.0f}/month**")
 
-    # Case 3: owner asks about their own listings
+    # Case 3: event surges at the airports mentioned (or anything upcoming)
+    if any(w in msg_lower for w in ['event', 'surge', 'fly-in', 'airshow', 'oshkosh', 'airventure']):
+        surge_index = get_surge_index()
+        lines = []
+        for icao in (airport_hits or []):
+            for hit in surge_index.upcoming(icao):
+                where = f"near {icao}" if hit.nearby else f"at {icao}"
+                lines.append(f"- **{hit.event.name}** {where} | {hit.event.dates} | **+{hit.surge_pct:.0f}%** nightly surge")
+        if not airport_hits:
+            today = datetime.date.today()
+            for ev in surge_index.events:
+                if ev.end >= today:
+                    lines.append(f"- **{ev.name}** | {ev.dates} | {', '.join(ev.airports)} | **+{ev.surge_pct}%** nightly surge")
+        if lines:
+            ctx_parts.append("**Upcoming event surges:**\n" + "\n".join(lines))
+        elif airport_hits:
+            ctx_parts.append(f"No upcoming event surges at {', '.join(airport_hits)}.")
+
+    # Case 4: owner asks about their own listings
     if any(w in msg_lower for w in ['my listing', 'my hangar', 'performing', 'health score', 'views']):
         if current_user.is_authenticated and current_user.role == 'owner':
             listings = Listing.query.filter_by(owner_id=current_user.id).all()
@@ -2492,6 +2551,19 @@ def _rule_based_response(message: str, user_role: str, db_context: str) -> str:
     return "I can help you find the perfect hangar. Try asking: *Show me covered hangars at CYYZ under $600*"
 
 
+def _concierge_turn(message, history):
+    """(LLM messages, user role, DB context) for one concierge message."""
+    db_context = _build_db_context(message)     # live DB context (RAG layer)
+    user_role = current_user.role if current_user.is_authenticated else 'guest'
+    messages = build_concierge_messages(
+        message, history, db_context,
+        user_name=current_user.username if current_user.is_authenticated else 'Guest',
+        user_role=user_role,
+        home_airport=getattr(current_user, 'alert_airport', None) or 'Not set',
+    )
+    return messages, user_role, db_context
+
+
 @bp.route('/api/concierge', methods=['POST'])
 @login_required
 def concierge_api():
@@ -2503,64 +2575,13 @@ def concierge_api():
     if not message:
         return jsonify({'reply': 'Please type a message.'}), 400
 
-    # Build live DB context (RAG layer)
-    db_context = _build_db_context(message)
-
-    # User context
-    user_role = current_user.role if current_user.is_authenticated else 'guest'
-    home_airport = getattr(current_user, 'alert_airport', None) or 'Not set'
-    user_name = current_user.username if current_user.is_authenticated else 'Guest'
-
-    # Try LLM (OpenAI / Grok-compatible endpoint)
-    api_key = os.environ.get('OPENAI_API_KEY') or os.environ.get('GROK_API_KEY')
-    base_url = os.environ.get('OPENAI_BASE_URL')  # Set to https://api.x.ai/v1 for Grok
+    messages, user_role, db_context = _concierge_turn(message, history)
 
-    if openai and api_key:
+    # Try LLM (OpenAI / Grok-compatible endpoint, OPENAI_BASE_URL=https://api.x.ai/v1 for Grok)
+    llm = openai_client()
+    if llm:
         try:
-            client_kwargs = {'api_key': api_key}
-            if base_url:
-                client_kwargs['base_url'] = base_url
-            client = openai.OpenAI(**client_kwargs)
-
-            system_prompt = f"""You are the HangarLinks AI Concierge — a smart, friendly aviation assistant specializing in Short-Term transient parking (Overnights & Weekends 1-7 days).
-You help transient aircraft owners find overnight hangars, and hangar owners optimize their listings for event surges.
-
-USER CONTEXT:
-- Name: {user_name}
-- Role: {user_role}
-- Home Airport: {home_airport}
-
-LIVE DATABASE CONTEXT (use this to answer):
-{db_context if db_context else "No specific data found for this query."}
-
-INSTRUCTIONS:
-- PRIORITY 1: Always prioritize and highlight listings with minimum stays of 1 to 7 nights first.
-- PRIORITY 2: Automatically check if dates/locations match Major Events (e.g. Oshkosh, Sun 'n Fun) and suggest nightly Event Surge rates.
-- Use the live data above to answer questions about availability, translating monthly rates down to estimated Nightly Rates (Monthly/30) if only monthly is defined.
-- Be concise and friendly. Use markdown (bold, bullet points) for clarity.
-- If you find matching listings, always include the [View Listing](/listing/ID) link.
-- If asked "Book this?" direct them to the listing link. If asked "Message owner?" state "I'll connect you — click the listing link and use the owner contact module."
-- NEVER make up listing data. Only use what's in LIVE DATABASE CONTEXT.
-- Keep replies under 200 words."""
-
-            # Build conversation messages
-            messages = [{'role': 'system', 'content': system_prompt}]
-            # Include last 6 messages of history for context
-            for h in history[-6:]:
-                if h.get('role') in ('user', 'assistant') and h.get('content'):
-                    messages.append({'role': h['role'], 'content': h['content']})
-            messages.append({'role': 'user', 'content': message})
-
-            model = os.environ.get('OPENAI_MODEL', 'gpt-4o-mini')
-            resp = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=400,
-                temperature=0.7,
-            )
-            reply = resp.choices[0].message.content.strip()
-            return jsonify({'reply': reply, 'source': 'llm'})
-
+            return jsonify({'reply': complete_concierge_reply(llm, messages), 'source': 'llm'})
         except Exception as e:
             current_app.logger.error(f"Concierge LLM error: {e}")
             # Fall through to rule-based
@@ -2569,6 +2590,40 @@ INSTRUCTIONS:
     reply = _rule_based_response(message, user_role, db_context)
     return jsonify({'reply': reply, 'source': 'rules'})
 
+
+@bp.route('/api/concierge/stream', methods=['POST'])
+@login_required
+def concierge_stream():
+    """SSE variant of /api/concierge: a `delta` event per chunk of the reply, then `done` with the whole reply."""
+    data = request.get_json(silent=True) or {}
+    message = (data.get('message') or '').strip()
+    history = data.get('history', [])
+
+    if not message:
+        return jsonify({'reply': 'Please type a message.'}), 400
+
+    messages, user_role, db_context = _concierge_turn(message, history)
+    llm = openai_client()
+
+    def events():
+        if llm:
+            parts = []
+            try:
+                for delta in stream_concierge_reply(llm, messages):
+                    parts.append(delta)
+                    yield sse('delta', {'delta': delta})
+                yield sse('done', {'reply': ''.join(parts).strip(), 'source': 'llm'})
+                return
+            except Exception as e:
+                current_app.logger.error(f"Concierge LLM stream error: {e}")
+        # `done` replaces whatever was streamed before a failure
+        yield sse('done', {'reply': _rule_based_response(message, user_role, db_context), 'source': 'rules'})
+
+    response = current_app.response_class(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the stream
+    return response
+
 @bp.route('/report-listing/<int:id>', methods=['POST'])
 @login_required
 def report_listing(id):
@@ -2577,12 +2632,17 @@ def report_listing(id):
     data = request.json or {}
     reason = data.get('reason', 'No reason provided')
     
-    listing.is_reported = True
-    listing.report_count += 1
-    new_reason = f"[{datetime.now().strftime('%Y-%m-%d')}] {reason}"
-    listing.report_reason = (listing.report_reason + " | " + new_reason) if listing.report_reason else new_reason
-    
-    db.session.commit()
+    from checkout import increment
+    new_reason = f"[{datetime.datetime.now().strftime('%Y-%m-%d')}] {reason}"
+    try:
+        listing.is_reported = True
+        increment(Listing, listing.id, report_count=1)
+        listing.report_reason = (listing.report_reason + " | " + new_reason) if listing.report_reason else new_reason
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()   # don't leave the counter UPDATE holding the write lock
+        current_app.logger.error(f"[report_listing] listing {id}: {e}")
+        return jsonify({'status': 'error', 'message': 'Could not save your report. Please try again.'}), 500
     return jsonify({'status': 'ok', 'report_count': listing.report_count})
 
 @bp.route('/verification', methods=['GET', 'POST'])
@@ -2641,49 +2701,6 @@ def verify_user_action(user_id, action):
 
 # --- AI Rental Optimizer Feature ---
 
-def train_optimizer_model():
-    """Trains a simple RandomForest model on current market data or synthetic data if empty"""
-    if not pd or not RandomForestRegressor:
-        return None, None
-
-    # Get all listings for training
-    all_listings = Listing.query.all()
-    
-    data = []
-    if len(all_listings) < 15:
-        # Generate synthetic data if not enough real data
-        # Features: [size_sqft, covered (1/0), airport_freq_score (simple mock)]
-        # Target: price_month
-        for _ in range(50):
-            size = random.randint(800, 5000)
-            is_covered = random.choice([0, 1])
-            base_price = (size * 0.15) + (is_covered * 200) + random.randint(-100, 100)
-            data.append({
-                'size_sqft': size,
-                'covered': is_covered,
-                'price_month': max(150, base_price)
-            })
-    
-    # Add real data
-    for l in all_listings:
-        data.append({
-            'size_sqft': l.size_sqft,
-            'covered': 1 if l.covered else 0,
-            'price_month': l.price_month
-        })
-
-    df = pd.DataFrame(data)
-    X = df[['size_sqft', 'covered']]
-    y = df['price_month']
-    
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X, y)
-    
-    # Calculate global market average
-    market_avg = df['price_month'].mean()
-    
-    return model, market_avg
-
 @bp.route('/insights/optimizer')
 @login_required
 def rental_optimizer():
@@ -2692,39 +2709,22 @@ def rental_optimizer():
         flash("AI Rental Optimizer is a Premium feature. Upgrade to unlock predictive insights.", "warning")
         return redirect(url_for('main.profile'))
 
-    # Load market model
-    model, market_avg = train_optimizer_model()
+    # Load the pre-trained market model (trained offline by train_pricing_model.py)
+    from pricing_model import get_model, stored_scores
+    artifact = get_model()
+    market_avg = artifact.market_avg if artifact else None
+    if artifact is None:
+        current_app.logger.warning("[OPTIMIZER] No pricing model published yet — run train_pricing_model.py")
     
-    # Analyze current user's active listings
+    # Analyze current user's active listings — nightly scores, one vectorized predict for any not scored yet
     user_listings = Listing.query.filter_by(owner_id=current_user.id, status='Active').all()
     insights = []
     
-    for l in user_listings:
-        # Prediction
-        ideal_price = l.price_month
-        success_chance = 75 # default
-        
-        if model:
-            pred_input = pd.DataFrame([[l.size_sqft, 1 if l.covered else 0]], columns=['size_sqft', 'covered'])
-            ideal_price = float(model.predict(pred_input)[0])
-            
-            # success chance logic: higher if price is <= ideal_price
-            price_diff_percent = (l.price_month - ideal_price) / ideal_price
-            success_chance = max(10, min(98, 85 - (price_diff_percent * 100)))
-
+    for l, score in zip(user_listings, stored_scores(user_listings, artifact)):
         # Historical comparison (Mocked for MVP)
         faster_than_avg = random.randint(15, 45)
         
-        insights.append({
-            'listing': l,
-            'ideal_price': round(ideal_price, 2),
-            'success_chance': round(success_chance, 1),
-            'price_diff': round(l.price_month - ideal_price, 2),
-            'trend': 'up' if l.price_month < ideal_price else 'down',
-            'faster_than_avg': faster_than_avg,
-            'suggestion': "Strong pricing - maintain." if abs(l.price_month - ideal_price) < 50 else 
-                          f"Recommendation: {'Decrease' if l.price_month > ideal_price else 'Increase'} price by ${abs(round(l.price_month - ideal_price, 2))} for optimal velocity."
-        })
+        insights.append(dict(score, listing=l, faster_than_avg=faster_than_avg))
 
     # Historical Trends Data (Mock for Chart.js)
     history_labels = [(date.today() - timedelta(days=i*30)).strftime('%b %Y') for i in range(6)][::-1]
@@ -2826,49 +2826,25 @@ def create_checkout_session():
 @bp.route('/payment-success')
 @login_required
 def payment_success():
-    """Handle successful checkout redirection"""
+    """Handle successful checkout redirection (fulfilment happens in the Stripe webhook worker)"""
     session_id = request.args.get('session_id')
     if not session_id:
         return redirect(url_for('main.index'))
-        
-    stripe_lib = get_stripe()
-    try:
-        session = stripe_lib.checkout.Session.retrieve(session_id)
-        payment = Payment.query.filter_by(stripe_session_id=session_id).first()
-        
-        if payment and payment.status == 'pending':
-            payment.status = 'completed'
-            payment.stripe_payment_intent = getattr(session, 'payment_intent', None) or getattr(session, 'subscription', None)
-            
-            # Apply feature logic based on item_type
-            item_type = session.metadata.get('item_type')
-            if item_type in ['premium_owner', 'premium_renter']:
-                current_user.is_premium = True
-                current_user.subscription_tier = 'premium'
-                current_user.subscription_expires = datetime.utcnow() + timedelta(days=30)
-            elif 'featured' in item_type:
-                listing_id = session.metadata.get('item_id')
-                if listing_id:
-                    listing = Listing.query.get(listing_id)
-                    if listing:
-                        listing.is_featured = True
-                        listing.is_premium_listing = True
-                        listing.featured_tier = item_type.split('_')[1]
-                        listing.featured_expires_at = datetime.utcnow() + timedelta(days=30)
-            elif item_type in ['analytics_report', 'analytics_report_national']:
-                current_user.has_analytics_access = True
-                current_user.analytics_expires_at = datetime.utcnow() + timedelta(days=30)
-            elif item_type == 'white_label':
-                current_user.is_white_label_partner = True
-                # Add any other flags needed for white label
-            
-            db.session.commit()
-            flash(f"Success! Your payment for {item_type.replace('_', ' ').capitalize()} has been processed.", "success")
-            
-        return render_template('payment_success.html')
-    except Exception as e:
-        flash(f"Verification error: {str(e)}", "error")
+
+    payment = Payment.query.filter_by(stripe_session_id=session_id, user_id=current_user.id).first()
+    if not payment:
+        flash("We couldn't find that payment.", "error")
         return redirect(url_for('main.profile'))
+    if payment.status == 'pending':
+        return render_template('payment_processing.html', title='Confirming your payment',
+                               message='We are confirming your payment with Stripe. '
+                                       'This page updates automatically.')
+    if payment.status != 'completed':
+        flash("Payment was not completed.", "error")
+        return redirect(url_for('main.profile'))
+
+    flash(f"Success! Your payment for {payment.item_type.replace('_', ' ').capitalize()} has been processed.", "success")
+    return render_template('payment_success.html')
 
 @bp.route('/payment-cancel')
 @login_required
@@ -2906,7 +2882,7 @@ def handle_connect():
 
 @socketio.on('chat_message')
 def handle_chat_message(data):
-    """Handle incoming WS messages natively mapping to the API hooks."""
+    """Concierge over WS: chat_delta per chunk of the LLM reply, then chat_response with the whole reply."""
     if not isinstance(data, dict):
         return
         
@@ -2916,67 +2892,23 @@ def handle_chat_message(data):
     if not user_msg:
         return
         
-    # Re-use our existing Logic layer but via WS instead of HTTP POST
-    user_role = current_user.role if current_user.is_authenticated else 'guest'
-    home_airport = getattr(current_user, 'alert_airport', None) or 'Not set'
-    user_name = current_user.username if current_user.is_authenticated else 'Guest'
-    
-    db_ctx = _build_db_context(user_msg)
-    
-    api_key = os.environ.get('OPENAI_API_KEY') or os.environ.get('GROK_API_KEY')
-    base_url = os.environ.get('OPENAI_BASE_URL')
+    messages, user_role, db_ctx = _concierge_turn(user_msg, history)
+    llm = openai_client()
     
     # Send an immediate 'typing' indicator
     emit('typing_status', {'isTyping': True})
 
-    try:
-        if openai and api_key:
-            client_kwargs = {'api_key': api_key}
-            if base_url:
-                client_kwargs['base_url'] = base_url
-            client = openai.OpenAI(**client_kwargs)
-
-            system_prompt = f"""You are the HangarLinks AI Concierge — a smart, friendly aviation assistant specializing in Short-Term transient parking (Overnights & Weekends 1-7 days).
-You help transient aircraft owners find overnight hangars, and hangar owners optimize their listings for event surges.
-
-USER CONTEXT:
-- Name: {user_name}
-- Role: {user_role}
-- Home Airport: {home_airport}
-
-LIVE DATABASE CONTEXT (use this to answer):
-{db_ctx if db_ctx else "No specific data found for this query."}
-
-INSTRUCTIONS:
-- PRIORITY 1: Always prioritize and highlight listings with minimum stays of 1 to 7 nights first.
-- PRIORITY 2: Automatically check if dates/locations match Major Events (e.g. Oshkosh, Sun 'n Fun) and suggest nightly Event Surge rates.
-- Use the live data above to answer questions about availability, translating monthly rates down to estimated Nightly Rates (Monthly/30) if only monthly is defined.
-- Be concise and friendly. Use markdown (bold, bullet points) for clarity.
-- If you find matching listings, always include the [View Listing](/listing/ID) link.
-- If asked "Book this?" direct them to the listing link. If asked "Message owner?" state "I'll connect you — click the listing link and use the owner contact module."
-- NEVER make up listing data. Only use what's in LIVE DATABASE CONTEXT.
-- Keep replies under 200 words."""
-
-            messages = [{'role': 'system', 'content': system_prompt}]
-            for h in history[-6:]:
-                if h.get('role') in ('user', 'assistant') and h.get('content'):
-                    messages.append({'role': h['role'], 'content': h['content']})
-            messages.append({'role': 'user', 'content': user_msg})
-
-            model = os.environ.get('OPENAI_MODEL', 'gpt-4o-mini')
-            resp = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=400,
-                temperature=0.7,
-            )
-            reply = resp.choices[0].message.content.strip()
-            emit('chat_response', {'reply': reply, 'source': 'llm'})
+    if llm:
+        parts = []
+        try:
+            for delta in stream_concierge_reply(llm, messages):
+                parts.append(delta)
+                emit('chat_delta', {'delta': delta})
+            emit('chat_response', {'reply': ''.join(parts).strip(), 'source': 'llm'})
             return
-            
-    except Exception as e:
-        current_app.logger.error(f"WS Concierge Error: {e}")
+        except Exception as e:
+            current_app.logger.error(f"WS Concierge Error: {e}")
         
-    # Fallback to rules layer
+    # Fallback to rules layer (chat_response replaces anything streamed before a failure)
     reply = _rule_based_response(user_msg, user_role, db_ctx)
     emit('chat_response', {'reply': reply, 'source': 'rules'})
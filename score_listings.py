@@ -0,0 +1,25 @@
+"""
+Nightly batch job: score every Active listing with the published pricing model.
+
+    python score_listings.py
+
+Writes ai_suggested_price / ai_model_version on each listing using one
+vectorized predict per chunk (see pricing_model.score_all_active); the
+optimizer page reads them through pricing_model.stored_scores().
+Run after train_pricing_model.py in the same cron entry.
+"""
+import time
+
+from app import app
+from pricing_model import score_all_active
+
+
+def main():
+    with app.app_context():
+        t0 = time.perf_counter()
+        total = score_all_active()
+        print(f"Scored {total} active listings in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+similar_listings.py — In-memory nearest-neighbour index for "Similar hangars".
+
+Each Active listing is a small feature vector:
+
+    location   unit-sphere x/y/z scaled so 1.0 ≈ LOCATION_SCALE_NM
+    price      log(price_month), standardised
+    size       log(size_sqft), standardised
+    amenities  covered, heated, 24/7 access, NFPA 409, GPU power, electric door
+
+Vectors live in one contiguous NumPy matrix with an id → row map. A query is
+a single vectorised squared-distance pass plus argpartition, which is a few
+milliseconds even for tens of thousands of listings.
+
+The index is refreshed incrementally: a session hook captures the rows of
+every Listing flushed in a transaction and applies them once it commits
+(rolled-back writes are dropped). Inserts fill free rows or grow the matrix,
+deactivated/deleted listings free their row. Standardisation statistics are
+fixed at build time, so the whole index is rebuilt every REBUILD_SECONDS to
+follow price drift and pick up writes made by other workers.
+
+Usage:
+    from similar_listings import similar_to
+    similar_to(listing, k=4)     # → [Listing, ...] most similar Active listings
+"""
+
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Listing
+
+logger = logging.getLogger(__name__)
+
+LOCATION_SCALE_NM = 150
+EARTH_RADIUS_NM = 3440.065
+REBUILD_SECONDS = 900
+DEFAULT_K = 4
+
+ELECTRIC_DOORS = {'Electric', 'Hydraulic', 'Bi-Fold (Electric)'}
+AMENITIES = ('covered', 'is_heated', 'access_24_7', 'nfpa_409_compliant', 'gpu_power_available')
+COLUMNS = ('id', 'status', 'airport_icao', 'lat', 'lon', 'price_month', 'size_sqft', 'door_type') + AMENITIES
+
+# Relative importance of each block of the vector
+W_LOCATION = 2.0
+W_PRICE = 1.0
+W_SIZE = 1.0
+W_AMENITY = 0.5
+
+DIMS = 3 + 2 + len(AMENITIES) + 1
+
+
+def _row(obj) -> dict:
+    return {c: getattr(obj, c, None) for c in COLUMNS}
+
+
+def _location(row):
+    lat, lon = row['lat'], row['lon']
+    if lat is None or lon is None:
+        from airport_coords import get_coords
+        lat, lon, found = get_coords(row['airport_icao'])
+        if not found:
+            return None
+    phi, lam = math.radians(lat), math.radians(lon)
+    r = EARTH_RADIUS_NM / LOCATION_SCALE_NM
+    return (r * math.cos(phi) * math.cos(lam), r * math.cos(phi) * math.sin(lam), r * math.sin(phi))
+
+
+def _log(v):
+    return math.log(v) if v and v > 0 else None
+
+
+class SimilarityIndex:
+
+    def __init__(self, rows=()):
+        rows = [r for r in rows if r['status'] == 'Active']
+        prices = [p for p in (_log(r['price_month']) for r in rows) if p is not None]
+        sizes = [s for s in (_log(r['size_sqft']) for r in rows) if s is not None]
+        self.price_stats = (float(np.mean(prices)), float(np.std(prices)) or 1.0) if prices else (0.0, 1.0)
+        self.size_stats = (float(np.mean(sizes)), float(np.std(sizes)) or 1.0) if sizes else (0.0, 1.0)
+
+        capacity = max(16, len(rows))
+        self.vectors = np.zeros((capacity, DIMS))
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.slot = {}
+        self.free = list(range(capacity - 1, -1, -1))
+        self.lock = threading.Lock()
+        self.built_at = time.monotonic()
+        for r in rows:
+            self._put(r)
+
+    def __len__(self):
+        return len(self.slot)
+
+    def vector(self, row) -> np.ndarray:
+        v = np.zeros(DIMS)
+        loc = _location(row)
+        if loc is not None:
+            v[0:3] = loc
+        else:
+            v[0:3] = np.nan     # unknown location: compared on the other features only
+        p, s = _log(row['price_month']), _log(row['size_sqft'])
+        v[3] = (p - self.price_stats[0]) / self.price_stats[1] if p is not None else 0.0
+        v[4] = (s - self.size_stats[0]) / self.size_stats[1] if s is not None else 0.0
+        for i, name in enumerate(AMENITIES):
+            v[5 + i] = 1.0 if row[name] else 0.0
+        v[5 + len(AMENITIES)] = 1.0 if row['door_type'] in ELECTRIC_DOORS else 0.0
+        return v * _WEIGHTS
+
+    def _put(self, row):
+        lid = row['id']
+        if lid in self.slot:
+            i = self.slot[lid]
+        else:
+            if not self.free:
+                self._grow()
+            i = self.free.pop()
+            self.slot[lid] = i
+            self.ids[i] = lid
+        self.vectors[i] = self.vector(row)
+
+    def _grow(self):
+        old = len(self.ids)
+        self.vectors = np.vstack([self.vectors, np.zeros((old, DIMS))])
+        self.ids = np.concatenate([self.ids, np.full(old, -1, dtype=np.int64)])
+        self.free.extend(range(2 * old - 1, old - 1, -1))
+
+    def remove(self, listing_id):
+        with self.lock:
+            i = self.slot.pop(listing_id, None)
+            if i is not None:
+                self.ids[i] = -1
+                self.free.append(i)
+
+    def upsert(self, row):
+        if row['status'] != 'Active':
+            self.remove(row['id'])
+            return
+        with self.lock:
+            self._put(row)
+
+    def query(self, row, k: int = DEFAULT_K) -> list:
+        """[(listing_id, distance)] of the k nearest Active listings, excluding `row` itself."""
+        with self.lock:
+            i = self.slot.get(row['id'])
+            q = self.vectors[i].copy() if i is not None else self.vector(row)
+            diff = self.vectors - q
+            # Either side missing a location → ignore the location block
+            diff[:, 0:3] = np.nan_to_num(diff[:, 0:3], nan=0.0)
+            dist = np.einsum('ij,ij->i', diff, diff)
+            dist[self.ids < 0] = np.inf
+            if i is not None:
+                dist[i] = np.inf
+            n = min(k, len(self.slot) - (i is not None))
+            if n <= 0:
+                return []
+            top = np.argpartition(dist, n - 1)[:n]
+            top = top[np.argsort(dist[top])]
+            return [(int(self.ids[j]), float(dist[j])) for j in top]
+
+
+_WEIGHTS = np.array([W_LOCATION] * 3 + [W_PRICE, W_SIZE] + [W_AMENITY] * (len(AMENITIES) + 1))
+
+
+# ── Process-wide index ────────────────────────────────────────────────────────
+_BUILD_LOCK = threading.Lock()
+_INDEX = None
+
+
+def build_index() -> SimilarityIndex:
+    cols = [getattr(Listing, c) for c in COLUMNS]
+    rows = [dict(r._mapping) for r in db.session.query(*cols).filter(Listing.status == 'Active')]
+    index = SimilarityIndex(rows)
+    logger.info(f"[SIMILAR] indexed {len(index)} active listings")
+    return index
+
+
+def get_index() -> SimilarityIndex:
+    global _INDEX
+    if _INDEX is None or time.monotonic() - _INDEX.built_at > REBUILD_SECONDS:
+        with _BUILD_LOCK:
+            if _INDEX is None or time.monotonic() - _INDEX.built_at > REBUILD_SECONDS:
+                _INDEX = build_index()
+    return _INDEX
+
+
+def reset_index() -> None:
+    global _INDEX
+    with _BUILD_LOCK:
+        _INDEX = None
+
+
+def similar_to(listing, k: int = DEFAULT_K) -> list:
+    """The k most similar Active listings to `listing`, nearest first."""
+    ranked = get_index().query(_row(listing), k)
+    if not ranked:
+        return []
+    by_id = {l.id: l for l in Listing.query.filter(Listing.id.in_([lid for lid, _ in ranked]),
+                                                   Listing.status == 'Active').all()}
+    return [by_id[lid] for lid, _ in ranked if lid in by_id]
+
+
+# ── Incremental refresh on committed listing writes ──────────────────────────
+_PENDING = 'similar_listings_pending'
+
+
+@event.listens_for(Session, 'after_flush')
+def _capture_listing_writes(session, flush_context):
+    pending = session.info.setdefault(_PENDING, {})
+    for obj in session.new.union(session.dirty):
+        if isinstance(obj, Listing) and obj.id is not None:
+            pending[obj.id] = _row(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Listing) and obj.id is not None:
+            pending[obj.id] = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_listing_writes(session):
+    pending = session.info.pop(_PENDING, None)
+    if not pending or _INDEX is None:
+        return
+    for lid, row in pending.items():
+        if row is None:
+            _INDEX.remove(lid)
+        else:
+            _INDEX.upsert(row)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_listing_writes(session):
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,246 @@
+"""
+stay_search.py — Date-range availability search across many listings.
+
+"Which hangars within 75 nm of KOSH are free July 20–26?" is answered by one
+indexed SQL query per search:
+
+    spatial      airport_icao IN (airports within the radius)   idx_listing_airport
+                 The set comes from the in-memory airport table (lat-sorted,
+                 bisected, then great-circle), so no trig runs in SQL.
+    filters      Active, min stay ≤ nights, nightly price band, amenities,
+                 fits the aircraft (precomputed capability columns)
+    anti-join    NOT EXISTS a holding whole-hangar booking over the stay
+                                                                idx_booking_listing_dates
+    capacity     size_sqft − SUM(overlapping footprints) ≥ need
+
+The SUM is an upper bound on the busiest night, so whatever passes it
+certainly fits. Shared hangars that fail it may still fit (two aircraft that
+never overlap each other), so those few are checked night by night with
+capacity.CapacityTimeline first and passed back in as `rescued` ids.
+
+During an event surge thousands of renters run the same few searches. The
+ordered id list is cached for SEARCH_CACHE_SECONDS under a key that includes a
+generation token per airport in the search area. Any booking or listing change
+at an airport bumps only that airport's token (once the transaction commits),
+so a booking at KOSH doesn't flush searches around KJFK. Pages are then
+sliced from the cached list.
+
+Usage:
+    from stay_search import StaySearch, search_page
+    s = StaySearch(start, end, airport='KOSH', radius_nm=75, max_night=150)
+    page = search_page(s, page=1)        # .items, .total, .pages, .has_next, ...
+"""
+
+import bisect
+import datetime
+import hashlib
+import logging
+import math
+import threading
+import uuid
+from dataclasses import dataclass, astuple
+
+from sqlalchemy import event, exists, func, select
+
+from commit_hooks import after_commit
+from extensions import db, cache
+from models import Booking, Listing
+from availability import as_date, overlaps
+from capacity import MIN_FREE_SQFT, free_sqft_by_listing
+from event_surge import haversine_nm
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_SECONDS = 60
+MAX_RESULTS = 2000
+MAX_RADIUS_NM = 500
+AMENITY_FLAGS = ('is_heated', 'access_24_7', 'nfpa_409_compliant', 'gpu_power_available')
+ELECTRIC_DOORS = ('Electric', 'Hydraulic', 'Bi-Fold (Electric)')
+_GEN_KEY = 'stay_search_gen:{}'
+
+
+@dataclass(frozen=True)
+class StaySearch:
+    start: datetime.date
+    end: datetime.date
+    airport: str = None
+    radius_nm: float = None
+    need_sqft: float = None
+    covered: bool = None
+    min_night: float = None          # nightly rate (price_night, else price_month / 30)
+    max_night: float = None
+    amenities: tuple = ()            # names from AMENITY_FLAGS that must be true
+    electric_doors: bool = False
+    aircraft: str = None             # catalogue name; the listing must be able to take it (packing.fits_aircraft)
+
+    @property
+    def nights(self) -> int:
+        return (as_date(self.end) - as_date(self.start)).days
+
+
+# ── Spatial prefilter ─────────────────────────────────────────────────────────
+
+_airport_index = (0, [], [])        # (size of the coords table, sorted lats, [(lat, lon, code)])
+_index_lock = threading.Lock()
+
+
+def _coords() -> dict:
+    import airport_coords
+    airport_coords.load_airport_coords()
+    return airport_coords._COORDS_CACHE or airport_coords.HARDCODED_COORDS
+
+
+def _by_latitude():
+    global _airport_index
+    coords = _coords()
+    with _index_lock:
+        if _airport_index[0] != len(coords):
+            rows = sorted((lat, lon, code) for code, (lat, lon) in coords.items())
+            _airport_index = (len(coords), [r[0] for r in rows], rows)
+        return _airport_index[1], _airport_index[2]
+
+
+def airports_within(icao, radius_nm) -> tuple:
+    """ICAO codes within radius_nm of `icao` (itself included), nearest first."""
+    icao = (icao or '').strip().upper()
+    centre = _coords().get(icao)
+    if not centre or not radius_nm:
+        return (icao,)
+    radius_nm = min(float(radius_nm), MAX_RADIUS_NM)
+    lat0, lon0 = centre
+    lats, rows = _by_latitude()
+    dlat = radius_nm / 60.0
+    dlon = dlat / max(0.01, math.cos(math.radians(lat0)))
+    found = {icao: 0.0}
+    for lat, lon, code in rows[bisect.bisect_left(lats, lat0 - dlat):bisect.bisect_right(lats, lat0 + dlat)]:
+        if abs(lon - lon0) <= dlon:
+            d = haversine_nm(lat0, lon0, lat, lon)
+            if d <= radius_nm:
+                found[code] = d
+    return tuple(sorted(found, key=found.get))
+
+
+# ── Query ─────────────────────────────────────────────────────────────────────
+
+def _candidates(s: StaySearch, codes):
+    """Listing ids passing every filter except the shared-capacity check."""
+    start, end = as_date(s.start), as_date(s.end)
+    q = db.session.query(Listing.id).filter(Listing.status == 'Active')
+    if codes is not None:
+        q = q.filter(Listing.airport_icao.in_(codes))
+    q = q.filter(db.or_(Listing.min_stay_nights.is_(None), Listing.min_stay_nights <= s.nights))
+    if s.covered is not None:
+        q = q.filter(Listing.covered == s.covered)
+    nightly = func.coalesce(Listing.price_night, Listing.price_month / 30.0)
+    if s.min_night:
+        q = q.filter(nightly >= s.min_night)
+    if s.max_night:
+        q = q.filter(nightly <= s.max_night)
+    for flag in s.amenities:
+        q = q.filter(getattr(Listing, flag).is_(True))
+    if s.electric_doors:
+        q = q.filter(Listing.door_type.in_(ELECTRIC_DOORS))
+    if s.aircraft:
+        from packing import fits_aircraft
+        q = q.filter(fits_aircraft(s.aircraft))
+    # Anti-join: a whole-hangar booking on any night of the stay rules the listing out
+    return q.filter(~exists().where(Booking.listing_id == Listing.id,
+                                    Booking.footprint_sqft.is_(None),
+                                    overlaps(start, end)))
+
+
+def _fits_by_sum(s: StaySearch):
+    """SQL: the listing certainly has room (sum of overlapping footprints leaves enough)."""
+    held = (select(func.coalesce(func.sum(Booking.footprint_sqft), 0.0))
+            .where(Booking.listing_id == Listing.id, Booking.footprint_sqft.isnot(None),
+                   overlaps(as_date(s.start), as_date(s.end)))
+            .correlate(Listing)
+            .scalar_subquery())
+    size = func.coalesce(Listing.size_sqft, 0)
+    if s.need_sqft:
+        return size - held >= s.need_sqft
+    # Listings nobody has booked stay visible even without a size on file
+    return db.or_(held == 0, size - held >= MIN_FREE_SQFT)
+
+
+def search_ids(s: StaySearch, codes=None) -> list:
+    """Ordered ids of listings with room for the whole stay (uncached)."""
+    fits = _fits_by_sum(s)
+    ambiguous = (_candidates(s, codes).filter(~fits)
+                 .with_entities(Listing.id, Listing.size_sqft).all())
+    rescued = []
+    if ambiguous:
+        need = s.need_sqft or MIN_FREE_SQFT
+        free = free_sqft_by_listing(ambiguous, s.start, s.end)
+        rescued = [lid for lid, sqft in free.items() if sqft >= need]
+
+    q = _candidates(s, codes).filter(db.or_(fits, Listing.id.in_(rescued)) if rescued else fits)
+    rows = q.order_by(Listing.min_stay_nights.asc(),
+                      Listing.is_featured.desc(),
+                      Listing.is_premium_listing.desc(),
+                      Listing.created_at.desc(),
+                      Listing.id.desc()).limit(MAX_RESULTS).all()
+    return [r.id for r in rows]
+
+
+# ── Cache ─────────────────────────────────────────────────────────────────────
+
+def _generations(codes) -> str:
+    """Combined generation token for the airports in a search (None → all listings)."""
+    codes = list(codes) if codes is not None else ['*']
+    keys = [_GEN_KEY.format(c) for c in codes]
+    gens = cache.get_many(*keys)
+    missing = {k: uuid.uuid4().hex[:12] for k, g in zip(keys, gens) if g is None}
+    if missing:
+        cache.set_many(missing, timeout=0)
+        gens = [g if g is not None else missing[k] for k, g in zip(keys, gens)]
+    return hashlib.sha1('|'.join(gens).encode()).hexdigest()[:16]
+
+
+def invalidate_airport(icao) -> None:
+    cache.set_many({_GEN_KEY.format((icao or '').upper()): uuid.uuid4().hex[:12],
+                    _GEN_KEY.format('*'): uuid.uuid4().hex[:12]}, timeout=0)
+
+
+def cached_search_ids(s: StaySearch) -> list:
+    codes = airports_within(s.airport, s.radius_nm) if s.airport else None
+    params = hashlib.sha1(repr(astuple(s)).encode()).hexdigest()[:16]
+    key = f"stay_search:{params}:{_generations(codes)}"
+    ids = cache.get(key)
+    if ids is None:
+        ids = search_ids(s, codes)
+        cache.set(key, ids, timeout=SEARCH_CACHE_SECONDS)
+    return ids
+
+
+class SearchPage:
+    """The bits of a Flask-SQLAlchemy Pagination that listings.html uses."""
+
+    def __init__(self, items, page, per_page, total):
+        self.items, self.page, self.per_page, self.total = items, page, per_page, total
+        self.pages = max(1, -(-total // per_page))
+        self.has_prev, self.has_next = page > 1, page < self.pages
+        self.prev_num, self.next_num = page - 1, page + 1
+
+
+def search_page(s: StaySearch, page: int = 1, per_page: int = 20) -> SearchPage:
+    ids = cached_search_ids(s)
+    page = max(1, page)
+    window = ids[(page - 1) * per_page:page * per_page]
+    by_id = {l.id: l for l in Listing.query.filter(Listing.id.in_(window)).all()} if window else {}
+    return SearchPage([by_id[i] for i in window if i in by_id], page, per_page, len(ids))
+
+
+@event.listens_for(Listing, 'after_insert')
+@event.listens_for(Listing, 'after_update')
+@event.listens_for(Listing, 'after_delete')
+def _listing_changed(mapper, connection, target):
+    after_commit(target, invalidate_airport, target.airport_icao)
+
+
+@event.listens_for(Booking, 'after_insert')
+@event.listens_for(Booking, 'after_update')
+@event.listens_for(Booking, 'after_delete')
+def _booking_changed(mapper, connection, target):
+    icao = connection.execute(select(Listing.airport_icao).where(Listing.id == target.listing_id)).scalar()
+    after_commit(target, invalidate_airport, icao)
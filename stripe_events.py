@@ -0,0 +1,233 @@
+"""
+stripe_events.py — Idempotent, queued Stripe webhook processing.
+
+Stripe retries a webhook until it gets a 2xx quickly, and may deliver the
+same event more than once. So /webhook/stripe only verifies the signature,
+inserts the raw event into stripe_events (primary key = Stripe's event id,
+so a redelivery is a no-op) and answers 200. A background worker in each web
+process then applies pending events through payments.py:
+
+    record_event()     insert once; False for a duplicate delivery
+    process_pending()  claim (pending → processing, one conditional UPDATE per
+                       event, so workers never apply the same event twice),
+                       dispatch by type, mark processed; failures go back to
+                       pending (retried after RETRY_SECONDS × attempts) until
+                       MAX_ATTEMPTS, then stay failed
+    start_worker()     background loop, woken by notify() after each webhook
+                       and every POLL_SECONDS otherwise
+
+Claims older than STALE_CLAIM_MINUTES (worker died mid-event) are taken
+again. stripe_worker.py runs the same loop as a standalone process.
+
+Usage:
+    from stripe_events import parse_event, record_event, notify
+    event = parse_event(payload, request.headers.get('Stripe-Signature'), secret)
+    if record_event(event, payload):
+        notify()
+"""
+
+import datetime
+import json
+import logging
+import threading
+
+from flask import current_app, has_request_context
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Booking, Payment, StripeEvent
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 50
+POLL_SECONDS = 30
+STALE_CLAIM_MINUTES = 10
+RETRY_SECONDS = 60              # × attempts so far, before a failed event is tried again
+
+
+class InvalidEvent(ValueError):
+    """Unsigned, badly signed or malformed webhook body."""
+
+
+def parse_event(payload: str, sig_header, secret, allow_unsigned: bool = False) -> dict:
+    """Verify the Stripe-Signature header and decode the event.
+
+    Without a signing secret anyone could post a forged checkout.session.completed,
+    so unsigned bodies are only accepted with allow_unsigned (STRIPE_WEBHOOK_ALLOW_UNSIGNED, local dev).
+    """
+    if not secret and not allow_unsigned:
+        raise InvalidEvent("Webhook signing secret not configured")
+    if secret:
+        try:
+            import stripe
+            stripe.Webhook.construct_event(payload, sig_header, secret)
+        except ImportError:
+            raise InvalidEvent("stripe library not installed")
+        except Exception as e:
+            raise InvalidEvent(f"Signature verification failed: {e}")
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        raise InvalidEvent("Body is not JSON")
+    if not isinstance(event, dict) or not event.get('id') or not event.get('type'):
+        raise InvalidEvent("Not a Stripe event")
+    return event
+
+
+# ── Handlers (event['data']['object'] → local state) ──────────────────────────
+
+def _checkout_completed(session):
+    if session.get('payment_status') not in (None, 'paid', 'no_payment_required'):
+        return      # delayed payment method; checkout.session.async_payment_succeeded follows
+    from payments import fulfil_booking, fulfil_payment, fulfil_white_label
+    item_type = (session.get('metadata') or {}).get('item_type')
+    if item_type == 'rental_booking':
+        booking = Booking.query.filter_by(stripe_payment_id=session['id']).first()
+        if booking:
+            fulfil_booking(booking, session.get('payment_intent'))
+    elif item_type == 'white_label_reservation':
+        fulfil_white_label(session)
+    else:
+        payment = Payment.query.filter_by(stripe_session_id=session['id']).first()
+        if payment:
+            fulfil_payment(payment, session)
+
+
+def _checkout_expired(session):
+    from payments import release_booking
+    booking = Booking.query.filter_by(stripe_payment_id=session['id']).first()
+    if booking:
+        release_booking(booking)
+
+
+def _subscription_deleted(subscription):
+    from payments import end_subscription
+    end_subscription(subscription['id'])
+
+
+def _invoice_paid(invoice):
+    from payments import renew_subscription
+    lines = (invoice.get('lines') or {}).get('data') or []
+    period_end = (lines[0].get('period') or {}).get('end') if lines else None
+    renew_subscription(invoice.get('customer'), period_end)
+
+
+HANDLERS = {
+    'checkout.session.completed': _checkout_completed,
+    'checkout.session.async_payment_succeeded': _checkout_completed,
+    'checkout.session.expired': _checkout_expired,
+    'checkout.session.async_payment_failed': _checkout_expired,
+    'customer.subscription.deleted': _subscription_deleted,
+    'invoice.payment_succeeded': _invoice_paid,
+}
+
+
+# ── Queue ─────────────────────────────────────────────────────────────────────
+
+def record_event(event: dict, payload: str) -> bool:
+    """Store a verified event; False if this event id was already received."""
+    status = 'pending' if event['type'] in HANDLERS else 'ignored'
+    db.session.add(StripeEvent(id=event['id'], type=event['type'], payload=payload, status=status))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        logger.info(f"[STRIPE] duplicate delivery of {event['id']} ignored")
+        return False
+    return True
+
+
+def _claim(event_id, seen_status, seen_claimed_at=None) -> bool:
+    """pending/stale → processing iff nobody claimed it since we looked."""
+    unchanged = (StripeEvent.claimed_at.is_(None) if seen_claimed_at is None
+                 else StripeEvent.claimed_at == seen_claimed_at)
+    result = db.session.execute(
+        update(StripeEvent)
+        .where(StripeEvent.id == event_id, StripeEvent.status == seen_status, unchanged)
+        .values(status='processing', claimed_at=datetime.datetime.utcnow(),
+                attempts=StripeEvent.attempts + 1)
+        .execution_options(synchronize_session=False))
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _finish(event_id, **values) -> None:
+    db.session.execute(update(StripeEvent).where(StripeEvent.id == event_id)
+                       .values(**values).execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+def process_pending(limit: int = BATCH_SIZE) -> int:
+    """Apply up to `limit` queued events; returns how many this call handled."""
+    if not has_request_context():
+        # Handlers build absolute links (lease e-mails); give url_for a base outside requests
+        with current_app.test_request_context(base_url=current_app.config.get('PUBLIC_URL')):
+            return process_pending(limit)
+
+    now = datetime.datetime.utcnow()
+    stale = now - datetime.timedelta(minutes=STALE_CLAIM_MINUTES)
+    rows = (db.session.query(StripeEvent.id, StripeEvent.status, StripeEvent.claimed_at, StripeEvent.attempts)
+            .filter(db.or_(StripeEvent.status == 'pending',
+                           db.and_(StripeEvent.status == 'processing', StripeEvent.claimed_at < stale)))
+            .order_by(StripeEvent.received_at)
+            .limit(limit).all())
+    db.session.commit()
+
+    handled = 0
+    for event_id, seen, claimed_at, attempts in rows:
+        if seen == 'pending' and claimed_at and claimed_at > now - datetime.timedelta(seconds=RETRY_SECONDS * attempts):
+            continue        # failed recently; back off
+        if not _claim(event_id, seen, claimed_at):
+            continue        # another worker took it
+        event = db.session.get(StripeEvent, event_id)
+        try:
+            HANDLERS[event.type](json.loads(event.payload)['data']['object'])
+        except Exception as e:
+            db.session.rollback()
+            event = db.session.get(StripeEvent, event_id)
+            status = 'failed' if event.attempts >= MAX_ATTEMPTS else 'pending'
+            logger.exception(f"[STRIPE] {event.type} {event_id} failed (attempt {event.attempts}), now {status}")
+            _finish(event_id, status=status, last_error=str(e)[:2000])
+        else:
+            _finish(event_id, status='processed', processed_at=datetime.datetime.utcnow(), last_error=None)
+        handled += 1
+    return handled
+
+
+# ── Background worker ─────────────────────────────────────────────────────────
+
+_wake = threading.Event()
+_start_lock = threading.Lock()
+
+
+def notify() -> None:
+    """Wake this process's worker (a new event was recorded)."""
+    _wake.set()
+
+
+def run_forever(app, poll_seconds: int = POLL_SECONDS) -> None:
+    while True:
+        _wake.wait(poll_seconds)
+        _wake.clear()
+        with app.app_context():
+            try:
+                while process_pending():
+                    pass
+            except Exception:
+                logger.exception("[STRIPE] worker pass failed")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+
+def start_worker(app) -> None:
+    """Start the event worker for this process, once."""
+    with _start_lock:
+        if app.extensions.get('stripe_event_worker'):
+            return
+        app.extensions['stripe_event_worker'] = True
+    # The eventlet gunicorn worker monkey-patches threading, so this is a green thread there
+    threading.Thread(target=run_forever, args=(app,), daemon=True, name='stripe-events').start()
+    logger.info("[STRIPE] event worker started")
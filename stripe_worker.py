@@ -0,0 +1,35 @@
+"""
+Background job: apply queued Stripe webhook events (see stripe_events.py).
+
+    python stripe_worker.py            # long-running worker (set STRIPE_EVENT_WORKER=0 on web)
+    python stripe_worker.py --once     # drain the queue and exit, e.g. every minute from cron
+
+Safe to run next to the in-process workers: events are claimed atomically.
+"""
+import argparse
+
+from app import app
+from stripe_events import process_pending, run_forever, POLL_SECONDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply queued Stripe webhook events")
+    parser.add_argument('--once', action='store_true', help="drain pending events and exit")
+    parser.add_argument('--poll', type=int, default=POLL_SECONDS, help="seconds between passes")
+    args = parser.parse_args()
+
+    if not args.once:
+        run_forever(app, args.poll)
+
+    with app.app_context():
+        total = 0
+        while True:
+            n = process_pending()
+            if not n:
+                break
+            total += n
+        print(f"Applied {total} Stripe events")
+
+
+if __name__ == '__main__':
+    main()
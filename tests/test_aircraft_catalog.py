@@ -0,0 +1,84 @@
+"""
+test_aircraft_catalog.py — flat aircraft index, aliases and the typeahead endpoint.
+"""
+import pytest
+import aircraft_catalog
+from aircraft_catalog import get, search
+from capacity import aircraft_footprint
+from conftest import make_owner, make_user, make_listing, login_as
+from models import Booking, Payment
+
+
+class TestCatalog:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app):
+        with app.app_context():
+            yield
+
+    def test_every_type_indexed_once(self, app):
+        nested = app.config['AIRCRAFT_SIZES']
+        flat = aircraft_catalog.catalog().types
+        assert len(flat) == sum(len(models) for models in nested.values())
+        assert flat['Cessna 172'].category == 'GA Aircraft'
+        assert aircraft_catalog.catalog() is aircraft_catalog.catalog()
+
+    def test_aliases(self):
+        for alias in ('Cessna 172', 'cessna-172', 'C172', 'c 172', '172'):
+            assert get(alias).name == 'Cessna 172'
+        assert get('P28A').name == 'Piper PA-28 Cherokee'
+        assert get('DA42').name == 'Diamond DA42'          # not the DA42 L360
+        assert get('TB21') is None                         # two Trinidads, neither plain
+        assert get('Boeing 747') is None
+        assert aircraft_footprint('C172') == aircraft_footprint('Cessna 172')
+
+    def test_search_ranks_prefix_then_word_then_fuzzy(self):
+        assert [a.name for a in search('c172', 2)] == ['Cessna 172', 'Cessna 172RG Cutlass']
+        assert {a.name for a in search('TB21')} >= {'Socata TB21 Trinidad', 'Socata TB21 Trinidad TC'}
+        assert search('cherokee')[0].name == 'Piper PA-28 Cherokee'
+        assert {a.name for a in search('bonanaz', 3)} == {'Beechcraft Bonanza', 'Beechcraft V35 Bonanza'}
+        assert search('') == [] and search('zzzz') == []
+        assert len(search('cessna', 50)) > 10
+
+
+class TestAircraftEndpoints:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        self.owner = make_owner(db, username='ac_owner', email='ac_owner@test.com')
+        self.renter = make_user(db, username='ac_renter', email='ac_renter@test.com')
+        self.listing = make_listing(db, self.owner, icao='KACX', size=3000)
+        self.listing.price_night = 60.0
+        db.session.commit()
+        yield
+        Payment.query.filter_by(user_id=self.renter.id).delete()
+        Booking.query.filter_by(listing_id=self.listing.id).delete()
+        for obj in [self.listing, self.owner, self.renter]:
+            db.session.delete(obj)
+        db.session.commit()
+        app.limiter.enabled = True
+
+    def test_typeahead_json(self, client):
+        r = client.get('/api/aircraft?q=c172&limit=3')
+        assert r.status_code == 200 and 'max-age' in r.headers['Cache-Control']
+        top = r.get_json()['results'][0]
+        assert top['name'] == 'Cessna 172' and top['exact'] is True
+        assert top['length'] == 27.2 and top['footprint_sqft'] == aircraft_footprint('Cessna 172')
+        assert len(r.get_json()['results']) <= 3
+        assert client.get('/api/aircraft').get_json() == {'results': []}
+
+    def test_pages_no_longer_embed_the_catalogue(self, client):
+        page = client.get(f'/listing/{self.listing.id}').data
+        assert b'aircraftTypeahead' in page and b'Beechcraft Starship' not in page
+        login_as(client, self.owner)
+        assert b'Beechcraft Starship' not in client.get('/dashboard/space-calculator').data
+
+    def test_booking_accepts_an_alias(self, client):
+        login_as(client, self.renter)
+        r = client.post(f'/book/{self.listing.id}', data={
+            'start_date': '2026-11-02', 'end_date': '2026-11-04', 'booking_aircraft': 'c-172'})
+        assert r.status_code == 303
+        booking = Booking.query.filter_by(listing_id=self.listing.id).one()
+        assert booking.aircraft_type == 'Cessna 172'
+        assert booking.footprint_sqft == aircraft_footprint('Cessna 172')
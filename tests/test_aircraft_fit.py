@@ -0,0 +1,97 @@
+"""
+test_aircraft_fit.py — "Fits my aircraft" capability columns and search filter.
+"""
+import datetime
+
+import pytest
+from capacity import aircraft_footprint
+from conftest import make_owner, make_listing
+from models import Listing
+from packing import UNCONSTRAINED_FT, backfill_fit_capability, fits_aircraft
+from stay_search import StaySearch, search_ids
+
+# (size sq ft, floor width × depth, door width × height, tail clearance)
+HANGARS = {
+    'open':        (3000, None, None, None),
+    'measured':    (3000, (60, 50), (42, 12), 16),
+    'narrow_door': (3000, (60, 50), (36, 12), None),
+    'low_door':    (3000, None, (42, 8.5), None),
+    'short_floor': (3000, (80, 28), None, None),
+    'small':       (900, None, None, None),
+}
+
+
+class TestAircraftFit:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        self.owner = make_owner(db, username='fit_owner', email='fit_owner@test.com')
+        self.listings = {}
+        for key, (size, floor, door, tail) in HANGARS.items():
+            l = make_listing(db, self.owner, icao='KFIT', size=size)
+            l.hangar_width_ft, l.hangar_depth_ft = floor or (None, None)
+            l.door_width_ft, l.door_height_ft = door or (None, None)
+            l.tail_height_clearance = tail
+            l.price_night, l.min_stay_nights = 50.0, 1
+            self.listings[key] = l
+        db.session.commit()
+        yield
+        for l in self.listings.values():
+            db.session.delete(l)
+        db.session.delete(self.owner)
+        db.session.commit()
+        app.limiter.enabled = True
+
+    def _fits(self, name):
+        ids = {l.id for l in Listing.query.filter(Listing.airport_icao == 'KFIT', fits_aircraft(name))}
+        return {key for key, l in self.listings.items() if l.id in ids}
+
+    def test_capability_columns_follow_the_listing(self, db):
+        open_, measured = self.listings['open'], self.listings['measured']
+        assert open_.fit_long_ft == open_.fit_span_ft == open_.fit_height_ft == UNCONSTRAINED_FT
+        assert (measured.fit_long_ft, measured.fit_short_ft) == (58.0, 48.0)
+        assert (measured.fit_span_ft, measured.fit_height_ft) == (40.0, 11.0)   # door lower than the tail clearance
+        measured.door_width_ft = None
+        db.session.commit()
+        assert measured.fit_span_ft == UNCONSTRAINED_FT
+
+    def test_backfill_fills_missing_rows(self, db):
+        db.session.execute(db.update(Listing).where(Listing.airport_icao == 'KFIT').values(fit_height_ft=None))
+        db.session.commit()
+        assert backfill_fit_capability(batch=2) >= len(HANGARS)
+        db.session.refresh(self.listings['measured'])
+        assert self.listings['measured'].fit_height_ft == 11.0
+
+    def test_filter_checks_door_height_floor_and_area(self):
+        assert self._fits('C172') == {'open', 'measured'}
+        assert self._fits('Cessna 172') == self._fits('c-172')
+        assert self._fits('Pilatus PC-12') == {'open'}
+        assert fits_aircraft('Boeing 747') is None
+        assert aircraft_footprint('Cessna 172') > HANGARS['small'][0]
+
+    def test_area_is_the_hangar_size_not_the_legacy_counter(self, db):
+        open_, small = self.listings['open'], self.listings['small']
+        open_.available_sqft = 0.0            # old permanent decrement left over from a past rental
+        db.session.commit()
+        assert 'open' in self._fits('C172')
+        small.size_sqft, small.available_sqft = 3000, 900
+        db.session.commit()
+        assert 'small' in self._fits('C172')
+        open_.size_sqft = 900
+        db.session.commit()
+        assert 'open' not in self._fits('C172')
+
+    def test_listings_page_filter(self, client):
+        page = client.get('/listings?airport=KFIT&aircraft=C172').data.decode()
+        shown = {key for key, l in self.listings.items() if f'/listing/{l.id}"' in page}
+        assert shown == {'open', 'measured'}
+        assert 'value="Cessna 172"' in page
+        page = client.get('/listings?airport=KFIT&aircraft=zzzz').data.decode()
+        assert "Unknown aircraft type" in page
+        assert all(f'/listing/{l.id}"' in page for l in self.listings.values())
+
+    def test_stay_search_filter(self):
+        s = StaySearch(datetime.date(2026, 8, 3), datetime.date(2026, 8, 6), aircraft='Pilatus PC-12')
+        ids = set(search_ids(s, ('KFIT',)))
+        assert {key for key, l in self.listings.items() if l.id in ids} == {'open'}
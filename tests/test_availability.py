@@ -0,0 +1,105 @@
+"""
+test_availability.py — booking calendar, double-booking checks and date-range search.
+"""
+import datetime
+
+import pytest
+from availability import merge_ranges, is_available
+from conftest import make_owner, make_user, make_listing, login_as
+from models import Booking, Payment
+
+
+def _d(s):
+    return datetime.date.fromisoformat(s)
+
+
+class TestMergeRanges:
+
+    def test_merges_overlapping_and_adjacent(self):
+        ranges = [(_d('2026-08-10'), _d('2026-08-12')), (_d('2026-08-01'), _d('2026-08-05')),
+                  (_d('2026-08-05'), _d('2026-08-07')), (_d('2026-08-11'), _d('2026-08-15'))]
+        assert merge_ranges(ranges) == [(_d('2026-08-01'), _d('2026-08-07')),
+                                        (_d('2026-08-10'), _d('2026-08-15'))]
+
+
+class TestAvailability:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        self.owner = make_owner(db, username='avail_owner', email='avail_owner@test.com')
+        self.renter = make_user(db, username='avail_renter', email='avail_renter@test.com')
+        self.other = make_user(db, username='avail_other', email='avail_other@test.com')
+        self.listing = make_listing(db, self.owner, icao='KAVA')
+        self.free = make_listing(db, self.owner, icao='KAVA')
+        for l in (self.listing, self.free):
+            l.price_night = 100.0
+        db.session.commit()
+        yield
+        ids = [self.listing.id, self.free.id]
+        Payment.query.filter(Payment.user_id.in_([self.renter.id, self.other.id])).delete()
+        Booking.query.filter(Booking.listing_id.in_(ids)).delete()
+        for obj in (self.listing, self.free, self.renter, self.other, self.owner):
+            db.session.delete(obj)
+        db.session.commit()
+        app.limiter.enabled = True
+
+    def _book(self, db, start, end, status='Confirmed', renter=None, session_id=None):
+        b = Booking(listing_id=self.listing.id, renter_id=(renter or self.other).id,
+                    start_date=datetime.datetime.fromisoformat(start), end_date=datetime.datetime.fromisoformat(end),
+                    total_price=100.0, status=status, stripe_payment_id=session_id)
+        db.session.add(b)
+        db.session.commit()
+        return b
+
+    def test_pending_and_confirmed_block_cancelled_does_not(self, db):
+        self._book(db, '2026-09-01', '2026-09-04', status='Pending')
+        self._book(db, '2026-09-10', '2026-09-12', status='Cancelled')
+        assert not is_available(self.listing.id, '2026-09-03', '2026-09-05')
+        assert is_available(self.listing.id, '2026-09-04', '2026-09-06')
+        assert is_available(self.listing.id, '2026-09-10', '2026-09-12')
+
+    def test_calendar_endpoint(self, client, db):
+        self._book(db, '2026-09-01', '2026-09-04')
+        self._book(db, '2026-09-04', '2026-09-05', status='Pending')
+        self._book(db, '2026-09-20', '2026-10-10')
+        r = client.get(f'/listing/{self.listing.id}/availability?start=2026-09-01&end=2026-10-01')
+        assert r.status_code == 200
+        data = r.get_json()
+        assert data['bookable'] is True
+        assert data['booked'] == [{'start': '2026-09-01', 'end': '2026-09-05'},
+                                  {'start': '2026-09-20', 'end': '2026-10-01'}]
+        assert len(data['unavailable_dates']) == 4 + 11
+        assert client.get(f'/listing/{self.listing.id}/availability?start=2026-09-05&end=2026-09-01'
+                          ).status_code == 400
+
+    def test_overlapping_booking_is_refused(self, client, db):
+        self._book(db, '2026-09-01', '2026-09-05')
+        login_as(client, self.renter)
+        r = client.post(f'/book/{self.listing.id}', data={'start_date': '2026-09-03', 'end_date': '2026-09-07'})
+        assert r.status_code == 302
+        assert Booking.query.filter_by(listing_id=self.listing.id, renter_id=self.renter.id).count() == 0
+
+    def test_retried_checkout_supersedes_own_pending(self, client):
+        login_as(client, self.renter)
+        for _ in range(2):
+            r = client.post(f'/book/{self.listing.id}', data={'start_date': '2026-09-01', 'end_date': '2026-09-04'})
+            assert r.status_code == 303
+        statuses = sorted(b.status for b in Booking.query.filter_by(listing_id=self.listing.id))
+        assert statuses == ['Cancelled', 'Pending']
+
+    def test_search_excludes_listings_booked_for_the_stay(self, client, db):
+        self._book(db, '2026-09-01', '2026-09-05')
+        page = client.get('/listings?airport=KAVA&duration=&check_in=2026-09-04&check_out=2026-09-06').data.decode()
+        assert f'/listing/{self.free.id}"' in page
+        assert f'/listing/{self.listing.id}"' not in page
+        page = client.get('/listings?airport=KAVA&duration=&check_in=2026-09-05&check_out=2026-09-06').data.decode()
+        assert f'/listing/{self.listing.id}"' in page
+
+    def test_confirmation_keeps_listing_bookable(self, client, db):
+        self._book(db, '2026-09-01', '2026-09-05', status='Pending', renter=self.renter, session_id='mock_session_avail')
+        login_as(client, self.renter)
+        client.get('/booking/success?session_id=mock_session_avail')
+        db.session.refresh(self.listing)
+        assert self.listing.status == 'Active'
+        assert not is_available(self.listing.id, '2026-09-02', '2026-09-03')
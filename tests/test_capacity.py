@@ -0,0 +1,109 @@
+"""
+test_capacity.py — time-aware floor space for shared hangars.
+"""
+import datetime
+import random
+
+import pytest
+from capacity import CapacityTimeline, aircraft_footprint, free_sqft_by_listing
+from conftest import make_owner, make_user, make_listing, login_as
+from models import Booking, Payment
+from packing import CLEARANCE_FT
+
+START = datetime.date(2026, 9, 1)
+
+
+def _day(i):
+    return START + datetime.timedelta(days=i)
+
+
+class TestCapacityTimeline:
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        tl = CapacityTimeline(10_000, START, _day(60))
+        used = [0.0] * 60
+        for _ in range(200):
+            lo = rng.randrange(-5, 60)
+            hi = lo + rng.randrange(1, 15)
+            sqft = rng.choice([None, rng.uniform(100, 1500)])
+            tl.add(_day(lo), _day(hi), sqft)
+            for d in range(max(0, lo), min(60, hi)):
+                used[d] += 10_000 if sqft is None else sqft
+        assert tl.daily_usage() == pytest.approx(used)
+        for _ in range(200):
+            lo = rng.randrange(0, 59)
+            hi = rng.randrange(lo + 1, 61)
+            assert tl.peak(_day(lo), _day(hi)) == pytest.approx(max(used[lo:hi]))
+
+    def test_segments_and_fits(self):
+        tl = CapacityTimeline(3000, START, _day(10))
+        tl.add(_day(2), _day(5), 1000)
+        tl.add(_day(4), _day(8), 1500)
+        assert [(s.day, e.day, f) for s, e, f in tl.segments()] == [
+            (1, 3, 3000), (3, 5, 2000), (5, 6, 500), (6, 9, 1500), (9, 11, 3000)]
+        assert tl.free(_day(0), _day(4)) == 2000
+        assert tl.fits(500, _day(4), _day(5))
+        assert not tl.fits(501, _day(4), _day(5))
+        assert not tl.fits(None)
+        assert tl.fits(None, _day(8), _day(10))
+
+
+class TestSharedHangar:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        self.owner = make_owner(db, username='cap_owner', email='cap_owner@test.com')
+        self.renters = [make_user(db, username=f'cap_renter{i}', email=f'cap_renter{i}@test.com') for i in range(3)]
+        self.listing = make_listing(db, self.owner, icao='KCAP', size=2500)
+        self.listing.price_night = 80.0
+        db.session.commit()
+        self.c172 = aircraft_footprint('Cessna 172')
+        yield
+        Payment.query.filter(Payment.user_id.in_([r.id for r in self.renters])).delete()
+        Booking.query.filter_by(listing_id=self.listing.id).delete()
+        for obj in [self.listing, self.owner] + self.renters:
+            db.session.delete(obj)
+        db.session.commit()
+        app.limiter.enabled = True
+
+    def _book(self, client, renter, start, end, aircraft='Cessna 172'):
+        login_as(client, renter)
+        r = client.post(f'/book/{self.listing.id}', data={
+            'start_date': start, 'end_date': end, 'booking_aircraft': aircraft})
+        client.get('/logout')
+        return r.status_code
+
+    def test_two_aircraft_share_then_full(self, client):
+        assert self._book(client, self.renters[0], '2026-09-01', '2026-09-05') == 303
+        assert self._book(client, self.renters[1], '2026-09-03', '2026-09-08') == 303
+        # 2500 sqft - 2 × ~1080 leaves no room for a third 172 on 3–4 Sept
+        assert self._book(client, self.renters[2], '2026-09-04', '2026-09-06') == 302
+        assert self._book(client, self.renters[2], '2026-09-05', '2026-09-07') == 303
+        footprints = {b.footprint_sqft for b in Booking.query.filter_by(listing_id=self.listing.id)}
+        assert footprints == {self.c172}
+
+    def test_calendar_reports_free_space(self, client):
+        self._book(client, self.renters[0], '2026-09-01', '2026-09-05')
+        cal = client.get(f'/listing/{self.listing.id}/availability?start=2026-09-01&end=2026-09-07').get_json()
+        assert cal['capacity_sqft'] == 2500
+        assert cal['booked'] == []
+        assert cal['free'][0] == {'start': '2026-09-01', 'end': '2026-09-05',
+                                  'free_sqft': round(2500 - self.c172, 1)}
+        assert cal['min_free_sqft'] == pytest.approx(2500 - self.c172)
+
+    def test_search_and_space_calculator(self, client):
+        self._book(client, self.renters[0], '2026-09-01', '2026-09-05')
+        assert free_sqft_by_listing([self.listing], _day(1), _day(3)) == {
+            self.listing.id: pytest.approx(2500 - self.c172)}
+        page = client.get('/listings?airport=KCAP&duration=&check_in=2026-09-02&check_out=2026-09-03'
+                          '&min_sqft=2000').data.decode()
+        assert f'/listing/{self.listing.id}"' not in page
+
+        login_as(client, self.owner)
+        r = client.post('/dashboard/space-calculator', data={
+            'listing_id': self.listing.id, 'start_date': '2026-09-02', 'end_date': '2026-09-03',
+            'aircraft_type_1': 'Cessna 172', 'qty_1': 1})
+        remaining = 2500 - self.c172 - round((36.1 + CLEARANCE_FT) * (27.2 + CLEARANCE_FT), 1)
+        assert "{:,.0f}".format(remaining).encode() in r.data
@@ -0,0 +1,130 @@
+"""
+test_checkout.py — checkout holds, optimistic locking and atomic counters.
+"""
+import datetime
+import threading
+
+import pytest
+from availability import is_available
+from capacity import aircraft_footprint
+from checkout import place_hold, release_hold, confirm_booking, HoldUnavailable
+from conftest import make_owner, make_user, make_listing, login_as
+from models import Booking, Payment, User
+from quotes import get_quote
+
+N_RENTERS = 50
+
+
+class TestCheckout:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        self.owner = make_owner(db, username='co_owner', email='co_owner@test.com')
+        self.renter = make_user(db, username='co_renter', email='co_renter@test.com')
+        # Room for two Cessna 172s (~1080 sqft each with buffer), not three
+        self.listing = make_listing(db, self.owner, icao='KCHK', size=2500)
+        self.listing.price_night = 90.0
+        db.session.commit()
+        self.renters = []
+        yield
+        ids = [self.renter.id] + [r.id for r in self.renters]
+        Payment.query.filter(Payment.user_id.in_(ids)).delete()
+        Booking.query.filter_by(listing_id=self.listing.id).delete()
+        db.session.delete(self.listing)
+        for u in [self.owner, self.renter] + self.renters:
+            db.session.delete(u)
+        db.session.commit()
+        app.limiter.enabled = True
+
+    def test_concurrent_bookings_never_oversell(self, app, db):
+        self.renters = [make_user(db, username=f'co_r{i}', email=f'co_r{i}@test.com') for i in range(N_RENTERS)]
+        clients = []
+        for r in self.renters:
+            c = app.test_client()
+            login_as(c, r)
+            clients.append(c)
+
+        url = f'/book/{self.listing.id}'
+        barrier = threading.Barrier(N_RENTERS)
+        results = [None] * N_RENTERS
+
+        def book(i):
+            barrier.wait()
+            results[i] = clients[i].post(url, data={
+                'start_date': '2026-11-02', 'end_date': '2026-11-06', 'booking_aircraft': 'Cessna 172'}).status_code
+
+        threads = [threading.Thread(target=book, args=(i,)) for i in range(N_RENTERS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        db.session.expire_all()
+        held = Booking.query.filter_by(listing_id=self.listing.id, status='Pending').all()
+        assert results.count(303) == len(held) == 2
+        assert sum(b.footprint_sqft for b in held) <= self.listing.size_sqft
+        assert not is_available(self.listing.id, '2026-11-03', '2026-11-04', sqft=aircraft_footprint('Cessna 172'))
+
+    def test_stale_version_is_retried_against_the_winner(self, db, monkeypatch):
+        import checkout
+        real_claim = checkout._claim
+        calls = []
+
+        def racing_claim(listing_id, seen):
+            # First attempt: another worker books the whole hangar between our check and our claim
+            if not calls:
+                calls.append(1)
+                db.session.rollback()
+                db.session.add(Booking(listing_id=listing_id, renter_id=self.owner.id, total_price=1.0,
+                                       start_date=datetime.datetime(2026, 12, 1), end_date=datetime.datetime(2026, 12, 9),
+                                       status='Confirmed'))
+                db.session.execute(db.text("UPDATE listings SET version = version + 1 WHERE id = :id"),
+                                   {'id': listing_id})
+                db.session.commit()
+            return real_claim(listing_id, seen)
+
+        monkeypatch.setattr(checkout, '_claim', racing_claim)
+        with pytest.raises(HoldUnavailable):
+            place_hold(self.listing, self.renter.id, '2026-12-02', '2026-12-04', footprint_sqft=500, total_price=1.0)
+        assert Booking.query.filter_by(listing_id=self.listing.id, renter_id=self.renter.id).count() == 0
+
+    def test_expired_hold_releases_space(self, db):
+        booking = place_hold(self.listing, self.renter.id, '2026-11-10', '2026-11-12', total_price=180.0)
+        assert not is_available(self.listing.id, '2026-11-10', '2026-11-12')
+        booking.hold_expires_at = datetime.datetime.utcnow() - datetime.timedelta(minutes=1)
+        db.session.commit()
+        assert is_available(self.listing.id, '2026-11-10', '2026-11-12')
+        # Payment that lands after the hold lapsed still confirms, exactly once
+        assert confirm_booking(booking) is True
+        assert confirm_booking(booking) is False
+
+    def test_released_hold_frees_cached_quotes(self, db):
+        start, end = '2027-01-04', '2027-01-08'
+        assert get_quote(self.listing.id, start, end)['available']
+        booking = place_hold(self.listing, self.renter.id, start, end, total_price=360.0)
+        assert not get_quote(self.listing.id, start, end)['available']
+        release_hold(booking)
+        assert is_available(self.listing.id, start, end)
+        assert get_quote(self.listing.id, start, end)['available']
+
+    def test_success_page_credits_owner_once(self, client, db):
+        login_as(client, self.renter)
+        r = client.post(f'/book/{self.listing.id}', data={
+            'start_date': '2026-11-20', 'end_date': '2026-11-22', 'booking_aircraft': 'Cessna 172'})
+        session_id = r.headers['Location'].split('session_id=')[1]
+        before = self.owner.total_revenue or 0.0
+        client.get(f'/booking/success?session_id={session_id}')
+        client.get(f'/booking/success?session_id={session_id}')
+        booking = Booking.query.filter_by(stripe_payment_id=session_id).one()
+        assert booking.status == 'Confirmed'
+        owner = db.session.get(User, self.owner.id)
+        db.session.refresh(owner)
+        assert owner.total_revenue == pytest.approx(before + booking.total_price * 0.9)
+
+    def test_like_is_an_sql_increment(self, client, db):
+        login_as(client, self.renter)
+        for _ in range(3):
+            client.post(f'/like/{self.listing.id}')
+        db.session.refresh(self.listing)
+        assert self.listing.likes == 3
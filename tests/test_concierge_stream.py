@@ -0,0 +1,93 @@
+"""
+test_concierge_stream.py — Streamed concierge replies over Socket.IO and SSE (fake streaming model).
+"""
+import json
+
+import pytest
+import concierge
+import integrations
+from conftest import make_user, login_as
+from extensions import socketio
+from integrations import FakeOpenAI
+
+REPLY = 'Try the **KOSH** hangar tonight.'
+
+
+class _BrokenStream(FakeOpenAI):
+    """Streams one chunk, then the connection drops."""
+
+    def create(self, **kwargs):
+        chunks = super().create(**kwargs)
+
+        def stream():
+            yield next(chunks)
+            raise ConnectionError('stream reset')
+        return stream()
+
+
+def _events(body):
+    frames = [f for f in body.split('\n\n') if f]
+    return [(f.split('\n')[0][len('event: '):], json.loads(f.split('\n')[1][len('data: '):])) for f in frames]
+
+
+class TestConciergeStream:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        self.user = make_user(db, username='stream_pilot', email='stream_pilot@test.com')
+        self.llm = FakeOpenAI(REPLY)
+        integrations.reset()
+        with integrations.fake('openai', self.llm):
+            yield
+        integrations.reset()
+        db.session.delete(self.user)
+        db.session.commit()
+        app.limiter.enabled = True
+
+    def test_sse_streams_deltas_then_done(self, client):
+        login_as(client, self.user)
+        r = client.post('/api/concierge/stream', json={'message': 'overnight hangar at KOSH?', 'history': []})
+        assert r.status_code == 200 and r.mimetype == 'text/event-stream'
+        events = _events(r.get_data(as_text=True))
+        deltas = [data['delta'] for name, data in events if name == 'delta']
+        assert len(deltas) == len(REPLY.split(' ')) and ''.join(deltas) == REPLY
+        assert events[-1] == ('done', {'reply': REPLY, 'source': 'llm'})
+        assert self.llm.requests[0]['stream'] is True
+        assert self.llm.requests[0]['messages'][-1] == {'role': 'user', 'content': 'overnight hangar at KOSH?'}
+
+    def test_sse_falls_back_to_rules_when_the_stream_breaks(self, client):
+        login_as(client, self.user)
+        integrations.install_fake('openai', _BrokenStream(REPLY))
+        events = _events(client.post('/api/concierge/stream', json={'message': 'hello'}).get_data(as_text=True))
+        assert [name for name, _ in events] == ['delta', 'done']
+        assert events[-1][1]['source'] == 'rules'
+
+    def test_socketio_emits_chat_delta_events(self, app, client):
+        login_as(client, self.user)
+        ws = socketio.test_client(app, flask_test_client=client)
+        ws.emit('chat_message', {'message': 'weekend hangar?', 'history': []})
+        received = ws.get_received()
+        names = [m['name'] for m in received]
+        assert names[0] == 'typing_status' and names[-1] == 'chat_response'
+        deltas = [m['args'][0]['delta'] for m in received if m['name'] == 'chat_delta']
+        assert ''.join(deltas) == REPLY and len(deltas) > 1
+        assert received[-1]['args'][0] == {'reply': REPLY, 'source': 'llm'}
+        ws.disconnect()
+
+    def test_llm_steps_run_off_the_hub(self, monkeypatch):
+        offloaded = []
+
+        def execute(fn, *args, **kwargs):
+            offloaded.append(fn)
+            return fn(*args, **kwargs)
+        monkeypatch.setattr(concierge, '_blocking', lambda: execute)
+        deltas = list(concierge.stream_reply(self.llm, concierge.build_messages('hi', [], '')))
+        assert ''.join(deltas) == REPLY
+        assert offloaded[0] is integrations.call                   # opening the stream
+        assert offloaded[1:] == [next] * (len(deltas) + 1)         # every chunk, and the end of the stream
+
+    def test_json_endpoint_still_answers_whole(self, client):
+        login_as(client, self.user)
+        r = client.post('/api/concierge', json={'message': 'hi'})
+        assert r.get_json() == {'reply': REPLY, 'source': 'llm'}
@@ -0,0 +1,131 @@
+"""
+test_demand_forecast.py — regional demand forecaster behind /api/forecast.
+"""
+import datetime
+
+import numpy as np
+import pytest
+import demand_forecast
+from conftest import make_owner, make_user, make_listing
+from models import Booking, SearchVolume
+
+
+@pytest.fixture
+def forecast_dir(app, tmp_path):
+    app.config['PRICING_MODEL_DIR'] = str(tmp_path)
+    demand_forecast.reset_cache()
+    yield str(tmp_path)
+    app.config['PRICING_MODEL_DIR'] = None
+    demand_forecast.reset_cache()
+
+
+class TestForecastModel:
+
+    def test_regions(self):
+        assert demand_forecast.region_for('CYTZ') == 'Ontario'
+        assert demand_forecast.region_for('KORD') == 'US Midwest'
+        assert demand_forecast.region_for('KXYZ', 34.0, -118.4) == 'US West'
+        assert demand_forecast.region_for('ZZZZ') is None
+
+    def test_ridge_recovers_coefficients(self):
+        rng = np.random.default_rng(0)
+        X = np.column_stack([np.ones(200), rng.normal(size=(200, 3))])
+        beta = np.array([1.0, 0.5, -2.0, 0.25])
+        fitted = demand_forecast.ridge(X, X @ beta, lam=1e-6)
+        assert np.allclose(fitted, beta, atol=1e-4)
+
+    def test_season_label(self):
+        assert demand_forecast.season_label(datetime.date(2026, 1, 10)) == 'Winter 2026'
+        assert demand_forecast.season_label(datetime.date(2026, 10, 10)) == 'Fall 2026'
+
+
+class TestForecastService:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        self.owner = make_owner(db, username='fc_owner', email='fc_owner@test.com')
+        self.renter = make_user(db, username='fc_renter', email='fc_renter@test.com')
+        self.listing = make_listing(db, self.owner, icao='CYTZ')
+        self.listing.lat, self.listing.lon = 43.6278, -79.3961
+        today = datetime.date.today()
+        # Demand ramping up over the last 20 weeks
+        for week in range(20):
+            start = datetime.datetime.combine(today - datetime.timedelta(weeks=20 - week), datetime.time.min)
+            for _ in range(1 + week // 2):
+                db.session.add(Booking(listing_id=self.listing.id, renter_id=self.renter.id, start_date=start,
+                                       end_date=start + datetime.timedelta(days=2), total_price=100.0,
+                                       status='Confirmed'))
+        db.session.commit()
+        yield
+        Booking.query.filter_by(listing_id=self.listing.id).delete()
+        SearchVolume.query.filter_by(airport_icao='CYTZ').delete()
+        db.session.delete(self.listing)
+        db.session.delete(self.renter)
+        db.session.delete(self.owner)
+        db.session.commit()
+        app.limiter.enabled = True
+
+    def test_fit_produces_regional_forecasts(self, forecast_dir):
+        params = demand_forecast.fit_and_publish(forecast_dir)
+        ontario = params['regions']['Ontario']
+        assert ontario['n_bookings'] >= 110
+        assert len(ontario['weekly']) == demand_forecast.HORIZON_WEEKS
+        assert len(ontario['beta']) == len(demand_forecast.FEATURES)
+        assert ontario['trend'] == 'rising'
+        assert not ontario['low_data']
+        assert 'Ontario region' in ontario['message']
+        assert demand_forecast.ALL_REGIONS in params['regions']
+        # Under a year of history: seasonal terms stay out of the fit
+        assert ontario['beta'][2] == ontario['beta'][3] == 0.0
+
+    def test_sparse_region_uses_global_curve(self, forecast_dir):
+        params = demand_forecast.fit_and_publish(forecast_dir)
+        quebec, everywhere = params['regions']['Quebec'], params['regions'][demand_forecast.ALL_REGIONS]
+        assert quebec['low_data']
+        assert quebec['weekly'] == everywhere['weekly']
+        assert 'Quebec region' in quebec['message']
+
+    def test_served_from_memory_after_publish(self, forecast_dir, monkeypatch):
+        demand_forecast.fit_and_publish(forecast_dir)
+
+        def _boom(*a, **kw):
+            raise AssertionError("requests must not refit")
+        monkeypatch.setattr(demand_forecast, 'fit', _boom)
+        assert demand_forecast.forecast_for(airport='CYTZ')['region'] == 'Ontario'
+        assert demand_forecast.forecast_for(region='Nowhere')['region'] == demand_forecast.ALL_REGIONS
+
+    def test_missing_forecast_is_neutral_not_fitted(self, client, forecast_dir, monkeypatch):
+        def _boom(*a, **kw):
+            raise AssertionError("requests must not fit")
+        monkeypatch.setattr(demand_forecast, 'fit', _boom)
+        data = client.get('/api/forecast?airport=CYTZ').get_json()
+        assert data['region'] == 'Ontario'
+        assert (data['trend'], data['percentage'], data['weekly']) == ('stable', 0, [])
+
+    def test_endpoint(self, client, forecast_dir):
+        demand_forecast.fit_and_publish(forecast_dir)
+        r = client.get('/api/forecast?airport=CYTZ')
+        assert r.status_code == 200
+        data = r.get_json()
+        assert data['region'] == 'Ontario'
+        assert {'trend', 'percentage', 'season', 'message', 'weekly'} <= set(data)
+        assert 'beta' not in data
+
+    def test_listing_search_volume_is_batched(self, client, db, monkeypatch):
+        # An airport no other test searches, starting from an empty buffer and no rows
+        monkeypatch.setattr(demand_forecast, 'SEARCH_FLUSH_SECONDS', 3600)
+        demand_forecast.reset_searches()
+        SearchVolume.query.filter_by(airport_icao='CYOO').delete()
+        db.session.commit()
+        client.get('/listings?airport=CYOO')
+        client.get('/listings?airport=cyoo')
+        today = datetime.datetime.utcnow().date()
+        assert SearchVolume.query.filter_by(airport_icao='CYOO').count() == 0     # nothing written per search
+        assert demand_forecast.flush_searches() == 1
+        assert SearchVolume.query.filter_by(airport_icao='CYOO', day=today).one().count == 2
+        demand_forecast.record_search('CYOO')
+        demand_forecast.flush_searches()
+        assert SearchVolume.query.filter_by(airport_icao='CYOO', day=today).one().count == 3
+        SearchVolume.query.filter_by(airport_icao='CYOO').delete()
+        db.session.commit()
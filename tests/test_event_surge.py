@@ -0,0 +1,109 @@
+"""
+test_event_surge.py — date-indexed event surge engine.
+"""
+import datetime
+
+import pytest
+import event_surge
+from event_surge import SurgeIndex, make_event
+from conftest import make_owner, make_user, make_listing, login_as
+from models import Booking, Payment
+
+D = datetime.date
+
+COORDS = {
+    'KOSH': (43.9844, -88.5570),
+    'KATW': (44.2581, -88.5191),   # ~16 nm north of KOSH
+    'KMSN': (43.1399, -89.3375),   # ~60 nm away
+}
+
+
+class TestSurgeIndex:
+
+    def test_airport_codes_are_normalised(self):
+        ev = make_event('Fly-In', '2026-10-15', '2026-10-18', 30, ['Dead Cow Lakebed', 'kRNO ', 'KWMC', 'KRNO'])
+        assert ev.airports == ('KRNO', 'KWMC')
+        index = SurgeIndex([ev], coords={})
+        assert index.multiplier('krno', D(2026, 10, 16)) == pytest.approx(1.3)
+        assert index.surge_for('Dead Cow Lakebed', D(2026, 10, 16)) is None
+
+    def test_registry_has_no_invalid_codes(self):
+        for ev in event_surge.EVENT_REGISTRY:
+            assert all(event_surge.normalize_icao(c) == c for c in ev.airports)
+
+    def test_lookup_by_night(self):
+        ev = make_event('AirVenture', '2026-07-20', '2026-07-26', 50, ['KOSH'], radius_nm=0)
+        index = SurgeIndex([ev], coords=COORDS)
+        assert index.multiplier('KOSH', D(2026, 7, 19)) == 1.0
+        assert index.multiplier('KOSH', D(2026, 7, 20)) == pytest.approx(1.5)
+        assert index.multiplier('KOSH', datetime.datetime(2026, 7, 26, 18)) == pytest.approx(1.5)
+        assert index.multiplier('KOSH', D(2026, 7, 27)) == 1.0
+        assert index.multiplier('KATW', D(2026, 7, 22)) == 1.0
+
+    def test_radius_extends_surge_to_nearby_airports(self):
+        ev = make_event('AirVenture', '2026-07-20', '2026-07-26', 50, ['KOSH'], radius_nm=30)
+        index = SurgeIndex([ev], coords=COORDS)
+        hit = index.surge_for('KATW', D(2026, 7, 22))
+        assert hit.nearby
+        assert hit.surge_pct == 50 * event_surge.NEARBY_SURGE_FACTOR
+        assert index.surge_for('KMSN', D(2026, 7, 22)) is None
+        assert not index.surge_for('KOSH', D(2026, 7, 22)).nearby
+
+    def test_overlapping_events_take_strongest(self):
+        a = make_event('Small', '2026-07-18', '2026-07-21', 10, ['KOSH'], radius_nm=0)
+        b = make_event('Big', '2026-07-20', '2026-07-26', 50, ['KOSH'], radius_nm=0)
+        index = SurgeIndex([a, b], coords=COORDS)
+        assert index.surge_for('KOSH', D(2026, 7, 19)).event.name == 'Small'
+        assert index.surge_for('KOSH', D(2026, 7, 21)).event.name == 'Big'
+        assert [h.event.name for h in index.upcoming('KOSH', today=D(2026, 7, 1))] == ['Small', 'Big']
+        assert [h.event.name for h in index.upcoming('KOSH', today=D(2026, 7, 22))] == ['Big']
+
+    def test_nightly_excludes_checkout_day(self):
+        ev = make_event('AirVenture', '2026-07-20', '2026-07-26', 50, ['KOSH'], radius_nm=0)
+        index = SurgeIndex([ev], coords=COORDS)
+        nights = index.nightly('KOSH', D(2026, 7, 18), D(2026, 7, 22))
+        assert [n for n, _, _ in nights] == [D(2026, 7, 18), D(2026, 7, 19), D(2026, 7, 20), D(2026, 7, 21)]
+        assert [m for _, m, _ in nights] == [1.0, 1.0, 1.5, 1.5]
+
+
+class TestSurgePricedBooking:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        ev = make_event('AirVenture', '2026-07-20', '2026-07-26', 50, ['KOSH'], radius_nm=0)
+        event_surge.reset_index(SurgeIndex([ev], coords=COORDS))
+        self.owner = make_owner(db, username='surge_owner', email='surge_owner@test.com')
+        self.renter = make_user(db, username='surge_renter', email='surge_renter@test.com')
+        self.listing = make_listing(db, self.owner, icao='KOSH')
+        self.listing.price_night = 100.0
+        db.session.commit()
+        yield
+        Payment.query.filter_by(user_id=self.renter.id).delete()
+        Booking.query.filter_by(listing_id=self.listing.id).delete()
+        db.session.delete(self.listing)
+        db.session.delete(self.renter)
+        db.session.delete(self.owner)
+        db.session.commit()
+        event_surge.reset_index()
+        app.limiter.enabled = True
+
+    def test_booking_applies_surge_per_night(self, client):
+        login_as(client, self.renter)
+        r = client.post(f'/book/{self.listing.id}', data={'start_date': '2026-07-18', 'end_date': '2026-07-22'})
+        assert r.status_code == 303
+        booking = Booking.query.filter_by(listing_id=self.listing.id).one()
+        # 2 normal nights + 2 surged nights at +50%
+        assert booking.total_price == pytest.approx(100 + 100 + 150 + 150)
+
+    def test_owner_dashboard_lists_upcoming_surge(self, client, monkeypatch):
+        class _Today(datetime.date):
+            @classmethod
+            def today(cls):
+                return cls(2026, 7, 1)
+        monkeypatch.setattr(event_surge.datetime, 'date', _Today)
+        login_as(client, self.owner)
+        r = client.get('/dashboard/owner')
+        assert r.status_code == 200
+        assert b'AirVenture' in r.data
+        assert b'$150.0/night' in r.data
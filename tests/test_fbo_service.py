@@ -0,0 +1,123 @@
+"""
+test_fbo_service.py — FBO/fuel providers, per-airport cache and circuit breaker (no network).
+"""
+import json
+import os
+
+import pytest
+import fbo_service
+import integrations
+from conftest import make_owner, make_listing
+from fbo_service import AviationStackProvider, DEFAULT_FBO, FBOService, StaticProvider
+
+
+class _Queue:
+    """Executor stand-in: refreshes run when the test says so."""
+
+    def __init__(self):
+        self.queued = []
+
+    def submit(self, fn, *args):
+        self.queued.append((fn, args))
+
+    def run(self):
+        while self.queued:
+            fn, args = self.queued.pop(0)
+            fn(*args)
+
+
+class TestFboService:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, tmp_path, monkeypatch):
+        self.now = 1000.0
+        monkeypatch.setattr(fbo_service, '_clock', lambda: self.now)
+        monkeypatch.setattr(integrations, '_clock', lambda: self.now)
+        self.dataset = tmp_path / 'fbo_fuel.json'
+        self.dataset.write_text(json.dumps({'kmsn': {'fbo_name': 'Wisconsin Aviation', 'fuel_type': '100LL',
+                                                     'fuel_price': 6.89, 'services': ['GPU']}}))
+        self.calls, self.status = [], 200
+        self.queue = _Queue()
+        self.service = FBOService(static=StaticProvider(str(self.dataset)), remote=AviationStackProvider('key'),
+                                  ttl=600, executor=self.queue)
+        integrations.reset()
+        with integrations.fake('aviationstack', self._aviationstack) as upstream:
+            self.breaker = upstream.breaker
+            yield
+        integrations.reset()
+
+    def _aviationstack(self, request):
+        icao = request.url.rsplit('search=', 1)[1]
+        self.calls.append(icao)
+        return self.status, {'data': [{'icao_code': icao, 'airport_name': 'Wittman Regional'}]}
+
+    def test_dataset_answers_without_a_call(self):
+        msn = self.service.lookup('KMSN')
+        assert msn['fbo_name'] == 'Wisconsin Aviation' and msn['source'] == 'dataset'
+        assert self.calls == [] and self.queue.queued == []
+        self.dataset.write_text(json.dumps({'KMSN': {'fbo_name': 'Jet Room', 'fuel_price': 7.10}}))
+        os.utime(self.dataset, (2e9, 2e9))
+        assert self.service.lookup('KMSN')['fbo_name'] == 'Jet Room'
+
+    def test_remote_is_cached_and_refreshed_off_the_request(self):
+        first = self.service.lookup('KOSH')
+        assert first == DEFAULT_FBO and self.calls == []                # the page doesn't wait
+        self.service.lookup('KOSH')
+        assert len(self.queue.queued) == 1                             # one refresh per airport
+        self.queue.run()
+        osh = self.service.lookup('KOSH')
+        assert osh['airport_name'] == 'Wittman Regional' and osh['source'] == 'aviationstack'
+        self.now += 599
+        self.service.lookup('KOSH')
+        assert self.queue.queued == [] and self.calls == ['KOSH']
+        self.now += 1
+        assert self.service.lookup('KOSH')['source'] == 'aviationstack'   # stale served while refreshing
+        self.queue.run()
+        assert self.calls == ['KOSH', 'KOSH']
+
+    def test_breaker_stops_calling_a_failing_upstream(self):
+        policy = integrations.policy('aviationstack')
+        self.status = 503
+        for i in range(policy.failure_threshold + 3):
+            assert self.service.lookup(f'KX{i:02d}') == DEFAULT_FBO
+            self.queue.run()
+        assert len(self.calls) == policy.failure_threshold
+        assert self.breaker.state == 'open'
+
+        # Half-open: one trial call; it fails, so the other queued refresh never reaches the upstream
+        self.now += policy.reset_seconds
+        self.service.lookup('KOSH')
+        self.service.lookup('KATW')
+        self.queue.run()
+        assert self.calls[policy.failure_threshold:] == ['KOSH']
+        assert self.breaker.state == 'open'
+
+        self.now += policy.reset_seconds
+        self.status = 200
+        self.service.lookup('KOSH')
+        self.queue.run()
+        assert self.breaker.state == 'closed'
+        assert self.service.lookup('KOSH')['source'] == 'aviationstack'
+
+
+class TestFboOnListingPage:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db, tmp_path, monkeypatch):
+        dataset = tmp_path / 'fbo_fuel.json'
+        dataset.write_text(json.dumps({'KFBO': {'fbo_name': 'Test Field FBO', 'fuel_type': 'Jet A',
+                                                'fuel_price': 5.25, 'services': ['Catering']}}))
+        monkeypatch.setitem(app.config, 'FBO_DATASET', str(dataset))
+        monkeypatch.delitem(app.extensions, 'fbo_service', raising=False)
+        self.owner = make_owner(db, username='fbo_owner', email='fbo_owner@test.com')
+        self.listing = make_listing(db, self.owner, icao='KFBO')
+        yield
+        app.extensions.pop('fbo_service', None)
+        db.session.delete(self.listing)
+        db.session.delete(self.owner)
+        db.session.commit()
+
+    def test_detail_page_uses_the_dataset(self, client):
+        page = client.get(f'/listing/{self.listing.id}').data.decode()
+        assert 'Test Field FBO' in page and '$5.25/gal' in page
+        assert 'airport dataset' in page
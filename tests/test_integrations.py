@@ -0,0 +1,131 @@
+"""
+test_integrations.py — Shared outbound client: pooling, budgets, breakers, metrics, fakes (no network).
+"""
+import pytest
+import requests
+
+import airport_coords
+import integrations
+from integrations import BudgetExceeded, CircuitBreaker, CircuitOpen, FakeOpenAI, Policy
+
+
+class _SDKError(Exception):
+
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.http_status = status
+
+
+class TestIntegrations:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, monkeypatch):
+        self.now = 1000.0
+        monkeypatch.setattr(integrations, '_clock', lambda: self.now)
+        monkeypatch.setitem(integrations.POLICIES, 'demo', Policy(timeout=3, budget=5, retries=2,
+                                                                  failure_threshold=3, reset_seconds=30, pool_size=7))
+        integrations.reset()
+        self.seen = []
+        yield
+        integrations.reset()
+
+    def _handler(self, *answers):
+        answers = list(answers)
+
+        def handler(request):
+            self.seen.append((request.method, request.url))
+            answer = answers.pop(0) if len(answers) > 1 else answers[0]
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+        return handler
+
+    def test_one_pooled_client_per_service(self):
+        demo = integrations.client('demo')
+        assert integrations.client('demo') is demo and demo.session is demo.session
+        assert demo.session.get_adapter('https://example.com')._pool_maxsize == 7
+
+    def test_idempotent_requests_retry_within_the_budget(self):
+        with integrations.fake('demo', self._handler(requests.ConnectionError('reset'), (503, 'busy'), {'ok': 1})):
+            assert integrations.client('demo').get('https://example.com/a').json() == {'ok': 1}
+        assert len(self.seen) == 3
+        with integrations.fake('demo', self._handler((503, 'busy'))):
+            with pytest.raises(requests.HTTPError):
+                integrations.client('demo').post('https://example.com/a')
+        assert len(self.seen) == 4                 # a POST is never retried
+
+    def test_budget_caps_the_attempts(self):
+        def slow(request):
+            self.now += 4
+            raise requests.Timeout('read timeout')
+        with integrations.fake('demo', slow):
+            with pytest.raises(BudgetExceeded):
+                integrations.client('demo').get('https://example.com/slow')
+
+    def test_breaker_fails_fast_then_trials(self):
+        with integrations.fake('demo', self._handler((500, 'down'))) as demo:
+            with pytest.raises(requests.HTTPError):
+                demo.get('https://example.com/x')      # 1 + 2 retries = three failures
+            assert demo.breaker.state == 'open'
+            with pytest.raises(CircuitOpen):
+                demo.get('https://example.com/x')
+            assert len(self.seen) == 3
+            self.now += 30
+            demo.install_fake(self._handler({'ok': True}))
+            assert demo.get('https://example.com/x').json() == {'ok': True}
+            assert demo.breaker.state == 'closed'
+        snapshot = integrations.metrics()['demo']
+        assert snapshot['calls'] == 4 and snapshot['failures'] == 3 and snapshot['short_circuits'] == 1
+        assert snapshot['p95_ms'] is not None and snapshot['breaker'] == 'closed'
+
+    def test_half_open_failure_reopens(self):
+        breaker = CircuitBreaker(threshold=2, reset_seconds=30)
+        breaker.failure()
+        breaker.failure()
+        assert not breaker.allow()
+        self.now += 30
+        assert breaker.allow() and not breaker.allow()
+        breaker.failure()
+        assert breaker.state == 'open'
+
+    def test_sdk_calls_only_count_upstream_failures(self):
+        def fails(status):
+            raise _SDKError(status)
+        for status in (400, 401, 404):
+            with pytest.raises(_SDKError):
+                integrations.call('demo', fails, status)
+        assert integrations.client('demo').breaker.failures == 0
+        for status in (429, 502, 503):
+            with pytest.raises(_SDKError):
+                integrations.call('demo', fails, status)
+        assert integrations.client('demo').breaker.state == 'open'
+
+    def test_openai_fake_answers_the_concierge(self):
+        with integrations.fake('openai', FakeOpenAI('Try KOSH.')):
+            llm = integrations.openai_client()
+            resp = integrations.call('openai', llm.chat.completions.create, model='m',
+                                     messages=[{'role': 'user', 'content': 'hangar?'}])
+        assert resp.choices[0].message.content == 'Try KOSH.'
+        assert integrations.metrics()['openai']['calls'] == 1
+
+    def test_stripe_uses_the_pooled_session(self):
+        stripe = pytest.importorskip('stripe')
+        integrations.configure_stripe(stripe)
+        http = stripe.default_http_client
+        with integrations.fake('stripe', self._handler((500, '{"error": {}}'), (200, '{"id": "cs_1"}'))):
+            assert http.request('post', 'https://api.stripe.com/v1/checkout/sessions', {})[1] == 500
+            assert http.request('post', 'https://api.stripe.com/v1/checkout/sessions', {})[1] == 200
+        snapshot = integrations.metrics()['stripe']
+        assert snapshot['calls'] == 2 and snapshot['failures'] == 1
+
+    def test_airport_download_falls_back_only_on_network_errors(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(airport_coords, 'CSV_LOCAL_PATH', tmp_path / 'airports.csv')
+        with integrations.fake('ourairports', self._handler(requests.ConnectionError('offline'))):
+            assert airport_coords._load_from_url('https://example.com/airports.csv') is None
+
+        def broken(stream):
+            raise KeyError('latitude_deg')
+        monkeypatch.setattr(airport_coords, '_load_csv_stream', broken)
+        with integrations.fake('ourairports', self._handler((200, 'ident,latitude_deg\n'))):
+            with pytest.raises(KeyError):
+                airport_coords._load_from_url('https://example.com/airports.csv')
@@ -0,0 +1,97 @@
+"""
+test_lease_pdf.py — content-addressed, off-request lease PDFs (WeasyPrint stubbed out).
+"""
+import os
+
+import pytest
+import lease_pdf
+from conftest import make_owner, make_user, make_listing, login_as
+from models import Booking, Payment
+
+
+class TestLeasePdf:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db, tmp_path, monkeypatch):
+        app.limiter.enabled = False
+        self.renders = []
+
+        def fake_render(html, out_path, css_path):
+            self.renders.append(os.path.basename(out_path))
+            with open(out_path, 'wb') as f:
+                f.write(b'%PDF-1.7 fake')
+            os.remove(out_path + '.pending')
+            return out_path
+
+        monkeypatch.setattr(lease_pdf, 'engine_available', lambda: True)
+        monkeypatch.setattr(lease_pdf, 'render_pdf', fake_render)
+        monkeypatch.setattr(lease_pdf, 'LEASE_SUBDIR', str(tmp_path))
+        self.dir = tmp_path
+
+        self.owner = make_owner(db, username='lp_owner', email='lp_owner@test.com')
+        self.renter = make_user(db, username='lp_renter', email='lp_renter@test.com')
+        self.listing = make_listing(db, self.owner, icao='KPDF', size=2000)
+        self.listing.price_night = 75.0
+        db.session.commit()
+        yield
+        Payment.query.filter_by(user_id=self.renter.id).delete()
+        Booking.query.filter_by(listing_id=self.listing.id).delete()
+        for obj in [self.listing, self.owner, self.renter]:
+            db.session.delete(obj)
+        db.session.commit()
+        app.limiter.enabled = True
+
+    def _paid_booking(self, client):
+        login_as(client, self.renter)
+        r = client.post(f'/book/{self.listing.id}', data={'start_date': '2026-10-05', 'end_date': '2026-10-08'})
+        session_id = r.headers['Location'].split('session_id=')[1]
+        client.get(f'/booking/success?session_id={session_id}')
+        return Booking.query.filter_by(stripe_payment_id=session_id).one()
+
+    def test_unchanged_lease_renders_once(self, client, db):
+        booking = self._paid_booking(client)
+        name = booking.lease_pdf_path
+        assert name.startswith('lease-') and self.renders == [name]
+
+        for _ in range(3):
+            page = client.get(f'/sign-lease/{booking.sign_token_renter}')
+            assert b'Preparing your PDF' not in page.data
+        status = client.get(f'/sign-lease/{booking.sign_token_renter}/pdf-status').get_json()
+        assert status == {'ready': True, 'pending': False, 'url': f'/static/leases/{name}'}
+        assert self.renders == [name]
+
+    def test_signature_produces_a_new_document(self, client, db):
+        booking = self._paid_booking(client)
+        unsigned = booking.lease_pdf_path
+        client.post(f'/execute-lease/{booking.sign_token_renter}')
+        db.session.refresh(booking)
+        assert booking.lease_pdf_path != unsigned
+        assert self.renders == [unsigned, booking.lease_pdf_path]
+        assert (self.dir / unsigned).exists()
+
+    def test_in_flight_render_is_polled_not_repeated(self, client, db, monkeypatch):
+        monkeypatch.setattr(lease_pdf, 'engine_available', lambda: False)
+        booking = self._paid_booking(client)
+        monkeypatch.setattr(lease_pdf, 'engine_available', lambda: True)
+
+        # Another process has claimed the render
+        with client.application.test_request_context():
+            name = lease_pdf.content_name(lease_pdf.lease_html(booking), lease_pdf._paths()[1])
+        (self.dir / (name + '.pending')).touch()
+
+        page = client.get(f'/sign-lease/{booking.sign_token_renter}')
+        assert b'Preparing your PDF' in page.data
+        status = client.get(f'/sign-lease/{booking.sign_token_renter}/pdf-status').get_json()
+        assert status == {'ready': False, 'pending': True, 'url': None}
+        assert self.renders == []
+
+    def test_status_is_private_to_the_parties(self, client, db):
+        booking = self._paid_booking(client)
+        client.get('/logout')
+        stranger = make_user(db, username='lp_stranger', email='lp_stranger@test.com')
+        try:
+            login_as(client, stranger)
+            assert client.get(f'/sign-lease/{booking.sign_token_renter}/pdf-status').status_code == 403
+        finally:
+            db.session.delete(stranger)
+            db.session.commit()
@@ -0,0 +1,103 @@
+"""
+test_lease_tokens.py — indexed signing-token lookup and signature events.
+"""
+import datetime
+
+import pytest
+import lease_pdf
+import lease_tokens
+from conftest import make_owner, make_user, make_listing, login_as
+from models import Booking, LeaseSignature, LeaseToken, Payment
+
+
+class TestLeaseTokens:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db, monkeypatch):
+        app.limiter.enabled = False
+        monkeypatch.setattr(lease_pdf, 'engine_available', lambda: False)
+        self.owner = make_owner(db, username='lt_owner', email='lt_owner@test.com')
+        self.renter = make_user(db, username='lt_renter', email='lt_renter@test.com')
+        self.listing = make_listing(db, self.owner, icao='KTOK', size=2000)
+        self.listing.price_night = 75.0
+        db.session.commit()
+        yield
+        ids = [b.id for b in Booking.query.filter_by(listing_id=self.listing.id)]
+        LeaseSignature.query.filter(LeaseSignature.booking_id.in_(ids)).delete()
+        LeaseToken.query.filter(LeaseToken.booking_id.in_(ids)).delete()
+        Payment.query.filter_by(user_id=self.renter.id).delete()
+        Booking.query.filter_by(listing_id=self.listing.id).delete()
+        for obj in [self.listing, self.owner, self.renter]:
+            db.session.delete(obj)
+        db.session.commit()
+        app.limiter.enabled = True
+
+    def _paid_booking(self, client):
+        login_as(client, self.renter)
+        r = client.post(f'/book/{self.listing.id}', data={'start_date': '2026-10-05', 'end_date': '2026-10-08'})
+        session_id = r.headers['Location'].split('session_id=')[1]
+        client.get(f'/booking/success?session_id={session_id}')
+        client.get('/logout')
+        return Booking.query.filter_by(stripe_payment_id=session_id).one()
+
+    def test_payment_issues_one_token_per_party(self, client):
+        booking = self._paid_booking(client)
+        tokens = {t.role: t for t in LeaseToken.query.filter_by(booking_id=booking.id)}
+        assert tokens['renter'].token == booking.sign_token_renter
+        assert tokens['owner'].token == booking.sign_token_owner
+        assert tokens['renter'].expires_at == booking.end_date + lease_tokens.TOKEN_GRACE
+        assert lease_tokens.find(booking.sign_token_owner).booking is booking
+        assert lease_tokens.find('nope') is None
+
+    def test_both_signatures_confirm_the_lease(self, client, db):
+        booking = self._paid_booking(client)
+        login_as(client, self.renter)
+        client.post(f'/execute-lease/{booking.sign_token_renter}')
+        client.post(f'/execute-lease/{booking.sign_token_renter}')           # double click
+        assert lease_tokens.signed_roles(booking.id) == {'renter'}
+        assert db.session.get(LeaseToken, booking.sign_token_renter).used_at is not None
+        client.get('/logout')
+
+        login_as(client, self.owner)
+        client.post(f'/execute-lease/{booking.sign_token_owner}')
+        db.session.refresh(booking)
+        assert booking.renter_signed and booking.owner_signed and booking.status == 'Confirmed'
+        assert LeaseSignature.query.filter_by(booking_id=booking.id).count() == 2
+        signature = LeaseSignature.query.filter_by(booking_id=booking.id, role='owner').one()
+        assert signature.user_id == self.owner.id
+
+    def test_only_confirmed_bookings_can_be_signed(self, client, db):
+        booking = self._paid_booking(client)
+        booking.status = 'Refund Due'
+        db.session.commit()
+        login_as(client, self.renter)
+        client.post(f'/execute-lease/{booking.sign_token_renter}')
+        client.get('/logout')
+        login_as(client, self.owner)
+        client.post(f'/execute-lease/{booking.sign_token_owner}')
+        db.session.refresh(booking)
+        assert booking.status == 'Refund Due'
+        assert lease_tokens.signed_roles(booking.id) == set()
+
+    def test_links_are_checked_per_party_and_expire(self, client, db):
+        booking = self._paid_booking(client)
+        login_as(client, self.owner)
+        assert client.post(f'/execute-lease/{booking.sign_token_renter}').status_code == 403
+        assert lease_tokens.signed_roles(booking.id) == set()
+
+        db.session.get(LeaseToken, booking.sign_token_owner).expires_at = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+        db.session.commit()
+        assert client.get(f'/sign-lease/{booking.sign_token_owner}').status_code == 404
+        assert client.get('/sign-lease/not-a-token').status_code == 404
+
+    def test_backfill_indexes_legacy_bookings(self, db):
+        booking = Booking(listing_id=self.listing.id, renter_id=self.renter.id, total_price=1.0,
+                          start_date=datetime.datetime(2027, 5, 1), end_date=datetime.datetime(2027, 5, 3),
+                          status='Confirmed', renter_signed=True,
+                          sign_token_renter='legacy-renter', sign_token_owner='legacy-owner')
+        db.session.add(booking)
+        db.session.commit()
+        assert lease_tokens.backfill_lease_tokens() >= 1
+        assert lease_tokens.find('legacy-owner').role == 'owner'
+        assert lease_tokens.signed_roles(booking.id) == {'renter'}
+        assert lease_tokens.backfill_lease_tokens() == 0
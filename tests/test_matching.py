@@ -0,0 +1,120 @@
+"""
+test_matching.py — SQL-side match scoring and cached top-k for /matches.
+"""
+import datetime
+
+import pytest
+import matching
+from conftest import make_owner, make_user, make_listing, login_as
+
+
+def reference_score(user, l):
+    """The original Python scoring loop from matches()."""
+    score = 60
+    if user.alert_airport and l.airport_icao == user.alert_airport:
+        score += 25
+    elif user.alert_airport:
+        score += 5
+    if user.alert_max_price and l.price_month <= user.alert_max_price:
+        score += 15
+    if l.owner.is_premium:
+        score += 5
+    if l.owner.is_certified:
+        score += 10
+    if l.health_score >= 80:
+        score += 5
+    if l.min_stay_nights <= 7:
+        score += 20
+    return min(score, 99)
+
+
+class TestMatching:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        self.owner = make_owner(db, username='match_owner', email='match_owner@test.com')
+        self.pro = make_owner(db, username='match_pro', email='match_pro@test.com')
+        self.pro.is_premium = True
+        self.pro.is_certified = True
+        self.user = make_user(db, username='match_user', email='match_user@test.com')
+        self.user.alert_airport = 'KMTC'
+        self.user.alert_max_price = 400
+        self.listings = []
+        for i, (owner, icao, price, health, stay) in enumerate([
+            (self.owner, 'KMTC', 500, 50, 30),
+            (self.pro, 'KMTC', 350, 90, 3),
+            (self.owner, 'KMTD', 300, 85, 1),
+            (self.pro, 'KMTD', 900, 10, 14),
+        ]):
+            l = make_listing(db, owner, icao=icao, price=price)
+            l.health_score = health
+            l.min_stay_nights = stay
+            # Oldest first, so these would have fallen outside the old "recent" pool
+            l.created_at = datetime.datetime(2000, 1, 1 + i)
+            self.listings.append(l)
+        db.session.commit()
+        yield
+        for l in self.listings:
+            db.session.delete(l)
+        for u in (self.user, self.owner, self.pro):
+            db.session.delete(u)
+        db.session.commit()
+        matching.invalidate_matches()
+        app.limiter.enabled = True
+
+    def test_sql_score_matches_reference(self, db):
+        ours = {l.id for l in self.listings}
+        ranked = dict(matching.ranked_ids(self.user, k=10000))
+        for l in self.listings:
+            assert ranked[l.id] == reference_score(self.user, l)
+        scores = [s for lid, s in matching.ranked_ids(self.user, k=10000) if lid in ours]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_considers_old_listings(self, db):
+        # Bury our listings under newer ones that score lower
+        self.listings += [make_listing(db, self.owner, icao='KZZZ', price=5000) for _ in range(3)]
+        ours = {l.id for l in self.listings}
+        top = [r for r in matching.ranked_ids(self.user, k=10000) if r[0] in ours][:2]
+        assert top == [(self.listings[2].id, 99), (self.listings[1].id, 99)]
+
+    def test_results_cached_until_prefs_or_listings_change(self, db, monkeypatch):
+        calls = []
+        real = matching.ranked_ids
+        monkeypatch.setattr(matching, 'ranked_ids', lambda *a, **kw: calls.append(1) or real(*a, **kw))
+
+        first = matching.cached_ranked_ids(self.user, 10)
+        assert matching.cached_ranked_ids(self.user, 10) == first
+        assert len(calls) == 1
+
+        self.user.alert_airport = 'KMTD'
+        db.session.commit()
+        matching.cached_ranked_ids(self.user, 10)
+        assert len(calls) == 2
+
+        self.listings[0].price_month = 100
+        db.session.commit()
+        matching.cached_ranked_ids(self.user, 10)
+        assert len(calls) == 3
+
+    def test_owner_badges_invalidate_matches(self, db, monkeypatch):
+        calls = []
+        real = matching.ranked_ids
+        monkeypatch.setattr(matching, 'ranked_ids', lambda *a, **kw: calls.append(1) or real(*a, **kw))
+
+        matching.cached_ranked_ids(self.user, 10)
+        self.owner.points = (self.owner.points or 0) + 1     # not part of the score
+        db.session.commit()
+        matching.cached_ranked_ids(self.user, 10)
+        assert len(calls) == 1
+
+        self.owner.is_certified = True
+        db.session.commit()
+        matching.cached_ranked_ids(self.user, 10)
+        assert len(calls) == 2
+
+    def test_matches_page(self, client):
+        login_as(client, self.user)
+        r = client.get('/matches')
+        assert r.status_code == 200
+        assert b'KMTC' in r.data
@@ -0,0 +1,93 @@
+"""
+test_metar_feed.py — bulk METAR/TAF ingestion from aviationweather.gov cache files (offline fixtures).
+"""
+import datetime
+import gzip
+import os
+
+import pytest
+import metar_feed
+import weather_service
+from conftest import make_owner, make_listing
+from weather_service import cached_airport_weather
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+METARS_CSV = os.path.join(FIXTURES, 'metars.cache.csv')
+METARS_XML = os.path.join(FIXTURES, 'metars.cache.xml')
+TAFS_XML = os.path.join(FIXTURES, 'tafs.cache.xml')
+NOW = datetime.datetime(2026, 10, 19, 15, 30)
+
+
+class TestMetarFeed:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, monkeypatch):
+        monkeypatch.setattr(metar_feed, '_utcnow', lambda: NOW)
+        self.live_calls = []
+        monkeypatch.setattr(weather_service, '_fetch_live',
+                            lambda lat, lon, icao='': self.live_calls.append(icao) or None)
+        metar_feed.load(METARS_CSV, TAFS_XML)
+        weather_service.clear_cache()
+        yield
+        metar_feed.clear()
+        weather_service.clear_cache()
+
+    def test_csv_index(self):
+        osh = metar_feed.metar('kosh')
+        assert osh.observed_at == datetime.datetime(2026, 10, 19, 14, 53)       # newest of two reports
+        assert (osh.wind_dir, osh.wind_kt, osh.visibility_mi) == (270, 8.0, 10.0)
+        assert (osh.cover, osh.ceiling_ft, osh.category) == ('FEW', None, 'VFR')
+        ord_ = metar_feed.metar('KORD')
+        assert (ord_.gust_kt, ord_.wx, ord_.ceiling_ft) == (32.0, '+TSRA', 2500.0)
+        assert metar_feed.metar('KSEA').ceiling_ft == 200.0                    # vertical visibility
+        assert metar_feed.metar('KMSN').wind_dir is None                       # VRB
+        assert metar_feed.metar('KOLD') is None                                # stopped reporting
+        assert metar_feed.metar('ZZZZ') is None
+
+    def test_taf_index(self):
+        assert metar_feed.taf('KOSH').raw.startswith('TAF KOSH 191120Z')
+        assert metar_feed.taf('KORD').valid_to == datetime.datetime(2026, 10, 20, 18)
+        assert metar_feed.taf('KMSN') is None                                  # expired
+
+    def test_xml_and_gzip_sources(self, tmp_path):
+        gz = tmp_path / 'metars.cache.csv.gz'
+        with open(METARS_CSV, 'rb') as f:
+            gz.write_bytes(gzip.compress(f.read()))
+        metar_feed.load(str(gz))
+        assert metar_feed.metar('KORD').raw.startswith('KORD 191451Z')
+        metar_feed.load(METARS_XML)
+        ytz = metar_feed.metar('CYTZ')
+        assert (ytz.wind_kt, ytz.gust_kt, ytz.wx, ytz.cover, ytz.ceiling_ft) == (14.0, 24.0, '-SHRA', 'BKN', 6000.0)
+
+    def test_failed_read_keeps_last_known_index(self, tmp_path):
+        before = metar_feed.metar('KOSH')
+        metar_feed.load(str(tmp_path / 'missing.csv'), str(tmp_path / 'missing.xml'))
+        assert metar_feed.metar('KOSH') is before and metar_feed.taf('KOSH') is not None
+
+    def test_go_nogo_from_observations(self):
+        osh = cached_airport_weather(0, 0, 'KOSH')
+        assert osh['source'] == 'metar' and osh['go_nogo'] == 'GO'
+        assert osh['temp_f'] == 54 and osh['description'] == 'Few Clouds' and osh['raw_taf']
+        ord_ = cached_airport_weather(0, 0, 'KORD')
+        assert ord_['go_nogo'] == 'NO-GO' and ord_['conditions'] == 'Thunderstorm'
+        assert ord_['description'] == 'Heavy Thunderstorm Rain' and ord_['storm_risk'] == 'High'
+        pdx = cached_airport_weather(0, 0, 'KPDX')
+        assert pdx['go_nogo'] == 'NO-GO' and pdx['go_nogo_reasons'] == ['Ceiling 800 ft — below VFR min']
+        msn = cached_airport_weather(0, 0, 'KMSN')
+        assert msn['go_nogo'] == 'CAUTION' and msn['wind_dir'] == 'VRB'
+        assert self.live_calls == []
+        # Not in the feed: the per-airport path as before
+        assert cached_airport_weather(0, 0, 'KOLD')['source'] == 'simulated'
+        assert self.live_calls == ['KOLD']
+
+    def test_listing_page_shows_the_metar(self, client, db):
+        owner = make_owner(db, username='mt_owner', email='mt_owner@test.com')
+        listing = make_listing(db, owner, icao='KORD')
+        try:
+            page = client.get(f'/listing/{listing.id}').data.decode()
+            assert 'KORD 191451Z 22018G32KT' in page and 'TAF KORD 191130Z' in page
+            assert 'Observed 14:51Z' in page
+        finally:
+            db.session.delete(listing)
+            db.session.delete(owner)
+            db.session.commit()
@@ -0,0 +1,94 @@
+"""
+test_owner_exports.py — streaming CSV/XLSX owner report exports.
+"""
+import csv
+import datetime
+import io
+import zipfile
+
+import pytest
+from conftest import make_owner, make_user, make_listing, login_as
+from models import Booking, Payment
+
+
+class TestOwnerExports:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        self.owner = make_owner(db, username='export_owner', email='export_owner@test.com')
+        self.owner.is_premium = True
+        self.renter = make_user(db, username='export_renter', email='export_renter@test.com')
+        self.listing = make_listing(db, self.owner, icao='KOSH')
+        start = datetime.datetime(2026, 7, 20)
+        self.bookings = []
+        for i in range(3):
+            b = Booking(listing_id=self.listing.id, renter_id=self.renter.id,
+                        start_date=start + datetime.timedelta(days=10 * i),
+                        end_date=start + datetime.timedelta(days=10 * i + 4),
+                        total_price=400.0, status='Confirmed' if i < 2 else 'Pending')
+            db.session.add(b)
+            self.bookings.append(b)
+        self.payment = Payment(user_id=self.renter.id, amount=440.0, item_type='rental_booking',
+                               item_id=self.listing.id, stripe_session_id='mock_export', status='completed')
+        db.session.add(self.payment)
+        db.session.commit()
+        yield
+        for b in self.bookings:
+            db.session.delete(b)
+        db.session.delete(self.payment)
+        db.session.delete(self.listing)
+        db.session.delete(self.renter)
+        db.session.delete(self.owner)
+        db.session.commit()
+        app.limiter.enabled = True
+
+    def test_export_requires_login(self, client):
+        r = client.get('/dashboard/owner/export/bookings.csv')
+        assert r.status_code == 302
+        assert 'login' in r.location.lower()
+
+    def test_export_requires_premium(self, client, db):
+        self.owner.is_premium = False
+        db.session.commit()
+        login_as(client, self.owner)
+        r = client.get('/dashboard/owner/export/bookings.csv')
+        assert r.status_code == 302
+        assert 'pricing' in r.location
+
+    def test_unknown_report_404(self, client):
+        login_as(client, self.owner)
+        assert client.get('/dashboard/owner/export/secrets.csv').status_code == 404
+        assert client.get('/dashboard/owner/export/bookings.pdf').status_code == 404
+
+    def test_bookings_csv_is_streamed(self, client):
+        login_as(client, self.owner)
+        r = client.get('/dashboard/owner/export/bookings.csv')
+        assert r.status_code == 200
+        assert r.is_streamed
+        assert 'attachment' in r.headers['Content-Disposition']
+        rows = list(csv.reader(io.StringIO(r.get_data(as_text=True))))
+        assert rows[0][0] == 'booking_id'
+        assert len(rows) == 4
+        assert {row[6] for row in rows[1:]} == {'4'}  # nights column
+
+    def test_earnings_csv_aggregates_confirmed(self, client):
+        login_as(client, self.owner)
+        r = client.get('/dashboard/owner/export/earnings.csv')
+        rows = list(csv.DictReader(io.StringIO(r.get_data(as_text=True))))
+        assert len(rows) == 1
+        assert rows[0]['bookings'] == '3'
+        assert rows[0]['confirmed_bookings'] == '2'
+        assert float(rows[0]['gross_revenue']) == 800.0
+        assert float(rows[0]['owner_earnings']) == 720.0
+
+    def test_payments_xlsx_is_valid_workbook(self, client):
+        login_as(client, self.owner)
+        r = client.get('/dashboard/owner/export/payments.xlsx')
+        assert r.status_code == 200
+        zf = zipfile.ZipFile(io.BytesIO(r.get_data()))
+        assert zf.testzip() is None
+        sheet = zf.read('xl/worksheets/sheet1.xml').decode()
+        assert 'payment_id' in sheet
+        assert 'mock_export' in sheet
+        assert sheet.count('<row>') == 2
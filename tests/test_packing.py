@@ -0,0 +1,138 @@
+"""
+test_packing.py — multi-aircraft hangar packing (geometry, options, cache, booking check).
+"""
+import datetime
+import random
+
+import pytest
+import packing
+import checkout
+from capacity import aircraft_footprint
+from checkout import place_hold, HoldUnavailable
+from conftest import make_owner, make_user, make_listing, login_as
+from models import Booking, Payment
+from packing import CLEARANCE_FT, how_many_more, pack
+
+
+class TestPacking:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app):
+        with app.app_context():
+            self.types = [n for models in app.config['AIRCRAFT_SIZES'].values() for n in models]
+            yield
+
+    def test_rows_of_172s(self):
+        assert pack(60, 50, ['Cessna 172', 'Cessna 172']).fits
+        third = pack(60, 50, ['Cessna 172'] * 3)
+        assert not third.fits and third.unplaced == ('Cessna 172',)
+        assert how_many_more(60, 50, [], 'Cessna 172') == 2
+        assert how_many_more(60, 50, ['Cessna 172'] * 3, 'Cessna 172') == 0
+
+    def test_geometry_beats_floor_area(self):
+        # 2,704 sq ft is more than a PC-12's L × W, but its span doesn't go across 52 ft either way
+        assert 52 * 52 > 47.3 * 53.4
+        assert not pack(52, 52, ['Pilatus PC-12']).fits
+        assert pack(60, 52, ['Pilatus PC-12']).fits
+
+    def test_wing_overlap_and_tail_height(self):
+        assert how_many_more(100, 32, [], 'Cessna 172') == 2
+        assert how_many_more(100, 32, [], 'Cessna 172', wing_overlap=True) == 3
+        tall = pack(80, 80, ['Pilatus PC-12', 'Cessna 172'], height_limit=14)
+        assert tall.too_tall == ('Pilatus PC-12',) and not tall.fits
+        assert how_many_more(80, 80, [], 'Pilatus PC-12', height_limit=14) == 0
+
+    def test_placements_are_disjoint_and_inside(self):
+        rng = random.Random(5)
+        for _ in range(30):
+            width, depth = rng.uniform(40, 160), rng.uniform(40, 120)
+            result = pack(width, depth, [rng.choice(self.types) for _ in range(rng.randrange(1, 9))])
+            spots = result.placements
+            for i, a in enumerate(spots):
+                assert a.x >= 0 and a.y >= 0
+                assert a.x + a.width <= round(width, 1) + 1e-6 and a.y + a.depth <= round(depth, 1) + 1e-6
+                for b in spots[i + 1:]:
+                    assert (a.x + a.width <= b.x + 1e-6 or b.x + b.width <= a.x + 1e-6 or
+                            a.y + a.depth <= b.y + 1e-6 or b.y + b.depth <= a.y + 1e-6)
+            assert len(spots) + len(result.unplaced) + len(result.too_tall) > 0
+
+    def test_packings_are_cached_by_multiset(self):
+        names = ['Cirrus SR22', 'Cessna 172', 'Cessna 172']
+        pack(75, 55, names)
+        hits = packing._pack.cache_info().hits
+        assert pack(75.0, 55.0, list(reversed(names))) == pack(75, 55, names)
+        assert packing._pack.cache_info().hits == hits + 2
+
+
+class TestBookingPacking:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        self.owner = make_owner(db, username='pk_owner', email='pk_owner@test.com')
+        self.renters = [make_user(db, username=f'pk_renter{i}', email=f'pk_renter{i}@test.com') for i in range(2)]
+        self.listing = make_listing(db, self.owner, icao='KPAK', size=2380)
+        self.listing.price_night = 80.0
+        self.listing.hangar_width_ft, self.listing.hangar_depth_ft = 70.0, 34.0
+        self.listing.tail_height_clearance = 12.0
+        db.session.commit()
+        yield
+        Payment.query.filter(Payment.user_id.in_([r.id for r in self.renters])).delete()
+        Booking.query.filter_by(listing_id=self.listing.id).delete()
+        for obj in [self.listing, self.owner] + self.renters:
+            db.session.delete(obj)
+        db.session.commit()
+        app.limiter.enabled = True
+
+    def _book(self, client, renter, aircraft, start='2026-09-01', end='2026-09-05'):
+        login_as(client, renter)
+        r = client.post(f'/book/{self.listing.id}', data={
+            'start_date': start, 'end_date': end, 'booking_aircraft': aircraft}, follow_redirects=False)
+        client.get('/logout')
+        return r.status_code
+
+    def test_checks_geometry_of_aircraft_already_booked(self, client):
+        assert self._book(client, self.renters[0], 'Cirrus SR22') == 303
+        assert Booking.query.filter_by(listing_id=self.listing.id).one().aircraft_type == 'Cirrus SR22'
+        # 2,380 sq ft takes an SR22 and a Bonanza by area, not by shape
+        assert not pack(70, 34, ['Cirrus SR22', 'Beechcraft Bonanza']).fits
+        assert self._book(client, self.renters[1], 'Beechcraft Bonanza', '2026-09-03', '2026-09-04') == 302
+        assert self._book(client, self.renters[1], 'Beechcraft Bonanza', '2026-09-05', '2026-09-08') == 303
+
+    def test_too_tall_for_the_door(self, client):
+        assert self._book(client, self.renters[0], 'Pilatus PC-12') == 302
+        assert Booking.query.filter_by(listing_id=self.listing.id).count() == 0
+
+    def test_packing_is_checked_under_the_hold_claim(self, db, monkeypatch):
+        real_claim = checkout._claim
+        calls = []
+
+        def racing_claim(listing_id, seen):
+            # Another worker holds an SR22 between our packing check and our claim
+            if not calls:
+                calls.append(1)
+                db.session.rollback()
+                db.session.add(Booking(listing_id=listing_id, renter_id=self.renters[0].id, total_price=1.0,
+                                       start_date=datetime.datetime(2026, 10, 1),
+                                       end_date=datetime.datetime(2026, 10, 5), status='Confirmed',
+                                       aircraft_type='Cirrus SR22', footprint_sqft=aircraft_footprint('Cirrus SR22')))
+                db.session.execute(db.text("UPDATE listings SET version = version + 1 WHERE id = :id"),
+                                   {'id': listing_id})
+                db.session.commit()
+            return real_claim(listing_id, seen)
+
+        monkeypatch.setattr(checkout, '_claim', racing_claim)
+        with pytest.raises(HoldUnavailable, match="won't fit the hangar floor"):
+            place_hold(self.listing, self.renters[1].id, '2026-10-02', '2026-10-04',
+                       footprint_sqft=aircraft_footprint('Beechcraft Bonanza'), total_price=1.0,
+                       aircraft_type='Beechcraft Bonanza')
+        assert Booking.query.filter_by(listing_id=self.listing.id, renter_id=self.renters[1].id).count() == 0
+
+    def test_space_calculator_counts_more_of_a_type(self, client):
+        login_as(client, self.owner)
+        r = client.post('/dashboard/space-calculator', data={
+            'hangar_length': 50, 'hangar_width': 60, 'aircraft_type_1': 'Cessna 172', 'qty_1': 1,
+            'target_type': 'Cessna 172'})
+        remaining = 3000 - round((36.1 + CLEARANCE_FT) * (27.2 + CLEARANCE_FT), 1)
+        assert "{:,.0f}".format(remaining).encode() in r.data
+        assert b'1 more' in r.data and b'Cessna 172' in r.data
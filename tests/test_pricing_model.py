@@ -0,0 +1,173 @@
+"""
+test_pricing_model.py — versioned, persisted AI Rental Optimizer model.
+"""
+import pytest
+import pricing_model
+from pricing_features import FeaturePipeline
+from conftest import make_owner, make_listing, login_as
+
+
+@pytest.fixture
+def model_dir(app, tmp_path):
+    app.config['PRICING_MODEL_DIR'] = str(tmp_path)
+    pricing_model.reset_cache()
+    yield str(tmp_path)
+    app.config['PRICING_MODEL_DIR'] = None
+    pricing_model.reset_cache()
+
+
+class TestPricingModel:
+
+    def test_train_publish_and_load(self, model_dir):
+        artifact = pricing_model.train_and_publish(model_dir)
+        assert artifact is not None
+        loaded = pricing_model.get_model(model_dir, force_check=True)
+        assert loaded.version == artifact.version
+        assert loaded.fingerprint == artifact.fingerprint
+        assert loaded.features == pricing_model.FEATURES
+
+    def test_unchanged_data_is_not_retrained(self, model_dir):
+        first = pricing_model.train_and_publish(model_dir)
+        assert pricing_model.train_and_publish(model_dir) is None
+        forced = pricing_model.train_and_publish(model_dir, force=True)
+        assert forced.version != first.version
+        assert forced.fingerprint == first.fingerprint
+
+    def test_hot_swap_on_new_version(self, model_dir):
+        pricing_model.train_and_publish(model_dir)
+        old = pricing_model.get_model(model_dir, force_check=True)
+        # Cached: no re-check inside the reload window
+        assert pricing_model.get_model(model_dir) is old
+        newer = pricing_model.train_and_publish(model_dir, force=True)
+        assert pricing_model.get_model(model_dir, force_check=True).version == newer.version
+
+    def test_fingerprint_is_order_independent(self):
+        rows = [{'size_sqft': 1000, 'covered': 1, 'price_month': 300},
+                {'size_sqft': 2000, 'covered': 0, 'price_month': 400}]
+        assert pricing_model.fingerprint_rows(rows) == pricing_model.fingerprint_rows(rows[::-1])
+
+    def test_optimizer_page_never_trains(self, app, client, db, model_dir, monkeypatch):
+        app.limiter.enabled = False
+        owner = make_owner(db, username='opt_owner', email='opt_owner@test.com')
+        owner.is_premium = True
+        listing = make_listing(db, owner, icao='KOSH')
+        pricing_model.train_and_publish(model_dir)
+        pricing_model.reset_cache()
+
+        def _boom(*a, **kw):
+            raise AssertionError("optimizer page must not train")
+        monkeypatch.setattr(pricing_model, 'train', _boom)
+
+        login_as(client, owner)
+        r = client.get('/insights/optimizer')
+        assert r.status_code == 200
+        assert b'KOSH' in r.data
+
+        db.session.delete(listing)
+        db.session.delete(owner)
+        db.session.commit()
+        app.limiter.enabled = True
+
+
+class TestBatchScoring:
+
+    @pytest.fixture(autouse=True)
+    def _listings(self, db, model_dir):
+        self.owner = make_owner(db, username='batch_owner', email='batch_owner@test.com')
+        self.listings = [make_listing(db, self.owner, icao='KOSH', price=200 + 150 * i, size=1000 + 500 * i)
+                         for i in range(4)]
+        yield
+        for l in self.listings:
+            db.session.delete(l)
+        db.session.delete(self.owner)
+        db.session.commit()
+
+    def test_batch_matches_single_row_predictions(self, model_dir):
+        artifact = pricing_model.train_and_publish(model_dir)
+        batch = pricing_model.score_listings(self.listings, artifact)
+        assert [s['listing_id'] for s in batch] == [l.id for l in self.listings]
+        for l, s in zip(self.listings, batch):
+            single = pricing_model.score_listings([l], artifact)[0]
+            assert single == s
+            assert 10 <= s['success_chance'] <= 98
+            assert s['price_diff'] == round(l.price_month - s['ideal_price'], 2)
+
+    def test_scoring_without_model_uses_listing_price(self, model_dir):
+        scores = pricing_model.score_listings(self.listings, None)
+        assert all(s['price_diff'] == 0 and s['success_chance'] == 75.0 for s in scores)
+
+    def test_score_all_active_persists_results(self, db, model_dir):
+        artifact = pricing_model.train_and_publish(model_dir)
+        scored = pricing_model.score_all_active(batch_size=3)
+        assert scored >= len(self.listings)
+        for l in self.listings:
+            db.session.refresh(l)
+            assert l.ai_model_version == artifact.version
+            assert l.ai_suggested_price is not None
+
+    def test_stored_scores_predict_only_unscored_listings(self, db, model_dir, monkeypatch):
+        artifact = pricing_model.train_and_publish(model_dir)
+        expected = pricing_model.score_listings(self.listings, artifact)
+        pricing_model.score_all_active()
+        for l in self.listings:
+            db.session.refresh(l)
+        fresh = make_listing(db, self.owner, icao='KOSH', price=900, size=2500)
+        self.listings.append(fresh)
+
+        predicted = []
+        real = artifact.model.predict
+        monkeypatch.setattr(artifact.model, 'predict', lambda X: predicted.append(len(X)) or real(X))
+        self.listings[0].price_month = 1500          # repriced since the nightly run
+        scores = pricing_model.stored_scores(self.listings, artifact)
+        assert predicted == [1]
+        assert [s['ideal_price'] for s in scores[:4]] == [s['ideal_price'] for s in expected]
+        assert scores[0]['price_diff'] == round(1500 - expected[0]['ideal_price'], 2)
+        assert scores[4] == pricing_model.score_listings([fresh], artifact)[0]
+
+
+class TestFeaturePipeline:
+
+    ROWS = [
+        {'airport_icao': 'KOSH', 'size_sqft': 1200, 'covered': True, 'is_heated': True, 'price_month': 600},
+        {'airport_icao': 'KOSH', 'size_sqft': 1500, 'covered': True, 'price_month': 700},
+        {'airport_icao': 'KAPA', 'size_sqft': 2000, 'covered': False, 'door_type': 'Electric', 'price_month': 300},
+        {'airport_icao': 'kapa ', 'size_sqft': 900, 'covered': False, 'lat': 39.57, 'lon': -104.85, 'price_month': 250},
+    ]
+
+    def test_fit_transform_shape_and_oof_encoding(self):
+        pipe = FeaturePipeline(folds=2)
+        X = pipe.fit_transform(self.ROWS, [r['price_month'] for r in self.ROWS])
+        assert list(X.columns) == pricing_model.FEATURES
+        assert not X.isna().any().any()
+        assert list(X['electric_door']) == [0, 0, 1, 0]
+        # 'kapa ' is normalised into the KAPA group
+        assert set(pipe.airport_means) == {'KOSH', 'KAPA'}
+        assert pipe.airport_means['KOSH'] > pipe.global_mean > pipe.airport_means['KAPA']
+
+    def test_unseen_airport_falls_back_to_global_mean(self):
+        pipe = FeaturePipeline()
+        pipe.fit_transform(self.ROWS, [r['price_month'] for r in self.ROWS])
+        X = pipe.transform([{'airport_icao': 'KZZZ', 'size_sqft': 1000}])
+        assert X['airport_te'].iloc[0] == pytest.approx(pipe.global_mean)
+        assert X['lat'].iloc[0] == pytest.approx(39.57)
+
+    def test_evaluate_reports_both_feature_sets(self):
+        rows = [{'airport_icao': 'KOSH' if i % 2 else 'KAPA', 'size_sqft': 800 + 100 * i,
+                 'covered': i % 3 == 0, 'price_month': 200 + 20 * i} for i in range(20)]
+        rows.append({'size_sqft': 5000, 'covered': 1, 'price_month': 999, 'synthetic': True})
+        report = pricing_model.evaluate(rows, test_size=0.25, seed=7)
+        assert report['n_test'] == 5
+        assert report['n_train'] == 16
+        assert report['synthetic_rows'] == 1
+        assert set(report['models']) == {'full', 'legacy'}
+        for m in report['models'].values():
+            assert {'mae', 'rmse', 'mape_pct', 'r2', 'fit_seconds', 'infer_ms_per_1k'} <= set(m)
+            assert m['rmse'] >= m['mae'] >= 0
+        # Same seed → same split and metrics
+        again = pricing_model.evaluate(rows, test_size=0.25, seed=7)
+        assert again['models']['full']['mae'] == report['models']['full']['mae']
+
+    def test_evaluate_needs_real_rows(self):
+        rows = [{'size_sqft': 1000, 'price_month': 300, 'synthetic': True}] * 10
+        with pytest.raises(ValueError):
+            pricing_model.evaluate(rows)
@@ -0,0 +1,128 @@
+"""
+test_quotes.py — shared pricing module and cached GET /api/quote.
+"""
+import datetime
+
+import pytest
+import event_surge
+import quotes
+from event_surge import SurgeIndex, make_event
+from conftest import make_owner, make_user, make_listing, login_as
+from models import Booking, Payment
+
+
+class TestQuoteApi:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        ev = make_event('AirVenture', '2026-07-20', '2026-07-26', 50, ['KOSH'], radius_nm=0)
+        event_surge.reset_index(SurgeIndex([ev], coords={}))
+        self.owner = make_owner(db, username='quote_owner', email='quote_owner@test.com')
+        self.renter = make_user(db, username='quote_renter', email='quote_renter@test.com')
+        self.listing = make_listing(db, self.owner, icao='KOSH', price=2400.0)
+        self.listing.price_night = 100.0
+        db.session.commit()
+        yield
+        Payment.query.filter_by(user_id=self.renter.id).delete()
+        Booking.query.filter_by(listing_id=self.listing.id).delete()
+        db.session.delete(self.listing)
+        db.session.delete(self.renter)
+        db.session.delete(self.owner)
+        db.session.commit()
+        event_surge.reset_index()
+        app.limiter.enabled = True
+
+    def _quote(self, client, start, end, **extra):
+        params = {'listing_id': self.listing.id, 'start': start, 'end': end, **extra}
+        return client.get('/api/quote', query_string=params)
+
+    def test_nightly_breakdown_with_surge(self, client):
+        r = self._quote(client, '2026-07-18', '2026-07-22', insurance=1)
+        assert r.status_code == 200
+        q = r.get_json()
+        assert q['rate_type'] == 'nightly'
+        assert [n['amount'] for n in q['breakdown']] == [100.0, 100.0, 150.0, 150.0]
+        assert q['breakdown'][2]['event'] == 'AirVenture'
+        assert q['rental'] == 500.0
+        assert q['surge_total'] == 100.0
+        assert q['platform_fee'] == 50.0
+        assert q['insurance_fee'] == 105.0
+        assert q['total'] == 655.0
+        assert q['available'] is True
+
+    def test_monthly_rate_for_long_stays(self, client):
+        q = self._quote(client, '2026-07-01', '2026-07-31').get_json()
+        assert q['rate_type'] == 'monthly'
+        assert q['rental'] == 2400.0
+        assert len(q['breakdown']) == 30
+
+    def test_invalid_ranges(self, client):
+        assert self._quote(client, '2026-07-22', '2026-07-18').status_code == 400
+        assert self._quote(client, 'tomorrow', '2026-07-18').status_code == 400
+        assert client.get('/api/quote?listing_id=1').status_code == 400
+        r = client.get('/api/quote', query_string={'listing_id': 999999, 'start': '2026-07-18', 'end': '2026-07-22'})
+        assert r.status_code == 404
+
+    def test_cached_until_listing_changes(self, client, db, monkeypatch):
+        calls = []
+        real = quotes.build_quote
+        monkeypatch.setattr(quotes, 'build_quote', lambda *a, **kw: calls.append(1) or real(*a, **kw))
+
+        first = self._quote(client, '2026-07-18', '2026-07-22').get_json()
+        assert self._quote(client, '2026-07-18', '2026-07-22').get_json() == first
+        assert len(calls) == 1
+
+        self.listing.price_night = 120.0
+        db.session.commit()
+        again = self._quote(client, '2026-07-18', '2026-07-22').get_json()
+        assert len(calls) == 2
+        assert again['breakdown'][0]['amount'] == 120.0
+
+    def test_invalidated_on_commit_not_flush(self, db):
+        before = quotes._listing_version(self.listing.id)
+        self.listing.price_night = 130.0
+        db.session.flush()
+        # Other requests still read the old row, so bumping now would let them recache it
+        assert quotes._listing_version(self.listing.id) == before
+        db.session.commit()
+        after = quotes._listing_version(self.listing.id)
+        assert after != before
+
+        self.listing.price_night = 140.0
+        db.session.flush()
+        db.session.rollback()
+        assert quotes._listing_version(self.listing.id) == after
+
+    def test_confirmed_booking_invalidates_and_blocks(self, client, db):
+        assert self._quote(client, '2026-08-01', '2026-08-05').get_json()['available'] is True
+        db.session.add(Booking(listing_id=self.listing.id, renter_id=self.renter.id,
+                               start_date=datetime.datetime(2026, 8, 3), end_date=datetime.datetime(2026, 8, 6),
+                               total_price=300.0, status='Confirmed'))
+        db.session.commit()
+        assert self._quote(client, '2026-08-01', '2026-08-05').get_json()['available'] is False
+        # Back-to-back stays don't overlap
+        assert self._quote(client, '2026-08-06', '2026-08-08').get_json()['available'] is True
+
+    def test_cached_no_longer_than_the_hold_blocking_it(self, db):
+        soon = datetime.datetime.utcnow() + datetime.timedelta(seconds=90)
+        db.session.add(Booking(listing_id=self.listing.id, renter_id=self.renter.id,
+                               start_date=datetime.datetime(2026, 9, 3), end_date=datetime.datetime(2026, 9, 6),
+                               total_price=300.0, status='Pending', hold_expires_at=soon))
+        db.session.commit()
+        assert quotes.get_quote(self.listing.id, '2026-09-01', '2026-09-05')['available'] is False
+        assert 85 <= quotes._quote_timeout(self.listing.id, '2026-09-01', '2026-09-05') <= 90
+        # Dates the hold doesn't touch keep the full lifetime
+        assert quotes._quote_timeout(self.listing.id, '2026-09-06', '2026-09-08') == quotes.QUOTE_CACHE_SECONDS
+
+    def test_booking_charges_the_quoted_total(self, client):
+        quoted = self._quote(client, '2026-07-18', '2026-07-22', insurance=1).get_json()
+        login_as(client, self.renter)
+        r = client.post(f'/book/{self.listing.id}', data={
+            'start_date': '2026-07-18', 'end_date': '2026-07-22', 'add_insurance': 'on'})
+        assert r.status_code == 303
+        booking = Booking.query.filter_by(listing_id=self.listing.id).one()
+        payment = Payment.query.filter_by(user_id=self.renter.id).one()
+        assert booking.total_price == quoted['rental']
+        assert booking.insurance_fee == quoted['insurance_fee']
+        assert payment.amount == pytest.approx(quoted['total'])
@@ -0,0 +1,109 @@
+"""
+test_recommendations.py — nightly precomputed user_recommendations.
+"""
+import numpy as np
+import pytest
+import matching
+import recommendations
+from conftest import make_owner, make_user, make_listing, login_as
+from models import UserRecommendation
+
+
+class TestTopN:
+
+    def test_ties_keep_column_order(self):
+        scores = np.array([[70, 99, 99, 80, 99],
+                           [10, 20, 30, 40, 50]])
+        idx, top = recommendations.top_n(scores, 3)
+        assert idx.tolist() == [[1, 2, 4], [4, 3, 2]]
+        assert top.tolist() == [[99, 99, 99], [50, 40, 30]]
+
+    def test_more_requested_than_columns(self):
+        idx, _ = recommendations.top_n(np.array([[5, 7]]), 10)
+        assert idx.tolist() == [[1, 0]]
+
+
+class TestRecommendations:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        self.owner = make_owner(db, username='rec_owner', email='rec_owner@test.com')
+        self.pro = make_owner(db, username='rec_pro', email='rec_pro@test.com')
+        self.pro.is_premium = True
+        self.pro.is_certified = True
+        self.users = []
+        for i, (airport, budget) in enumerate([('KREA', 400), ('KREB', None), (None, 250)]):
+            u = make_user(db, username=f'rec_user{i}', email=f'rec_user{i}@test.com')
+            u.alert_airport, u.alert_max_price = airport, budget
+            self.users.append(u)
+        self.listings = []
+        for owner, icao, price, health, stay in [
+            (self.owner, 'KREA', 500, 50, 30),
+            (self.pro, 'KREA', 350, 90, 3),
+            (self.owner, 'KREB', 200, 85, 1),
+            (self.pro, 'KREB', 900, 10, 14),
+            (self.owner, 'KREC', 240, 95, 7),
+        ]:
+            l = make_listing(db, owner, icao=icao, price=price)
+            l.health_score, l.min_stay_nights = health, stay
+            self.listings.append(l)
+        db.session.commit()
+        yield
+        UserRecommendation.query.delete()
+        for l in self.listings:
+            db.session.delete(l)
+        for u in self.users + [self.owner, self.pro]:
+            db.session.delete(u)
+        db.session.commit()
+        matching.invalidate_matches()
+        app.limiter.enabled = True
+
+    def _stored(self, user):
+        return [(r.listing_id, int(r.score)) for r in
+                UserRecommendation.query.filter_by(user_id=user.id).order_by(UserRecommendation.rank)]
+
+    def test_rebuild_matches_live_sql_ranking(self):
+        # block_cells=1 forces one user per block
+        recommendations.rebuild_all(n=3, block_cells=1)
+        for u in self.users:
+            assert self._stored(u) == matching.ranked_ids(u, k=3)
+
+    def test_delta_rescores_only_affected_users(self, db):
+        recommendations.rebuild_all(n=2)
+        before = {u.id: self._stored(u) for u in self.users}
+        since = db.session.query(db.func.max(UserRecommendation.computed_at)).scalar()
+
+        # Strong for KREA's budget user only: ordinary owner, long stay, low health
+        fresh = make_listing(db, self.owner, icao='KREA', price=300)
+        fresh.health_score, fresh.min_stay_nights = 10, 30
+        db.session.commit()
+        self.listings.append(fresh)
+
+        affected = recommendations.affected_by_new_listings(since, n=2)
+        assert self.users[0].id in affected
+        assert self.users[1].id not in affected
+
+        recommendations.refresh_for_new_listings(since=since, n=2)
+        assert self._stored(self.users[0]) == matching.ranked_ids(self.users[0], k=2)
+        assert self._stored(self.users[1]) == before[self.users[1].id]
+
+    def test_matches_page_reads_precomputed_rows(self, client, monkeypatch):
+        recommendations.rebuild_all(n=5)
+
+        def _boom(*a, **kw):
+            raise AssertionError("live ranking should not run")
+        monkeypatch.setattr(matching, 'ranked_ids', _boom)
+
+        login_as(client, self.users[0])
+        r = client.get('/matches')
+        assert r.status_code == 200
+        assert b'KREA' in r.data
+        assert client.get('/renter-dashboard').status_code == 200
+
+    def test_profile_change_clears_rows(self, client):
+        recommendations.rebuild_all(n=5)
+        login_as(client, self.users[1])
+        client.post('/profile', data={'alert_airport': 'KREC'})
+        assert self._stored(self.users[1]) == []
+        assert self._stored(self.users[0]) != []
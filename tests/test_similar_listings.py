@@ -0,0 +1,79 @@
+"""
+test_similar_listings.py — "Similar hangars" nearest-neighbour index.
+"""
+import pytest
+import similar_listings
+from conftest import make_owner, make_listing
+from models import Listing
+
+
+class TestSimilarListings:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        similar_listings.reset_index()
+        self.owner = make_owner(db, username='sim_owner', email='sim_owner@test.com')
+        spec = [
+            # icao, lat, lon, price, size, covered
+            ('KOSH', 43.98, -88.56, 600, 2000, True),    # the one we view
+            ('KATW', 44.26, -88.52, 650, 2100, True),    # nearby twin
+            ('KFLD', 43.77, -88.49, 590, 1900, False),   # nearby, uncovered
+            ('KLAX', 33.94, -118.41, 3000, 9000, False), # far and different
+        ]
+        self.listings = []
+        for icao, lat, lon, price, size, covered in spec:
+            l = make_listing(db, self.owner, icao=icao, price=price, size=size, covered=covered)
+            l.lat, l.lon = lat, lon
+            self.listings.append(l)
+        db.session.commit()
+        yield
+        for l in self.listings:
+            db.session.delete(l)
+        db.session.delete(self.owner)
+        db.session.commit()
+        similar_listings.reset_index()
+        app.limiter.enabled = True
+
+    def _ours(self, results):
+        ids = {l.id for l in self.listings}
+        return [l.id for l in results if l.id in ids]
+
+    def test_nearest_first_and_excludes_self(self):
+        base, twin, uncovered, far = self.listings
+        ranked = self._ours(similar_listings.similar_to(base, k=50))
+        assert base.id not in ranked
+        assert ranked[:2] == [twin.id, uncovered.id]
+        assert ranked.index(far.id) > 1
+
+    def test_incremental_insert_and_deactivate(self, db):
+        base = self.listings[0]
+        index = similar_listings.get_index()
+        clone = make_listing(db, self.owner, icao='KOSH', price=600, size=2000, covered=True)
+        clone.lat, clone.lon = 43.98, -88.56
+        db.session.commit()
+        self.listings.append(clone)
+        assert similar_listings.get_index() is index      # no rebuild
+        assert similar_listings.similar_to(base, k=1)[0].id == clone.id
+
+        clone.status = 'Inactive'
+        db.session.commit()
+        assert clone.id not in self._ours(similar_listings.similar_to(base, k=50))
+
+    def test_rolled_back_write_is_ignored(self, db):
+        base = self.listings[0]
+        similar_listings.get_index()
+        ghost = Listing(airport_icao='KOSH', price_month=600, size_sqft=2000, covered=True,
+                        owner_id=self.owner.id, status='Active', lat=43.98, lon=-88.56)
+        db.session.add(ghost)
+        db.session.flush()
+        ghost_id = ghost.id
+        db.session.rollback()
+        assert ghost_id not in similar_listings.get_index().slot
+        assert similar_listings.similar_to(base, k=1)[0].id != ghost_id
+
+    def test_detail_page_shows_panel(self, client):
+        r = client.get(f'/listing/{self.listings[0].id}')
+        assert r.status_code == 200
+        assert b'Similar Hangars' in r.data
+        assert b'KATW' in r.data
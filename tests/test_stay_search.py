@@ -0,0 +1,118 @@
+"""
+test_stay_search.py — date-range availability search (radius + anti-join + shared capacity).
+"""
+import datetime
+import random
+
+import pytest
+import stay_search
+from availability import is_available
+from capacity import aircraft_footprint
+from conftest import make_owner, make_listing
+from models import Booking
+from stay_search import StaySearch, airports_within, cached_search_ids, search_ids
+
+COORDS = {
+    'KOSH': (43.9844, -88.5570),
+    'KATW': (44.2581, -88.5191),     # ~16 nm
+    'KMKE': (42.9472, -87.8966),     # ~67 nm
+    'KORD': (41.9786, -87.9048),     # ~124 nm
+}
+JUL20, JUL26 = datetime.date(2026, 7, 20), datetime.date(2026, 7, 26)
+
+
+def _dt(d):
+    return datetime.datetime.combine(d, datetime.time.min)
+
+
+class TestStaySearch:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db, monkeypatch):
+        monkeypatch.setattr(stay_search, '_coords', lambda: COORDS)
+        monkeypatch.setattr(stay_search, '_airport_index', (0, [], []))
+        self.owner = make_owner(db, username='ss_owner', email='ss_owner@test.com')
+        self.listings = {}
+        for icao, size, night in [('KOSH', 2500, 90.0), ('KATW', 3000, 140.0),
+                                  ('KMKE', 3000, 60.0), ('KORD', 3000, 60.0)]:
+            l = make_listing(db, self.owner, icao=icao, size=size)
+            l.price_night = night
+            l.min_stay_nights = 1
+            self.listings[icao] = l
+        db.session.commit()
+        yield
+        ids = [l.id for l in self.listings.values()]
+        Booking.query.filter(Booking.listing_id.in_(ids)).delete()
+        for l in self.listings.values():
+            db.session.delete(l)
+        db.session.delete(self.owner)
+        db.session.commit()
+
+    def _book(self, db, icao, start, end, sqft=None, status='Confirmed'):
+        db.session.add(Booking(listing_id=self.listings[icao].id, renter_id=self.owner.id, total_price=1.0,
+                               start_date=_dt(start), end_date=_dt(end), footprint_sqft=sqft, status=status))
+        db.session.commit()
+
+    def _found(self, **kw):
+        s = StaySearch(JUL20, JUL26, **kw)
+        ids = set(search_ids(s, airports_within(s.airport, s.radius_nm) if s.airport else None))
+        return {icao for icao, l in self.listings.items() if l.id in ids}
+
+    def test_radius_prefilter(self):
+        assert airports_within('KOSH', 75) == ('KOSH', 'KATW', 'KMKE')
+        assert airports_within('KOSH', None) == ('KOSH',)
+        assert self._found(airport='KOSH', radius_nm=75) == {'KOSH', 'KATW', 'KMKE'}
+        assert self._found(airport='KOSH', radius_nm=75, max_night=100) == {'KOSH', 'KMKE'}
+
+    def test_whole_hangar_booking_is_anti_joined(self, db):
+        self._book(db, 'KATW', datetime.date(2026, 7, 25), datetime.date(2026, 7, 28))
+        self._book(db, 'KMKE', datetime.date(2026, 7, 26), datetime.date(2026, 7, 30))   # starts at checkout
+        assert self._found(airport='KOSH', radius_nm=75) == {'KOSH', 'KMKE'}
+
+    def test_shared_hangar_checked_night_by_night(self, db):
+        c172 = aircraft_footprint('Cessna 172')
+        # Two 172s that never overlap each other: the sum says full, the nights say room for one more
+        self._book(db, 'KOSH', datetime.date(2026, 7, 18), datetime.date(2026, 7, 22), sqft=c172)
+        self._book(db, 'KOSH', datetime.date(2026, 7, 23), datetime.date(2026, 7, 28), sqft=c172)
+        assert 'KOSH' in self._found(airport='KOSH', radius_nm=10, need_sqft=c172)
+        # A third 172 overlapping the first leaves less than one on 20–21 July
+        self._book(db, 'KOSH', datetime.date(2026, 7, 20), datetime.date(2026, 7, 21), sqft=c172)
+        assert 'KOSH' not in self._found(airport='KOSH', radius_nm=10, need_sqft=c172)
+        assert 'KOSH' in self._found(airport='KOSH', radius_nm=10, need_sqft=300)
+
+    def test_matches_per_listing_availability(self, db):
+        rng = random.Random(11)
+        for _ in range(40):
+            icao = rng.choice(list(COORDS))
+            start = JUL20 + datetime.timedelta(days=rng.randrange(-6, 8))
+            end = start + datetime.timedelta(days=rng.randrange(1, 5))
+            sqft = rng.choice([None, 400.0, 900.0, 1300.0])
+            self._book(db, icao, start, end, sqft, status=rng.choice(['Confirmed', 'Cancelled']))
+        for need in (None, 500.0, 1200.0):
+            expected = {icao for icao, l in self.listings.items()
+                        if is_available(l.id, JUL20, JUL26, sqft=need)}
+            assert self._found(need_sqft=need) & set(COORDS) == expected
+
+    def test_cached_until_a_booking_in_the_area(self, db, monkeypatch):
+        calls = []
+        real = stay_search.search_ids
+        monkeypatch.setattr(stay_search, 'search_ids', lambda s, codes=None: calls.append(1) or real(s, codes))
+        near = StaySearch(JUL20, JUL26, airport='KOSH', radius_nm=75)
+        far = StaySearch(JUL20, JUL26, airport='KORD', radius_nm=10)
+        for _ in range(3):
+            cached_search_ids(near)
+            cached_search_ids(far)
+        assert len(calls) == 2
+
+        self._book(db, 'KATW', JUL20, JUL26)
+        assert self.listings['KATW'].id not in cached_search_ids(near)
+        cached_search_ids(far)
+        assert len(calls) == 3
+
+    def test_listings_page_dated_radius_search(self, client):
+        page = client.get('/listings?airport=KOSH&within_nm=75&duration=&check_in=2026-07-20'
+                          '&check_out=2026-07-26&max_price=100').data.decode()
+        assert f'/listing/{self.listings["KOSH"].id}"' in page
+        assert f'/listing/{self.listings["KMKE"].id}"' in page
+        assert f'/listing/{self.listings["KATW"].id}"' not in page
+        assert f'/listing/{self.listings["KORD"].id}"' not in page
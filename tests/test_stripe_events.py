@@ -0,0 +1,194 @@
+"""
+test_stripe_events.py — idempotent, queued Stripe webhook processing (driven by fake_stripe).
+"""
+import datetime
+
+import pytest
+import fake_stripe
+import stripe_events
+from stripe_events import process_pending, MAX_ATTEMPTS
+from conftest import make_owner, make_user, make_listing, login_as
+from models import Booking, Payment, StripeEvent, User, WhiteLabelRequest
+
+SECRET = 'whsec_test_secret'
+
+
+class TestStripeWebhook:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, db):
+        app.limiter.enabled = False
+        app.config['STRIPE_WEBHOOK_SECRET'] = SECRET
+        self.owner = make_owner(db, username='se_owner', email='se_owner@test.com')
+        self.renter = make_user(db, username='se_renter', email='se_renter@test.com')
+        self.listing = make_listing(db, self.owner, icao='KSTR', size=3000)
+        self.listing.price_night = 100.0
+        db.session.commit()
+        yield
+        StripeEvent.query.delete()
+        WhiteLabelRequest.query.filter_by(fbo_name='SE Aviation').delete()
+        Payment.query.filter_by(user_id=self.renter.id).delete()
+        Booking.query.filter_by(listing_id=self.listing.id).delete()
+        for obj in [self.listing, self.owner, self.renter]:
+            db.session.delete(obj)
+        db.session.commit()
+        app.config['STRIPE_WEBHOOK_SECRET'] = ''
+        app.config['STRIPE_SECRET_KEY'] = ''
+        app.limiter.enabled = True
+
+    def _post(self, client, evt, secret=SECRET):
+        body, headers = fake_stripe.signed(evt, secret)
+        return client.post('/webhook/stripe', data=body, headers=headers)
+
+    def _hold(self, client):
+        login_as(client, self.renter)
+        client.post(f'/book/{self.listing.id}', data={
+            'start_date': '2026-12-01', 'end_date': '2026-12-04', 'booking_aircraft': 'Cessna 172'})
+        return Booking.query.filter_by(listing_id=self.listing.id, renter_id=self.renter.id).one()
+
+    def test_redelivered_event_is_applied_once(self, client, db):
+        booking = self._hold(client)
+        evt = fake_stripe.checkout_completed(booking.stripe_payment_id, {
+            'item_type': 'rental_booking', 'booking_id': booking.id}, payment_intent='pi_test_1')
+        statuses = [self._post(client, evt).get_json()['status'] for _ in range(3)]
+        assert statuses == ['queued', 'duplicate', 'duplicate']
+        assert StripeEvent.query.count() == 1
+
+        # Acknowledged before anything was applied
+        db.session.refresh(booking)
+        assert booking.status == 'Pending'
+
+        before = db.session.get(User, self.owner.id).total_revenue or 0.0
+        assert process_pending() == 1
+        assert process_pending() == 0
+        db.session.refresh(booking)
+        assert booking.status == 'Confirmed' and booking.sign_token_renter
+        payment = Payment.query.filter_by(stripe_session_id=booking.stripe_payment_id).one()
+        assert (payment.status, payment.stripe_payment_intent) == ('completed', 'pi_test_1')
+        owner = db.session.get(User, self.owner.id)
+        db.session.refresh(owner)
+        assert owner.total_revenue == pytest.approx(before + booking.total_price * 0.9)
+        assert db.session.get(StripeEvent, evt['id']).status == 'processed'
+
+    def test_late_payment_for_resold_space_is_not_confirmed(self, client, db):
+        booking = self._hold(client)
+        booking.hold_expires_at = datetime.datetime.utcnow() - datetime.timedelta(days=3)
+        db.session.add(Booking(listing_id=self.listing.id, renter_id=self.owner.id, total_price=1.0, status='Confirmed',
+                               start_date=datetime.datetime(2026, 12, 2), end_date=datetime.datetime(2026, 12, 3)))
+        db.session.commit()
+        before = db.session.get(User, self.owner.id).total_revenue or 0.0
+
+        evt = fake_stripe.event('checkout.session.async_payment_succeeded', fake_stripe.checkout_session(
+            booking.stripe_payment_id, {'item_type': 'rental_booking', 'booking_id': booking.id}))
+        self._post(client, evt)
+        assert process_pending() == 1
+        db.session.refresh(booking)
+        assert booking.status == 'Refund Due'
+        assert booking.sign_token_renter is None and booking.sign_token_owner is None
+        owner = db.session.get(User, self.owner.id)
+        db.session.refresh(owner)
+        assert (owner.total_revenue or 0.0) == before
+
+        r = client.get(f'/booking/success?session_id={booking.stripe_payment_id}')
+        assert r.status_code == 302 and '/sign-lease/' not in r.headers['Location']
+        with client.session_transaction() as session:
+            assert 'refunded' in session['_flashes'][-1][1]
+
+    def test_bad_signature_is_rejected_and_not_stored(self, client):
+        r = self._post(client, fake_stripe.subscription_deleted('sub_x'), secret='whsec_wrong')
+        assert r.status_code == 400
+        assert StripeEvent.query.count() == 0
+
+    def test_unsigned_event_needs_a_secret_or_dev_mode(self, app, client):
+        evt = fake_stripe.subscription_deleted('sub_unsigned')
+        app.config['STRIPE_WEBHOOK_SECRET'] = ''
+        app.config['STRIPE_SECRET_KEY'] = 'sk_test_local'
+        try:
+            assert client.post('/webhook/stripe', json=evt).status_code == 400
+            assert StripeEvent.query.count() == 0
+            app.config['STRIPE_WEBHOOK_ALLOW_UNSIGNED'] = True
+            assert client.post('/webhook/stripe', json=evt).get_json() == {'status': 'queued'}
+        finally:
+            app.config.pop('STRIPE_WEBHOOK_ALLOW_UNSIGNED')
+
+    def test_expired_checkout_releases_hold(self, client, db):
+        booking = self._hold(client)
+        self._post(client, fake_stripe.checkout_expired(booking.stripe_payment_id, {'item_type': 'rental_booking'}))
+        process_pending()
+        db.session.refresh(booking)
+        assert booking.status == 'Cancelled'
+        assert Payment.query.filter_by(stripe_session_id=booking.stripe_payment_id).one().status == 'failed'
+
+    def test_success_pages_read_local_state(self, app, client, db, monkeypatch):
+        import stripe
+
+        def no_stripe(*a, **kw):
+            raise AssertionError("success page called Stripe")
+
+        app.config['STRIPE_SECRET_KEY'] = 'sk_test_local'
+        monkeypatch.setattr(stripe.checkout.Session, 'retrieve', no_stripe)
+        db.session.add(Payment(user_id=self.renter.id, amount=9.99, item_type='premium_owner',
+                               stripe_session_id='cs_test_prem', status='pending'))
+        db.session.commit()
+        login_as(client, self.renter)
+
+        assert b'Confirming your payment' in client.get('/payment-success?session_id=cs_test_prem').data
+
+        self._post(client, fake_stripe.checkout_completed('cs_test_prem', {'item_type': 'premium_owner'},
+                                                          mode='subscription', customer='cus_se',
+                                                          subscription='sub_se'))
+        process_pending()
+        page = client.get('/payment-success?session_id=cs_test_prem')
+        assert b'Payment' in page.data and b'Confirming' not in page.data
+        renter = db.session.get(User, self.renter.id)
+        db.session.refresh(renter)
+        assert renter.subscription_tier == 'premium'
+        assert (renter.stripe_customer_id, renter.stripe_subscription_id) == ('cus_se', 'sub_se')
+
+        # Later lifecycle events find the user by the ids stored above
+        self._post(client, fake_stripe.invoice_paid('cus_se', 'sub_se', period_end=1893456000))
+        self._post(client, fake_stripe.subscription_deleted('sub_se', 'cus_se'))
+        assert process_pending() == 2
+        db.session.refresh(renter)
+        assert renter.subscription_expires.year == 2030
+        assert renter.subscription_tier == 'free' and not renter.is_premium
+
+    def test_white_label_matches_request_id(self, client, db):
+        req = WhiteLabelRequest(fbo_name='SE Aviation', contact_name='A', contact_email='a@se.test',
+                                status='Pending Payment')
+        other = WhiteLabelRequest(fbo_name='SE Aviation', contact_name='B', contact_email='b@se.test',
+                                  status='Pending Payment')
+        db.session.add_all([req, other])
+        db.session.commit()
+        self._post(client, fake_stripe.checkout_completed(None, {
+            'item_type': 'white_label_reservation', 'fbo_name': 'SE Aviation', 'request_id': other.id}))
+        process_pending()
+        db.session.refresh(req)
+        db.session.refresh(other)
+        assert (req.status, other.status) == ('Pending Payment', 'Paid')
+
+    def test_failing_event_is_retried_then_parked(self, client, db, monkeypatch):
+        def boom(obj):
+            raise RuntimeError("downstream unavailable")
+
+        monkeypatch.setitem(stripe_events.HANDLERS, 'customer.subscription.deleted', boom)
+        monkeypatch.setattr(stripe_events, 'RETRY_SECONDS', 0)
+        evt = fake_stripe.subscription_deleted('sub_missing')
+        self._post(client, evt)
+        process_pending()
+        assert process_pending() == 1
+        monkeypatch.setattr(stripe_events, 'RETRY_SECONDS', 3600)
+        assert process_pending() == 0          # backing off
+        monkeypatch.setattr(stripe_events, 'RETRY_SECONDS', 0)
+        for _ in range(MAX_ATTEMPTS + 2):
+            process_pending()
+        row = db.session.get(StripeEvent, evt['id'])
+        db.session.refresh(row)
+        assert (row.status, row.attempts) == ('failed', MAX_ATTEMPTS)
+        assert 'downstream unavailable' in row.last_error
+
+    def test_event_is_claimed_by_one_worker(self, client):
+        evt = fake_stripe.subscription_deleted('sub_claim')
+        self._post(client, evt)
+        assert stripe_events._claim(evt['id'], 'pending') is True
+        assert stripe_events._claim(evt['id'], 'pending') is False
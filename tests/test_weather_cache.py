@@ -0,0 +1,128 @@
+"""
+test_weather_cache.py — per-ICAO weather cache with stale-while-revalidate.
+"""
+import threading
+import time
+
+import pytest
+import weather_service
+from conftest import make_owner, make_listing
+from weather_service import RETRY_SECONDS, cached_airport_weather
+
+
+class _Inline:
+    """Executor stand-in: runs the refresh when the test says so."""
+
+    def __init__(self):
+        self.queued = []
+
+    def submit(self, fn, *args):
+        self.queued.append((fn, args))
+
+    def run(self):
+        while self.queued:
+            fn, args = self.queued.pop(0)
+            fn(*args)
+
+
+class TestWeatherCache:
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, app, monkeypatch):
+        self.now = 1000.0
+        self.calls = []
+        self.fail = False
+        self.pool = _Inline()
+
+        def fake_fetch(lat, lon, icao=''):
+            self.calls.append(icao)
+            if self.fail:
+                return None
+            return {'icao': icao, 'temp_f': 60 + len(self.calls), 'source': 'live'}
+
+        monkeypatch.setattr(weather_service, '_fetch_live', fake_fetch)
+        monkeypatch.setattr(weather_service, '_clock', lambda: self.now)
+        monkeypatch.setattr(weather_service, '_get_pool', lambda: self.pool)
+        monkeypatch.setitem(app.config, 'WEATHER_TTL_SECONDS', 600)
+        monkeypatch.setitem(app.config, 'WEATHER_MAX_STALE_SECONDS', 3600)
+        weather_service.clear_cache()
+        with app.app_context():
+            yield
+        weather_service.clear_cache()
+
+    def _get(self, icao='KOSH'):
+        return cached_airport_weather(44.0, -88.5, icao)
+
+    def test_fresh_entries_are_served_from_memory(self):
+        first = self._get()
+        self.now += 599
+        assert self._get() is first and self._get('kosh') is first
+        assert self.calls == ['KOSH']
+        self._get('KATW')
+        assert self.calls == ['KOSH', 'KATW']
+
+    def test_stale_is_served_while_one_refresh_runs(self):
+        first = self._get()
+        self.now += 700
+        assert self._get() is first and self._get() is first
+        assert self.calls == ['KOSH'] and len(self.pool.queued) == 1
+        self.pool.run()
+        assert self.calls == ['KOSH', 'KOSH']
+        assert self._get()['temp_f'] == first['temp_f'] + 1
+
+    def test_failures_keep_last_known_data(self):
+        first = self._get()
+        self.fail = True
+        self.now += 700
+        assert self._get() is first
+        self.pool.run()
+        assert self._get() is first and not self.pool.queued      # backing off, not re-queued
+        # Too old to show without trying, and the fetch fails: still the last-known data
+        self.now += 4000
+        assert self._get() is first
+        assert len(self.calls) == 3
+        self.now += RETRY_SECONDS - 1
+        assert self._get() is first and len(self.calls) == 3
+
+    def test_cold_failure_is_simulated_and_backs_off(self):
+        self.fail = True
+        weather = self._get('KFAIL')
+        assert weather['source'] == 'simulated' and weather['icao'] == 'KFAIL'
+        assert self._get('KFAIL') is weather and self.calls == ['KFAIL']
+        self.fail = False
+        self.now += RETRY_SECONDS
+        assert self._get('KFAIL')['source'] == 'live'
+
+    def test_concurrent_misses_share_one_fetch(self, monkeypatch):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_fetch(lat, lon, icao=''):
+            self.calls.append(icao)
+            started.set()
+            release.wait(5)
+            return {'icao': icao, 'source': 'live'}
+
+        monkeypatch.setattr(weather_service, '_fetch_live', slow_fetch)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self._get('KMSN'))) for _ in range(4)]
+        threads[0].start()
+        started.wait(5)
+        for t in threads[1:]:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join(5)
+        assert self.calls == ['KMSN'] and len(results) == 4
+
+    def test_listing_page_uses_the_cache(self, client, db):
+        owner = make_owner(db, username='wx_owner', email='wx_owner@test.com')
+        listing = make_listing(db, owner, icao='KWXC')
+        try:
+            for _ in range(3):
+                assert client.get(f'/listing/{listing.id}').status_code == 200
+            assert self.calls == ['KWXC']
+        finally:
+            db.session.delete(listing)
+            db.session.delete(owner)
+            db.session.commit()
@@ -0,0 +1,57 @@
+"""
+Offline trainer for the AI Rental Optimizer model.
+
+Run from cron / a Railway scheduled job (or by hand after a big import):
+    python train_pricing_model.py            # retrain only if listing data changed
+    python train_pricing_model.py --force    # always publish a new version
+    python train_pricing_model.py --evaluate # hold-out metrics, publishes nothing
+    python train_pricing_model.py --evaluate --json
+
+Web workers pick up the new version within pricing_model.RELOAD_CHECK_SECONDS.
+"""
+import argparse
+import json
+
+from app import app
+from models import Listing
+from pricing_model import build_training_rows, evaluate, train_and_publish, model_dir
+
+
+def print_report(report):
+    print(f"Hold-out evaluation: {report['n_train']} train rows "
+          f"({report['synthetic_rows']} synthetic), {report['n_test']} test rows, seed {report['seed']}")
+    print(f"{'model':<8} {'MAE':>9} {'RMSE':>9} {'MAPE%':>7} {'R2':>7} {'fit s':>7} {'ms/1k':>8}")
+    for name, m in report['models'].items():
+        print(f"{name:<8} {m['mae']:>9.2f} {m['rmse']:>9.2f} {m['mape_pct']:>7.2f} {m['r2']:>7.3f} "
+              f"{m['fit_seconds']:>7.2f} {m['infer_ms_per_1k']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and publish the rental optimizer model")
+    parser.add_argument('--force', action='store_true', help="publish even if training data is unchanged")
+    parser.add_argument('--model-dir', default=None, help="override PRICING_MODEL_DIR")
+    parser.add_argument('--evaluate', action='store_true', help="report hold-out metrics instead of publishing")
+    parser.add_argument('--seed', type=int, default=42, help="split / model seed for --evaluate")
+    parser.add_argument('--json', action='store_true', help="print the --evaluate report as JSON")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.evaluate:
+            report = evaluate(build_training_rows(Listing.query.all()), seed=args.seed)
+            if args.json:
+                print(json.dumps(report, indent=2))
+            else:
+                print_report(report)
+            return
+
+        directory = args.model_dir or model_dir()
+        artifact = train_and_publish(directory, force=args.force)
+        if artifact is None:
+            print(f"No change — current model in {directory} is up to date.")
+        else:
+            print(f"Published model {artifact.version} ({artifact.n_samples} rows, "
+                  f"fingerprint {artifact.fingerprint}) to {directory}")
+
+
+if __name__ == '__main__':
+    main()
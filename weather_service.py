@@ -4,19 +4,48 @@ weather_service.py — Airport weather + Go/No-Go decision engine.
 Uses OpenWeatherMap API to fetch current conditions at an airport's coordinates.
 Returns a structured dict with temperature, wind, visibility, conditions,
 and a Go/No-Go recommendation based on VFR pilot minimums.
+
+Airports in the bulk METAR feed (metar_feed.py) are answered from their
+latest observation — real wind, visibility, weather and ceiling — with no
+call at all. Everywhere else, listing pages go through
+cached_airport_weather(), a per-ICAO cache:
+
+    age < WEATHER_TTL_SECONDS           served from memory
+    age < WEATHER_MAX_STALE_SECONDS     served stale; one background refresh per
+                                        airport is queued (stale-while-revalidate)
+    older, or never fetched             fetched in the request
+
+A failed fetch never replaces what is cached: the last-known conditions keep
+being served and the airport is not retried for RETRY_SECONDS. Concurrent
+misses for one airport wait on a single fetch.
+
+Usage:
+    from weather_service import cached_airport_weather
+    weather = cached_airport_weather(listing.lat, listing.lon, listing.airport_icao)
 """
 
 import os
 import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_MAX_STALE_SECONDS = 3600
+RETRY_SECONDS = 60             # after a failed fetch, before that airport is tried again
+REFRESH_WORKERS = 2
+
 # VFR Go/No-Go thresholds
 WIND_CAUTION_KTS = 20      # Crosswind caution
 WIND_NOGO_KTS = 30         # Dangerous for GA
 VISIBILITY_MIN_MI = 3      # Below 3 SM = marginal VFR
 GUST_NOGO_KTS = 35         # Gusts above 35 kts
+CEILING_MIN_FT = 1000      # Below 1,000 ft AGL = IFR
+CEILING_MARGINAL_FT = 3000 # Below 3,000 ft AGL = marginal VFR
 STORM_KEYWORDS = {'thunderstorm', 'tornado', 'squall', 'hurricane', 'tropical storm'}
 ADVERSE_KEYWORDS = {'rain', 'snow', 'sleet', 'freezing', 'ice', 'fog', 'mist', 'haze', 'drizzle'}
 
@@ -35,13 +64,18 @@ def fetch_airport_weather(lat: float, lon: float, icao: str = '') -> Optional[di
     
     Returns None if API call fails or key not set.
     """
+    return _metar_weather(icao) or _fetch_live(lat, lon, icao) or _simulated_weather(icao)
+
+
+def _fetch_live(lat: float, lon: float, icao: str = '') -> Optional[dict]:
+    """One OpenWeatherMap call; simulated data when no key is set, None if the call fails."""
     api_key = os.environ.get('OPENWEATHER_API_KEY', '')
     if not api_key:
         logger.warning("[WEATHER] OPENWEATHER_API_KEY not set, returning simulated data")
         return _simulated_weather(icao)
 
     try:
-        import requests
+        from integrations import client
         url = f"https://api.openweathermap.org/data/2.5/weather"
         params = {
             'lat': lat,
@@ -49,10 +83,10 @@ def fetch_airport_weather(lat: float, lon: float, icao: str = '') -> Optional[di
             'appid': api_key,
             'units': 'imperial'  # Fahrenheit, mph
         }
-        resp = requests.get(url, params=params, timeout=5)
+        resp = client('openweathermap').get(url, params=params)
         if resp.status_code != 200:
             logger.warning(f"[WEATHER] API returned {resp.status_code}: {resp.text[:200]}")
-            return _simulated_weather(icao)
+            return None
 
         data = resp.json()
         return _parse_owm_response(data, icao)
@@ -62,7 +96,115 @@ def fetch_airport_weather(lat: float, lon: float, icao: str = '') -> Optional[di
         return _simulated_weather(icao)
     except Exception as e:
         logger.error(f"[WEATHER] Error fetching weather: {e}")
-        return _simulated_weather(icao)
+        return None
+
+
+# ── Per-ICAO cache ────────────────────────────────────────────────────────────
+
+_Entry = namedtuple('_Entry', 'data fetched_at retry_at')     # monotonic seconds
+
+_cache = {}                 # icao → _Entry
+_cache_lock = threading.Lock()
+_fetch_locks = {}           # icao → Lock held while fetching it in a request
+_refreshing = set()         # icaos with a background refresh queued
+_pool = None
+_clock = time.monotonic
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _cache_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='weather')
+        return _pool
+
+
+def _fetch_into_cache(lat, lon, icao) -> Optional[_Entry]:
+    """Fetch and store; on failure keep what was cached and back off. Returns the entry now cached."""
+    data = _fetch_live(lat, lon, icao)
+    now = _clock()
+    with _cache_lock:
+        old = _cache.get(icao)
+        if data is not None:
+            _cache[icao] = _Entry(data, now, None)
+        elif old is not None:
+            _cache[icao] = old._replace(retry_at=now + RETRY_SECONDS)
+        else:
+            # Nothing known yet: simulated conditions, never fresh, until the retry
+            _cache[icao] = _Entry(_simulated_weather(icao), float('-inf'), now + RETRY_SECONDS)
+        return _cache[icao]
+
+
+def _refresh(lat, lon, icao):
+    try:
+        _fetch_into_cache(lat, lon, icao)
+    except Exception as e:
+        logger.error(f"[WEATHER] background refresh of {icao} failed: {e}")
+    finally:
+        with _cache_lock:
+            _refreshing.discard(icao)
+
+
+def _backing_off(entry, now) -> bool:
+    return entry.retry_at is not None and now < entry.retry_at
+
+
+def _config(name, default):
+    try:
+        from flask import current_app
+        return current_app.config.get(name, default)
+    except RuntimeError:        # outside an app context
+        return default
+
+
+def cached_airport_weather(lat: float, lon: float, icao: str = '') -> Optional[dict]:
+    """fetch_airport_weather() through the per-ICAO cache (see module docstring)."""
+    key = (icao or 'UNKN').upper()
+    observed = _metar_weather(key)
+    if observed:
+        return observed
+    ttl = _config('WEATHER_TTL_SECONDS', DEFAULT_TTL_SECONDS)
+    max_stale = max(ttl, _config('WEATHER_MAX_STALE_SECONDS', DEFAULT_MAX_STALE_SECONDS))
+    now = _clock()
+
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and (now - entry.fetched_at < ttl or _backing_off(entry, now)):
+            return entry.data
+        if entry is not None and now - entry.fetched_at < max_stale:
+            if key not in _refreshing:
+                _refreshing.add(key)
+                queue = True
+            else:
+                queue = False
+        else:
+            queue = None
+        lock = _fetch_locks.setdefault(key, threading.Lock())
+
+    if queue is not None:
+        if queue:
+            try:
+                _get_pool().submit(_refresh, lat, lon, key)
+            except Exception as e:
+                logger.error(f"[WEATHER] could not queue refresh of {key}: {e}")
+                with _cache_lock:
+                    _refreshing.discard(key)
+        return entry.data
+
+    # Cold or too old to show without trying: one request per airport fetches, the rest wait for it
+    with lock:
+        with _cache_lock:
+            entry = _cache.get(key)
+        now = _clock()
+        if entry is None or (now - entry.fetched_at >= max_stale and not _backing_off(entry, now)):
+            entry = _fetch_into_cache(lat, lon, key)
+    return entry.data
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+        _refreshing.clear()
 
 
 def _parse_owm_response(data: dict, icao: str) -> dict:
@@ -117,8 +259,8 @@ def _parse_owm_response(data: dict, icao: str) -> dict:
     }
 
 
-def _evaluate_go_nogo(wind_kts, gust_kts, vis_mi, conditions, desc):
-    """Evaluate Go/No-Go based on VFR minimums."""
+def _evaluate_go_nogo(wind_kts, gust_kts, vis_mi, conditions, desc, ceiling_ft=None):
+    """Evaluate Go/No-Go based on VFR minimums (ceiling only when observed, i.e. from a METAR)."""
     reasons = []
     status = 'GO'
 
@@ -147,6 +289,14 @@ def _evaluate_go_nogo(wind_kts, gust_kts, vis_mi, conditions, desc):
         if status != 'NO-GO':
             status = 'CAUTION'
 
+    # Ceiling
+    if ceiling_ft is not None and ceiling_ft < CEILING_MIN_FT:
+        reasons.append(f'Ceiling {ceiling_ft:,.0f} ft — below VFR min')
+        return 'NO-GO', reasons
+    elif ceiling_ft is not None and ceiling_ft < CEILING_MARGINAL_FT:
+        reasons.append(f'Ceiling {ceiling_ft:,.0f} ft — marginal')
+        status = 'CAUTION'
+
     # Adverse conditions
     if any(kw in desc_lower for kw in ADVERSE_KEYWORDS):
         reasons.append(f'Adverse conditions: {desc.title()}')
@@ -176,6 +326,95 @@ def _assess_storm_risk(conditions, description, gust_kts):
     return 'Low', False
 
 
+# ── METAR observations (metar_feed.py) ───────────────────────────────────────
+
+WX_WORDS = {
+    'TS': 'thunderstorm', 'RA': 'rain', 'SN': 'snow', 'DZ': 'drizzle', 'FZ': 'freezing',
+    'PL': 'sleet', 'GR': 'hail', 'GS': 'small hail', 'IC': 'ice crystals', 'UP': 'unknown precipitation',
+    'BR': 'mist', 'FG': 'fog', 'HZ': 'haze', 'FU': 'smoke', 'DU': 'dust', 'SA': 'sand', 'VA': 'volcanic ash',
+    'SQ': 'squall', 'FC': 'tornado', 'SH': 'showers', 'BL': 'blowing', 'DR': 'drifting', 'MI': 'shallow',
+    'BC': 'patches', 'PR': 'partial', 'SS': 'sandstorm', 'DS': 'duststorm', 'PO': 'dust whirls',
+}
+# First match wins: (METAR code, OpenWeatherMap-style condition, icon)
+WX_CONDITIONS = [
+    ('TS', 'Thunderstorm', '11d'), ('FC', 'Thunderstorm', '11d'), ('SQ', 'Squall', '11d'),
+    ('SN', 'Snow', '13d'), ('PL', 'Snow', '13d'), ('GR', 'Snow', '13d'), ('GS', 'Snow', '13d'),
+    ('RA', 'Rain', '10d'), ('UP', 'Rain', '10d'), ('DZ', 'Drizzle', '09d'),
+    ('FG', 'Fog', '50d'), ('BR', 'Mist', '50d'), ('HZ', 'Haze', '50d'), ('FU', 'Smoke', '50d'),
+]
+SKY_DESCRIPTIONS = {
+    'FEW': ('Clouds', 'few clouds', '02d'), 'SCT': ('Clouds', 'scattered clouds', '03d'),
+    'BKN': ('Clouds', 'broken clouds', '04d'), 'OVC': ('Clouds', 'overcast clouds', '04d'),
+    'OVX': ('Fog', 'sky obscured', '50d'), 'VV': ('Fog', 'sky obscured', '50d'),
+}
+
+
+def _describe_wx(wx: str) -> str:
+    """'-SHRA BR' → 'light showers rain, mist'."""
+    phrases = []
+    for token in wx.split():
+        words = []
+        if token.startswith('-'):
+            words.append('light')
+        elif token.startswith('+'):
+            words.append('heavy')
+        token = token.lstrip('+-')
+        if token.startswith('VC'):
+            words.append('nearby')
+            token = token[2:]
+        words += [WX_WORDS.get(token[i:i + 2], token[i:i + 2]) for i in range(0, len(token), 2)]
+        phrases.append(' '.join(words))
+    return ', '.join(phrases)
+
+
+def _metar_weather(icao: str) -> Optional[dict]:
+    """Weather dict from the airport's latest METAR (plus TAF), or None if the feed hasn't got one."""
+    import metar_feed
+    obs = metar_feed.metar(icao)
+    if obs is None:
+        return None
+    codes = obs.wx.replace('+', ' ').replace('-', ' ')
+    match = next(((cond, icon) for code, cond, icon in WX_CONDITIONS if code in codes), None)
+    sky = SKY_DESCRIPTIONS.get(obs.cover, ('Clear', 'clear sky', '01d'))
+    if match:
+        conditions, icon = match
+        description = _describe_wx(obs.wx)
+    else:
+        conditions, description, icon = sky
+        if obs.wx:
+            description = _describe_wx(obs.wx)
+
+    visibility_mi = obs.visibility_mi if obs.visibility_mi is not None else 10.0
+    go_nogo, reasons = _evaluate_go_nogo(obs.wind_kt, obs.gust_kt, visibility_mi, conditions, description,
+                                         ceiling_ft=obs.ceiling_ft)
+    storm_risk, covered_suggestion = _assess_storm_risk(conditions, description, obs.gust_kt)
+    temp_c = obs.temp_c if obs.temp_c is not None else 15.0
+    forecast = metar_feed.taf(icao)
+
+    return {
+        'temp_f': round(temp_c * 9 / 5 + 32),
+        'temp_c': round(temp_c, 1),
+        'wind_speed_kts': obs.wind_kt,
+        'wind_gust_kts': obs.gust_kt,
+        'wind_dir': obs.wind_dir if obs.wind_dir is not None else 'VRB',
+        'visibility_mi': visibility_mi,
+        'conditions': conditions,
+        'description': description.title(),
+        'icon': icon,
+        'go_nogo': go_nogo,
+        'go_nogo_reasons': reasons,
+        'storm_risk': storm_risk,
+        'covered_suggestion': covered_suggestion,
+        'icao': obs.station,
+        'source': 'metar',
+        'ceiling_ft': obs.ceiling_ft,
+        'flight_category': obs.category,
+        'observed_at': obs.observed_at,
+        'raw_metar': obs.raw,
+        'raw_taf': forecast.raw if forecast else None,
+    }
+
+
 def _simulated_weather(icao: str) -> dict:
     """
     Return simulated weather data when API key isn't set.